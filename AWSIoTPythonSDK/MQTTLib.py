@@ -21,6 +21,7 @@ from AWSIoTPythonSDK.core.util.providers import EndpointProvider
 from AWSIoTPythonSDK.core.jobs.thingJobManager import jobExecutionTopicType
 from AWSIoTPythonSDK.core.jobs.thingJobManager import jobExecutionTopicReplyType
 from AWSIoTPythonSDK.core.protocol.mqtt_core import MqttCore
+from AWSIoTPythonSDK.core.protocol.async_mqtt_core import AsyncMqttCore
 import AWSIoTPythonSDK.core.shadow.shadowManager as shadowManager
 import AWSIoTPythonSDK.core.shadow.deviceShadow as deviceShadow
 import AWSIoTPythonSDK.core.jobs.thingJobManager as thingJobManager
@@ -33,9 +34,23 @@ MQTTv3_1_1 = 4
 DROP_OLDEST = 0
 DROP_NEWEST = 1
 
+# - Write modes:
+WRITE_MODE_THROUGHPUT = 0
+WRITE_MODE_LATENCY = 1
+
+# - Outbound queue full policies:
+OUTBOUND_QUEUE_BLOCK = 0
+OUTBOUND_QUEUE_FAIL_FAST = 1
+OUTBOUND_QUEUE_DROP_QOS0 = 2
+
+# - Inbound queue full policies:
+INBOUND_QUEUE_DROP_OLDEST_QOS0 = 0
+INBOUND_QUEUE_DROP_NEWEST_QOS0 = 1
+INBOUND_QUEUE_PAUSE_READING = 2
+
 class AWSIoTMQTTClient:
 
-    def __init__(self, clientID, protocolType=MQTTv3_1_1, useWebsocket=False, cleanSession=True):
+    def __init__(self, clientID, protocolType=MQTTv3_1_1, useWebsocket=False, cleanSession=True, networkReactor=None):
         """
 
         The client class that connects to and accesses AWS IoT over MQTT v3.1/3.1.1.
@@ -69,6 +84,10 @@ class AWSIoTMQTTClient:
           myAWSIoTMQTTClient = AWSIoTPyMQTT.AWSIoTMQTTClient("testIoTPySDK")
           # Create an AWS IoT MQTT Client using Websocket SigV4
           myAWSIoTMQTTClient = AWSIoTPyMQTT.AWSIoTMQTTClient("testIoTPySDK", useWebsocket=True)
+          # Create many AWS IoT MQTT Clients whose network I/O shares a single thread
+          from AWSIoTPythonSDK.core.protocol.paho.reactor import NetworkReactor
+          reactor = NetworkReactor()
+          myAWSIoTMQTTClients = [AWSIoTPyMQTT.AWSIoTMQTTClient("testIoTPySDK%d" % i, networkReactor=reactor) for i in range(100)]
 
         **Parameters**
 
@@ -80,12 +99,20 @@ class AWSIoTMQTTClient:
 
         *useWebsocket* - Boolean that denotes enabling MQTT over Websocket SigV4 or not.
 
+        *cleanSession* - Boolean that denotes starting a clean MQTT session or not.
+
+        *networkReactor* - :code:`AWSIoTPythonSDK.core.protocol.paho.reactor.NetworkReactor` that runs
+        the network I/O of this client together with that of the other clients sharing it, on a fixed
+        number of threads multiplexed with epoll/select. If None (default), the client uses a dedicated
+        network thread. Reconnects and TLS handshakes run on the shared thread, so a slow handshake
+        delays the other clients served by it.
+
         **Returns**
 
         :code:`AWSIoTPythonSDK.MQTTLib.AWSIoTMQTTClient` object
 
         """
-        self._mqtt_core = MqttCore(clientID, cleanSession, protocolType, useWebsocket)
+        self._mqtt_core = MqttCore(clientID, cleanSession, protocolType, useWebsocket, networkReactor)
 
     # Configuration APIs
     def configureLastWill(self, topic, payload, QoS, retain=False):
@@ -276,7 +303,7 @@ class AWSIoTMQTTClient:
         """
         self._mqtt_core.configure_reconnect_back_off(baseReconnectQuietTimeSecond, maxReconnectQuietTimeSecond, stableConnectionTimeSecond)
 
-    def configureOfflinePublishQueueing(self, queueSize, dropBehavior=DROP_NEWEST):
+    def configureOfflinePublishQueueing(self, queueSize, dropBehavior=DROP_NEWEST, maxQueuedBytes=0):
         """
         **Description**
 
@@ -292,58 +319,1453 @@ class AWSIoTMQTTClient:
           # Configure the offline queue for publish requests to be 20 in size and drop the oldest
            request when the queue is full.
           myAWSIoTMQTTClient.configureOfflinePublishQueueing(20, AWSIoTPyMQTT.DROP_OLDEST)
+          # Configure an infinite offline queue that holds at most 1 MB of topics and payloads
+          myAWSIoTMQTTClient.configureOfflinePublishQueueing(-1, AWSIoTPyMQTT.DROP_OLDEST, 1024 * 1024)
 
         **Parameters**
 
         *queueSize* - Size of the queue for offline publish requests queueing.
          If set to 0, the queue is disabled. If set to -1, the queue size is set to be infinite.
 
-        *dropBehavior* - the type of drop behavior when the queue is full.
-         Could be :code:`AWSIoTPythonSDK.core.util.enums.DropBehaviorTypes.DROP_OLDEST` or
-         :code:`AWSIoTPythonSDK.core.util.enums.DropBehaviorTypes.DROP_NEWEST`.
+        *dropBehavior* - the type of drop behavior when the queue is full.
+         Could be :code:`AWSIoTPythonSDK.core.util.enums.DropBehaviorTypes.DROP_OLDEST` or
+         :code:`AWSIoTPythonSDK.core.util.enums.DropBehaviorTypes.DROP_NEWEST`.
+
+        *maxQueuedBytes* - Maximum total size, in bytes of topics and payloads, of the queued requests. The queue
+         is full once either this or :code:`queueSize` is reached; with :code:`DROP_OLDEST`, as many of the oldest
+         requests are dropped as it takes to make room. A single request larger than this is always dropped.
+         If set to 0, the size in bytes is unlimited.
+
+        **Returns**
+
+        None
+
+        """
+        self._mqtt_core.configure_offline_requests_queue(queueSize, dropBehavior, maxQueuedBytes)
+
+    def configurePersistentOfflinePublishQueueing(self, directory, maxQueuedBytes=0, dropBehavior=DROP_NEWEST):
+        """
+        **Description**
+
+        Used to configure offline publish requests to be queued on disk, under the given directory, instead of
+        in memory. Queued publish requests survive a restart of the process and are sent once the client next
+        connects with the same directory configured. Should be called before connect. Subscribe and unsubscribe
+        requests are still queued in memory, and are sent before the publish requests.
+
+        Publish requests are delivered at least once. A QoS1 publish request stays on disk until AWS IoT 
+        acknowledges it, a QoS0 one until it is written to the socket. After a crash, the requests not yet 
+        acknowledged, along with some sent during the last second or so before it, are sent again.
+
+        **Syntax**
+
+        .. code:: python
+
+          import AWSIoTPythonSDK.MQTTLib as AWSIoTPyMQTT
+
+          # Queue offline publish requests on disk, holding at most 1 GB of topics and payloads
+          myAWSIoTMQTTClient.configurePersistentOfflinePublishQueueing("/var/lib/my-device/queue", 1024 * 1024 * 1024)
+
+        **Parameters**
+
+        *directory* - Directory that holds the queue files. It is created if it does not exist, and must not be
+         shared with another client.
+
+        *maxQueuedBytes* - Maximum total size, in bytes, of the queued publish requests as stored on disk, which
+         is their topics and payloads plus 5 bytes each. If set to 0, only the disk limits the queue.
+
+        *dropBehavior* - the type of drop behavior when the queue is full.
+         Could be :code:`AWSIoTPythonSDK.core.util.enums.DropBehaviorTypes.DROP_OLDEST` or
+         :code:`AWSIoTPythonSDK.core.util.enums.DropBehaviorTypes.DROP_NEWEST`.
+
+        **Returns**
+
+        None
+
+        """
+        self._mqtt_core.configure_persistent_offline_requests_queue(directory, maxQueuedBytes, dropBehavior)
+
+    def configureDrainingFrequency(self, frequencyInHz):
+        """
+        **Description**
+
+        Used to configure the draining speed to clear up the queued requests when the connection is back.
+        Should be called before connect.
+
+        **Syntax**
+
+        .. code:: python
+
+          # Configure the draining speed to be 2 requests/second
+          myAWSIoTMQTTClient.configureDrainingFrequency(2)
+
+        .. note::
+
+          Make sure the draining speed is fast enough and faster than the publish rate. Slow draining 
+          could result in inifinite draining process.
+
+        **Parameters**
+
+        *frequencyInHz* - The draining speed to clear the queued requests, in requests/second.
+
+        **Returns**
+
+        None
+
+        """
+        self._mqtt_core.configure_draining_interval_sec(1/float(frequencyInHz))
+
+    def configureAdaptiveDraining(self, maxInFlightPublishes, initialRatePerSecond=10, rateIncreasePerSecond=10,
+                                  maxAckLatencySecond=1.0):
+        """
+        **Description**
+
+        Used to configure the queued requests to be drained without waiting for each PUBACK, at a rate that adapts
+        to the connection. Up to :code:`maxInFlightPublishes` QoS1 publishes are sent ahead of their PUBACKs. The
+        rate starts at :code:`initialRatePerSecond` and goes up by :code:`rateIncreasePerSecond` every second that
+        PUBACKs keep coming back within :code:`maxAckLatencySecond`. It is halved when one takes longer, or when
+        the connection drops. The draining frequency set with :code:`configureDrainingFrequency` remains the
+        highest rate, so raise it as well. Should be called before connect.
+
+        **Syntax**
+
+        .. code:: python
+
+          # Drain at up to 100 requests/second, with up to 20 publishes waiting for their PUBACKs
+          myAWSIoTMQTTClient.configureDrainingFrequency(100)
+          myAWSIoTMQTTClient.configureAdaptiveDraining(20)
+          # Go back to sending one request per draining interval
+          myAWSIoTMQTTClient.configureAdaptiveDraining(0)
+
+        **Parameters**
+
+        *maxInFlightPublishes* - Maximum number of drained QoS1 publishes waiting for their PUBACKs. If set to 0,
+        adaptive draining is disabled.
+
+        *initialRatePerSecond* - Draining rate to start with, in requests/second. The rate is never halved below it,
+         or below half the draining frequency if that is lower.
+
+        *rateIncreasePerSecond* - How much the draining rate goes up per second of timely PUBACKs, in requests/second.
+
+        *maxAckLatencySecond* - PUBACK latency, in seconds, above which the draining rate is halved.
+
+        **Returns**
+
+        None
+
+        """
+        self._mqtt_core.configure_adaptive_draining(maxInFlightPublishes, initialRatePerSecond, rateIncreasePerSecond,
+                                                    maxAckLatencySecond)
+
+    def getDrainingProgress(self):
+        """
+        **Description**
+
+        Used to get the progress of draining the queued offline requests.
+
+        **Syntax**
+
+        .. code:: python
+
+          progress = myAWSIoTMQTTClient.getDrainingProgress()
+          print("%d sent, %d to go" % (progress["drained"], progress["remaining"]))
+
+        **Parameters**
+
+        None
+
+        **Returns**
+
+        A dict with the number of requests sent by the current or last draining (:code:`drained`), the number of
+        requests still queued (:code:`remaining`), the number of drained QoS1 publishes waiting for their PUBACKs
+        (:code:`in_flight`) and the current draining rate in requests/second (:code:`rate`).
+
+        """
+        return self._mqtt_core.get_draining_progress()
+
+    def configureMaxTopicsPerSubscribe(self, maxTopics):
+        """
+        **Description**
+
+        Used to configure how many topics are resubscribed to per SUBSCRIBE packet when the connection is back.
+        Defaults to 8, the most AWS IoT accepts in one packet. Should be called before connect.
+
+        **Syntax**
+
+        .. code:: python
+
+          # Resubscribe one topic per SUBSCRIBE packet
+          myAWSIoTMQTTClient.configureMaxTopicsPerSubscribe(1)
+
+        **Parameters**
+
+        *maxTopics* - Maximum number of topics in each resubscribe SUBSCRIBE packet. Must be positive.
+
+        **Returns**
+
+        None
+
+        """
+        if maxTopics < 1:
+            raise ValueError("Max topics per subscribe must be positive.")
+        self._mqtt_core.configure_max_topics_per_subscribe(maxTopics)
+
+    def configureMessageDispatchPool(self, workerCount, queueSize=0):
+        """
+        **Description**
+
+        Used to run subscription message callbacks on a pool of worker threads instead of one after another on
+        the single event dispatching thread, so that slow callbacks do not cap the receive throughput of the
+        client. Messages on the same topic always go to the same worker and are delivered in the order they were
+        received; messages on different topics may be delivered concurrently. Disabled by default. Should be
+        called before connect.
+
+        **Syntax**
+
+        .. code:: python
+
+          # Run message callbacks on 4 worker threads, with at most 100 messages waiting per worker
+          myAWSIoTMQTTClient.configureMessageDispatchPool(4, 100)
+          # Go back to delivering messages on the event dispatching thread
+          myAWSIoTMQTTClient.configureMessageDispatchPool(0)
+
+        **Parameters**
+
+        *workerCount* - Number of worker threads running message callbacks. If set to 0, the pool is disabled
+         and message callbacks run on the event dispatching thread.
+
+        *queueSize* - Maximum number of messages waiting for each worker. Once a worker's queue is full, event
+         dispatching waits for room instead of dropping messages. If set to 0, the queues are unbounded. On
+         disconnect, queued messages are still delivered, except those of a worker whose queue is full.
+
+        **Returns**
+
+        None
+
+        """
+        if workerCount < 0:
+            raise ValueError("Worker count must not be negative.")
+        if queueSize < 0:
+            raise ValueError("Queue size must not be negative.")
+        self._mqtt_core.configure_message_dispatch_pool(workerCount, queueSize)
+
+    def configureMessageProcessPool(self, processCount, batchSize=100, batchLatencySecond=0.01):
+        """
+        **Description**
+
+        Used to set up a pool of worker processes for CPU-heavy message processing, such as decoding or
+        decompressing payloads, that would otherwise be limited to one core by the GIL. Subscriptions made with a
+        :code:`processHandler` send each message's topic and payload to the pool, gathered into batches to cut the
+        inter-process overhead, and get the handler's results back on their message callback in this process.
+        The worker processes are started by this call and again by each connect, and stopped by disconnect, so this
+        is best called before connect and before starting other threads. Calling this again replaces the pool;
+        subscriptions made through the previous pool need to be made again.
+
+        **Syntax**
+
+        .. code:: python
+
+          import multiprocessing
+
+          # One worker process per core, batches of up to 100 messages sent at most 10 ms after their first message
+          myAWSIoTMQTTClient.configureMessageProcessPool(multiprocessing.cpu_count())
+          # Disable the pool
+          myAWSIoTMQTTClient.configureMessageProcessPool(0)
+
+        **Parameters**
+
+        *processCount* - Number of worker processes. If set to 0, the pool is disabled.
+
+        *batchSize* - Maximum number of messages sent to the pool in one batch.
+
+        *batchLatencySecond* - Maximum time, in seconds, a message waits for its batch to fill up before the batch
+         is sent anyway.
+
+        **Returns**
+
+        None
+
+        """
+        if processCount < 0:
+            raise ValueError("Process count must not be negative.")
+        if batchSize <= 0:
+            raise ValueError("Batch size must be positive.")
+        if batchLatencySecond < 0:
+            raise ValueError("Batch latency must not be negative.")
+        self._mqtt_core.configure_message_process_pool(processCount, batchSize, batchLatencySecond)
+
+    def configureWriteMode(self, writeMode):
+        """
+        **Description**
+
+        Used to configure how outbound MQTT packets are written to the network. Should be called before connect.
+
+        **Syntax**
+
+        .. code:: python
+
+          import AWSIoTPythonSDK.MQTTLib as AWSIoTPyMQTT
+
+          # Write each publish straight from the publishing thread
+          myAWSIoTMQTTClient.configureWriteMode(AWSIoTPyMQTT.WRITE_MODE_LATENCY)
+
+        **Parameters**
+
+        *writeMode* - Could be :code:`AWSIoTPythonSDK.MQTTLib.WRITE_MODE_THROUGHPUT` (default), where the network
+         thread gathers all pending packets into as few socket writes (and TLS records) as possible, or
+         :code:`AWSIoTPythonSDK.MQTTLib.WRITE_MODE_LATENCY`, where publish requests write their packet to the socket
+         from the calling thread whenever the socket can take it, without waiting for the network thread.
+
+        **Returns**
+
+        None
+
+        """
+        if writeMode not in (WRITE_MODE_THROUGHPUT, WRITE_MODE_LATENCY):
+            raise ValueError("Invalid write mode.")
+        self._mqtt_core.configure_write_mode(writeMode)
+
+    def configureOutboundQueueLimit(self, maxQueuedBytes, queueFullPolicy=OUTBOUND_QUEUE_BLOCK):
+        """
+        **Description**
+
+        Used to configure the high-water mark, in bytes, of the outbound packet queue, which holds MQTT packets
+        waiting to be written to the network, and the behavior of publish requests once the queue reaches it.
+        Only applies while the client is connected; offline requests go to the offline requests queue instead.
+
+        **Syntax**
+
+        .. code:: python
+
+          import AWSIoTPythonSDK.MQTTLib as AWSIoTPyMQTT
+
+          # Keep at most 1 MB of outbound packets and fail fast once it is reached
+          myAWSIoTMQTTClient.configureOutboundQueueLimit(1024 * 1024, AWSIoTPyMQTT.OUTBOUND_QUEUE_FAIL_FAST)
+
+        **Parameters**
+
+        *maxQueuedBytes* - High-water mark of the outbound packet queue, in bytes. If set to 0, the queue size is
+         unlimited.
+
+        *queueFullPolicy* - What a publish request does when the queue is at its high-water mark.
+         Could be :code:`AWSIoTPythonSDK.MQTTLib.OUTBOUND_QUEUE_BLOCK`, which waits for room for up to the MQTT
+         operation timeout and then raises :code:`publishTimeoutException`,
+         :code:`AWSIoTPythonSDK.MQTTLib.OUTBOUND_QUEUE_FAIL_FAST`, which raises
+         :code:`publishOutboundQueueFullException` immediately, or
+         :code:`AWSIoTPythonSDK.MQTTLib.OUTBOUND_QUEUE_DROP_QOS0`, which silently drops QoS0 publish requests and
+         raises :code:`publishOutboundQueueFullException` for QoS1 ones. A dropped publish request makes
+         :code:`publish` return False and :code:`publishAsync` return
+         :code:`AWSIoTPythonSDK.core.protocol.internal.events.FixedEventMids.DROPPED_MID`.
+
+        **Returns**
+
+        None
+
+        """
+        if maxQueuedBytes < 0:
+            raise ValueError("Max queued bytes must not be negative.")
+        if queueFullPolicy not in (OUTBOUND_QUEUE_BLOCK, OUTBOUND_QUEUE_FAIL_FAST, OUTBOUND_QUEUE_DROP_QOS0):
+            raise ValueError("Invalid outbound queue full policy.")
+        self._mqtt_core.configure_outbound_queue_limit(maxQueuedBytes, queueFullPolicy)
+
+    def getOutboundQueuedBytes(self):
+        """
+        **Description**
+
+        Used to get the number of bytes currently waiting in the outbound packet queue.
+
+        **Syntax**
+
+        .. code:: python
+
+          myAWSIoTMQTTClient.getOutboundQueuedBytes()
+
+        **Parameters**
+
+        None
+
+        **Returns**
+
+        Number of queued outbound bytes.
+
+        """
+        return self._mqtt_core.get_outbound_queued_bytes()
+
+    def configureInboundQueueLimit(self, maxQueuedMessages, maxQueuedBytes=0, queueFullPolicy=INBOUND_QUEUE_PAUSE_READING):
+        """
+        **Description**
+
+        Used to put a ceiling on the inbound event queue, which holds received messages waiting for the event
+        dispatching thread to run their callbacks, and to choose what happens once it is reached. Without a limit,
+        a subscription receiving messages faster than its callbacks handle them grows the queue without bound.
+        Acks, connack and disconnect events do not count towards the limit and are never dropped.
+
+        **Syntax**
+
+        .. code:: python
+
+          import AWSIoTPythonSDK.MQTTLib as AWSIoTPyMQTT
+
+          # Keep at most 1000 messages or 1 MB of received messages, dropping the oldest QoS0 ones beyond that
+          myAWSIoTMQTTClient.configureInboundQueueLimit(1000, 1024 * 1024, AWSIoTPyMQTT.INBOUND_QUEUE_DROP_OLDEST_QOS0)
+          # Keep at most 1000 received messages and stop reading from the network until they are handled
+          myAWSIoTMQTTClient.configureInboundQueueLimit(1000)
+
+        **Parameters**
+
+        *maxQueuedMessages* - Maximum number of messages in the queue. If set to 0, the number is unlimited.
+
+        *maxQueuedBytes* - Maximum total size, in bytes of topic and payload, of the messages in the queue. If set to
+         0, the size is unlimited.
+
+        *queueFullPolicy* - What happens to a received message that does not fit.
+         Could be :code:`AWSIoTPythonSDK.MQTTLib.INBOUND_QUEUE_DROP_OLDEST_QOS0`, which drops the oldest queued QoS0
+         messages to make room, :code:`AWSIoTPythonSDK.MQTTLib.INBOUND_QUEUE_DROP_NEWEST_QOS0`, which drops the
+         received message if it is QoS0, or :code:`AWSIoTPythonSDK.MQTTLib.INBOUND_QUEUE_PAUSE_READING`, which
+         queues the message and stops reading from the network until the queue is down to half its limits, so
+         that TCP and the broker's QoS1 flow control hold back further messages. QoS1 messages are never dropped;
+         when one does not fit under a drop policy, reading is paused as well. Reading stays paused for as long as
+         the callbacks take to catch up, so a pause longer than the keepalive interval may be seen as a
+         lost connection.
+
+        **Returns**
+
+        None
+
+        """
+        if maxQueuedMessages < 0:
+            raise ValueError("Max queued messages must not be negative.")
+        if maxQueuedBytes < 0:
+            raise ValueError("Max queued bytes must not be negative.")
+        if queueFullPolicy not in (INBOUND_QUEUE_DROP_OLDEST_QOS0, INBOUND_QUEUE_DROP_NEWEST_QOS0, INBOUND_QUEUE_PAUSE_READING):
+            raise ValueError("Invalid inbound queue full policy.")
+        self._mqtt_core.configure_inbound_queue_limit(maxQueuedMessages, maxQueuedBytes, queueFullPolicy)
+
+    def getInboundDroppedMessageCount(self):
+        """
+        **Description**
+
+        Used to get the number of received messages dropped so far because the inbound event queue was full.
+
+        **Syntax**
+
+        .. code:: python
+
+          myAWSIoTMQTTClient.getInboundDroppedMessageCount()
+
+        **Parameters**
+
+        None
+
+        **Returns**
+
+        Number of dropped inbound messages.
+
+        """
+        return self._mqtt_core.get_inbound_dropped_message_count()
+
+    def getInboundDroppedByteCount(self):
+        """
+        **Description**
+
+        Used to get the total size, in bytes of topic and payload, of the received messages dropped so far because
+        the inbound event queue was full.
+
+        **Syntax**
+
+        .. code:: python
+
+          myAWSIoTMQTTClient.getInboundDroppedByteCount()
+
+        **Parameters**
+
+        None
+
+        **Returns**
+
+        Number of dropped inbound bytes.
+
+        """
+        return self._mqtt_core.get_inbound_dropped_byte_count()
+
+    def configureConnectDisconnectTimeout(self, timeoutSecond):
+        """
+        **Description**
+
+        Used to configure the time in seconds to wait for a CONNACK or a disconnect to complete. 
+        Should be called before connect.
+
+        **Syntax**
+
+        .. code:: python
+
+          # Configure connect/disconnect timeout to be 10 seconds
+          myAWSIoTMQTTClient.configureConnectDisconnectTimeout(10)
+
+        **Parameters**
+
+        *timeoutSecond* - Time in seconds to wait for a CONNACK or a disconnect to complete.
+
+        **Returns**
+
+        None
+
+        """
+        self._mqtt_core.configure_connect_disconnect_timeout_sec(timeoutSecond)
+
+    def configureMQTTOperationTimeout(self, timeoutSecond):
+        """
+        **Description**
+
+        Used to configure the timeout in seconds for MQTT QoS 1 publish, subscribe and unsubscribe. 
+        Should be called before connect.
+
+        **Syntax**
+
+        .. code:: python
+
+          # Configure MQTT operation timeout to be 5 seconds
+          myAWSIoTMQTTClient.configureMQTTOperationTimeout(5)
+
+        **Parameters**
+
+        *timeoutSecond* - Time in seconds to wait for a PUBACK/SUBACK/UNSUBACK.
+
+        **Returns**
+
+        None
+
+        """
+        self._mqtt_core.configure_operation_timeout_sec(timeoutSecond)
+
+    def configureUsernamePassword(self, username, password=None):
+        """
+        **Description**
+
+        Used to configure the username and password used in CONNECT packet.
+
+        **Syntax**
+
+        .. code:: python
+
+          # Configure user name and password
+          myAWSIoTMQTTClient.configureUsernamePassword("myUsername", "myPassword")
+
+        **Parameters**
+
+        *username* - Username used in the username field of CONNECT packet.
+
+        *password* - Password used in the password field of CONNECT packet.
+
+        **Returns**
+
+        None
+
+        """
+        self._mqtt_core.configure_username_password(username, password)
+
+    def configureSocketFactory(self, socket_factory):
+        """
+        **Description**
+
+        Configure a socket factory to custom configure a different socket type for
+        mqtt connection. Creating a custom socket allows for configuration of a proxy
+
+        **Syntax**
+
+        .. code:: python
+
+          # Configure socket factory
+          custom_args = {"arg1": "val1", "arg2": "val2"}
+          socket_factory = lambda: custom.create_connection((host, port), **custom_args)
+          myAWSIoTMQTTClient.configureSocketFactory(socket_factory)
+
+        **Parameters**
+
+        *socket_factory* - Anonymous function which creates a custom socket to spec.
+
+        **Returns**
+
+        None
+
+        """
+        self._mqtt_core.configure_socket_factory(socket_factory)
+        
+    def enableMetricsCollection(self):
+        """
+        **Description**
+
+        Used to enable SDK metrics collection. Username field in CONNECT packet will be used to append the SDK name
+        and SDK version in use and communicate to AWS IoT cloud. This metrics collection is enabled by default.
+
+        **Syntax**
+
+        .. code:: python
+
+          myAWSIoTMQTTClient.enableMetricsCollection()
+
+        **Parameters**
+
+        None
+
+        **Returns**
+
+        None
+
+        """
+        self._mqtt_core.enable_metrics_collection()
+
+    def disableMetricsCollection(self):
+        """
+        **Description**
+
+        Used to disable SDK metrics collection.
+
+        **Syntax**
+
+        .. code:: python
+
+          myAWSIoTMQTTClient.disableMetricsCollection()
+
+        **Parameters**
+
+        None
+
+        **Returns**
+
+        None
+
+        """
+        self._mqtt_core.disable_metrics_collection()
+
+    # MQTT functionality APIs
+    def connect(self, keepAliveIntervalSecond=600):
+        """
+        **Description**
+
+        Connect to AWS IoT, with user-specific keepalive interval configuration.
+
+        **Syntax**
+
+        .. code:: python
+
+          # Connect to AWS IoT with default keepalive set to 600 seconds
+          myAWSIoTMQTTClient.connect()
+          # Connect to AWS IoT with keepalive interval set to 1200 seconds
+          myAWSIoTMQTTClient.connect(1200)
+
+        **Parameters**
+
+        *keepAliveIntervalSecond* - Time in seconds for interval of sending MQTT ping request.
+        A shorter keep-alive interval allows the client to detect disconnects more quickly.
+        Default set to 600 seconds.
+
+        **Returns**
+
+        True if the connect attempt succeeded. False if failed.
+
+        """
+        self._load_callbacks()
+        return self._mqtt_core.connect(keepAliveIntervalSecond)
+
+    def connectAsync(self, keepAliveIntervalSecond=600, ackCallback=None):
+        """
+        **Description**
+
+        Connect asynchronously to AWS IoT, with user-specific keepalive interval configuration and CONNACK callback.
+
+        **Syntax**
+
+        .. code:: python
+
+          # Connect to AWS IoT with default keepalive set to 600 seconds and a custom CONNACK callback
+          myAWSIoTMQTTClient.connectAsync(ackCallback=my_connack_callback)
+          # Connect to AWS IoT with default keepalive set to 1200 seconds and a custom CONNACK callback
+          myAWSIoTMQTTClient.connectAsync(keepAliveInternvalSecond=1200, ackCallback=myConnackCallback)
+
+        **Parameters**
+
+        *keepAliveIntervalSecond* - Time in seconds for interval of sending MQTT ping request.
+        Default set to 600 seconds.
+
+        *ackCallback* - Callback to be invoked when the client receives a CONNACK. Should be in form
+        :code:`customCallback(mid, data)`, where :code:`mid` is the packet id for the connect request
+        and :code:`data` is the connect result code.
+
+        **Returns**
+
+        Connect request packet id, for tracking purpose in the corresponding callback.
+
+        """
+        self._load_callbacks()
+        return self._mqtt_core.connect_async(keepAliveIntervalSecond, ackCallback)
+
+    def _load_callbacks(self):
+        self._mqtt_core.on_online = self.onOnline
+        self._mqtt_core.on_offline = self.onOffline
+        self._mqtt_core.on_message = self.onMessage
+
+    def disconnect(self):
+        """
+        **Description**
+
+        Disconnect from AWS IoT.
+
+        **Syntax**
+
+        .. code:: python
+
+          myAWSIoTMQTTClient.disconnect()
+
+        **Parameters**
+
+        None
+
+        **Returns**
+
+        True if the disconnect attempt succeeded. False if failed.
+
+        """
+        return self._mqtt_core.disconnect()
+
+    def disconnectAsync(self, ackCallback=None):
+        """
+        **Description**
+
+        Disconnect asynchronously to AWS IoT.
+
+        **Syntax**
+
+        .. code:: python
+
+          myAWSIoTMQTTClient.disconnectAsync(ackCallback=myDisconnectCallback)
+
+        **Parameters**
+
+        *ackCallback* - Callback to be invoked when the client finishes sending disconnect and internal clean-up.
+        Should be in form :code:`customCallback(mid, data)`, where :code:`mid` is the packet id for the disconnect
+        request and :code:`data` is the disconnect result code.
+
+        **Returns**
+
+        Disconnect request packet id, for tracking purpose in the corresponding callback.
+
+        """
+        return self._mqtt_core.disconnect_async(ackCallback)
+
+    def publish(self, topic, payload, QoS):
+        """
+        **Description**
+
+        Publish a new message to the desired topic with QoS.
+
+        **Syntax**
+
+        .. code:: python
+
+          # Publish a QoS0 message "myPayload" to topic "myTopic"
+          myAWSIoTMQTTClient.publish("myTopic", "myPayload", 0)
+          # Publish a QoS1 message "myPayloadWithQos1" to topic "myTopic/sub"
+          myAWSIoTMQTTClient.publish("myTopic/sub", "myPayloadWithQos1", 1)
+
+        **Parameters**
+
+        *topic* - Topic name to publish to.
+
+        *payload* - Payload to publish. Could be a string or a bytes-like object (:code:`bytes`, :code:`bytearray`,
+         :code:`memoryview`, :code:`array.array`, NumPy array...). Bytes-like payloads are not copied: the client
+         keeps a reference to the buffer and writes it to the network as is. The buffer must not be modified until
+         the publish request completes, which is when this call returns for a QoS1 request sent while online. For
+         QoS0, or when the request goes to the offline requests queue, the buffer must not be modified until the
+         message has been written to the network, so pass an immutable :code:`bytes` object or a copy if the buffer
+         is about to be reused.
+
+        *QoS* - Quality of Service. Could be 0 or 1.
+
+        **Returns**
+
+        True if the publish request has been sent to paho. False if the request did not reach paho.
+
+        """
+        return self._mqtt_core.publish(topic, payload, QoS, False)  # Disable retain for publish by now
+
+    def publishAsync(self, topic, payload, QoS, ackCallback=None):
+        """
+        **Description**
+
+        Publish a new message asynchronously to the desired topic with QoS and PUBACK callback. Note that the ack
+        callback configuration for a QoS0 publish request will be ignored as there are no PUBACK reception.
+
+        **Syntax**
+
+        .. code:: python
+
+          # Publish a QoS0 message "myPayload" to topic "myTopic"
+          myAWSIoTMQTTClient.publishAsync("myTopic", "myPayload", 0)
+          # Publish a QoS1 message "myPayloadWithQos1" to topic "myTopic/sub", with custom PUBACK callback
+          myAWSIoTMQTTClient.publishAsync("myTopic/sub", "myPayloadWithQos1", 1, ackCallback=myPubackCallback)
+
+        **Parameters**
+
+        *topic* - Topic name to publish to.
+
+        *payload* - Payload to publish. Could be a string or a bytes-like object (:code:`bytes`, :code:`bytearray`,
+         :code:`memoryview`, :code:`array.array`, NumPy array...). Bytes-like payloads are not copied: the client
+         keeps a reference to the buffer and writes it to the network as is. The buffer must not be modified until
+         the publish request completes: until *ackCallback* is invoked for QoS1, or until the message has been
+         written to the network for QoS0. This includes the time the request spends in the offline requests queue.
+         Pass an immutable :code:`bytes` object or a copy if the buffer is about to be reused.
+
+        *QoS* - Quality of Service. Could be 0 or 1.
+
+        *ackCallback* - Callback to be invoked when the client receives a PUBACK. Should be in form
+        :code:`customCallback(mid)`, where :code:`mid` is the packet id for the disconnect request.
+
+        **Returns**
+
+        Publish request packet id, for tracking purpose in the corresponding callback.
+
+        """
+        return self._mqtt_core.publish_async(topic, payload, QoS, False, ackCallback)
+
+    def subscribe(self, topic, QoS, callback, processHandler=None):
+        """
+        **Description**
+
+        Subscribe to the desired topic and register a callback.
+
+        **Syntax**
+
+        .. code:: python
+
+          # Subscribe to "myTopic" with QoS0 and register a callback
+          myAWSIoTMQTTClient.subscribe("myTopic", 0, customCallback)
+          # Subscribe to "myTopic/#" with QoS1 and register a callback
+          myAWSIoTMQTTClient.subscribe("myTopic/#", 1, customCallback)
+          # Subscribe to "myTopic/#" with QoS1, decode payloads in the message process pool and get the results
+          myAWSIoTMQTTClient.subscribe("myTopic/#", 1, customCallback, processHandler=decodePayload)
+
+        **Parameters**
+
+        *topic* - Topic name or filter to subscribe to.
+
+        *QoS* - Quality of Service. Could be 0 or 1.
+
+        *callback* - Function to be called when a new message for the subscribed topic
+        comes in. Should be in form :code:`customCallback(client, userdata, message)`, where
+        :code:`message` contains :code:`topic` and :code:`payload`. Note that :code:`client` and :code:`userdata` are
+        here just to be aligned with the underneath Paho callback function signature. These fields are pending to be
+        deprecated and should not be depended on. With a :code:`processHandler`, :code:`payload` is the value the
+        handler returned, and the callback can be None if the results are not needed.
+
+        *processHandler* - Picklable function, e.g. defined at the top level of a module, to be run on each
+        message's :code:`topic` and :code:`payload` in the message process pool. Should be in form
+        :code:`processHandler(topic, payload)`. Requires :code:`configureMessageProcessPool`.
+
+        **Returns**
+
+        True if the subscribe attempt succeeded. False if failed.
+
+        """
+        if processHandler is not None:
+            callback = self._mqtt_core.create_message_process_callback(processHandler, callback)
+        return self._mqtt_core.subscribe(topic, QoS, callback)
+
+    def subscribeAsync(self, topic, QoS, ackCallback=None, messageCallback=None, processHandler=None):
+        """
+        **Description**
+
+        Subscribe to the desired topic and register a message callback with SUBACK callback.
+
+        **Syntax**
+
+        .. code:: python
+
+          # Subscribe to "myTopic" with QoS0, custom SUBACK callback and a message callback
+          myAWSIoTMQTTClient.subscribe("myTopic", 0, ackCallback=mySubackCallback, messageCallback=customMessageCallback)
+          # Subscribe to "myTopic/#" with QoS1, custom SUBACK callback and a message callback
+          myAWSIoTMQTTClient.subscribe("myTopic/#", 1, ackCallback=mySubackCallback, messageCallback=customMessageCallback)
+
+        **Parameters**
+
+        *topic* - Topic name or filter to subscribe to.
+
+        *QoS* - Quality of Service. Could be 0 or 1.
+
+        *ackCallback* - Callback to be invoked when the client receives a SUBACK. Should be in form
+        :code:`customCallback(mid, data)`, where :code:`mid` is the packet id for the disconnect request and
+        :code:`data` is the granted QoS for this subscription.
+
+        *messageCallback* - Function to be called when a new message for the subscribed topic
+        comes in. Should be in form :code:`customCallback(client, userdata, message)`, where
+        :code:`message` contains :code:`topic` and :code:`payload`. Note that :code:`client` and :code:`userdata` are
+        here just to be aligned with the underneath Paho callback function signature. These fields are pending to be
+        deprecated and should not be depended on. With a :code:`processHandler`, :code:`payload` is the value the
+        handler returned.
+
+        *processHandler* - Picklable function to be run on each message's :code:`topic` and :code:`payload` in the
+        message process pool. Should be in form :code:`processHandler(topic, payload)`. Requires
+        :code:`configureMessageProcessPool`.
+
+        **Returns**
+
+        Subscribe request packet id, for tracking purpose in the corresponding callback.
+
+        """
+        if processHandler is not None:
+            messageCallback = self._mqtt_core.create_message_process_callback(processHandler, messageCallback)
+        return self._mqtt_core.subscribe_async(topic, QoS, ackCallback, messageCallback)
+
+    def subscribeBatch(self, topic, QoS, batchCallback, maxBatchSize=100, maxLatencySecond=0.01):
+        """
+        **Description**
+
+        Subscribe to the desired topic and register a callback that receives the incoming messages in batches
+        instead of one at a time, which cuts the per-message callback overhead for high rate subscriptions and
+        suits bulk work such as database writes or aggregation. A batch is delivered once it holds
+        :code:`maxBatchSize` messages, or once its oldest message has waited :code:`maxLatencySecond`, whichever
+        comes first. Messages in a batch are in the order they were received.
+
+        **Syntax**
+
+        .. code:: python
+
+          # Subscribe to "myTopic/#" with QoS0 and get its messages in batches of up to 100, at most 10 ms late
+          myAWSIoTMQTTClient.subscribeBatch("myTopic/#", 0, customBatchCallback)
+          # Subscribe to "myTopic/#" with QoS1 and get its messages in batches of up to 1000, at most 1 second late
+          myAWSIoTMQTTClient.subscribeBatch("myTopic/#", 1, customBatchCallback, 1000, 1)
+
+        **Parameters**
+
+        *topic* - Topic name or filter to subscribe to.
+
+        *QoS* - Quality of Service. Could be 0 or 1.
+
+        *batchCallback* - Function to be called with a batch of messages for the subscribed topic. Should be in form
+        :code:`customBatchCallback(client, userdata, messages)`, where :code:`messages` is a list of messages that
+        each contain :code:`topic` and :code:`payload`. Note that :code:`client` and :code:`userdata` are
+        here just to be aligned with the message callback signature and should not be depended on.
+
+        *maxBatchSize* - Maximum number of messages in a batch.
+
+        *maxLatencySecond* - Maximum time, in seconds, a message waits for its batch to fill up. If set to 0, each
+        batch holds the messages that arrived together, without waiting for more.
+
+        **Returns**
+
+        True if the subscribe attempt succeeded. False if failed.
+
+        """
+        return self._mqtt_core.subscribe(topic, QoS, self._create_message_batch_callback(batchCallback, maxBatchSize, maxLatencySecond))
+
+    def subscribeBatchAsync(self, topic, QoS, ackCallback=None, batchCallback=None, maxBatchSize=100, maxLatencySecond=0.01):
+        """
+        **Description**
+
+        Subscribe to the desired topic and register a batch message callback with SUBACK callback. See
+        :code:`subscribeBatch` for how batches are formed.
+
+        **Syntax**
+
+        .. code:: python
+
+          # Subscribe to "myTopic/#" with QoS1, custom SUBACK callback and a batch message callback
+          myAWSIoTMQTTClient.subscribeBatchAsync("myTopic/#", 1, ackCallback=mySubackCallback, batchCallback=customBatchCallback)
+
+        **Parameters**
+
+        *topic* - Topic name or filter to subscribe to.
+
+        *QoS* - Quality of Service. Could be 0 or 1.
+
+        *ackCallback* - Callback to be invoked when the client receives a SUBACK. Should be in form
+        :code:`customCallback(mid, data)`, where :code:`mid` is the packet id for the disconnect request and
+        :code:`data` is the granted QoS for this subscription.
+
+        *batchCallback* - Function to be called with a batch of messages for the subscribed topic. Should be in form
+        :code:`customBatchCallback(client, userdata, messages)`, where :code:`messages` is a list of messages.
+
+        *maxBatchSize* - Maximum number of messages in a batch.
+
+        *maxLatencySecond* - Maximum time, in seconds, a message waits for its batch to fill up.
+
+        **Returns**
+
+        Subscribe request packet id, for tracking purpose in the corresponding callback.
+
+        """
+        return self._mqtt_core.subscribe_async(topic, QoS, ackCallback,
+                                               self._create_message_batch_callback(batchCallback, maxBatchSize, maxLatencySecond))
+
+    def _create_message_batch_callback(self, batchCallback, maxBatchSize, maxLatencySecond):
+        if maxBatchSize <= 0:
+            raise ValueError("Max batch size must be positive.")
+        if maxLatencySecond < 0:
+            raise ValueError("Max latency must not be negative.")
+        if batchCallback is None:
+            return None
+        return self._mqtt_core.create_message_batch_callback(batchCallback, maxBatchSize, maxLatencySecond)
+
+    def unsubscribe(self, topic):
+        """
+        **Description**
+
+        Unsubscribe to the desired topic.
+
+        **Syntax**
+
+        .. code:: python
+
+          myAWSIoTMQTTClient.unsubscribe("myTopic")
+
+        **Parameters**
+
+        *topic* - Topic name or filter to unsubscribe to.
+
+        **Returns**
+
+        True if the unsubscribe attempt succeeded. False if failed.
+
+        """
+        return self._mqtt_core.unsubscribe(topic)
+
+    def unsubscribeAsync(self, topic, ackCallback=None):
+        """
+        **Description**
+
+        Unsubscribe to the desired topic with UNSUBACK callback.
+
+        **Syntax**
+
+        .. code:: python
+
+          myAWSIoTMQTTClient.unsubscribe("myTopic", ackCallback=myUnsubackCallback)
+
+        **Parameters**
+
+        *topic* - Topic name or filter to unsubscribe to.
+
+        *ackCallback* - Callback to be invoked when the client receives a UNSUBACK. Should be in form
+        :code:`customCallback(mid)`, where :code:`mid` is the packet id for the disconnect request.
+
+        **Returns**
+
+        Unsubscribe request packet id, for tracking purpose in the corresponding callback.
+
+        """
+        return self._mqtt_core.unsubscribe_async(topic, ackCallback)
+
+    def onOnline(self):
+        """
+        **Description**
+
+        Callback that gets called when the client is online. The callback registration should happen before calling
+        connect/connectAsync.
+
+        **Syntax**
+
+        .. code:: python
+
+          # Register an onOnline callback
+          myAWSIoTMQTTClient.onOnline = myOnOnlineCallback
+
+        **Parameters**
+
+        None
+
+        **Returns**
+
+        None
+
+        """
+        pass
+
+    def onOffline(self):
+        """
+        **Description**
+
+        Callback that gets called when the client is offline. The callback registration should happen before calling
+        connect/connectAsync.
+
+        **Syntax**
+
+        .. code:: python
+
+          # Register an onOffline callback
+          myAWSIoTMQTTClient.onOffline = myOnOfflineCallback
+
+        **Parameters**
+
+        None
+
+        **Returns**
+
+        None
+
+        """
+        pass
+
+    def onMessage(self, message):
+        """
+        **Description**
+
+        Callback that gets called when the client receives a new message. The callback registration should happen before
+        calling connect/connectAsync. This callback, if present, will always be triggered regardless of whether there is
+        any message callback registered upon subscribe API call. It is for the purpose to aggregating the processing of
+        received messages in one function.
+
+        **Syntax**
+
+        .. code:: python
+
+          # Register an onMessage callback
+          myAWSIoTMQTTClient.onMessage = myOnMessageCallback
+
+        **Parameters**
+
+        *message* - Received MQTT message. It contains the source topic as :code:`message.topic`, and the payload as
+        :code:`message.payload`.
+
+        **Returns**
+
+        None
+
+        """
+        pass
+
+class AsyncAWSIoTMQTTClient:
+
+    def __init__(self, clientID, protocolType=MQTTv3_1_1, cleanSession=True):
+        """
+
+        The asyncio counterpart of :code:`AWSIoTPythonSDK.MQTTLib.AWSIoTMQTTClient`, for TLSv1.2 Mutual
+        Authentication connections to AWS IoT.
+
+        The client runs entirely on the asyncio event loop it is connected from: :code:`connect`,
+        :code:`disconnect`, :code:`publish`, :code:`subscribe` and :code:`unsubscribe` are coroutines, network
+        I/O goes through asyncio transports and no background threads are started. Auto reconnect/resubscribe,
+        progressive reconnect backoff and offline requests queueing with draining behave as they do for
+        :code:`AWSIoTMQTTClient`. Websocket SigV4 connections are not supported.
+
+        **Syntax**
+
+        .. code:: python
+
+          import AWSIoTPythonSDK.MQTTLib as AWSIoTPyMQTT
+
+          async def main():
+              myAsyncClient = AWSIoTPyMQTT.AsyncAWSIoTMQTTClient("testIoTPySDK")
+              myAsyncClient.configureEndpoint("random.iot.region.amazonaws.com", 8883)
+              myAsyncClient.configureCredentials("PATH/TO/ROOT_CA", "PATH/TO/PRIVATE_KEY", "PATH/TO/CERTIFICATE")
+              await myAsyncClient.connect()
+              await myAsyncClient.publish("myTopic", "myPayload", 1)
+
+        **Parameters**
+
+        *clientID* - String that denotes the client identifier used to connect to AWS IoT.
+        If empty string were provided, client id for this connection will be randomly generated
+        n server side.
+
+        *protocolType* - MQTT version in use for this connection. Could be :code:`AWSIoTPythonSDK.MQTTLib.MQTTv3_1` or :code:`AWSIoTPythonSDK.MQTTLib.MQTTv3_1_1`
+
+        *cleanSession* - Boolean that denotes starting a clean MQTT session or not.
+
+        **Returns**
+
+        :code:`AWSIoTPythonSDK.MQTTLib.AsyncAWSIoTMQTTClient` object
+
+        """
+        self._mqtt_core = AsyncMqttCore(clientID, cleanSession, protocolType)
+
+    # Configuration APIs
+    def configureLastWill(self, topic, payload, QoS, retain=False):
+        """
+        **Description**
+
+        Used to configure the last will topic, payload and QoS of the client. Should be called before connect.
+
+        **Syntax**
+
+        .. code:: python
+
+          myAsyncClient.configureLastWill("last/Will/Topic", "lastWillPayload", 0)
+
+        **Parameters**
+
+        *topic* - Topic name that last will publishes to.
+
+        *payload* - Payload to publish for last will.
+
+        *QoS* - Quality of Service. Could be 0 or 1.
+
+        **Returns**
+
+        None
+
+        """
+        self._mqtt_core.configure_last_will(topic, payload, QoS, retain)
+
+    def clearLastWill(self):
+        """
+        **Description**
+
+        Used to clear the last will configuration that is previously set through configureLastWill.
+
+        **Syntax**
+
+        .. code:: python
+
+          myAsyncClient.clearLastWill()
+
+        **Parameter**
+
+        None
+
+        **Returns**
+
+        None
+
+        """
+        self._mqtt_core.clear_last_will()
+
+    def configureEndpoint(self, hostName, portNumber):
+        """
+        **Description**
+
+        Used to configure the host name and port number the client tries to connect to. Should be called
+        before connect.
+
+        **Syntax**
+
+        .. code:: python
+
+          myAsyncClient.configureEndpoint("random.iot.region.amazonaws.com", 8883)
+
+        **Parameters**
+
+        *hostName* - String that denotes the host name of the user-specific AWS IoT endpoint.
+
+        *portNumber* - Integer that denotes the port number to connect to. Could be :code:`8883` for
+        TLSv1.2 Mutual Authentication or :code:`443` for TLSv1.2 Mutual Authentication with ALPN extension.
+
+        **Returns**
+
+        None
+
+        """
+        endpoint_provider = EndpointProvider()
+        endpoint_provider.set_host(hostName)
+        endpoint_provider.set_port(portNumber)
+        self._mqtt_core.configure_endpoint(endpoint_provider)
+        if portNumber == 443:
+            self._mqtt_core.configure_alpn_protocols()
+
+    def configureCredentials(self, CAFilePath, KeyPath="", CertificatePath="", Ciphers=None):
+        """
+        **Description**
+
+        Used to configure the rootCA, private key and certificate files. Should be called before connect.
+
+        **Syntax**
+
+        .. code:: python
+
+          myAsyncClient.configureCredentials("PATH/TO/ROOT_CA", "PATH/TO/PRIVATE_KEY", "PATH/TO/CERTIFICATE")
+
+        **Parameters**
+
+        *CAFilePath* - Path to read the root CA file.
+
+        *KeyPath* - Path to read the private key.
+
+        *CertificatePath* - Path to read the certificate.
+
+        *Ciphers* - String of colon split SSL ciphers to use.  If not passed, default ciphers will be used.
+
+        **Returns**
+
+        None
+
+        """
+        cert_credentials_provider = CertificateCredentialsProvider()
+        cert_credentials_provider.set_ca_path(CAFilePath)
+        cert_credentials_provider.set_key_path(KeyPath)
+        cert_credentials_provider.set_cert_path(CertificatePath)
+
+        cipher_provider = CiphersProvider()
+        cipher_provider.set_ciphers(Ciphers)
+
+        self._mqtt_core.configure_cert_credentials(cert_credentials_provider, cipher_provider)
+
+    def configureAutoReconnectBackoffTime(self, baseReconnectQuietTimeSecond, maxReconnectQuietTimeSecond, stableConnectionTimeSecond):
+        """
+        **Description**
+
+        Used to configure the auto-reconnect backoff timing. Should be called before connect.
+
+        **Syntax**
+
+        .. code:: python
+
+          # Configure the auto-reconnect backoff to start with 1 second and use 128 seconds as a maximum back off time.
+          # Connection over 20 seconds is considered stable and will reset the back off time back to its base.
+          myAsyncClient.configureAutoReconnectBackoffTime(1, 128, 20)
+
+        **Parameters**
+
+        *baseReconnectQuietTimeSecond* - The initial back off time to start with, in seconds.
+        Should be less than the stableConnectionTime.
+
+        *maxReconnectQuietTimeSecond* - The maximum back off time, in seconds.
+
+        *stableConnectionTimeSecond* - The number of seconds for a connection to last to be considered as stable.
+        Back off time will be reset to base once the connection is stable.
+
+        **Returns**
+
+        None
+
+        """
+        self._mqtt_core.configure_reconnect_back_off(baseReconnectQuietTimeSecond, maxReconnectQuietTimeSecond, stableConnectionTimeSecond)
+
+    def configureOfflinePublishQueueing(self, queueSize, dropBehavior=DROP_NEWEST, maxQueuedBytes=0):
+        """
+        **Description**
+
+        Used to configure the queue size and drop behavior for the offline requests queueing. Should be
+        called before connect. Queueable offline requests include publish, subscribe and unsubscribe.
+
+        **Syntax**
+
+        .. code:: python
+
+          import AWSIoTPythonSDK.MQTTLib as AWSIoTPyMQTT
+
+          # Configure the offline queue for publish requests to be 20 in size and drop the oldest
+           request when the queue is full.
+          myAsyncClient.configureOfflinePublishQueueing(20, AWSIoTPyMQTT.DROP_OLDEST)
+          # Configure an infinite offline queue that holds at most 1 MB of topics and payloads
+          myAsyncClient.configureOfflinePublishQueueing(-1, AWSIoTPyMQTT.DROP_OLDEST, 1024 * 1024)
+
+        **Parameters**
+
+        *queueSize* - Size of the queue for offline publish requests queueing.
+         If set to 0, the queue is disabled. If set to -1, the queue size is set to be infinite.
+
+        *dropBehavior* - the type of drop behavior when the queue is full.
+         Could be :code:`AWSIoTPythonSDK.core.util.enums.DropBehaviorTypes.DROP_OLDEST` or
+         :code:`AWSIoTPythonSDK.core.util.enums.DropBehaviorTypes.DROP_NEWEST`.
+
+        *maxQueuedBytes* - Maximum total size, in bytes of topics and payloads, of the queued requests. The queue
+         is full once either this or :code:`queueSize` is reached; with :code:`DROP_OLDEST`, as many of the oldest
+         requests are dropped as it takes to make room. A single request larger than this is always dropped.
+         If set to 0, the size in bytes is unlimited.
+
+        **Returns**
+
+        None
+
+        """
+        self._mqtt_core.configure_offline_requests_queue(queueSize, dropBehavior, maxQueuedBytes)
+
+    def configurePersistentOfflinePublishQueueing(self, directory, maxQueuedBytes=0, dropBehavior=DROP_NEWEST):
+        """
+        **Description**
+
+        Used to configure offline publish requests to be queued on disk, under the given directory, instead of
+        in memory. Queued publish requests survive a restart of the process and are sent once the client next
+        connects with the same directory configured. Should be called before connect. Subscribe and unsubscribe
+        requests are still queued in memory, and are sent before the publish requests.
+
+        Publish requests are delivered at least once. A QoS1 publish request stays on disk until AWS IoT 
+        acknowledges it, a QoS0 one until it is written to the socket. After a crash, the requests not yet 
+        acknowledged, along with some sent during the last second or so before it, are sent again.
+
+        **Syntax**
+
+        .. code:: python
+
+          import AWSIoTPythonSDK.MQTTLib as AWSIoTPyMQTT
+
+          # Queue offline publish requests on disk, holding at most 1 GB of topics and payloads
+          myAsyncClient.configurePersistentOfflinePublishQueueing("/var/lib/my-device/queue", 1024 * 1024 * 1024)
+
+        **Parameters**
+
+        *directory* - Directory that holds the queue files. It is created if it does not exist, and must not be
+         shared with another client.
+
+        *maxQueuedBytes* - Maximum total size, in bytes, of the queued publish requests as stored on disk, which
+         is their topics and payloads plus 5 bytes each. If set to 0, only the disk limits the queue.
+
+        *dropBehavior* - the type of drop behavior when the queue is full.
+         Could be :code:`AWSIoTPythonSDK.core.util.enums.DropBehaviorTypes.DROP_OLDEST` or
+         :code:`AWSIoTPythonSDK.core.util.enums.DropBehaviorTypes.DROP_NEWEST`.
+
+        **Returns**
+
+        None
+
+        """
+        self._mqtt_core.configure_persistent_offline_requests_queue(directory, maxQueuedBytes, dropBehavior)
+
+    def configureDrainingFrequency(self, frequencyInHz):
+        """
+        **Description**
+
+        Used to configure the draining speed to clear up the queued requests when the connection is back.
+        Should be called before connect.
+
+        **Syntax**
+
+        .. code:: python
+
+          # Configure the draining speed to be 2 requests/second
+          myAsyncClient.configureDrainingFrequency(2)
+
+        **Parameters**
+
+        *frequencyInHz* - The draining speed to clear the queued requests, in requests/second.
 
         **Returns**
 
         None
 
         """
-        self._mqtt_core.configure_offline_requests_queue(queueSize, dropBehavior)
+        self._mqtt_core.configure_draining_interval_sec(1/float(frequencyInHz))
 
-    def configureDrainingFrequency(self, frequencyInHz):
+    def configureMaxTopicsPerSubscribe(self, maxTopics):
         """
         **Description**
 
-        Used to configure the draining speed to clear up the queued requests when the connection is back.
-        Should be called before connect.
+        Used to configure how many topics are resubscribed to per SUBSCRIBE packet when the connection is back.
+        Defaults to 8, the most AWS IoT accepts in one packet. Draining of queued offline requests starts once 
+        every resubscribe packet has been acknowledged or timed out. Should be called before connect.
 
         **Syntax**
 
         .. code:: python
 
-          # Configure the draining speed to be 2 requests/second
-          myAWSIoTMQTTClient.configureDrainingFrequency(2)
-
-        .. note::
-
-          Make sure the draining speed is fast enough and faster than the publish rate. Slow draining 
-          could result in inifinite draining process.
+          # Resubscribe one topic per SUBSCRIBE packet
+          myAsyncClient.configureMaxTopicsPerSubscribe(1)
 
         **Parameters**
 
-        *frequencyInHz* - The draining speed to clear the queued requests, in requests/second.
+        *maxTopics* - Maximum number of topics in each resubscribe SUBSCRIBE packet. Must be positive.
 
         **Returns**
 
         None
 
         """
-        self._mqtt_core.configure_draining_interval_sec(1/float(frequencyInHz))
+        if maxTopics < 1:
+            raise ValueError("Max topics per subscribe must be positive.")
+        self._mqtt_core.configure_max_topics_per_subscribe(maxTopics)
 
     def configureConnectDisconnectTimeout(self, timeoutSecond):
         """
         **Description**
 
-        Used to configure the time in seconds to wait for a CONNACK or a disconnect to complete. 
+        Used to configure the time in seconds to wait for a CONNACK or a disconnect to complete.
         Should be called before connect.
 
         **Syntax**
@@ -351,7 +1773,7 @@ class AWSIoTMQTTClient:
         .. code:: python
 
           # Configure connect/disconnect timeout to be 10 seconds
-          myAWSIoTMQTTClient.configureConnectDisconnectTimeout(10)
+          myAsyncClient.configureConnectDisconnectTimeout(10)
 
         **Parameters**
 
@@ -368,7 +1790,7 @@ class AWSIoTMQTTClient:
         """
         **Description**
 
-        Used to configure the timeout in seconds for MQTT QoS 1 publish, subscribe and unsubscribe. 
+        Used to configure the timeout in seconds for MQTT QoS 1 publish, subscribe and unsubscribe.
         Should be called before connect.
 
         **Syntax**
@@ -376,7 +1798,7 @@ class AWSIoTMQTTClient:
         .. code:: python
 
           # Configure MQTT operation timeout to be 5 seconds
-          myAWSIoTMQTTClient.configureMQTTOperationTimeout(5)
+          myAsyncClient.configureMQTTOperationTimeout(5)
 
         **Parameters**
 
@@ -400,7 +1822,7 @@ class AWSIoTMQTTClient:
         .. code:: python
 
           # Configure user name and password
-          myAWSIoTMQTTClient.configureUsernamePassword("myUsername", "myPassword")
+          myAsyncClient.configureUsernamePassword("myUsername", "myPassword")
 
         **Parameters**
 
@@ -415,33 +1837,6 @@ class AWSIoTMQTTClient:
         """
         self._mqtt_core.configure_username_password(username, password)
 
-    def configureSocketFactory(self, socket_factory):
-        """
-        **Description**
-
-        Configure a socket factory to custom configure a different socket type for
-        mqtt connection. Creating a custom socket allows for configuration of a proxy
-
-        **Syntax**
-
-        .. code:: python
-
-          # Configure socket factory
-          custom_args = {"arg1": "val1", "arg2": "val2"}
-          socket_factory = lambda: custom.create_connection((host, port), **custom_args)
-          myAWSIoTMQTTClient.configureSocketFactory(socket_factory)
-
-        **Parameters**
-
-        *socket_factory* - Anonymous function which creates a custom socket to spec.
-
-        **Returns**
-
-        None
-
-        """
-        self._mqtt_core.configure_socket_factory(socket_factory)
-        
     def enableMetricsCollection(self):
         """
         **Description**
@@ -453,7 +1848,7 @@ class AWSIoTMQTTClient:
 
         .. code:: python
 
-          myAWSIoTMQTTClient.enableMetricsCollection()
+          myAsyncClient.enableMetricsCollection()
 
         **Parameters**
 
@@ -476,7 +1871,7 @@ class AWSIoTMQTTClient:
 
         .. code:: python
 
-          myAWSIoTMQTTClient.disableMetricsCollection()
+          myAsyncClient.disableMetricsCollection()
 
         **Parameters**
 
@@ -490,73 +1885,40 @@ class AWSIoTMQTTClient:
         self._mqtt_core.disable_metrics_collection()
 
     # MQTT functionality APIs
-    def connect(self, keepAliveIntervalSecond=600):
+    async def connect(self, keepAliveIntervalSecond=600):
         """
         **Description**
 
-        Connect to AWS IoT, with user-specific keepalive interval configuration.
+        Connect to AWS IoT, with user-specific keepalive interval configuration. The client runs on the event loop
+        this coroutine is awaited from.
 
         **Syntax**
 
         .. code:: python
 
           # Connect to AWS IoT with default keepalive set to 600 seconds
-          myAWSIoTMQTTClient.connect()
-          # Connect to AWS IoT with keepalive interval set to 1200 seconds
-          myAWSIoTMQTTClient.connect(1200)
-
-        **Parameters**
-
-        *keepAliveIntervalSecond* - Time in seconds for interval of sending MQTT ping request.
-        A shorter keep-alive interval allows the client to detect disconnects more quickly.
-        Default set to 600 seconds.
-
-        **Returns**
-
-        True if the connect attempt succeeded. False if failed.
-
-        """
-        self._load_callbacks()
-        return self._mqtt_core.connect(keepAliveIntervalSecond)
-
-    def connectAsync(self, keepAliveIntervalSecond=600, ackCallback=None):
-        """
-        **Description**
-
-        Connect asynchronously to AWS IoT, with user-specific keepalive interval configuration and CONNACK callback.
-
-        **Syntax**
-
-        .. code:: python
-
-          # Connect to AWS IoT with default keepalive set to 600 seconds and a custom CONNACK callback
-          myAWSIoTMQTTClient.connectAsync(ackCallback=my_connack_callback)
-          # Connect to AWS IoT with default keepalive set to 1200 seconds and a custom CONNACK callback
-          myAWSIoTMQTTClient.connectAsync(keepAliveInternvalSecond=1200, ackCallback=myConnackCallback)
+          await myAsyncClient.connect()
 
         **Parameters**
 
         *keepAliveIntervalSecond* - Time in seconds for interval of sending MQTT ping request.
         Default set to 600 seconds.
 
-        *ackCallback* - Callback to be invoked when the client receives a CONNACK. Should be in form
-        :code:`customCallback(mid, data)`, where :code:`mid` is the packet id for the connect request
-        and :code:`data` is the connect result code.
-
         **Returns**
 
-        Connect request packet id, for tracking purpose in the corresponding callback.
+        True once the client has received a successful CONNACK. Raises :code:`connectTimeoutException` if no CONNACK
+        arrives in time and :code:`connectError` if the connection is refused.
 
         """
         self._load_callbacks()
-        return self._mqtt_core.connect_async(keepAliveIntervalSecond, ackCallback)
+        return await self._mqtt_core.connect(keepAliveIntervalSecond)
 
     def _load_callbacks(self):
         self._mqtt_core.on_online = self.onOnline
         self._mqtt_core.on_offline = self.onOffline
         self._mqtt_core.on_message = self.onMessage
 
-    def disconnect(self):
+    async def disconnect(self):
         """
         **Description**
 
@@ -566,7 +1928,7 @@ class AWSIoTMQTTClient:
 
         .. code:: python
 
-          myAWSIoTMQTTClient.disconnect()
+          await myAsyncClient.disconnect()
 
         **Parameters**
 
@@ -574,37 +1936,12 @@ class AWSIoTMQTTClient:
 
         **Returns**
 
-        True if the disconnect attempt succeeded. False if failed.
-
-        """
-        return self._mqtt_core.disconnect()
-
-    def disconnectAsync(self, ackCallback=None):
-        """
-        **Description**
-
-        Disconnect asynchronously to AWS IoT.
-
-        **Syntax**
-
-        .. code:: python
-
-          myAWSIoTMQTTClient.disconnectAsync(ackCallback=myDisconnectCallback)
-
-        **Parameters**
-
-        *ackCallback* - Callback to be invoked when the client finishes sending disconnect and internal clean-up.
-        Should be in form :code:`customCallback(mid, data)`, where :code:`mid` is the packet id for the disconnect
-        request and :code:`data` is the disconnect result code.
-
-        **Returns**
-
-        Disconnect request packet id, for tracking purpose in the corresponding callback.
+        True once the disconnect has completed.
 
         """
-        return self._mqtt_core.disconnect_async(ackCallback)
+        return await self._mqtt_core.disconnect()
 
-    def publish(self, topic, payload, QoS):
+    async def publish(self, topic, payload, QoS):
         """
         **Description**
 
@@ -615,107 +1952,42 @@ class AWSIoTMQTTClient:
         .. code:: python
 
           # Publish a QoS0 message "myPayload" to topic "myTopic"
-          myAWSIoTMQTTClient.publish("myTopic", "myPayload", 0)
-          # Publish a QoS1 message "myPayloadWithQos1" to topic "myTopic/sub"
-          myAWSIoTMQTTClient.publish("myTopic/sub", "myPayloadWithQos1", 1)
-
-        **Parameters**
-
-        *topic* - Topic name to publish to.
-
-        *payload* - Payload to publish.
-
-        *QoS* - Quality of Service. Could be 0 or 1.
-
-        **Returns**
-
-        True if the publish request has been sent to paho. False if the request did not reach paho.
-
-        """
-        return self._mqtt_core.publish(topic, payload, QoS, False)  # Disable retain for publish by now
-
-    def publishAsync(self, topic, payload, QoS, ackCallback=None):
-        """
-        **Description**
-
-        Publish a new message asynchronously to the desired topic with QoS and PUBACK callback. Note that the ack
-        callback configuration for a QoS0 publish request will be ignored as there are no PUBACK reception.
-
-        **Syntax**
-
-        .. code:: python
-
-          # Publish a QoS0 message "myPayload" to topic "myTopic"
-          myAWSIoTMQTTClient.publishAsync("myTopic", "myPayload", 0)
-          # Publish a QoS1 message "myPayloadWithQos1" to topic "myTopic/sub", with custom PUBACK callback
-          myAWSIoTMQTTClient.publishAsync("myTopic/sub", "myPayloadWithQos1", 1, ackCallback=myPubackCallback)
+          await myAsyncClient.publish("myTopic", "myPayload", 0)
+          # Publish a QoS1 message and wait for its PUBACK
+          await myAsyncClient.publish("myTopic/sub", "myPayloadWithQos1", 1)
 
         **Parameters**
 
         *topic* - Topic name to publish to.
 
-        *payload* - Payload to publish.
+        *payload* - Payload to publish. Could be a string or a bytes-like object. As for
+         :code:`AWSIoTMQTTClient.publish`, bytes-like payloads are not copied and must not be modified until the
+         publish request completes.
 
         *QoS* - Quality of Service. Could be 0 or 1.
 
-        *ackCallback* - Callback to be invoked when the client receives a PUBACK. Should be in form
-        :code:`customCallback(mid)`, where :code:`mid` is the packet id for the disconnect request.
-
         **Returns**
 
-        Publish request packet id, for tracking purpose in the corresponding callback.
+        True once the message has been handed to the transport (QoS0) or acknowledged (QoS1). False if the
+        request went to the offline requests queue.
 
         """
-        return self._mqtt_core.publish_async(topic, payload, QoS, False, ackCallback)
+        return await self._mqtt_core.publish(topic, payload, QoS, False)  # Disable retain for publish by now
 
-    def subscribe(self, topic, QoS, callback):
+    async def subscribe(self, topic, QoS, callback=None):
         """
         **Description**
 
-        Subscribe to the desired topic and register a callback.
+        Subscribe to the desired topic and optionally register a message callback.
 
         **Syntax**
 
         .. code:: python
 
-          # Subscribe to "myTopic" with QoS0 and register a callback
-          myAWSIoTMQTTClient.subscribe("myTopic", 0, customCallback)
-          # Subscribe to "myTopic/#" with QoS1 and register a callback
-          myAWSIoTMQTTClient.subscribe("myTopic/#", 1, customCallback)
-
-        **Parameters**
-
-        *topic* - Topic name or filter to subscribe to.
-
-        *QoS* - Quality of Service. Could be 0 or 1.
-
-        *callback* - Function to be called when a new message for the subscribed topic
-        comes in. Should be in form :code:`customCallback(client, userdata, message)`, where
-        :code:`message` contains :code:`topic` and :code:`payload`. Note that :code:`client` and :code:`userdata` are
-        here just to be aligned with the underneath Paho callback function signature. These fields are pending to be
-        deprecated and should not be depended on.
-
-        **Returns**
-
-        True if the subscribe attempt succeeded. False if failed.
-
-        """
-        return self._mqtt_core.subscribe(topic, QoS, callback)
-
-    def subscribeAsync(self, topic, QoS, ackCallback=None, messageCallback=None):
-        """
-        **Description**
-
-        Subscribe to the desired topic and register a message callback with SUBACK callback.
-
-        **Syntax**
-
-        .. code:: python
+          async def customCallback(client, userdata, message):
+              await process(message.payload)
 
-          # Subscribe to "myTopic" with QoS0, custom SUBACK callback and a message callback
-          myAWSIoTMQTTClient.subscribe("myTopic", 0, ackCallback=mySubackCallback, messageCallback=customMessageCallback)
-          # Subscribe to "myTopic/#" with QoS1, custom SUBACK callback and a message callback
-          myAWSIoTMQTTClient.subscribe("myTopic/#", 1, ackCallback=mySubackCallback, messageCallback=customMessageCallback)
+          await myAsyncClient.subscribe("myTopic/#", 1, customCallback)
 
         **Parameters**
 
@@ -723,24 +1995,18 @@ class AWSIoTMQTTClient:
 
         *QoS* - Quality of Service. Could be 0 or 1.
 
-        *ackCallback* - Callback to be invoked when the client receives a SUBACK. Should be in form
-        :code:`customCallback(mid, data)`, where :code:`mid` is the packet id for the disconnect request and
-        :code:`data` is the granted QoS for this subscription.
-
-        *messageCallback* - Function to be called when a new message for the subscribed topic
-        comes in. Should be in form :code:`customCallback(client, userdata, message)`, where
-        :code:`message` contains :code:`topic` and :code:`payload`. Note that :code:`client` and :code:`userdata` are
-        here just to be aligned with the underneath Paho callback function signature. These fields are pending to be
-        deprecated and should not be depended on.
+        *callback* - Function or coroutine function to be called when a new message for the subscribed topic
+        comes in, in form :code:`customCallback(client, userdata, message)`. Coroutines are scheduled as tasks on the
+        client's event loop. Messages can also be consumed with :code:`messages`.
 
         **Returns**
 
-        Subscribe request packet id, for tracking purpose in the corresponding callback.
+        True once the SUBACK has been received. False if the request went to the offline requests queue.
 
         """
-        return self._mqtt_core.subscribe_async(topic, QoS, ackCallback, messageCallback)
+        return await self._mqtt_core.subscribe(topic, QoS, callback)
 
-    def unsubscribe(self, topic):
+    async def unsubscribe(self, topic):
         """
         **Description**
 
@@ -750,7 +2016,7 @@ class AWSIoTMQTTClient:
 
         .. code:: python
 
-          myAWSIoTMQTTClient.unsubscribe("myTopic")
+          await myAsyncClient.unsubscribe("myTopic")
 
         **Parameters**
 
@@ -758,50 +2024,54 @@ class AWSIoTMQTTClient:
 
         **Returns**
 
-        True if the unsubscribe attempt succeeded. False if failed.
+        True once the UNSUBACK has been received. False if the request went to the offline requests queue.
 
         """
-        return self._mqtt_core.unsubscribe(topic)
+        return await self._mqtt_core.unsubscribe(topic)
 
-    def unsubscribeAsync(self, topic, ackCallback=None):
+    def messages(self, topicFilter="#", maxSize=0):
         """
         **Description**
 
-        Unsubscribe to the desired topic with UNSUBACK callback.
+        Create an async iterator over the received messages that match a topic filter. Messages are buffered from
+        the time the iterator is created until it is closed, either explicitly or by leaving its :code:`async with`
+        block. The iterator does not subscribe by itself.
 
         **Syntax**
 
         .. code:: python
 
-          myAWSIoTMQTTClient.unsubscribe("myTopic", ackCallback=myUnsubackCallback)
+          await myAsyncClient.subscribe("myTopic/#", 1)
+          async with myAsyncClient.messages("myTopic/#") as messages:
+              async for message in messages:
+                  print(message.topic, message.payload)
 
         **Parameters**
 
-        *topic* - Topic name or filter to unsubscribe to.
+        *topicFilter* - Topic filter that received messages must match. Default set to all messages.
 
-        *ackCallback* - Callback to be invoked when the client receives a UNSUBACK. Should be in form
-        :code:`customCallback(mid)`, where :code:`mid` is the packet id for the disconnect request.
+        *maxSize* - Maximum number of buffered messages. The oldest one is dropped when it is reached.
+        If set to 0 (default), the buffer is unbounded.
 
         **Returns**
 
-        Unsubscribe request packet id, for tracking purpose in the corresponding callback.
+        :code:`AWSIoTPythonSDK.core.protocol.async_mqtt_core.MessageStream` object
 
         """
-        return self._mqtt_core.unsubscribe_async(topic, ackCallback)
+        return self._mqtt_core.message_stream(topicFilter, maxSize)
 
     def onOnline(self):
         """
         **Description**
 
-        Callback that gets called when the client is online. The callback registration should happen before calling
-        connect/connectAsync.
+        Callback that gets called when the client is online. May be a coroutine function. The callback registration
+        should happen before calling connect.
 
         **Syntax**
 
         .. code:: python
 
-          # Register an onOnline callback
-          myAWSIoTMQTTClient.onOnline = myOnOnlineCallback
+          myAsyncClient.onOnline = myOnOnlineCallback
 
         **Parameters**
 
@@ -818,15 +2088,14 @@ class AWSIoTMQTTClient:
         """
         **Description**
 
-        Callback that gets called when the client is offline. The callback registration should happen before calling
-        connect/connectAsync.
+        Callback that gets called when the client is offline. May be a coroutine function. The callback registration
+        should happen before calling connect.
 
         **Syntax**
 
         .. code:: python
 
-          # Register an onOffline callback
-          myAWSIoTMQTTClient.onOffline = myOnOfflineCallback
+          myAsyncClient.onOffline = myOnOfflineCallback
 
         **Parameters**
 
@@ -843,17 +2112,15 @@ class AWSIoTMQTTClient:
         """
         **Description**
 
-        Callback that gets called when the client receives a new message. The callback registration should happen before
-        calling connect/connectAsync. This callback, if present, will always be triggered regardless of whether there is
-        any message callback registered upon subscribe API call. It is for the purpose to aggregating the processing of
-        received messages in one function.
+        Callback that gets called when the client receives a new message, regardless of the message callbacks
+        registered upon subscribe. May be a coroutine function. The callback registration should happen before
+        calling connect.
 
         **Syntax**
 
         .. code:: python
 
-          # Register an onMessage callback
-          myAWSIoTMQTTClient.onMessage = myOnMessageCallback
+          myAsyncClient.onMessage = myOnMessageCallback
 
         **Parameters**
 
@@ -867,6 +2134,7 @@ class AWSIoTMQTTClient:
         """
         pass
 
+
 class _AWSIoTMQTTDelegatingClient(object):
 
     def __init__(self, clientID, protocolType=MQTTv3_1_1, useWebsocket=False, cleanSession=True, awsIoTMQTTClient=None):
@@ -1450,7 +2718,40 @@ class AWSIoTMQTTShadowClient(_AWSIoTMQTTDelegatingClient):
         self._shadowManager = shadowManager.shadowManager(self._AWSIoTMQTTClient._mqtt_core)
 
     # Shadow management API
-    def createShadowHandlerWithName(self, shadowName, isPersistentSubscribe):
+    def configureShadowRouting(self, topicFilters=None):
+        """
+        **Description**
+
+        Route shadow responses through wildcard subscriptions instead of subscribing to the accepted, rejected
+        and delta topics of every device shadow. The topic filters are subscribed to once, when the first
+        shadow request is made, and each incoming shadow response is handed to the device shadow handler
+        created for its thing name. Meant for gateways managing many things. Only affects device shadow
+        handlers created after this call. Shadow actions whose topics are not covered by the topic filters are
+        subscribed to per device shadow as usual.
+
+        **Syntax**
+
+        .. code:: python
+
+          # Route the responses of every shadow through one wildcard subscription
+          myAWSIoTMQTTShadowClient.configureShadowRouting()
+          # Only route get and update responses, delete responses are subscribed to per shadow
+          myAWSIoTMQTTShadowClient.configureShadowRouting(["$aws/things/+/shadow/get/+", "$aws/things/+/shadow/update/+"])
+
+        **Parameters**
+
+        *topicFilters* - List of topic filters to subscribe to for shadow responses. Defaults to
+        :code:`["$aws/things/+/shadow/#"]`.
+
+        **Returns**
+
+        None
+
+        """
+        self._shadowManager = shadowManager.shadowRouter(self._AWSIoTMQTTClient._mqtt_core, topicFilters)
+
+    def createShadowHandlerWithName(self, shadowName, isPersistentSubscribe, enableCache=False, snapshotPath=None,
+                                    updateCoalescingWindowSecond=0):
         """
         **Description**
 
@@ -1464,6 +2765,12 @@ class AWSIoTMQTTShadowClient(_AWSIoTMQTTDelegatingClient):
           Bot1Shadow = myAWSIoTMQTTShadowClient.createShadowHandlerWithName("Bot1", True)
           # Create a device shadow handler for shadow named "Bot2", using non-persistent subscription
           Bot2Shadow = myAWSIoTMQTTShadowClient.createShadowHandlerWithName("Bot2", False)
+          # Create a device shadow handler for shadow named "Bot3", keeping its document cached locally
+          Bot3Shadow = myAWSIoTMQTTShadowClient.createShadowHandlerWithName("Bot3", True, enableCache=True)
+          # Create a device shadow handler for shadow named "Bot4", starting from the document saved on the last run
+          Bot4Shadow = myAWSIoTMQTTShadowClient.createShadowHandlerWithName("Bot4", True, snapshotPath="/var/lib/bot4.json")
+          # Create a device shadow handler for shadow named "Bot5", merging the updates made within 100 ms into one request
+          Bot5Shadow = myAWSIoTMQTTShadowClient.createShadowHandlerWithName("Bot5", True, updateCoalescingWindowSecond=0.1)
 
         **Parameters**
 
@@ -1473,13 +2780,30 @@ class AWSIoTMQTTShadowClient(_AWSIoTMQTTDelegatingClient):
         when there is a response. Will subscribe at the first time the shadow request is made and will
         not unsubscribe if isPersistentSubscribe is set.
 
+        *enableCache* - Whether to keep the shadow document from get/update accepted responses and delta
+        messages in memory, so that it can be read with :code:`getCachedState` without a round trip to AWS IoT.
+        Deltas are only received after :code:`shadowRegisterDeltaCallback`.
+
+        *snapshotPath* - Path of a file to keep the cached shadow document in across restarts. Implies
+        :code:`enableCache`. The file is loaded right away, so :code:`getCachedState` answers before any response
+        from AWS IoT, and a get request is sent in the background to reconcile it. Should be called after
+        :code:`connect` for that get request to go out. Changes are written to the file atomically, batched over
+        one second. Each snapshot file should belong to one device shadow handler.
+
+        *updateCoalescingWindowSecond* - Time in seconds to hold back a shadow update, so that the updates made in
+        the meantime are merged into it and sent as one request. Cuts the update requests of code that updates a
+        shadow many times per second. 0 sends every update right away, which is the default.
+
         **Returns**
 
         AWSIoTPythonSDK.core.shadow.deviceShadow.deviceShadow object, which exposes the device shadow interface.
 
         """
         # Create and return a deviceShadow instance
-        return deviceShadow.deviceShadow(shadowName, isPersistentSubscribe, self._shadowManager)
+        if updateCoalescingWindowSecond < 0:
+            raise ValueError("Update coalescing window must not be negative.")
+        return deviceShadow.deviceShadow(shadowName, isPersistentSubscribe, self._shadowManager, srcIsCacheEnabled=enableCache,
+                                         srcSnapshotPath=snapshotPath, srcUpdateCoalescingWindowSecond=updateCoalescingWindowSecond)
         # Shadow APIs are accessible in deviceShadow instance":
         ###
         # deviceShadow.shadowGet
@@ -1487,6 +2811,7 @@ class AWSIoTMQTTShadowClient(_AWSIoTMQTTDelegatingClient):
         # deviceShadow.shadowDelete
         # deviceShadow.shadowRegisterDelta
         # deviceShadow.shadowUnregisterDelta
+        # deviceShadow.getCachedState
 
 class AWSIoTMQTTThingJobsClient(_AWSIoTMQTTDelegatingClient):
 
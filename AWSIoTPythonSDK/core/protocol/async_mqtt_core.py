@@ -0,0 +1,733 @@
+# /*
+# * Copyright 2010-2017 Amazon.com, Inc. or its affiliates. All Rights Reserved.
+# *
+# * Licensed under the Apache License, Version 2.0 (the "License").
+# * You may not use this file except in compliance with the License.
+# * A copy of the License is located at
+# *
+# *  http://aws.amazon.com/apache2.0
+# *
+# * or in the "license" file accompanying this file. This file is distributed
+# * on an "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either
+# * express or implied. See the License for the specific language governing
+# * permissions and limitations under the License.
+# */
+
+import AWSIoTPythonSDK
+import AWSIoTPythonSDK.core.protocol.paho.client as mqtt
+from AWSIoTPythonSDK.core.protocol.internal.clients import ClientStatusContainer
+from AWSIoTPythonSDK.core.protocol.internal.clients import ClientStatus
+from AWSIoTPythonSDK.core.protocol.internal.workers import SubscriptionManager
+from AWSIoTPythonSDK.core.protocol.internal.workers import OfflineRequestsManager
+from AWSIoTPythonSDK.core.protocol.internal.workers import PersistentOfflineRequestsManager
+from AWSIoTPythonSDK.core.protocol.internal.requests import RequestTypes
+from AWSIoTPythonSDK.core.protocol.internal.requests import QueueableRequest
+from AWSIoTPythonSDK.core.protocol.internal.queues import AppendResults
+from AWSIoTPythonSDK.core.protocol.internal.defaults import DEFAULT_CONNECT_DISCONNECT_TIMEOUT_SEC
+from AWSIoTPythonSDK.core.protocol.internal.defaults import DEFAULT_OPERATION_TIMEOUT_SEC
+from AWSIoTPythonSDK.core.protocol.internal.defaults import DEFAULT_DRAINING_INTERNAL_SEC
+from AWSIoTPythonSDK.core.protocol.internal.defaults import DEFAULT_MAX_TOPICS_PER_SUBSCRIBE
+from AWSIoTPythonSDK.core.protocol.internal.defaults import METRICS_PREFIX
+from AWSIoTPythonSDK.core.protocol.internal.defaults import ALPN_PROTCOLS
+from AWSIoTPythonSDK.core.protocol.paho.client import MQTT_ERR_SUCCESS, SUBACK_ERROR
+from AWSIoTPythonSDK.core.protocol.paho.client import MQTTv31
+from AWSIoTPythonSDK.core.protocol.paho.client import topic_matches_sub
+from AWSIoTPythonSDK.exception.AWSIoTExceptions import connectError
+from AWSIoTPythonSDK.exception.AWSIoTExceptions import connectTimeoutException
+from AWSIoTPythonSDK.exception.AWSIoTExceptions import disconnectError
+from AWSIoTPythonSDK.exception.AWSIoTExceptions import disconnectTimeoutException
+from AWSIoTPythonSDK.exception.AWSIoTExceptions import publishError
+from AWSIoTPythonSDK.exception.AWSIoTExceptions import publishTimeoutException
+from AWSIoTPythonSDK.exception.AWSIoTExceptions import publishQueueFullException
+from AWSIoTPythonSDK.exception.AWSIoTExceptions import publishQueueDisabledException
+from AWSIoTPythonSDK.exception.AWSIoTExceptions import subscribeQueueFullException
+from AWSIoTPythonSDK.exception.AWSIoTExceptions import subscribeQueueDisabledException
+from AWSIoTPythonSDK.exception.AWSIoTExceptions import unsubscribeQueueFullException
+from AWSIoTPythonSDK.exception.AWSIoTExceptions import unsubscribeQueueDisabledException
+from AWSIoTPythonSDK.exception.AWSIoTExceptions import subscribeError, subackError
+from AWSIoTPythonSDK.exception.AWSIoTExceptions import subscribeTimeoutException
+from AWSIoTPythonSDK.exception.AWSIoTExceptions import unsubscribeError
+from AWSIoTPythonSDK.exception.AWSIoTExceptions import unsubscribeTimeoutException
+from AWSIoTPythonSDK.core.util.enums import DropBehaviorTypes
+import asyncio
+import errno
+import inspect
+import logging
+import socket
+import ssl
+
+# How often keepalive and message retries are checked, as loop_forever() does
+MISC_INTERVAL_SEC = 1.0
+
+
+class _TransportSocket(object):
+    """Socket-like facade over an asyncio transport for the paho client.
+
+    Bytes received by the protocol are buffered here and handed out by
+    recv_into(), writes go straight to the transport. Encryption is left to
+    the transport, so paho sees a plain non-blocking socket.
+    """
+
+    def __init__(self, transport):
+        self._transport = transport
+        self._inbound = bytearray()
+        self._eof = False
+
+    def feed(self, data):
+        self._inbound.extend(data)
+
+    def feed_eof(self):
+        self._eof = True
+
+    def readable(self):
+        return len(self._inbound) > 0 or self._eof
+
+    def recv_into(self, buffer, nbytes=0):
+        if len(self._inbound) == 0:
+            if self._eof:
+                return 0
+            raise socket.error(errno.EAGAIN, "Resource temporarily unavailable")
+        received = min(nbytes or len(buffer), len(self._inbound))
+        with memoryview(self._inbound) as inbound:
+            buffer[:received] = inbound[:received]
+        del self._inbound[:received]
+        return received
+
+    def send(self, data):
+        if self._transport.is_closing():
+            raise socket.error(errno.EPIPE, "Broken pipe")
+        self._transport.write(data)
+        return len(data)
+
+    def sendmsg(self, buffers):
+        if self._transport.is_closing():
+            raise socket.error(errno.EPIPE, "Broken pipe")
+        self._transport.writelines(buffers)
+        return sum(len(buf) for buf in buffers)
+
+    def setblocking(self, flag):
+        pass
+
+    def close(self):
+        self._transport.close()
+
+
+class _MqttProtocol(asyncio.Protocol):
+
+    def __init__(self, core):
+        self._core = core
+        self.sock = None
+        self._paused = False
+        self._drain_waiters = []
+
+    def connection_made(self, transport):
+        self.sock = _TransportSocket(transport)
+
+    def data_received(self, data):
+        self.sock.feed(data)
+        self._core._on_data(self.sock)
+
+    def eof_received(self):
+        return False  # Let the transport close itself
+
+    def connection_lost(self, exc):
+        self.sock.feed_eof()
+        self._paused = False
+        self._wake_drain_waiters()
+        self._core._on_data(self.sock)
+
+    def pause_writing(self):
+        self._paused = True
+
+    def resume_writing(self):
+        self._paused = False
+        self._wake_drain_waiters()
+
+    def _wake_drain_waiters(self):
+        waiters, self._drain_waiters = self._drain_waiters, []
+        for waiter in waiters:
+            if not waiter.done():
+                waiter.set_result(None)
+
+    async def drain(self):
+        if self._paused:
+            waiter = asyncio.get_running_loop().create_future()
+            self._drain_waiters.append(waiter)
+            await waiter
+
+
+class MessageStream(object):
+    """Async iterator over the inbound messages that match a topic filter.
+
+    Messages are buffered from the moment the stream is created until it is
+    closed. When max_size is reached the oldest buffered message is dropped.
+    """
+
+    _logger = logging.getLogger(__name__)
+    _CLOSED = object()
+
+    def __init__(self, core, topic_filter, max_size=0):
+        self._core = core
+        self._topic_filter = topic_filter
+        self._queue = asyncio.Queue(max_size)
+        self._closed = False
+
+    def offer(self, message):
+        if self._closed or not topic_matches_sub(self._topic_filter, message.topic):
+            return
+        if self._queue.full():
+            dropped = self._queue.get_nowait()
+            self._logger.warn("offer: Full message stream. Drop the oldest message on: " + str(dropped.topic))
+        self._queue.put_nowait(message)
+
+    def close(self):
+        if not self._closed:
+            self._closed = True
+            self._core._remove_message_stream(self)
+            if self._queue.full():
+                self._queue.get_nowait()
+            self._queue.put_nowait(self._CLOSED)
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        message = await self._queue.get()
+        if message is self._CLOSED:
+            self._queue.put_nowait(self._CLOSED)  # Keep other readers from waiting forever
+            raise StopAsyncIteration
+        return message
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        self.close()
+
+
+class AsyncMqttCore(object):
+    """MqttCore counterpart that runs on an asyncio event loop.
+
+    The paho client still does all the MQTT framing and session bookkeeping,
+    driven from protocol callbacks instead of a network thread. Requests made
+    while the client is not connected go through the same offline requests
+    queue as MqttCore, and reconnects use the same progressive backoff, with
+    asyncio.sleep() in place of blocking waits. No threads are started.
+    """
+
+    _logger = logging.getLogger(__name__)
+
+    def __init__(self, client_id, clean_session, protocol):
+        self._paho_client = mqtt.Client(client_id, clean_session, None, protocol)
+        self._paho_client._backoffCore.setStableConnectionTimerEnabled(False)
+        self._paho_client.on_connect = self._on_connect
+        self._paho_client.on_disconnect = self._on_disconnect
+        self._paho_client.on_publish = self._on_publish
+        self._paho_client.on_subscribe = self._on_subscribe
+        self._paho_client.on_unsubscribe = self._on_unsubscribe
+        self._paho_client.on_message = self._on_message
+        self._username = ""
+        self._password = None
+        self._enable_metrics_collection = True
+        self._endpoint_provider = None
+        self._cert_credentials_provider = None
+        self._ciphers_provider = None
+        self._alpn_protocols = None
+        self._keep_alive_sec = 600
+        self._client_status = ClientStatusContainer()
+        self._subscription_manager = SubscriptionManager()
+        self._offline_requests_manager = OfflineRequestsManager(-1, DropBehaviorTypes.DROP_NEWEST)  # Infinite queue
+        self._connect_disconnect_timeout_sec = DEFAULT_CONNECT_DISCONNECT_TIMEOUT_SEC
+        self._operation_timeout_sec = DEFAULT_OPERATION_TIMEOUT_SEC
+        self._draining_interval_sec = DEFAULT_DRAINING_INTERNAL_SEC
+        self._max_topics_per_subscribe = DEFAULT_MAX_TOPICS_PER_SUBSCRIBE
+        self._loop = None
+        self._protocol = None
+        self._connack_future = None
+        self._disconnect_future = None
+        self._ack_futures = dict()
+        self._message_streams = []
+        self._tasks = set()
+        self._reconnect_task = None
+        self._misc_handle = None
+        self._init_offline_request_exceptions()
+        self._logger.info("AsyncMqttCore initialized")
+        self._logger.info("Client id: %s" % client_id)
+        self._logger.info("Protocol version: %s" % ("MQTTv3.1" if protocol == MQTTv31 else "MQTTv3.1.1"))
+
+    def _init_offline_request_exceptions(self):
+        self._offline_request_queue_disabled_exceptions = {
+            RequestTypes.PUBLISH : publishQueueDisabledException,
+            RequestTypes.SUBSCRIBE : subscribeQueueDisabledException,
+            RequestTypes.UNSUBSCRIBE : unsubscribeQueueDisabledException
+        }
+        self._offline_request_queue_full_exceptions = {
+            RequestTypes.PUBLISH : publishQueueFullException,
+            RequestTypes.SUBSCRIBE : subscribeQueueFullException,
+            RequestTypes.UNSUBSCRIBE : unsubscribeQueueFullException
+        }
+        self._offline_request_handlers = {
+            RequestTypes.PUBLISH : self._handle_offline_publish,
+            RequestTypes.SUBSCRIBE : self._handle_offline_subscribe,
+            RequestTypes.UNSUBSCRIBE : self._handle_offline_unsubscribe
+        }
+
+    # Used for general message event reception
+    def on_message(self, message):
+        pass
+
+    # Used for general online event notification
+    def on_online(self):
+        pass
+
+    # Used for general offline event notification
+    def on_offline(self):
+        pass
+
+    def configure_cert_credentials(self, cert_credentials_provider, ciphers_provider):
+        self._logger.info("Configuring certificates and ciphers...")
+        self._cert_credentials_provider = cert_credentials_provider
+        self._ciphers_provider = ciphers_provider
+
+    def configure_endpoint(self, endpoint_provider):
+        self._logger.info("Configuring endpoint...")
+        self._endpoint_provider = endpoint_provider
+
+    def configure_alpn_protocols(self):
+        self._logger.info("Configuring alpn protocols...")
+        self._alpn_protocols = [ALPN_PROTCOLS]
+
+    def configure_connect_disconnect_timeout_sec(self, connect_disconnect_timeout_sec):
+        self._logger.info("Configuring connect/disconnect time out: %f sec" % connect_disconnect_timeout_sec)
+        self._connect_disconnect_timeout_sec = connect_disconnect_timeout_sec
+
+    def configure_operation_timeout_sec(self, operation_timeout_sec):
+        self._logger.info("Configuring MQTT operation time out: %f sec" % operation_timeout_sec)
+        self._operation_timeout_sec = operation_timeout_sec
+
+    def configure_reconnect_back_off(self, base_reconnect_quiet_sec, max_reconnect_quiet_sec, stable_connection_sec):
+        self._logger.info("Configuring reconnect back off timing...")
+        self._logger.info("Base quiet time: %f sec" % base_reconnect_quiet_sec)
+        self._logger.info("Max quiet time: %f sec" % max_reconnect_quiet_sec)
+        self._logger.info("Stable connection time: %f sec" % stable_connection_sec)
+        self._paho_client.setBackoffTiming(base_reconnect_quiet_sec, max_reconnect_quiet_sec, stable_connection_sec)
+
+    def configure_last_will(self, topic, payload, qos, retain=False):
+        self._logger.info("Configuring last will...")
+        self._paho_client.will_set(topic, payload, qos, retain)
+
+    def clear_last_will(self):
+        self._logger.info("Clearing last will...")
+        self._paho_client.will_clear()
+
+    def configure_username_password(self, username, password=None):
+        self._logger.info("Configuring username and password...")
+        self._username = username
+        self._password = password
+
+    def enable_metrics_collection(self):
+        self._enable_metrics_collection = True
+
+    def disable_metrics_collection(self):
+        self._enable_metrics_collection = False
+
+    def configure_offline_requests_queue(self, max_size, drop_behavior, max_bytes=0):
+        self._logger.info("Configuring offline requests queueing: max queue size: %d, max queue bytes: %d", max_size, max_bytes)
+        self._offline_requests_manager.close()
+        self._offline_requests_manager = OfflineRequestsManager(max_size, drop_behavior, max_bytes)
+
+    def configure_persistent_offline_requests_queue(self, directory, max_bytes, drop_behavior):
+        self._logger.info("Configuring persistent offline requests queueing: directory: %s, max queue bytes: %d",
+                          directory, max_bytes)
+        self._offline_requests_manager.close()
+        self._offline_requests_manager = PersistentOfflineRequestsManager(directory, max_bytes, drop_behavior)
+
+    def configure_draining_interval_sec(self, draining_interval_sec):
+        self._logger.info("Configuring offline requests queue draining interval: %f sec", draining_interval_sec)
+        self._draining_interval_sec = draining_interval_sec
+
+    def configure_max_topics_per_subscribe(self, max_topics_per_subscribe):
+        self._logger.info("Configuring max topics per resubscribe packet: %d", max_topics_per_subscribe)
+        self._max_topics_per_subscribe = max_topics_per_subscribe
+
+    def message_stream(self, topic_filter, max_size=0):
+        stream = MessageStream(self, topic_filter, max_size)
+        self._message_streams.append(stream)
+        return stream
+
+    def _remove_message_stream(self, stream):
+        if stream in self._message_streams:
+            self._message_streams.remove(stream)
+
+    async def connect(self, keep_alive_sec):
+        self._logger.info("Performing async connect...")
+        self._logger.info("Keep-alive: %f sec" % keep_alive_sec)
+        self._loop = asyncio.get_running_loop()
+        self._keep_alive_sec = keep_alive_sec
+        self._load_username_password()
+        self._client_status.set_status(ClientStatus.CONNECT)
+        self._connack_future = self._loop.create_future()
+        try:
+            await self._open_connection()
+            rc = await asyncio.wait_for(self._connack_future, self._connect_disconnect_timeout_sec)
+        except asyncio.TimeoutError:
+            self._logger.error("Connect timed out")
+            self._abort_connection()
+            raise connectTimeoutException()
+        except Exception:
+            self._abort_connection()
+            raise
+        finally:
+            self._connack_future = None
+        if rc != 0:
+            self._logger.error("Connect error: %d", rc)
+            self._abort_connection()
+            raise connectError(rc)
+        self._start_misc()
+        return True
+
+    def _abort_connection(self):
+        self._client_status.set_status(ClientStatus.IDLE)
+        self._close_connection()
+
+    def _close_connection(self):
+        if self._misc_handle is not None:
+            self._misc_handle.cancel()
+            self._misc_handle = None
+        if self._reconnect_task is not None:
+            self._reconnect_task.cancel()
+            self._reconnect_task = None
+        if self._paho_client.socket() is not None:
+            self._paho_client.socket().close()
+            self._paho_client._sock = None
+        self._protocol = None
+
+    def _load_username_password(self):
+        username_candidate = self._username
+        if self._enable_metrics_collection:
+            username_candidate += METRICS_PREFIX
+            username_candidate += AWSIoTPythonSDK.__version__
+        self._paho_client.username_pw_set(username_candidate, self._password)
+
+    def _create_ssl_context(self):
+        if self._cert_credentials_provider is None:
+            return None  # Plain TCP, as the paho client does without tls_set()
+        ssl_context = ssl.SSLContext(ssl.PROTOCOL_TLS_CLIENT)
+        ssl_context.load_verify_locations(self._cert_credentials_provider.get_ca_path())
+        cert_path = self._cert_credentials_provider.get_cert_path()
+        if cert_path:
+            ssl_context.load_cert_chain(cert_path, self._cert_credentials_provider.get_key_path())
+        ssl_context.verify_mode = ssl.CERT_REQUIRED
+        ciphers = self._ciphers_provider.get_ciphers() if self._ciphers_provider else None
+        if ciphers is not None:
+            ssl_context.set_ciphers(ciphers)
+        if self._alpn_protocols is not None:
+            ssl_context.set_alpn_protocols(self._alpn_protocols)
+        return ssl_context
+
+    async def _open_connection(self):
+        host = self._endpoint_provider.get_host()
+        port = self._endpoint_provider.get_port()
+        ssl_context = self._create_ssl_context()
+        transport, protocol = await asyncio.wait_for(
+            self._loop.create_connection(lambda: _MqttProtocol(self), host, port, ssl=ssl_context,
+                                         server_hostname=host if ssl_context else None),
+            self._connect_disconnect_timeout_sec)
+        self._protocol = protocol
+        # reconnect() takes the connected transport from here and sends CONNECT through it
+        self._paho_client.socket_factory_set(lambda: protocol.sock)
+        rc = self._paho_client.connect(host, port, self._keep_alive_sec)
+        if MQTT_ERR_SUCCESS != rc:
+            transport.close()
+            raise connectError(rc)
+        self._on_data(protocol.sock)  # Anything that arrived before paho took over the socket
+
+    def _start_misc(self):
+        if self._misc_handle is None:
+            self._misc_handle = self._loop.call_later(MISC_INTERVAL_SEC, self._on_misc)
+
+    def _on_misc(self):
+        self._misc_handle = self._loop.call_later(MISC_INTERVAL_SEC, self._on_misc)
+        if self._paho_client.socket() is not None:
+            self._paho_client.loop_misc()
+            self._flush()
+
+    def _on_data(self, sock):
+        while self._paho_client.socket() is sock and sock.readable():
+            if self._paho_client.loop_read() != MQTT_ERR_SUCCESS:
+                break
+        self._flush()
+
+    def _flush(self):
+        # Packets queued from within paho callbacks are left for the caller to write
+        if self._paho_client.socket() is not None and self._paho_client.want_write():
+            self._paho_client.loop_write()
+
+    async def _reconnect(self):
+        while ClientStatus.USER_DISCONNECT != self._client_status.get_status():
+            await asyncio.sleep(self._paho_client._backoffCore.nextBackOffTimeSecond())
+            if ClientStatus.USER_DISCONNECT == self._client_status.get_status():
+                break
+            try:
+                await self._open_connection()
+                break
+            except (socket.error, asyncio.TimeoutError, connectError) as e:
+                self._logger.warn("Reconnect failed: " + str(e))
+        self._reconnect_task = None
+
+    def _create_task(self, coroutine):
+        task = self._loop.create_task(coroutine)
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+        return task
+
+    def _invoke(self, callback, *args):
+        try:
+            result = callback(*args)
+            if inspect.isawaitable(result):
+                self._create_task(result)
+        except Exception:
+            self._logger.exception("Callback raised an exception")
+
+    def _on_connect(self, client, user_data, flags, rc):
+        session_present = bool(flags.get("session present")) if flags else False
+        self._logger.debug("Dispatching [connack] event, session present: %s", session_present)
+        if self._connack_future is not None and not self._connack_future.done():
+            self._connack_future.set_result(rc)
+        if rc != 0:  # Refused, the client is not online
+            return
+        if not session_present:  # The broker dropped every subscription along with the session
+            self._subscription_manager.unconfirm_all_records()
+        self._invoke(self.on_online)
+        if self._need_recover():
+            if ClientStatus.STABLE != self._client_status.get_status():  # To avoid multiple connack dispatching
+                self._logger.debug("Has recovery job")
+                self._create_task(self._clean_up_debt())
+        else:
+            self._logger.debug("No need for recovery")
+            self._client_status.set_status(ClientStatus.STABLE)
+
+    def _need_recover(self):
+        return self._subscription_manager.list_unconfirmed_records() or self._offline_requests_manager.has_more()
+
+    async def _clean_up_debt(self):
+        await self._handle_resubscribe()
+        await self._handle_draining()
+        self._client_status.set_status(ClientStatus.STABLE)
+
+    async def _handle_resubscribe(self):
+        # With the session present, the broker still holds every subscription it acknowledged, so only the
+        # records it never confirmed are sent again
+        subscriptions = self._subscription_manager.list_unconfirmed_records()
+        if subscriptions and not self._has_user_disconnect_request():
+            self._logger.debug("Start resubscribing")
+            self._client_status.set_status(ClientStatus.RESUBSCRIBE)
+            # Up to max_topics_per_subscribe topics go in each SUBSCRIBE packet, each packet with its own SUBACK
+            suback_futures = []
+            for i in range(0, len(subscriptions), self._max_topics_per_subscribe):
+                if self._has_user_disconnect_request() or self._paho_client.socket() is None:
+                    self._logger.debug("Resubscribing interrupted")
+                    break
+                batch = [(topic, qos) for topic, (qos, message_callback, ack_callback)
+                         in subscriptions[i:i + self._max_topics_per_subscribe]]
+                rc, mid = self._paho_client.subscribe(batch)
+                if MQTT_ERR_SUCCESS == rc:
+                    suback_futures.append(self._track_suback(mid, [topic for topic, qos in batch]))
+            # Draining starts once the broker has answered every resubscribe packet, or the SUBACKs timed out
+            if suback_futures:
+                await asyncio.wait(suback_futures)
+
+    def _track_suback(self, mid, topics):
+        # Records are confirmed once the broker grants them, as the threaded core's confirming ack callbacks do.
+        # Unanswered SUBACKs give up after the operation timeout, their records are sent again on the next connect
+        future = self._loop.create_future()
+        self._ack_futures[mid] = future
+        self._loop.call_later(self._operation_timeout_sec, future.cancel)
+
+        def confirm_granted(done_future):
+            self._ack_futures.pop(mid, None)
+            if done_future.cancelled():
+                return
+            for topic, granted_qos in zip(topics, done_future.result() or []):
+                if granted_qos != SUBACK_ERROR:
+                    self._subscription_manager.confirm_record(topic)
+        future.add_done_callback(confirm_granted)
+        return future
+
+    async def _handle_draining(self):
+        if self._offline_requests_manager.has_more() and not self._has_user_disconnect_request():
+            self._logger.debug("Start draining")
+            self._client_status.set_status(ClientStatus.DRAINING)
+            while self._offline_requests_manager.has_more():
+                if self._has_user_disconnect_request() or self._paho_client.socket() is None:
+                    self._logger.debug("Draining interrupted")
+                    break
+                offline_request = self._offline_requests_manager.get_next()
+                if offline_request:
+                    self._offline_request_handlers[offline_request.type](offline_request)
+                    await asyncio.sleep(self._draining_interval_sec)
+
+    def _has_user_disconnect_request(self):
+        return ClientStatus.USER_DISCONNECT == self._client_status.get_status()
+
+    def _handle_offline_publish(self, request):
+        topic, payload, qos, retain = request.data
+        rc, mid = self._paho_client.publish(topic, payload, qos, retain)
+        if request.record_id is not None:
+            # Requests from a persistent queue are acked on their PUBACK, or right away for QoS0 as publish()
+            # has written them to the transport, and nacked when they could not be sent
+            if MQTT_ERR_SUCCESS != rc:
+                self._offline_requests_manager.nack(request.record_id)
+            elif qos > 0:
+                future = self._loop.create_future()
+                self._ack_futures[mid] = future
+                future.add_done_callback(lambda done_future: self._offline_requests_manager.ack(request.record_id))
+            else:
+                self._offline_requests_manager.ack(request.record_id)
+        self._logger.debug("Processed offline publish request")
+
+    def _handle_offline_subscribe(self, request):
+        topic, qos, message_callback, ack_callback = request.data
+        self._subscription_manager.add_record(topic, qos, message_callback, ack_callback)
+        rc, mid = self._paho_client.subscribe(topic, qos)
+        if MQTT_ERR_SUCCESS == rc:
+            self._track_suback(mid, [topic])
+        self._logger.debug("Processed offline subscribe request")
+
+    def _handle_offline_unsubscribe(self, request):
+        topic, ack_callback = request.data
+        self._subscription_manager.remove_record(topic)
+        self._paho_client.unsubscribe(topic)
+        self._logger.debug("Processed offline unsubscribe request")
+
+    def _on_disconnect(self, client, user_data, rc):
+        self._logger.debug("Dispatching [disconnect] event")
+        self._protocol = None
+        self._invoke(self.on_offline)
+        status = self._client_status.get_status()
+        if ClientStatus.USER_DISCONNECT == status:
+            if self._disconnect_future is not None and not self._disconnect_future.done():
+                self._disconnect_future.set_result(rc)
+        elif ClientStatus.CONNECT == status:
+            if self._connack_future is not None and not self._connack_future.done():
+                self._connack_future.set_exception(connectError(rc))
+        else:
+            self._client_status.set_status(ClientStatus.ABNORMAL_DISCONNECT)
+            if self._reconnect_task is None:
+                self._reconnect_task = self._create_task(self._reconnect())
+
+    def _on_publish(self, client, user_data, mid):
+        self._resolve_ack(mid, None)
+
+    def _on_subscribe(self, client, user_data, mid, granted_qos):
+        self._resolve_ack(mid, granted_qos)
+
+    def _on_unsubscribe(self, client, user_data, mid):
+        self._resolve_ack(mid, None)
+
+    def _resolve_ack(self, mid, data):
+        future = self._ack_futures.pop(mid, None)
+        if future is not None and not future.done():
+            future.set_result(data)
+
+    def _on_message(self, client, user_data, message):
+        self._logger.debug("Dispatching [message] event")
+        for qos, message_callback, _ in self._subscription_manager.match_records(message.topic):
+            if message_callback:
+                self._invoke(message_callback, None, None, message)  # message_callback(client, userdata, message)
+        self._invoke(self.on_message, message)
+        for stream in list(self._message_streams):
+            stream.offer(message)
+
+    async def _wait_for_ack(self, mid, timeout_exception):
+        future = self._loop.create_future()
+        self._ack_futures[mid] = future
+        try:
+            return await asyncio.wait_for(future, self._operation_timeout_sec)
+        except asyncio.TimeoutError:
+            self._ack_futures.pop(mid, None)
+            raise timeout_exception()
+
+    async def _drain(self):
+        if self._protocol is not None:
+            await self._protocol.drain()
+
+    async def disconnect(self):
+        self._logger.info("Performing async disconnect...")
+        self._client_status.set_status(ClientStatus.USER_DISCONNECT)
+        if self._reconnect_task is not None:
+            self._reconnect_task.cancel()
+            self._reconnect_task = None
+        if self._paho_client.socket() is None:
+            self._close_connection()
+            return True
+        self._disconnect_future = self._loop.create_future()
+        try:
+            rc = self._paho_client.disconnect()
+            if MQTT_ERR_SUCCESS != rc:
+                self._logger.error("Disconnect error: %d", rc)
+                raise disconnectError(rc)
+            await asyncio.wait_for(self._disconnect_future, self._connect_disconnect_timeout_sec)
+        except asyncio.TimeoutError:
+            self._logger.error("Disconnect timed out")
+            raise disconnectTimeoutException()
+        finally:
+            self._disconnect_future = None
+            self._close_connection()
+        return True
+
+    async def publish(self, topic, payload, qos, retain=False):
+        self._logger.info("Performing async publish...")
+        if ClientStatus.STABLE != self._client_status.get_status():
+            self._handle_offline_request(RequestTypes.PUBLISH, (topic, payload, qos, retain))
+            return False
+        rc, mid = self._paho_client.publish(topic, payload, qos, retain)
+        if MQTT_ERR_SUCCESS != rc:
+            self._logger.error("Publish error: %d", rc)
+            raise publishError(rc)
+        if qos > 0:
+            await self._wait_for_ack(mid, publishTimeoutException)
+        else:
+            await self._drain()
+        return True
+
+    async def subscribe(self, topic, qos, message_callback=None):
+        self._logger.info("Performing async subscribe...")
+        if ClientStatus.STABLE != self._client_status.get_status():
+            self._handle_offline_request(RequestTypes.SUBSCRIBE, (topic, qos, message_callback, None))
+            return False
+        self._subscription_manager.add_record(topic, qos, message_callback, None)
+        rc, mid = self._paho_client.subscribe(topic, qos)
+        if MQTT_ERR_SUCCESS != rc:
+            self._logger.error("Subscribe error: %d", rc)
+            raise subscribeError(rc)
+        granted_qos = await self._wait_for_ack(mid, subscribeTimeoutException)
+        if granted_qos and granted_qos[0] == SUBACK_ERROR:
+            self._logger.error(f"Suback error return code: {granted_qos[0]}")
+            raise subackError(suback=granted_qos)
+        self._subscription_manager.confirm_record(topic)
+        return True
+
+    async def unsubscribe(self, topic):
+        self._logger.info("Performing async unsubscribe...")
+        if ClientStatus.STABLE != self._client_status.get_status():
+            self._handle_offline_request(RequestTypes.UNSUBSCRIBE, (topic, None))
+            return False
+        self._subscription_manager.remove_record(topic)
+        rc, mid = self._paho_client.unsubscribe(topic)
+        if MQTT_ERR_SUCCESS != rc:
+            self._logger.error("Unsubscribe error: %d", rc)
+            raise unsubscribeError(rc)
+        await self._wait_for_ack(mid, unsubscribeTimeoutException)
+        return True
+
+    def _handle_offline_request(self, type, data):
+        self._logger.info("Offline request detected!")
+        offline_request = QueueableRequest(type, data)
+        append_result = self._offline_requests_manager.add_one(offline_request)
+        if AppendResults.APPEND_FAILURE_QUEUE_DISABLED == append_result:
+            self._logger.error("Offline request queue has been disabled")
+            raise self._offline_request_queue_disabled_exceptions[type]()
+        if AppendResults.APPEND_FAILURE_QUEUE_FULL == append_result:
+            self._logger.error("Offline request queue is full")
+            raise self._offline_request_queue_full_exceptions[type]()
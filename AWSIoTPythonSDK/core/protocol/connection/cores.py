@@ -67,6 +67,9 @@ class ProgressiveBackOffCore:
         self._currentBackoffTimeSecond = 1
         # Handler for timer
         self._resetBackoffTimer = None
+        # Connection start time when tracked without a timer, see markConnectionStart
+        self._connectedSinceTimeSecond = None
+        self._stableConnectionTimerEnabled = True
 
     # For custom progressiveBackoff timing configuration
     def configTime(self, srcBaseReconnectTimeSecond, srcMaximumReconnectTimeSecond, srcMinimumConnectTimeSecond):
@@ -87,11 +90,20 @@ class ProgressiveBackOffCore:
     # This should get called only when a disconnect/reconnect happens
     def backOff(self):
         self._logger.debug("backOff: current backoff time is: " + str(self._currentBackoffTimeSecond) + " sec.")
+        # Block the reconnect logic
+        time.sleep(self.nextBackOffTimeSecond())
+
+    # Same as backOff, but returns the time to wait instead of sleeping,
+    # for network loops that cannot block
+    def nextBackOffTimeSecond(self):
         if self._resetBackoffTimer is not None:
             # Cancel the timer
             self._resetBackoffTimer.cancel()
-        # Block the reconnect logic
-        time.sleep(self._currentBackoffTimeSecond)
+        if self._connectedSinceTimeSecond is not None:
+            if time.time() - self._connectedSinceTimeSecond >= self._minimumConnectTimeSecond:
+                self._connectionStableThenResetBackoffTime()
+            self._connectedSinceTimeSecond = None
+        backoffTimeSecond = self._currentBackoffTimeSecond
         # Update the backoff time
         if self._currentBackoffTimeSecond == 0:
             # This is the first attempt to connect, set it to base
@@ -99,18 +111,33 @@ class ProgressiveBackOffCore:
         else:
             # r_cur = min(2^n*r_base, r_max)
             self._currentBackoffTimeSecond = min(self._maximumReconnectTimeSecond, self._currentBackoffTimeSecond * 2)
+        return backoffTimeSecond
 
     # Start the timer for resetting _currentBackoffTimeSecond
     # Will be cancelled upon calling backOff
     def startStableConnectionTimer(self):
+        if not self._stableConnectionTimerEnabled:
+            self.markConnectionStart()
+            return
         self._resetBackoffTimer = threading.Timer(self._minimumConnectTimeSecond,
                                                   self._connectionStableThenResetBackoffTime)
         self._resetBackoffTimer.start()
 
+    # Same as startStableConnectionTimer, without a timer thread per connection:
+    # the stable connection check is done by the next nextBackOffTimeSecond call
+    def markConnectionStart(self):
+        self._connectedSinceTimeSecond = time.time()
+
+    # Have startStableConnectionTimer fall back to markConnectionStart, for
+    # network loops that must not start threads of their own
+    def setStableConnectionTimerEnabled(self, enabled):
+        self._stableConnectionTimerEnabled = enabled
+
     def stopStableConnectionTimer(self):
         if self._resetBackoffTimer is not None:
             # Cancel the timer
             self._resetBackoffTimer.cancel()
+        self._connectedSinceTimeSecond = None
 
     # Timer callback to reset _currentBackoffTimeSecond
     # If the connection is stable for longer than _minimumConnectTimeSecond,
@@ -53,8 +53,10 @@ class InternalAsyncMqttClient(object):
 
     _logger = logging.getLogger(__name__)
 
-    def __init__(self, client_id, clean_session, protocol, use_wss):
+    def __init__(self, client_id, clean_session, protocol, use_wss, network_reactor=None):
         self._paho_client = self._create_paho_client(client_id, clean_session, None, protocol, use_wss)
+        if network_reactor is not None:
+            self._paho_client.reactor_set(network_reactor)
         self._use_wss = use_wss
         self._event_callback_map_lock = Lock()
         self._event_callback_map = dict()
@@ -112,6 +114,27 @@ class InternalAsyncMqttClient(object):
     def configure_reconnect_back_off(self, base_reconnect_quiet_sec, max_reconnect_quiet_sec, stable_connection_sec):
         self._paho_client.setBackoffTiming(base_reconnect_quiet_sec, max_reconnect_quiet_sec, stable_connection_sec)
 
+    def configure_write_mode(self, write_mode):
+        self._paho_client.write_mode_set(write_mode)
+
+    def configure_max_queued_bytes(self, max_queued_bytes):
+        self._paho_client.max_queued_bytes_set(max_queued_bytes)
+
+    def get_queued_bytes(self):
+        return self._paho_client.queued_bytes()
+
+    def is_queue_full(self):
+        return self._paho_client.queue_full()
+
+    def wait_for_queue_room(self, timeout_sec):
+        return self._paho_client.wait_for_queue_room(timeout_sec)
+
+    def pause_reading(self):
+        self._paho_client.pause_reading()
+
+    def resume_reading(self):
+        self._paho_client.resume_reading()
+
     def connect(self, keep_alive_sec, ack_callback=None):
         host = self._endpoint_provider.get_host()
         port = self._endpoint_provider.get_port()
@@ -176,10 +199,11 @@ class InternalAsyncMqttClient(object):
     def on_message(self, message):
         pass
 
-    def publish(self, topic, payload, qos, retain=False, ack_callback=None):
+    def publish(self, topic, payload, qos, retain=False, ack_callback=None, ack_on_write=False):
+        # QoS0 publishes have no PUBACK. With ack_on_write, their ack callback is called once they are written
         with self._event_callback_map_lock:
             rc, mid = self._paho_client.publish(topic, payload, qos, retain)
-            if MQTT_ERR_SUCCESS == rc and qos > 0 and ack_callback:
+            if MQTT_ERR_SUCCESS == rc and (qos > 0 or ack_on_write) and ack_callback:
                 self._logger.debug("Filling in custom puback (QoS>0) event callback...")
                 self._event_callback_map[mid] = ack_callback
             return rc, mid
@@ -192,6 +216,27 @@ class InternalAsyncMqttClient(object):
                 self._event_callback_map[mid] = ack_callback
             return rc, mid
 
+    def subscribe_batch(self, subscriptions):
+        # subscriptions: list of (topic, qos, ack_callback), sent as one SUBSCRIBE packet. Each ack callback gets
+        # its own topic's granted QoS, the same way it would for a single topic SUBSCRIBE
+        with self._event_callback_map_lock:
+            rc, mid = self._paho_client.subscribe([(topic, qos) for topic, qos, ack_callback in subscriptions])
+            if MQTT_ERR_SUCCESS == rc:
+                self._logger.debug("Filling in custom batched suback event callback...")
+                self._event_callback_map[mid] = self._create_batched_suback_callback(subscriptions)
+            return rc, mid
+
+    def _create_batched_suback_callback(self, subscriptions):
+        def batched_suback_callback(mid, data):
+            failed_topics = [topic for (topic, qos, ack_callback), granted_qos in zip(subscriptions, data)
+                             if granted_qos == mqtt.SUBACK_ERROR]
+            if failed_topics:
+                self._logger.error("Suback error for topics: %s", ", ".join(failed_topics))
+            for (topic, qos, ack_callback), granted_qos in zip(subscriptions, data):
+                if ack_callback:
+                    ack_callback(mid=mid, data=(granted_qos,))
+        return batched_suback_callback
+
     def unsubscribe(self, topic, ack_callback=None):
         with self._event_callback_map_lock:
             rc, mid = self._paho_client.unsubscribe(topic)
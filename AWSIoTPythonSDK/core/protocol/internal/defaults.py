@@ -17,4 +17,8 @@ DEFAULT_CONNECT_DISCONNECT_TIMEOUT_SEC = 30
 DEFAULT_OPERATION_TIMEOUT_SEC = 5
 DEFAULT_DRAINING_INTERNAL_SEC = 0.5
 METRICS_PREFIX = "?SDK=Python&Version="
-ALPN_PROTCOLS = "x-amzn-mqtt-ca"
\ No newline at end of file
+ALPN_PROTCOLS = "x-amzn-mqtt-ca"
+DEFAULT_SEGMENT_SIZE_BYTES = 64 * 1024 * 1024
+DEFAULT_FSYNC_INTERVAL_SEC = 1.0
+DEFAULT_FSYNC_BATCH_RECORDS = 1000
+DEFAULT_MAX_TOPICS_PER_SUBSCRIBE = 8  # AWS IoT Core accepts at most 8 subscriptions per SUBSCRIBE packet
@@ -27,3 +27,4 @@ class FixedEventMids(object):
     DISCONNECT_MID = "DISCONNECTED"
     MESSAGE_MID = "MESSAGE"
     QUEUED_MID = "QUEUED"
+    DROPPED_MID = "DROPPED"
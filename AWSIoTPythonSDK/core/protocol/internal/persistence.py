@@ -0,0 +1,315 @@
+# /*
+# * Copyright 2010-2017 Amazon.com, Inc. or its affiliates. All Rights Reserved.
+# *
+# * Licensed under the Apache License, Version 2.0 (the "License").
+# * You may not use this file except in compliance with the License.
+# * A copy of the License is located at
+# *
+# *  http://aws.amazon.com/apache2.0
+# *
+# * or in the "license" file accompanying this file. This file is distributed
+# * on an "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either
+# * express or implied. See the License for the specific language governing
+# * permissions and limitations under the License.
+# */
+
+import logging
+import os
+import struct
+import time
+import zlib
+from collections import OrderedDict
+from threading import Lock
+from AWSIoTPythonSDK.core.protocol.internal.defaults import DEFAULT_SEGMENT_SIZE_BYTES
+from AWSIoTPythonSDK.core.protocol.internal.defaults import DEFAULT_FSYNC_INTERVAL_SEC
+from AWSIoTPythonSDK.core.protocol.internal.defaults import DEFAULT_FSYNC_BATCH_RECORDS
+
+
+class SegmentFileQueue(object):
+    # FIFO queue of byte records kept in append-only segment files in a directory, so that it survives
+    # process restarts and is not limited by memory:
+    #
+    # - Records are appended to the newest segment with buffered sequential writes, as a length and
+    #   CRC32 header followed by the record. A new segment is started once one reaches segment_size_bytes.
+    # - Writes are fsynced in batches, every fsync_batch_records records or fsync_interval_sec seconds,
+    #   whichever comes first, and on flush() and close(). A crash loses at most the last batch.
+    # - pop() hands a record out with its id and keeps it in flight. The reader calls ack() with that id
+    #   once it is done with the record, or nack() to have it handed out again.
+    # - The position of the oldest record not yet acked is saved in a checkpoint file on the same schedule,
+    #   so records in flight, or acked since the last checkpoint, are handed out again after a crash.
+    # - Segments are deleted once every record in them has been acked, and the newest one is replaced by
+    #   an empty one whenever the queue is drained with nothing in flight.
+    # - On startup, the segments after the checkpoint are scanned to count their records. A torn or
+    #   corrupt record, such as one cut short by a power loss, ends its segment there.
+    # - pop() checks each record against its CRC32 again, and skips one damaged since it was written.
+    _HEADER = struct.Struct("!II")  # Record length, CRC32 of the record
+    _CHECKPOINT = struct.Struct("!QQI")  # Segment id, offset, CRC32 of the two
+    _CHECKPOINT_FILE_NAME = "checkpoint"
+    _SEGMENT_FILE_SUFFIX = ".seg"
+    _logger = logging.getLogger(__name__)
+
+    def __init__(self, directory, segment_size_bytes=DEFAULT_SEGMENT_SIZE_BYTES,
+                 fsync_interval_sec=DEFAULT_FSYNC_INTERVAL_SEC, fsync_batch_records=DEFAULT_FSYNC_BATCH_RECORDS):
+        if segment_size_bytes <= 0:
+            raise ValueError("Segment size must be positive.")
+        if not os.path.isdir(directory):
+            os.makedirs(directory)
+        self._directory = directory
+        self._segment_size_bytes = segment_size_bytes
+        self._fsync_interval_sec = fsync_interval_sec
+        self._fsync_batch_records = fsync_batch_records
+        self._lock = Lock()
+        self._segment_ids = []
+        self._record_count = 0
+        self._byte_count = 0
+        self._write_file = None
+        self._write_size = 0
+        self._read_file = None
+        self._read_segment_id = 0
+        self._read_offset = 0
+        self._in_flight = OrderedDict()  # Record id -> record, in the order they were read
+        self._nacked = OrderedDict()  # Ids of records in flight to hand out again, before any unread record
+        self._unsynced_count = 0  # Appends and acks since the last sync
+        self._last_sync_time = time.time()
+        self._recover()
+
+    def __len__(self):
+        return self._record_count
+
+    def get_byte_count(self):
+        # Bytes of the records in the queue, not counting records in flight, headers or segments not yet deleted
+        return self._byte_count
+
+    def append(self, record):
+        with self._lock:
+            if self._write_size > 0 and self._write_size + self._HEADER.size + len(record) > self._segment_size_bytes:
+                self._start_segment()
+            self._write_file.write(self._HEADER.pack(len(record), zlib.crc32(record) & 0xffffffff))
+            self._write_file.write(record)
+            self._write_size += self._HEADER.size + len(record)
+            self._record_count += 1
+            self._byte_count += len(record)
+            self._count_unsynced()
+
+    def pop(self):
+        # Returns (record id, record), or None when there is nothing to hand out
+        with self._lock:
+            if self._record_count == 0:
+                return None
+            if self._nacked:
+                record_id = self._nacked.popitem(last=False)[0]
+                record = self._in_flight[record_id]
+                self._record_count -= 1
+                self._byte_count -= len(record)
+                return record_id, record
+            while True:
+                if self._record_count == 0:  # Only corrupt records were left
+                    if not self._in_flight:
+                        self._start_segment()
+                    return None
+                if self._read_file is None:
+                    self._read_file = open(self._get_segment_path(self._read_segment_id), "rb")
+                    self._read_file.seek(self._read_offset)
+                if self._read_segment_id == self._segment_ids[-1]:
+                    self._write_file.flush()  # Reading the segment being written
+                header = self._read_file.read(self._HEADER.size)
+                if len(header) == self._HEADER.size:
+                    length, crc = self._HEADER.unpack(header)
+                    record = self._read_file.read(length)
+                    if len(record) == length and zlib.crc32(record) & 0xffffffff == crc:
+                        break
+                    if len(record) == length:
+                        # Damaged since it was appended or recovered, the records after it can still be read
+                        self._logger.warning("Skipping corrupt record at offset %d of segment %s",
+                                             self._read_offset, self._get_segment_path(self._read_segment_id))
+                        self._read_offset += self._HEADER.size + length
+                        self._record_count -= 1
+                        self._byte_count -= length
+                        continue
+                if header:
+                    # The record length cannot be trusted, so neither can anything after it in this segment
+                    self._logger.warning("Skipping the rest of segment %s from offset %d, its record length is corrupt",
+                                         self._get_segment_path(self._read_segment_id), self._read_offset)
+                self._read_next_segment()
+            record_id = (self._read_segment_id, self._read_offset)
+            self._in_flight[record_id] = record
+            self._read_offset += self._HEADER.size + length
+            self._record_count -= 1
+            self._byte_count -= length
+            return record_id, record
+
+    def ack(self, record_id):
+        # The reader is done with the record, it is not handed out again even after a crash
+        with self._lock:
+            record = self._in_flight.pop(record_id, None)
+            if record is None:
+                return
+            if record_id in self._nacked:
+                del self._nacked[record_id]
+                self._record_count -= 1
+                self._byte_count -= len(record)
+            if self._record_count == 0 and not self._in_flight:
+                self._start_segment()  # Drained, give the disk space back
+            else:
+                self._delete_acked_segments()
+                self._count_unsynced()
+
+    def nack(self, record_id):
+        # The reader could not use the record, it is handed out again before any unread record
+        with self._lock:
+            if record_id in self._in_flight and record_id not in self._nacked:
+                self._nacked[record_id] = None
+                self._record_count += 1
+                self._byte_count += len(self._in_flight[record_id])
+
+    def flush(self):
+        with self._lock:
+            self._sync()
+
+    def close(self):
+        with self._lock:
+            self._sync()
+            self._write_file.close()
+            if self._read_file is not None:
+                self._read_file.close()
+                self._read_file = None
+
+    def _count_unsynced(self):
+        self._unsynced_count += 1
+        if self._unsynced_count >= self._fsync_batch_records \
+                or time.time() - self._last_sync_time >= self._fsync_interval_sec:
+            self._sync()
+
+    def _sync(self):
+        self._write_file.flush()
+        os.fsync(self._write_file.fileno())
+        self._write_checkpoint(*self._get_checkpoint_position())
+        self._unsynced_count = 0
+        self._last_sync_time = time.time()
+
+    def _get_checkpoint_position(self):
+        # The oldest record not yet acked, or the read position with nothing in flight
+        if self._in_flight:
+            return next(iter(self._in_flight))
+        return self._read_segment_id, self._read_offset
+
+    def _read_next_segment(self):
+        self._read_file.close()
+        self._read_file = None
+        if self._read_segment_id == self._segment_ids[-1]:
+            # Nothing left to read, the records still counted were lost in a skipped segment tail
+            self._logger.warning("Dropping %d records lost to corruption", self._record_count)
+            self._read_offset = self._write_size
+            self._record_count = 0
+            self._byte_count = 0
+            return
+        self._read_segment_id = self._segment_ids[self._segment_ids.index(self._read_segment_id) + 1]
+        self._read_offset = 0
+        self._delete_acked_segments()
+
+    def _delete_acked_segments(self):
+        checkpoint_segment_id = self._get_checkpoint_position()[0]
+        while self._segment_ids[0] < checkpoint_segment_id:
+            os.remove(self._get_segment_path(self._segment_ids.pop(0)))
+
+    def _start_segment(self):
+        # Seals the segment being written and starts a new one. With the queue empty and nothing in flight,
+        # every older segment has been acked and is deleted
+        if self._write_file is not None:
+            self._write_file.flush()
+            os.fsync(self._write_file.fileno())
+            self._write_file.close()
+        segment_id = self._segment_ids[-1] + 1 if self._segment_ids else 0
+        self._segment_ids.append(segment_id)
+        self._write_file = open(self._get_segment_path(segment_id), "ab")
+        self._write_size = 0
+        if self._record_count == 0 and not self._in_flight:
+            if self._read_file is not None:
+                self._read_file.close()
+                self._read_file = None
+            self._read_segment_id = segment_id
+            self._read_offset = 0
+            self._write_checkpoint(segment_id, 0)
+            for stale_segment_id in self._segment_ids[:-1]:
+                os.remove(self._get_segment_path(stale_segment_id))
+            del self._segment_ids[:-1]
+            self._unsynced_count = 0
+            self._last_sync_time = time.time()
+
+    def _write_checkpoint(self, segment_id, offset):
+        # Written to a temporary file and renamed over the old one, so a crash leaves one or the other
+        path = os.path.join(self._directory, self._CHECKPOINT_FILE_NAME)
+        with open(path + ".tmp", "wb") as checkpoint_file:
+            checkpoint_file.write(self._CHECKPOINT.pack(segment_id, offset, self._get_checkpoint_crc(segment_id, offset)))
+            checkpoint_file.flush()
+            os.fsync(checkpoint_file.fileno())
+        os.replace(path + ".tmp", path)
+
+    def _read_checkpoint(self):
+        try:
+            with open(os.path.join(self._directory, self._CHECKPOINT_FILE_NAME), "rb") as checkpoint_file:
+                data = checkpoint_file.read()
+        except IOError:
+            return None
+        if len(data) != self._CHECKPOINT.size:
+            return None
+        segment_id, offset, crc = self._CHECKPOINT.unpack(data)
+        if crc != self._get_checkpoint_crc(segment_id, offset):
+            return None
+        return segment_id, offset
+
+    def _get_checkpoint_crc(self, segment_id, offset):
+        return zlib.crc32(struct.pack("!QQ", segment_id, offset)) & 0xffffffff
+
+    def _get_segment_path(self, segment_id):
+        return os.path.join(self._directory, "%020d%s" % (segment_id, self._SEGMENT_FILE_SUFFIX))
+
+    def _recover(self):
+        segment_ids = sorted(int(file_name[:-len(self._SEGMENT_FILE_SUFFIX)]) for file_name in os.listdir(self._directory)
+                             if file_name.endswith(self._SEGMENT_FILE_SUFFIX))
+        checkpoint = self._read_checkpoint()
+        read_segment_id, read_offset = checkpoint if checkpoint else (segment_ids[0] if segment_ids else 0, 0)
+        for segment_id in segment_ids:
+            if segment_id < read_segment_id:  # Read through before the crash
+                os.remove(self._get_segment_path(segment_id))
+            else:
+                self._segment_ids.append(segment_id)
+        if self._segment_ids and self._segment_ids[0] != read_segment_id:
+            read_offset = 0  # Checkpointed segment is gone, start from the oldest one left
+        for segment_id in self._segment_ids:
+            self._scan_segment(segment_id, read_offset if segment_id == self._segment_ids[0] else 0)
+        self._read_offset = read_offset
+        if self._segment_ids:
+            self._read_segment_id = self._segment_ids[0]
+            self._write_file = open(self._get_segment_path(self._segment_ids[-1]), "ab")
+            self._write_size = self._write_file.tell()
+            if self._record_count == 0:
+                self._start_segment()
+        else:
+            self._segment_ids.append(read_segment_id)
+            self._read_segment_id = read_segment_id
+            self._write_file = open(self._get_segment_path(read_segment_id), "ab")
+            self._write_checkpoint(read_segment_id, 0)
+        self._logger.debug("Recovered %d queued records, %d bytes, from %s",
+                           self._record_count, self._byte_count, self._directory)
+
+    def _scan_segment(self, segment_id, offset):
+        path = self._get_segment_path(segment_id)
+        with open(path, "rb") as segment_file:
+            segment_file.seek(offset)
+            while True:
+                header = segment_file.read(self._HEADER.size)
+                if not header:
+                    return
+                if len(header) == self._HEADER.size:
+                    length, crc = self._HEADER.unpack(header)
+                    record = segment_file.read(length)
+                    if len(record) == length and zlib.crc32(record) & 0xffffffff == crc:
+                        offset += self._HEADER.size + length
+                        self._record_count += 1
+                        self._byte_count += length
+                        continue
+                break
+        self._logger.warning("Truncating torn or corrupt segment %s at offset %d", path, offset)
+        with open(path, "r+b") as segment_file:
+            segment_file.truncate(offset)
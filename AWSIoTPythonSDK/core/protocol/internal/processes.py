@@ -0,0 +1,172 @@
+# /*
+# * Copyright 2010-2017 Amazon.com, Inc. or its affiliates. All Rights Reserved.
+# *
+# * Licensed under the Apache License, Version 2.0 (the "License").
+# * You may not use this file except in compliance with the License.
+# * A copy of the License is located at
+# *
+# *  http://aws.amazon.com/apache2.0
+# *
+# * or in the "license" file accompanying this file. This file is distributed
+# * on an "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either
+# * express or implied. See the License for the specific language governing
+# * permissions and limitations under the License.
+# */
+
+import logging
+import multiprocessing
+import time
+from collections import deque
+from threading import Condition
+from threading import Lock
+from threading import Thread
+from AWSIoTPythonSDK.core.protocol.paho.client import MQTTMessage
+import sys
+if sys.version_info[0] < 3:
+    from Queue import Queue
+else:
+    from queue import Queue
+
+
+def _process_batch(process_handler, topics_and_payloads):
+    # Runs in a worker process. Exceptions are turned into strings, since not every exception pickles
+    results = []
+    for topic, payload in topics_and_payloads:
+        try:
+            results.append((True, process_handler(topic, payload)))
+        except Exception as e:
+            results.append((False, repr(e)))
+    return results
+
+
+class MessageProcessPool(object):
+
+    _STOP = (None, None, None)
+    _logger = logging.getLogger(__name__)
+
+    def __init__(self, process_count, batch_size, batch_latency_sec, start_method=None):
+        if process_count <= 0:
+            raise ValueError("Process count must be positive.")
+        if batch_size <= 0:
+            raise ValueError("Batch size must be positive.")
+        self._process_count = process_count
+        self._batch_size = batch_size
+        self._batch_latency_sec = batch_latency_sec
+        self._context = multiprocessing.get_context(start_method) if start_method else multiprocessing
+        self._max_pending_messages = batch_size * process_count * 4
+        self._pending_messages = deque()  # (process_handler, result_callback, message)
+        self._pending_cv = Condition()
+        self._in_flight_batches = Queue(process_count * 2)
+        self._pool = None
+        self._workers = []
+        self._open_lock = Lock()
+        self._is_closed = True
+        self.open()
+
+    def get_process_count(self):
+        return self._process_count
+
+    def create_message_callback(self, process_handler, result_callback=None):
+        def message_callback(client, userdata, message):
+            self._submit(process_handler, result_callback, message)
+        return message_callback
+
+    def open(self):
+        # Worker processes are forked here, from the thread configuring or connecting the client, never from
+        # the event consumer thread. Reopening waits for the previous worker processes to finish their messages
+        with self._open_lock:
+            with self._pending_cv:
+                if not self._is_closed:
+                    return
+            for worker in self._workers:
+                worker.join()
+            self._pool = self._context.Pool(self._process_count)
+            self._workers = [Thread(target=self._batch), Thread(target=self._collect)]
+            with self._pending_cv:
+                self._is_closed = False
+            for worker in self._workers:
+                worker.daemon = True
+                worker.start()
+            self._logger.debug("Message process pool started with %d processes", self._process_count)
+
+    def close(self):
+        with self._pending_cv:
+            if self._is_closed:
+                return
+            self._is_closed = True
+            self._pending_cv.notify_all()
+        # The batching thread flushes what is pending, then tells the collecting thread to finish up
+
+    def _submit(self, process_handler, result_callback, message):
+        with self._pending_cv:
+            while len(self._pending_messages) >= self._max_pending_messages and not self._is_closed:
+                self._pending_cv.wait()  # Hold back the event consumer rather than buffering without bound
+            if self._is_closed:  # Also when closed while waiting for room
+                self._logger.warning("Message process pool is closed, dropping message on topic: %s" % message.topic)
+                return
+            self._pending_messages.append((process_handler, result_callback, message))
+            if len(self._pending_messages) == 1 or len(self._pending_messages) >= self._batch_size:
+                self._pending_cv.notify_all()
+
+    def _batch(self):
+        while True:
+            with self._pending_cv:
+                while not self._pending_messages and not self._is_closed:
+                    self._pending_cv.wait()
+                if not self._pending_messages:
+                    break
+                # Give the batch up to batch_latency_sec after its first message to fill up
+                deadline = time.time() + self._batch_latency_sec
+                while len(self._pending_messages) < self._batch_size and not self._is_closed:
+                    remaining_sec = deadline - time.time()
+                    if remaining_sec <= 0:
+                        break
+                    self._pending_cv.wait(remaining_sec)
+                batch = [self._pending_messages.popleft()
+                         for i in range(min(self._batch_size, len(self._pending_messages)))]
+                self._pending_cv.notify_all()
+            self._dispatch_batch(batch)
+        self._in_flight_batches.put(self._STOP)
+
+    def _dispatch_batch(self, batch):
+        # One IPC round trip per handler in the batch, keeping each handler's messages in arrival order
+        batches_by_handler = dict()
+        for process_handler, result_callback, message in batch:
+            batches_by_handler.setdefault(process_handler, []).append((result_callback, message))
+        for process_handler, callbacks_and_messages in batches_by_handler.items():
+            topics_and_payloads = [(message.topic, message.payload) for result_callback, message in callbacks_and_messages]
+            async_result = self._pool.apply_async(_process_batch, (process_handler, topics_and_payloads))
+            self._in_flight_batches.put((process_handler, callbacks_and_messages, async_result))
+
+    def _collect(self):
+        while True:
+            process_handler, callbacks_and_messages, async_result = self._in_flight_batches.get()
+            if async_result is None:
+                break
+            try:
+                results = async_result.get()
+            except Exception as e:  # Handler could not be pickled, or a worker process died
+                self._logger.error("Message process pool failed to run a batch of %d messages: %s"
+                                   % (len(callbacks_and_messages), str(e)))
+                continue
+            for (result_callback, message), (is_successful, result) in zip(callbacks_and_messages, results):
+                if not is_successful:
+                    self._logger.error("Message process handler failed on topic %s: %s" % (message.topic, result))
+                elif result_callback is not None:
+                    try:
+                        result_callback(None, None, self._create_result_message(message, result))
+                    except Exception:
+                        self._logger.exception("Message process result callback raised an exception")
+        self._pool.close()
+        self._pool.join()
+        self._logger.debug("Message process pool stopped")
+
+    def _create_result_message(self, message, result):
+        result_message = MQTTMessage()
+        result_message.timestamp = message.timestamp
+        result_message.mid = message.mid
+        result_message.topic = message.topic
+        result_message.qos = message.qos
+        result_message.retain = message.retain
+        result_message.payload = result
+        return result_message
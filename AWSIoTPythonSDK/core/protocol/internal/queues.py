@@ -14,7 +14,16 @@
 # */
 
 import logging
+from collections import deque
 from AWSIoTPythonSDK.core.util.enums import DropBehaviorTypes
+from AWSIoTPythonSDK.core.util.enums import InboundQueueFullPolicyTypes
+from AWSIoTPythonSDK.core.protocol.internal.events import EventTypes
+from AWSIoTPythonSDK.core.protocol.internal.requests import RequestTypes
+import sys
+if sys.version_info[0] < 3:
+    from Queue import Queue
+else:
+    from queue import Queue
 
 
 class AppendResults(object):
@@ -23,35 +32,43 @@ class AppendResults(object):
     APPEND_SUCCESS = 0
 
 
-class OfflineRequestQueue(list):
+class OfflineRequestQueue(deque):
     _logger = logging.getLogger(__name__)
 
-    def __init__(self, max_size, drop_behavior=DropBehaviorTypes.DROP_NEWEST):
-        if not isinstance(max_size, int) or not isinstance(drop_behavior, int):
-            self._logger.error("init: MaximumSize/DropBehavior must be integer.")
-            raise TypeError("MaximumSize/DropBehavior must be integer.")
+    def __init__(self, max_size, drop_behavior=DropBehaviorTypes.DROP_NEWEST, max_bytes=0):
+        if not isinstance(max_size, int) or not isinstance(drop_behavior, int) or not isinstance(max_bytes, int):
+            self._logger.error("init: MaximumSize/DropBehavior/MaximumBytes must be integer.")
+            raise TypeError("MaximumSize/DropBehavior/MaximumBytes must be integer.")
         if drop_behavior != DropBehaviorTypes.DROP_OLDEST and drop_behavior != DropBehaviorTypes.DROP_NEWEST:
             self._logger.error("init: Drop behavior not supported.")
             raise ValueError("Drop behavior not supported.")
+        if max_bytes < 0:
+            self._logger.error("init: Maximum bytes must not be negative.")
+            raise ValueError("Maximum bytes must not be negative.")
 
-        list.__init__([])
+        deque.__init__(self)
         self._drop_behavior = drop_behavior
         # When self._maximumSize > 0, queue is limited
         # When self._maximumSize == 0, queue is disabled
         # When self._maximumSize < 0. queue is infinite
         self._max_size = max_size
+        # When self._max_bytes > 0, queue is also limited to this many bytes of topics and payloads,
+        # which are only counted then
+        self._max_bytes = max_bytes
+        self._byte_count = 0
 
     def _is_enabled(self):
         return self._max_size != 0
 
-    def _need_drop_messages(self):
+    def _need_drop_messages(self, incoming_size=0):
         # Need to drop messages when:
-        # 1. Queue is limited and full
+        # 1. Queue is limited and full, in number of requests or in bytes
         # 2. Queue is disabled
         is_queue_full = len(self) >= self._max_size
         is_queue_limited = self._max_size > 0
         is_queue_disabled = not self._is_enabled()
-        return (is_queue_full and is_queue_limited) or is_queue_disabled
+        is_queue_out_of_bytes = self._max_bytes > 0 and self._byte_count + incoming_size > self._max_bytes
+        return (is_queue_full and is_queue_limited) or is_queue_disabled or is_queue_out_of_bytes
 
     def set_behavior_drop_newest(self):
         self._drop_behavior = DropBehaviorTypes.DROP_NEWEST
@@ -59,6 +76,9 @@ class OfflineRequestQueue(list):
     def set_behavior_drop_oldest(self):
         self._drop_behavior = DropBehaviorTypes.DROP_OLDEST
 
+    def get_byte_count(self):
+        return self._byte_count
+
     # Override
     # Append to a queue with a limited size.
     # Return APPEND_SUCCESS if the append is successful
@@ -67,21 +87,211 @@ class OfflineRequestQueue(list):
     def append(self, data):
         ret = AppendResults.APPEND_SUCCESS
         if self._is_enabled():
-            if self._need_drop_messages():
-                # We should drop the newest
-                if DropBehaviorTypes.DROP_NEWEST == self._drop_behavior:
-                    self._logger.warn("append: Full queue. Drop the newest: " + str(data))
+            size = _get_request_size(data) if self._max_bytes > 0 else 0  # Only counted when limited
+            if self._need_drop_messages(size):
+                # We should drop the newest, or a request that would not fit into the queue even on its own
+                if DropBehaviorTypes.DROP_NEWEST == self._drop_behavior or 0 < self._max_bytes < size:
+                    self._logger.warn("append: Full queue. Drop the newest: %s", data)
                     ret = AppendResults.APPEND_FAILURE_QUEUE_FULL
-                # We should drop the oldest
+                # We should drop the oldest, as many as it takes to make room in bytes
                 else:
-                    current_oldest = super(OfflineRequestQueue, self).pop(0)
-                    self._logger.warn("append: Full queue. Drop the oldest: " + str(current_oldest))
+                    while len(self) > 0 and self._need_drop_messages(size):
+                        current_oldest = self.popleft()
+                        self._logger.warn("append: Full queue. Drop the oldest: %s", current_oldest)
+                    self._byte_count += size
                     super(OfflineRequestQueue, self).append(data)
                     ret = AppendResults.APPEND_FAILURE_QUEUE_FULL
             else:
-                self._logger.debug("append: Add new element: " + str(data))
+                self._logger.debug("append: Add new element: %s", data)
+                self._byte_count += size
                 super(OfflineRequestQueue, self).append(data)
         else:
-            self._logger.debug("append: Queue is disabled. Drop the message: " + str(data))
+            self._logger.debug("append: Queue is disabled. Drop the message: %s", data)
             ret = AppendResults.APPEND_FAILURE_QUEUE_DISABLED
         return ret
+
+    # Override
+    def popleft(self):
+        data = super(OfflineRequestQueue, self).popleft()
+        if self._max_bytes > 0:
+            self._byte_count -= _get_request_size(data)
+        return data
+
+    # Override
+    def clear(self):
+        super(OfflineRequestQueue, self).clear()
+        self._byte_count = 0
+
+
+def _get_request_size(request):
+    # Bytes held by the topic and payload of a queued request, anything else is not counted
+    data = getattr(request, "data", None)
+    if RequestTypes.PUBLISH == getattr(request, "type", None):
+        topic, payload = data[0], data[1]
+        return len(topic) + _get_payload_size(payload)
+    if RequestTypes.SUBSCRIBE == getattr(request, "type", None) or RequestTypes.UNSUBSCRIBE == getattr(request, "type", None):
+        return len(data[0])
+    return 0
+
+
+def _get_payload_size(payload):
+    if payload is None:
+        return 0
+    if isinstance(payload, memoryview):
+        return payload.nbytes
+    try:
+        return len(payload)
+    except TypeError:  # Numbers are published as their string form
+        return len(str(payload))
+
+
+class _InboundEventDeque(deque):
+    # Keeps count of the message events and their bytes as they come and go, including when the
+    # event consumer takes everything at once with clear()
+
+    def __init__(self, on_removed):
+        deque.__init__(self)
+        self.message_count = 0
+        self.byte_count = 0
+        self._on_removed = on_removed
+
+    def append(self, event):
+        deque.append(self, event)
+        self._track(event, 1)
+
+    def popleft(self):
+        event = deque.popleft(self)
+        self._track(event, -1)
+        self._on_removed()
+        return event
+
+    def clear(self):
+        deque.clear(self)
+        self.message_count = 0
+        self.byte_count = 0
+        self._on_removed()
+
+    def remove_oldest_qos0(self):
+        for index, event in enumerate(self):
+            if _is_message_event(event) and event[2].qos == 0:
+                del self[index]
+                self._track(event, -1)
+                return event
+        return None
+
+    def _track(self, event, sign):
+        if _is_message_event(event):
+            self.message_count += sign
+            self.byte_count += sign * _get_message_size(event[2])
+
+
+def _is_message_event(event):
+    return event[1] == EventTypes.MESSAGE
+
+
+def _get_message_size(message):
+    return len(message.topic) + len(message.payload)
+
+
+class InboundEventQueue(Queue):
+    # Event queue from the network thread to the event consumer. Unbounded until configure_limits() is
+    # called. Only message events count towards the limits and can be dropped; acks, connack and disconnect
+    # events are always queued.
+    _logger = logging.getLogger(__name__)
+
+    def __init__(self):
+        Queue.__init__(self)
+        self._max_messages = 0
+        self._max_bytes = 0
+        self._full_policy = InboundQueueFullPolicyTypes.PAUSE_READING
+        self._pause_reading = None
+        self._resume_reading = None
+        self._is_reading_paused = False
+        self._dropped_message_count = 0
+        self._dropped_byte_count = 0
+
+    # Override
+    def _init(self, maxsize):
+        self.queue = _InboundEventDeque(self._on_events_removed)
+
+    def configure_limits(self, max_messages, max_bytes, full_policy):
+        with self.mutex:
+            self._max_messages = max_messages  # 0 means no limit
+            self._max_bytes = max_bytes  # 0 means no limit
+            self._full_policy = full_policy
+            self._on_events_removed()
+
+    def set_read_controls(self, pause_reading, resume_reading):
+        self._pause_reading = pause_reading
+        self._resume_reading = resume_reading
+
+    def get_message_count(self):
+        return self.queue.message_count
+
+    def get_byte_count(self):
+        return self.queue.byte_count
+
+    def get_dropped_message_count(self):
+        return self._dropped_message_count
+
+    def get_dropped_byte_count(self):
+        return self._dropped_byte_count
+
+    def is_reading_paused(self):
+        return self._is_reading_paused
+
+    # Override
+    # Never blocks. A message event that does not fit is either dropped or queued anyway with socket
+    # reads paused, depending on the policy. QoS1 messages are never dropped: without reads paused,
+    # the queue may go over its limits by the QoS1 messages read before the broker runs out of its
+    # in-flight window.
+    def put(self, event, block=True, timeout=None):
+        with self.mutex:
+            if _is_message_event(event) and not self._make_room(event[2]):
+                return
+            self._put(event)
+            self.unfinished_tasks += 1
+            self.not_empty.notify()
+
+    def _make_room(self, message):
+        size = _get_message_size(message)
+        if InboundQueueFullPolicyTypes.DROP_OLDEST_QOS0 == self._full_policy:
+            while self._is_full(size):
+                oldest = self.queue.remove_oldest_qos0()
+                if oldest is None:
+                    break
+                self._count_dropped(oldest[2], "oldest")
+        if not self._is_full(size):
+            return True
+        if message.qos == 0 and InboundQueueFullPolicyTypes.PAUSE_READING != self._full_policy:
+            self._count_dropped(message, "newest")
+            return False
+        self._set_reading_paused(True)
+        return True
+
+    def _is_full(self, incoming_size):
+        if self.queue.message_count == 0:
+            return False  # Always let one message through, however big
+        return (0 < self._max_messages < self.queue.message_count + 1) \
+            or (0 < self._max_bytes < self.queue.byte_count + incoming_size)
+
+    def _count_dropped(self, message, which):
+        self._dropped_message_count += 1
+        self._dropped_byte_count += _get_message_size(message)
+        self._logger.warning("Inbound event queue full. Dropping the %s QoS0 message on topic: %s. Total dropped: %d",
+                             which, message.topic, self._dropped_message_count)
+
+    def _on_events_removed(self):
+        # Resume reading at half the limits, so reads are not paused and resumed on every message
+        if self._is_reading_paused \
+                and (self._max_messages == 0 or self.queue.message_count <= self._max_messages // 2) \
+                and (self._max_bytes == 0 or self.queue.byte_count <= self._max_bytes // 2):
+            self._set_reading_paused(False)
+
+    def _set_reading_paused(self, is_paused):
+        if is_paused != self._is_reading_paused:
+            self._is_reading_paused = is_paused
+            self._logger.debug("Inbound event queue %s socket reads", "pausing" if is_paused else "resuming")
+            read_control = self._pause_reading if is_paused else self._resume_reading
+            if read_control:
+                read_control()
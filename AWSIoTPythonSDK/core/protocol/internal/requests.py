@@ -22,6 +22,7 @@ class RequestTypes(object):
 
 class QueueableRequest(object):
 
-    def __init__(self, type, data):
+    def __init__(self, type, data, record_id=None):
         self.type = type
         self.data = data  # Can be a tuple
+        self.record_id = record_id  # Set on requests read from a persistent queue, to ack them with
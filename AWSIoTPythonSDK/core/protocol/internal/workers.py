@@ -15,27 +15,48 @@
 
 import time
 import logging
+import struct
+from numbers import Number
 from threading import Thread
 from threading import Event
+from threading import Condition
+from threading import Lock
+from threading import current_thread
 from AWSIoTPythonSDK.core.protocol.internal.events import EventTypes
 from AWSIoTPythonSDK.core.protocol.internal.events import FixedEventMids
 from AWSIoTPythonSDK.core.protocol.internal.clients import ClientStatus
 from AWSIoTPythonSDK.core.protocol.internal.queues import OfflineRequestQueue
+from AWSIoTPythonSDK.core.protocol.internal.queues import AppendResults
+from AWSIoTPythonSDK.core.protocol.internal.persistence import SegmentFileQueue
+from AWSIoTPythonSDK.core.protocol.internal.requests import QueueableRequest
 from AWSIoTPythonSDK.core.protocol.internal.requests import RequestTypes
-from AWSIoTPythonSDK.core.protocol.paho.client import topic_matches_sub
+from AWSIoTPythonSDK.core.protocol.paho.matcher import MQTTMatcher
+from AWSIoTPythonSDK.core.protocol.paho.client import MQTT_ERR_SUCCESS
+from AWSIoTPythonSDK.core.protocol.paho.client import SUBACK_ERROR
 from AWSIoTPythonSDK.core.protocol.internal.defaults import DEFAULT_DRAINING_INTERNAL_SEC
+from AWSIoTPythonSDK.core.protocol.internal.defaults import DEFAULT_MAX_TOPICS_PER_SUBSCRIBE
+from AWSIoTPythonSDK.core.util.enums import DropBehaviorTypes
+import sys
+if sys.version_info[0] < 3:
+    from Queue import Queue
+    from Queue import Empty
+    from Queue import Full
+else:
+    from queue import Queue
+    from queue import Empty
+    from queue import Full
 
 
 class EventProducer(object):
 
     _logger = logging.getLogger(__name__)
 
-    def __init__(self, cv, event_queue):
-        self._cv = cv
+    def __init__(self, event_queue):
         self._event_queue = event_queue
 
     def on_connect(self, client, user_data, flags, rc):
-        self._add_to_queue(FixedEventMids.CONNACK_MID, EventTypes.CONNACK, rc)
+        session_present = bool(flags.get("session present")) if flags else False
+        self._add_to_queue(FixedEventMids.CONNACK_MID, EventTypes.CONNACK, (rc, session_present))
         self._logger.debug("Produced [connack] event")
 
     def on_disconnect(self, client, user_data, rc):
@@ -59,26 +80,30 @@ class EventProducer(object):
         self._logger.debug("Produced [message] event")
 
     def _add_to_queue(self, mid, event_type, data):
-        with self._cv:
-            self._event_queue.put((mid, event_type, data))
-            self._cv.notify()
+        self._event_queue.put((mid, event_type, data))
 
 
 class EventConsumer(object):
 
-    MAX_DISPATCH_INTERNAL_SEC = 0.01
+    _WAKE_UP_EVENT = (None, None, None)  # Falsy mid, skipped by dispatch_one
+    _DRAIN_WAIT_SEC = 0.1  # Longest wait for a send slot before checking for disconnects again
     _logger = logging.getLogger(__name__)
 
-    def __init__(self, cv, event_queue, internal_async_client,
+    def __init__(self, event_queue, internal_async_client,
                  subscription_manager, offline_requests_manager, client_status):
-        self._cv = cv
         self._event_queue = event_queue
         self._internal_async_client = internal_async_client
         self._subscription_manager = subscription_manager
         self._offline_requests_manager = offline_requests_manager
         self._client_status = client_status
         self._is_running = False
+        self._dispatch_thread = None
+        self._message_dispatch_pool = None
+        self._pending_message_batchers = []  # Batchers holding messages, only touched on the dispatching thread
         self._draining_interval_sec = DEFAULT_DRAINING_INTERNAL_SEC
+        self._drain_rate_controller = None  # When set, draining is pipelined and paced by it
+        self._drained_count = 0  # Requests sent by the current or last draining
+        self._max_topics_per_subscribe = DEFAULT_MAX_TOPICS_PER_SUBSCRIBE
         self._dispatch_methods = {
             EventTypes.CONNACK : self._dispatch_connack,
             EventTypes.DISCONNECT : self._dispatch_disconnect,
@@ -97,27 +122,63 @@ class EventConsumer(object):
     def update_offline_requests_manager(self, offline_requests_manager):
         self._offline_requests_manager = offline_requests_manager
 
+    def update_message_dispatch_pool(self, message_dispatch_pool):
+        if self._is_running:
+            if self._message_dispatch_pool:
+                self._message_dispatch_pool.stop()
+            if message_dispatch_pool:
+                message_dispatch_pool.start()
+        self._message_dispatch_pool = message_dispatch_pool
+
     def update_draining_interval_sec(self, draining_interval_sec):
         self._draining_interval_sec = draining_interval_sec
 
     def get_draining_interval_sec(self):
         return self._draining_interval_sec
 
+    def update_max_topics_per_subscribe(self, max_topics_per_subscribe):
+        self._max_topics_per_subscribe = max_topics_per_subscribe
+
+    def get_max_topics_per_subscribe(self):
+        return self._max_topics_per_subscribe
+
+    def update_drain_rate_controller(self, drain_rate_controller):
+        self._drain_rate_controller = drain_rate_controller
+
+    def get_draining_progress(self):
+        progress = {
+            "drained": self._drained_count,
+            "remaining": self._offline_requests_manager.get_queued_count(),
+            "in_flight": 0,
+            "rate": 1 / self._draining_interval_sec if self._draining_interval_sec > 0 else float("inf")
+        }
+        if self._drain_rate_controller:
+            progress["in_flight"] = self._drain_rate_controller.get_in_flight_count()
+            progress["rate"] = self._drain_rate_controller.get_rate(self._draining_interval_sec)
+        return progress
+
     def is_running(self):
         return self._is_running
 
     def start(self):
         self._stopper.clear()
         self._is_running = True
-        dispatch_events = Thread(target=self._dispatch)
-        dispatch_events.daemon = True
-        dispatch_events.start()
+        if self._message_dispatch_pool:
+            self._message_dispatch_pool.start()
+        self._dispatch_thread = Thread(target=self._dispatch)
+        self._dispatch_thread.daemon = True
+        self._dispatch_thread.start()
         self._logger.debug("Event consuming thread started")
 
     def stop(self):
         if self._is_running:
             self._is_running = False
             self._clean_up()
+            if self._message_dispatch_pool:
+                self._message_dispatch_pool.stop()  # Messages already handed over still get their callbacks
+            if current_thread() is not self._dispatch_thread:
+                # The dispatching thread blocks on the queue, hand it something to wake up on
+                self._event_queue.put(self._WAKE_UP_EVENT)
         self._logger.debug("Event consuming thread stopped")
 
     def _clean_up(self):
@@ -139,19 +200,38 @@ class EventConsumer(object):
 
     def _dispatch(self):
         while self._is_running:
-            with self._cv:
-                if self._event_queue.empty():
-                    self._cv.wait(self.MAX_DISPATCH_INTERNAL_SEC)
-                else:
-                    while not self._event_queue.empty():
-                        self._dispatch_one()
+            for event in self._take_batch():
+                self._dispatch_one(event)
+                if not self._is_running:  # Stopped on a disconnect event, the rest of the batch is dropped like the queue
+                    break
+            self._deliver_due_message_batches(True)
+        self._deliver_due_message_batches(False)  # Messages already received are still delivered
         self._stopper.set()
         self._logger.debug("Exiting dispatching loop...")
 
-    def _dispatch_one(self):
-        mid, event_type, data = self._event_queue.get()
+    def _take_batch(self):
+        # Block for the first event, then take everything queued behind it in one go. Events are
+        # dispatched with the queue unlocked, so the network thread never waits on user callbacks.
+        # With message batches pending, wait no longer than the earliest of them is due
+        try:
+            if self._pending_message_batchers:
+                timeout_sec = min(batcher.get_deadline() for batcher in self._pending_message_batchers) - time.time()
+                batch = [self._event_queue.get(timeout=max(timeout_sec, 0))]
+            else:
+                batch = [self._event_queue.get()]
+        except Empty:
+            return []
+        with self._event_queue.mutex:
+            batch.extend(self._event_queue.queue)
+            self._event_queue.queue.clear()
+        return batch
+
+    def _dispatch_one(self, event):
+        mid, event_type, data = event
         if mid:
             self._dispatch_methods[event_type](mid, data)
+            if EventTypes.CONNACK == event_type:
+                data = data[0]  # Connect callbacks only get the return code, not the session present flag
             self._internal_async_client.invoke_event_callback(mid, data=data)
             # We need to make sure disconnect event gets dispatched and then we stop the consumer
             if self._need_to_stop_dispatching(mid):
@@ -162,9 +242,13 @@ class EventConsumer(object):
         return (ClientStatus.USER_DISCONNECT == status or ClientStatus.CONNECT == status) \
                and mid == FixedEventMids.DISCONNECT_MID
 
-    def _dispatch_connack(self, mid, rc):
+    def _dispatch_connack(self, mid, connack):
+        rc, session_present = connack
         status = self._client_status.get_status()
-        self._logger.debug("Dispatching [connack] event")
+        self._logger.debug("Dispatching [connack] event, session present: %s", session_present)
+        if not session_present:
+            # Nothing the broker was subscribed to carried over, every record has to be subscribed again
+            self._subscription_manager.unconfirm_all_records()
         if self._need_recover():
             if ClientStatus.STABLE != status:  # To avoid multiple connack dispatching
                 self._logger.debug("Has recovery job")
@@ -175,7 +259,7 @@ class EventConsumer(object):
             self._client_status.set_status(ClientStatus.STABLE)
 
     def _need_recover(self):
-        return self._subscription_manager.list_records() or self._offline_requests_manager.has_more()
+        return self._subscription_manager.list_unconfirmed_records() or self._offline_requests_manager.has_more()
 
     def _clean_up_debt(self):
         self._handle_resubscribe()
@@ -183,29 +267,70 @@ class EventConsumer(object):
         self._client_status.set_status(ClientStatus.STABLE)
 
     def _handle_resubscribe(self):
-        subscriptions = self._subscription_manager.list_records()
+        # With the session present, the broker still holds every subscription it acknowledged, so only the
+        # records it never confirmed are sent again
+        subscriptions = self._subscription_manager.list_unconfirmed_records()
         if subscriptions and not self._has_user_disconnect_request():
             self._logger.debug("Start resubscribing")
             self._client_status.set_status(ClientStatus.RESUBSCRIBE)
-            for topic, (qos, message_callback, ack_callback) in subscriptions:
+            # Up to max_topics_per_subscribe topics go in each SUBSCRIBE packet, each packet with its own SUBACK
+            for i in range(0, len(subscriptions), self._max_topics_per_subscribe):
                 if self._has_user_disconnect_request():
                     self._logger.debug("User disconnect detected")
                     break
-                self._internal_async_client.subscribe(topic, qos, ack_callback)
+                batch = [(topic, qos, self._subscription_manager.create_confirming_ack_callback(topic, ack_callback))
+                         for topic, (qos, message_callback, ack_callback)
+                         in subscriptions[i:i + self._max_topics_per_subscribe]]
+                if len(batch) == 1:
+                    self._internal_async_client.subscribe(*batch[0])
+                else:
+                    self._internal_async_client.subscribe_batch(batch)
 
     def _handle_draining(self):
         if self._offline_requests_manager.has_more() and not self._has_user_disconnect_request():
             self._logger.debug("Start draining")
             self._client_status.set_status(ClientStatus.DRAINING)
+            self._drained_count = 0
+            if self._drain_rate_controller:
+                self._handle_pipelined_draining(self._drain_rate_controller)
+                return
             while self._offline_requests_manager.has_more():
                 if self._has_user_disconnect_request():
                     self._logger.debug("User disconnect detected")
                     break
+                if ClientStatus.DRAINING != self._client_status.get_status():
+                    self._logger.debug("Draining interrupted")  # Requests that failed to send wait for the next connection
+                    break
                 offline_request = self._offline_requests_manager.get_next()
                 if offline_request:
                     self._offline_request_handlers[offline_request.type](offline_request)
+                    self._drained_count += 1
                     time.sleep(self._draining_interval_sec)
 
+    def _handle_pipelined_draining(self, drain_rate_controller):
+        # QoS1 publishes go out without waiting for their PUBACKs, up to the controller's in-flight window,
+        # at the rate it allows. The draining interval still caps that rate
+        while self._offline_requests_manager.has_more():
+            if ClientStatus.DRAINING != self._client_status.get_status():
+                self._logger.debug("Draining interrupted")
+                break
+            if not drain_rate_controller.wait_for_send_slot(self._draining_interval_sec, self._DRAIN_WAIT_SEC):
+                continue  # Check the status again
+            offline_request = self._offline_requests_manager.get_next()
+            if offline_request is None:
+                continue
+            send_time = drain_rate_controller.on_send()
+            if offline_request.type == RequestTypes.PUBLISH and offline_request.data[2] > 0:
+                rc, mid = self._publish_offline_request(offline_request, drain_rate_controller.on_puback)
+                if MQTT_ERR_SUCCESS == rc:
+                    drain_rate_controller.on_publish_sent(mid, send_time)
+                else:
+                    drain_rate_controller.on_send_failed()
+            else:
+                self._offline_request_handlers[offline_request.type](offline_request)
+                drain_rate_controller.on_sent_without_ack()
+            self._drained_count += 1
+
     def _has_user_disconnect_request(self):
         return ClientStatus.USER_DISCONNECT == self._client_status.get_status()
 
@@ -216,6 +341,8 @@ class EventConsumer(object):
             pass
         else:
             self._client_status.set_status(ClientStatus.ABNORMAL_DISCONNECT)
+        if self._drain_rate_controller:
+            self._drain_rate_controller.on_disconnect()
 
     # For puback, suback and unsuback, ack callback invocation is handled in dispatch_one
     # Do nothing in the event dispatching itself
@@ -230,21 +357,70 @@ class EventConsumer(object):
 
     def _dispatch_message(self, mid, message):
         self._logger.debug("Dispatching [message] event")
-        subscriptions = self._subscription_manager.list_records()
-        if subscriptions:
-            for topic, (qos, message_callback, _) in subscriptions:
-                if topic_matches_sub(topic, message.topic) and message_callback:
+        for qos, message_callback, _ in self._subscription_manager.match_records(message.topic):
+            if isinstance(message_callback, MessageBatcher):
+                self._add_to_message_batch(message_callback, message)
+            elif message_callback:
+                if self._message_dispatch_pool:
+                    self._message_dispatch_pool.submit(message.topic, message_callback, message)
+                else:
                     message_callback(None, None, message)  # message_callback(client, userdata, message)
 
+    def _add_to_message_batch(self, message_batcher, message):
+        if not message_batcher.has_messages():
+            self._pending_message_batchers.append(message_batcher)
+        message_batcher.add(message)
+        if message_batcher.is_full():
+            self._pending_message_batchers.remove(message_batcher)
+            self._deliver_message_batch(message_batcher)
+
+    def _deliver_due_message_batches(self, wait_for_deadline):
+        if self._pending_message_batchers:
+            now = time.time()
+            still_pending = []
+            for message_batcher in self._pending_message_batchers:
+                if wait_for_deadline and message_batcher.get_deadline() > now:
+                    still_pending.append(message_batcher)
+                else:
+                    self._deliver_message_batch(message_batcher)
+            self._pending_message_batchers = still_pending
+
+    def _deliver_message_batch(self, message_batcher):
+        messages = message_batcher.take()
+        if self._message_dispatch_pool:
+            # Keyed on the batcher, so one subscription's batches are delivered in order
+            self._message_dispatch_pool.submit(message_batcher, message_batcher.batch_callback, messages)
+        else:
+            message_batcher.batch_callback(None, None, messages)  # batch_callback(client, userdata, messages)
+
     def _handle_offline_publish(self, request):
-        topic, payload, qos, retain = request.data
-        self._internal_async_client.publish(topic, payload, qos, retain)
+        self._publish_offline_request(request)
         self._logger.debug("Processed offline publish request")
 
+    def _publish_offline_request(self, request, ack_callback=None):
+        # Requests from a persistent queue are acked on their PUBACK, or once written for QoS0, and nacked
+        # when they could not be sent, so that they are handed out again
+        topic, payload, qos, retain = request.data
+        is_persisted = request.record_id is not None
+        if is_persisted:
+            ack_callback = self._create_offline_publish_ack_callback(request.record_id, ack_callback)
+        rc, mid = self._internal_async_client.publish(topic, payload, qos, retain, ack_callback, is_persisted)
+        if MQTT_ERR_SUCCESS != rc:
+            self._offline_requests_manager.nack(request.record_id)
+        return rc, mid
+
+    def _create_offline_publish_ack_callback(self, record_id, ack_callback):
+        def offline_publish_ack_callback(mid, data=None):
+            self._offline_requests_manager.ack(record_id)
+            if ack_callback:
+                ack_callback(mid=mid)
+        return offline_publish_ack_callback
+
     def _handle_offline_subscribe(self, request):
         topic, qos, message_callback, ack_callback = request.data
         self._subscription_manager.add_record(topic, qos, message_callback, ack_callback)
-        self._internal_async_client.subscribe(topic, qos, ack_callback)
+        self._internal_async_client.subscribe(topic, qos,
+                                              self._subscription_manager.create_confirming_ack_callback(topic, ack_callback))
         self._logger.debug("Processed offline subscribe request")
 
     def _handle_offline_unsubscribe(self, request):
@@ -254,43 +430,420 @@ class EventConsumer(object):
         self._logger.debug("Processed offline unsubscribe request")
 
 
+class MessageDispatchPool(object):
+
+    _STOP = (None, None)
+    _logger = logging.getLogger(__name__)
+
+    def __init__(self, worker_count, max_queued_messages=0):
+        if worker_count <= 0:
+            raise ValueError("Worker count must be positive.")
+        self._worker_count = worker_count
+        self._max_queued_messages = max_queued_messages  # Per worker, 0 means unbounded
+        self._queues = None
+        self._stop_events = None
+
+    def get_worker_count(self):
+        return self._worker_count
+
+    def is_running(self):
+        return self._queues is not None
+
+    def start(self):
+        if self._queues is None:
+            # Fresh queues on every start, so workers left over from a previous run that are still
+            # finishing their backlog never compete with the new ones
+            self._queues = [Queue(self._max_queued_messages) for i in range(self._worker_count)]
+            self._stop_events = [Event() for i in range(self._worker_count)]
+            for event_queue, stop_event in zip(self._queues, self._stop_events):
+                worker = Thread(target=self._work, args=(event_queue, stop_event))
+                worker.daemon = True
+                worker.start()
+            self._logger.debug("Message dispatch pool started with %d workers", self._worker_count)
+
+    def stop(self):
+        # Never blocks: a worker whose queue is full, likely behind a slow or stuck callback, is told to stop
+        # after its current message instead, dropping its backlog
+        queues, self._queues = self._queues, None
+        if queues is not None:
+            for event_queue, stop_event in zip(queues, self._stop_events):
+                try:
+                    event_queue.put_nowait(self._STOP)
+                except Full:
+                    self._logger.warning("Message dispatch worker queue is full, dropping %d queued messages", event_queue.qsize())
+                    stop_event.set()
+            self._logger.debug("Message dispatch pool stopped")
+
+    def submit(self, topic, message_callback, message):
+        # All messages of one topic go to the same worker, so they are delivered in order. Blocks on a
+        # full worker queue, which holds back the event consumer rather than dropping messages
+        queues = self._queues
+        if queues is not None:
+            queues[hash(topic) % len(queues)].put((message_callback, message))
+
+    def _work(self, event_queue, stop_event):
+        while not stop_event.is_set():
+            message_callback, message = event_queue.get()
+            if message_callback is None or stop_event.is_set():
+                break
+            try:
+                message_callback(None, None, message)  # message_callback(client, userdata, message)
+            except Exception:
+                self._logger.exception("Message callback raised an exception")
+
+
+class MessageBatcher(object):
+
+    # Stands in for the message callback of a subscription. The event consumer collects the subscription's
+    # messages in it and hands them to batch_callback as a list, once max_batch_size of them are in or once
+    # the oldest has waited max_latency_sec, whichever comes first. With max_latency_sec set to 0, each batch
+    # holds whatever one wakeup of the event consumer took off the event queue.
+    def __init__(self, batch_callback, max_batch_size, max_latency_sec):
+        if max_batch_size <= 0:
+            raise ValueError("Max batch size must be positive.")
+        if max_latency_sec < 0:
+            raise ValueError("Max latency must not be negative.")
+        self.batch_callback = batch_callback
+        self._max_batch_size = max_batch_size
+        self._max_latency_sec = max_latency_sec
+        self._messages = []
+        self._deadline = None
+
+    def add(self, message):
+        if not self._messages:
+            self._deadline = time.time() + self._max_latency_sec
+        self._messages.append(message)
+
+    def has_messages(self):
+        return len(self._messages) > 0
+
+    def is_full(self):
+        return len(self._messages) >= self._max_batch_size
+
+    def get_deadline(self):
+        return self._deadline
+
+    def take(self):
+        messages, self._messages = self._messages, []
+        self._deadline = None
+        return messages
+
+
+class DrainRateController(object):
+
+    # Paces offline queue draining with additive increase, multiplicative decrease. The send rate goes up by
+    # rate_increase_per_sec for every second of requests that are acknowledged within max_ack_latency_sec,
+    # and is halved, down to no less than the initial rate, when a PUBACK takes longer than that or the
+    # connection drops. It is halved at most once per max_ack_latency_sec, so one slow burst counts once.
+    # At most max_in_flight QoS1 publishes wait for their PUBACKs at any time. The draining interval caps
+    # the rate, the initial rate included, without changing the rate the controller has worked out. Below
+    # that cap, the rate can be halved down to half the cap.
+    _logger = logging.getLogger(__name__)
+
+    def __init__(self, max_in_flight, initial_rate_per_sec, rate_increase_per_sec, max_ack_latency_sec):
+        if max_in_flight <= 0:
+            raise ValueError("Max in-flight count must be positive.")
+        if initial_rate_per_sec <= 0:
+            raise ValueError("Initial rate must be positive.")
+        if rate_increase_per_sec < 0:
+            raise ValueError("Rate increase must not be negative.")
+        if max_ack_latency_sec <= 0:
+            raise ValueError("Max ack latency must be positive.")
+        self._max_in_flight = max_in_flight
+        self._min_rate_per_sec = initial_rate_per_sec
+        self._rate_per_sec = initial_rate_per_sec
+        self._max_rate_per_sec = float("inf")  # From the draining interval of the last wait_for_send_slot
+        self._rate_increase_per_sec = rate_increase_per_sec
+        self._max_ack_latency_sec = max_ack_latency_sec
+        self._in_flight = dict()  # mid -> send time
+        self._early_acks = dict()  # mid -> ack time, for PUBACKs dispatched before on_publish_sent
+        self._sending_count = 0  # Requests between on_send and on_publish_sent/on_sent_without_ack
+        self._next_send_time = 0
+        self._last_decrease_time = 0
+        self._cv = Condition()
+
+    def get_rate(self, min_interval_sec=0):
+        with self._cv:
+            return min(self._rate_per_sec, self._get_max_rate(min_interval_sec))
+
+    def get_in_flight_count(self):
+        with self._cv:
+            return len(self._in_flight)
+
+    def wait_for_send_slot(self, min_interval_sec, timeout_sec):
+        # True once the window has room and the rate allows another request, False after timeout_sec
+        deadline = time.time() + timeout_sec
+        with self._cv:
+            # Capped on every wait, so a lowered draining interval applies straight away
+            self._max_rate_per_sec = self._get_max_rate(min_interval_sec)
+            self._next_send_time = min(self._next_send_time, time.time() + 1 / self._get_capped_rate())
+            while True:
+                now = time.time()
+                has_room = len(self._in_flight) + self._sending_count < self._max_in_flight
+                if has_room and now >= self._next_send_time:
+                    return True
+                if now >= deadline:
+                    return False
+                self._cv.wait(min(self._next_send_time, deadline) - now if has_room else deadline - now)
+
+    def on_send(self):
+        with self._cv:
+            now = time.time()
+            self._next_send_time = max(self._next_send_time, now) + 1 / self._get_capped_rate()
+            self._sending_count += 1
+            return now
+
+    def on_publish_sent(self, mid, send_time):
+        with self._cv:
+            self._sending_count -= 1
+            ack_time = self._early_acks.pop(mid, None)
+            if ack_time is None:
+                self._in_flight[mid] = send_time
+            else:
+                self._on_ack(send_time, ack_time)
+
+    def on_send_failed(self):
+        with self._cv:
+            self._sending_count -= 1
+            self._cv.notify_all()
+
+    def on_puback(self, mid, data=None):
+        with self._cv:
+            now = time.time()
+            send_time = self._in_flight.pop(mid, None)
+            if send_time is None:
+                self._early_acks[mid] = now
+            else:
+                self._on_ack(send_time, now)
+
+    def on_sent_without_ack(self):
+        # QoS0 publishes, subscribes and unsubscribes give no latency feedback, only disconnects slow them down
+        with self._cv:
+            self._sending_count -= 1
+            self._increase()
+
+    def on_disconnect(self):
+        with self._cv:
+            # Their PUBACKs are not coming back on this connection
+            self._in_flight.clear()
+            self._early_acks.clear()
+            self._decrease(time.time())
+            self._cv.notify_all()
+
+    def _on_ack(self, send_time, ack_time):
+        if ack_time - send_time > self._max_ack_latency_sec:
+            self._decrease(ack_time)
+        else:
+            self._increase()
+        self._cv.notify_all()
+
+    def _increase(self):
+        # Every request adds its share, so a second's worth of requests adds rate_increase_per_sec. Grows
+        # from the capped rate, so it does not run away while the cap holds it back
+        rate_per_sec = self._get_capped_rate()
+        self._rate_per_sec = rate_per_sec + self._rate_increase_per_sec / rate_per_sec
+
+    def _decrease(self, now):
+        if now - self._last_decrease_time > self._max_ack_latency_sec:
+            # With the cap below the initial rate, the floor drops to half the cap, so backing off still slows down
+            min_rate_per_sec = min(self._min_rate_per_sec, self._max_rate_per_sec / 2)
+            self._rate_per_sec = max(self._get_capped_rate() / 2, min_rate_per_sec)
+            self._last_decrease_time = now
+            self._logger.debug("Slowing draining down to %.1f requests/s", self._rate_per_sec)
+
+    def _get_capped_rate(self):
+        return min(self._rate_per_sec, self._max_rate_per_sec)
+
+    def _get_max_rate(self, min_interval_sec):
+        return 1 / min_interval_sec if min_interval_sec > 0 else float("inf")
+
+
 class SubscriptionManager(object):
 
     _logger = logging.getLogger(__name__)
 
     def __init__(self):
         self._subscription_map = dict()
+        self._subscription_matcher = MQTTMatcher()  # Topic filter index for inbound message routing
+        self._unconfirmed_topics = set()  # Recorded topics the broker has not granted a subscription for yet
+        self._lock = Lock()
 
     def add_record(self, topic, qos, message_callback, ack_callback):
         self._logger.debug("Adding a new subscription record: %s qos: %d", topic, qos)
-        self._subscription_map[topic] = qos, message_callback, ack_callback  # message_callback and/or ack_callback could be None
+        record = qos, message_callback, ack_callback  # message_callback and/or ack_callback could be None
+        with self._lock:
+            self._subscription_map[topic] = record
+            self._subscription_matcher[topic] = record
+            self._unconfirmed_topics.add(topic)
 
     def remove_record(self, topic):
         self._logger.debug("Removing subscription record: %s", topic)
-        if self._subscription_map.get(topic):  # Ignore topics that are never subscribed to
-            del self._subscription_map[topic]
-        else:
-            self._logger.warn("Removing attempt for non-exist subscription record: %s", topic)
+        with self._lock:
+            if self._subscription_map.get(topic):  # Ignore topics that are never subscribed to
+                del self._subscription_map[topic]
+                del self._subscription_matcher[topic]
+                self._unconfirmed_topics.discard(topic)
+            else:
+                self._logger.warn("Removing attempt for non-exist subscription record: %s", topic)
 
     def list_records(self):
         return list(self._subscription_map.items())
 
+    def list_unconfirmed_records(self):
+        with self._lock:
+            return [(topic, record) for topic, record in self._subscription_map.items()
+                    if topic in self._unconfirmed_topics]
+
+    def confirm_record(self, topic):
+        with self._lock:
+            self._unconfirmed_topics.discard(topic)
+
+    def unconfirm_all_records(self):
+        with self._lock:
+            self._unconfirmed_topics.update(self._subscription_map)
+
+    def create_confirming_ack_callback(self, topic, ack_callback):
+        # Marks the record confirmed once the broker grants the subscription, then calls on to ack_callback
+        def confirming_ack_callback(mid, data):
+            if data and data[0] != SUBACK_ERROR:
+                self.confirm_record(topic)
+            if ack_callback:
+                ack_callback(mid=mid, data=data)
+        return confirming_ack_callback
+
+    def match_records(self, topic):
+        # Cost depends on the topic depth rather than on the number of subscription records
+        return self._subscription_matcher.iter_match(topic)
+
 
 class OfflineRequestsManager(object):
 
     _logger = logging.getLogger(__name__)
 
-    def __init__(self, max_size, drop_behavior):
-        self._queue = OfflineRequestQueue(max_size, drop_behavior)
+    def __init__(self, max_size, drop_behavior, max_bytes=0):
+        self._queue = OfflineRequestQueue(max_size, drop_behavior, max_bytes)
 
     def has_more(self):
         return len(self._queue) > 0
 
+    def get_queued_count(self):
+        return len(self._queue)
+
     def add_one(self, request):
         return self._queue.append(request)
 
     def get_next(self):
         if self.has_more():
-            return self._queue.pop(0)
+            return self._queue.popleft()
         else:
             return None
+
+    # Requests leave the in-memory queue when they are handed out, there is nothing to ack
+    def ack(self, record_id):
+        pass
+
+    def nack(self, record_id):
+        pass
+
+    def close(self):
+        pass
+
+
+class PersistentOfflineRequestsManager(object):
+    # Keeps offline publish requests on disk, so they are still sent after the process restarts. Subscribe
+    # and unsubscribe requests carry callbacks that cannot be written out, so they stay in memory and are
+    # handed out before the publish requests.
+    #
+    # A publish request handed out by get_next stays on disk until it is acked: on its PUBACK for QoS1, once
+    # written to the socket for QoS0. A crash before that hands it out again, so publish requests are
+    # delivered at least once. A request that could not be sent is nacked and handed out again.
+
+    _PUBLISH_HEADER = struct.Struct("!HBBB")  # Topic length, QoS, retain, payload is text
+    _logger = logging.getLogger(__name__)
+
+    def __init__(self, directory, max_bytes, drop_behavior, **segment_file_queue_options):
+        if drop_behavior != DropBehaviorTypes.DROP_OLDEST and drop_behavior != DropBehaviorTypes.DROP_NEWEST:
+            self._logger.error("init: Drop behavior not supported.")
+            raise ValueError("Drop behavior not supported.")
+        if max_bytes < 0:
+            self._logger.error("init: Maximum bytes must not be negative.")
+            raise ValueError("Maximum bytes must not be negative.")
+        # When max_bytes > 0, queued topics and payloads on disk are limited to this many bytes
+        # When max_bytes == 0, only the disk limits the queue
+        self._max_bytes = max_bytes
+        self._drop_behavior = drop_behavior
+        self._memory_queue = OfflineRequestQueue(-1, DropBehaviorTypes.DROP_NEWEST)
+        self._disk_queue = SegmentFileQueue(directory, **segment_file_queue_options)
+
+    def has_more(self):
+        return len(self._memory_queue) > 0 or len(self._disk_queue) > 0
+
+    def get_queued_count(self):
+        return len(self._memory_queue) + len(self._disk_queue)
+
+    def add_one(self, request):
+        if request.type != RequestTypes.PUBLISH:
+            return self._memory_queue.append(request)
+        record = self._encode_publish_request(request)
+        append_result = AppendResults.APPEND_SUCCESS
+        if self._max_bytes > 0:
+            if len(record) > self._max_bytes:
+                self._logger.warning("add_one: Publish request larger than the whole queue, dropping it")
+                return AppendResults.APPEND_FAILURE_QUEUE_FULL
+            while self._disk_queue.get_byte_count() + len(record) > self._max_bytes:
+                if self._drop_behavior == DropBehaviorTypes.DROP_NEWEST:
+                    self._logger.warning("add_one: Persistent offline queue is full, dropping the newest request")
+                    return AppendResults.APPEND_FAILURE_QUEUE_FULL
+                self._logger.warning("add_one: Persistent offline queue is full, dropping the oldest request")
+                self._disk_queue.ack(self._disk_queue.pop()[0])
+                append_result = AppendResults.APPEND_FAILURE_QUEUE_FULL  # Queued, but something was dropped
+        self._disk_queue.append(record)
+        return append_result
+
+    def get_next(self):
+        if len(self._memory_queue) > 0:
+            return self._memory_queue.popleft()
+        popped = self._disk_queue.pop()
+        if popped is None:
+            return None
+        record_id, record = popped
+        return self._decode_publish_request(record, record_id)
+
+    def ack(self, record_id):
+        if record_id is not None:
+            self._disk_queue.ack(record_id)
+
+    def nack(self, record_id):
+        if record_id is not None:
+            self._disk_queue.nack(record_id)
+
+    def get_byte_count(self):
+        return self._disk_queue.get_byte_count()
+
+    def close(self):
+        self._disk_queue.close()
+
+    def _encode_publish_request(self, request):
+        topic, payload, qos, retain = request.data
+        encoded_topic = topic.encode("utf-8")
+        is_text, encoded_payload = self._encode_payload(payload)
+        return self._PUBLISH_HEADER.pack(len(encoded_topic), qos, 1 if retain else 0, 1 if is_text else 0) \
+            + encoded_topic + encoded_payload
+
+    def _encode_payload(self, payload):
+        # Same payload types as publish: None is an empty payload, numbers go out as their string form
+        if payload is None:
+            return False, b""
+        if isinstance(payload, Number):
+            return True, str(payload).encode("utf-8")
+        try:
+            return False, bytes(memoryview(payload))  # bytes, bytearray, memoryview and other buffers
+        except TypeError:
+            return True, payload.encode("utf-8")
+
+    def _decode_publish_request(self, record, record_id):
+        topic_length, qos, retain, is_text = self._PUBLISH_HEADER.unpack_from(record)
+        topic_end = self._PUBLISH_HEADER.size + topic_length
+        topic = record[self._PUBLISH_HEADER.size:topic_end].decode("utf-8")
+        payload = record[topic_end:].decode("utf-8") if is_text else record[topic_end:]
+        return QueueableRequest(RequestTypes.PUBLISH, (topic, payload, qos, bool(retain)), record_id)
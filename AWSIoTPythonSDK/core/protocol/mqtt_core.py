@@ -21,6 +21,11 @@ from AWSIoTPythonSDK.core.protocol.internal.workers import EventProducer
 from AWSIoTPythonSDK.core.protocol.internal.workers import EventConsumer
 from AWSIoTPythonSDK.core.protocol.internal.workers import SubscriptionManager
 from AWSIoTPythonSDK.core.protocol.internal.workers import OfflineRequestsManager
+from AWSIoTPythonSDK.core.protocol.internal.workers import PersistentOfflineRequestsManager
+from AWSIoTPythonSDK.core.protocol.internal.workers import MessageDispatchPool
+from AWSIoTPythonSDK.core.protocol.internal.workers import MessageBatcher
+from AWSIoTPythonSDK.core.protocol.internal.workers import DrainRateController
+from AWSIoTPythonSDK.core.protocol.internal.processes import MessageProcessPool
 from AWSIoTPythonSDK.core.protocol.internal.requests import RequestTypes
 from AWSIoTPythonSDK.core.protocol.internal.requests import QueueableRequest
 from AWSIoTPythonSDK.core.protocol.internal.defaults import DEFAULT_CONNECT_DISCONNECT_TIMEOUT_SEC
@@ -36,6 +41,7 @@ from AWSIoTPythonSDK.exception.AWSIoTExceptions import disconnectTimeoutExceptio
 from AWSIoTPythonSDK.exception.AWSIoTExceptions import publishError
 from AWSIoTPythonSDK.exception.AWSIoTExceptions import publishTimeoutException
 from AWSIoTPythonSDK.exception.AWSIoTExceptions import publishQueueFullException
+from AWSIoTPythonSDK.exception.AWSIoTExceptions import publishOutboundQueueFullException
 from AWSIoTPythonSDK.exception.AWSIoTExceptions import publishQueueDisabledException
 from AWSIoTPythonSDK.exception.AWSIoTExceptions import subscribeQueueFullException
 from AWSIoTPythonSDK.exception.AWSIoTExceptions import subscribeQueueDisabledException
@@ -46,16 +52,12 @@ from AWSIoTPythonSDK.exception.AWSIoTExceptions import subscribeTimeoutException
 from AWSIoTPythonSDK.exception.AWSIoTExceptions import unsubscribeError
 from AWSIoTPythonSDK.exception.AWSIoTExceptions import unsubscribeTimeoutException
 from AWSIoTPythonSDK.core.protocol.internal.queues import AppendResults
+from AWSIoTPythonSDK.core.protocol.internal.queues import InboundEventQueue
 from AWSIoTPythonSDK.core.util.enums import DropBehaviorTypes
+from AWSIoTPythonSDK.core.util.enums import OutboundQueueFullPolicyTypes
 from AWSIoTPythonSDK.core.protocol.paho.client import MQTTv31
-from threading import Condition
 from threading import Event
 import logging
-import sys
-if sys.version_info[0] < 3:
-    from Queue import Queue
-else:
-    from queue import Queue
 
 
 class SubackPacket(object):
@@ -68,26 +70,29 @@ class MqttCore(object):
 
     _logger = logging.getLogger(__name__)
 
-    def __init__(self, client_id, clean_session, protocol, use_wss):
+    def __init__(self, client_id, clean_session, protocol, use_wss, network_reactor=None):
         self._use_wss = use_wss
         self._username = ""
         self._password = None
         self._enable_metrics_collection = True
-        self._event_queue = Queue()
-        self._event_cv = Condition()
-        self._event_producer = EventProducer(self._event_cv, self._event_queue)
+        self._event_queue = InboundEventQueue()
+        self._event_producer = EventProducer(self._event_queue)
         self._client_status = ClientStatusContainer()
-        self._internal_async_client = InternalAsyncMqttClient(client_id, clean_session, protocol, use_wss)
+        self._internal_async_client = InternalAsyncMqttClient(client_id, clean_session, protocol, use_wss, network_reactor)
+        self._event_queue.set_read_controls(self._internal_async_client.pause_reading,
+                                            self._internal_async_client.resume_reading)
         self._subscription_manager = SubscriptionManager()
         self._offline_requests_manager = OfflineRequestsManager(-1, DropBehaviorTypes.DROP_NEWEST)  # Infinite queue
-        self._event_consumer = EventConsumer(self._event_cv,
-                                             self._event_queue,
+        self._event_consumer = EventConsumer(self._event_queue,
                                              self._internal_async_client,
                                              self._subscription_manager,
                                              self._offline_requests_manager,
                                              self._client_status)
         self._connect_disconnect_timeout_sec = DEFAULT_CONNECT_DISCONNECT_TIMEOUT_SEC
         self._operation_timeout_sec = DEFAULT_OPERATION_TIMEOUT_SEC
+        self._outbound_queue_full_policy = OutboundQueueFullPolicyTypes.BLOCK
+        self._outbound_dropped_count = 0
+        self._message_process_pool = None
         self._init_offline_request_exceptions()
         self._init_workers()
         self._logger.info("MqttCore initialized")
@@ -187,15 +192,83 @@ class MqttCore(object):
     def disable_metrics_collection(self):
         self._enable_metrics_collection = False
 
-    def configure_offline_requests_queue(self, max_size, drop_behavior):
-        self._logger.info("Configuring offline requests queueing: max queue size: %d", max_size)
-        self._offline_requests_manager = OfflineRequestsManager(max_size, drop_behavior)
+    def configure_offline_requests_queue(self, max_size, drop_behavior, max_bytes=0):
+        self._logger.info("Configuring offline requests queueing: max queue size: %d, max queue bytes: %d", max_size, max_bytes)
+        self._offline_requests_manager.close()
+        self._offline_requests_manager = OfflineRequestsManager(max_size, drop_behavior, max_bytes)
         self._event_consumer.update_offline_requests_manager(self._offline_requests_manager)
 
+    def configure_persistent_offline_requests_queue(self, directory, max_bytes, drop_behavior):
+        self._logger.info("Configuring persistent offline requests queueing: directory: %s, max queue bytes: %d",
+                          directory, max_bytes)
+        self._offline_requests_manager.close()
+        self._offline_requests_manager = PersistentOfflineRequestsManager(directory, max_bytes, drop_behavior)
+        self._event_consumer.update_offline_requests_manager(self._offline_requests_manager)
+
+    def configure_write_mode(self, write_mode):
+        self._logger.info("Configuring write mode: %d", write_mode)
+        self._internal_async_client.configure_write_mode(write_mode)
+
+    def configure_outbound_queue_limit(self, max_queued_bytes, queue_full_policy):
+        self._logger.info("Configuring outbound queue limit: %d bytes, policy: %d", max_queued_bytes, queue_full_policy)
+        self._outbound_queue_full_policy = queue_full_policy
+        self._internal_async_client.configure_max_queued_bytes(max_queued_bytes)
+
+    def get_outbound_queued_bytes(self):
+        return self._internal_async_client.get_queued_bytes()
+
+    def configure_inbound_queue_limit(self, max_queued_messages, max_queued_bytes, queue_full_policy):
+        self._logger.info("Configuring inbound queue limit: %d messages, %d bytes, policy: %d",
+                          max_queued_messages, max_queued_bytes, queue_full_policy)
+        self._event_queue.configure_limits(max_queued_messages, max_queued_bytes, queue_full_policy)
+
+    def get_inbound_dropped_message_count(self):
+        return self._event_queue.get_dropped_message_count()
+
+    def get_inbound_dropped_byte_count(self):
+        return self._event_queue.get_dropped_byte_count()
+
+    def configure_message_dispatch_pool(self, worker_count, max_queued_messages):
+        self._logger.info("Configuring message dispatch pool: %d workers, max queued messages per worker: %d",
+                          worker_count, max_queued_messages)
+        message_dispatch_pool = MessageDispatchPool(worker_count, max_queued_messages) if worker_count > 0 else None
+        self._event_consumer.update_message_dispatch_pool(message_dispatch_pool)
+
+    def configure_message_process_pool(self, process_count, batch_size, batch_latency_sec):
+        self._logger.info("Configuring message process pool: %d processes, batch size: %d, batch latency: %f sec",
+                          process_count, batch_size, batch_latency_sec)
+        if self._message_process_pool:
+            self._message_process_pool.close()  # Subscriptions made through it keep dropping messages until renewed
+        self._message_process_pool = MessageProcessPool(process_count, batch_size, batch_latency_sec) if process_count > 0 else None
+
+    def create_message_process_callback(self, process_handler, result_callback=None):
+        if self._message_process_pool is None:
+            raise ValueError("Message process pool is not configured.")
+        return self._message_process_pool.create_message_callback(process_handler, result_callback)
+
+    def create_message_batch_callback(self, batch_callback, max_batch_size, max_latency_sec):
+        return MessageBatcher(batch_callback, max_batch_size, max_latency_sec)
+
     def configure_draining_interval_sec(self, draining_interval_sec):
         self._logger.info("Configuring offline requests queue draining interval: %f sec", draining_interval_sec)
         self._event_consumer.update_draining_interval_sec(draining_interval_sec)
 
+    def configure_max_topics_per_subscribe(self, max_topics_per_subscribe):
+        self._logger.info("Configuring max topics per resubscribe packet: %d", max_topics_per_subscribe)
+        self._event_consumer.update_max_topics_per_subscribe(max_topics_per_subscribe)
+
+    def configure_adaptive_draining(self, max_in_flight, initial_rate_per_sec, rate_increase_per_sec, max_ack_latency_sec):
+        self._logger.info("Configuring adaptive draining: max in-flight publishes: %d, initial rate: %f requests/s",
+                          max_in_flight, initial_rate_per_sec)
+        drain_rate_controller = None
+        if max_in_flight > 0:
+            drain_rate_controller = DrainRateController(max_in_flight, initial_rate_per_sec, rate_increase_per_sec,
+                                                        max_ack_latency_sec)
+        self._event_consumer.update_drain_rate_controller(drain_rate_controller)
+
+    def get_draining_progress(self):
+        return self._event_consumer.get_draining_progress()
+
     def connect(self, keep_alive_sec):
         self._logger.info("Performing sync connect...")
         event = Event()
@@ -208,6 +281,8 @@ class MqttCore(object):
     def connect_async(self, keep_alive_sec, ack_callback=None):
         self._logger.info("Performing async connect...")
         self._logger.info("Keep-alive: %f sec" % keep_alive_sec)
+        if self._message_process_pool:
+            self._message_process_pool.open()  # Closed by the last disconnect
         self._start_workers()
         self._load_callbacks()
         self._load_username_password()
@@ -262,6 +337,8 @@ class MqttCore(object):
         if MQTT_ERR_SUCCESS != rc:
             self._logger.error("Disconnect error: %d", rc)
             raise disconnectError(rc)
+        if self._message_process_pool:
+            self._message_process_pool.close()  # Worker processes finish the messages they have, then exit
         return FixedEventMids.DISCONNECT_MID
 
     def publish(self, topic, payload, qos, retain=False):
@@ -278,7 +355,9 @@ class MqttCore(object):
                     self._logger.error("Publish timed out")
                     raise publishTimeoutException()
             else:
-                self._publish_async(topic, payload, qos, retain)
+                rc, mid = self._publish_async(topic, payload, qos, retain)
+                if FixedEventMids.DROPPED_MID == mid:
+                    return False
             ret = True
         return ret
 
@@ -292,12 +371,28 @@ class MqttCore(object):
             return mid
 
     def _publish_async(self, topic, payload, qos, retain=False, ack_callback=None):
+        if self._internal_async_client.is_queue_full() and not self._wait_for_outbound_queue_room(qos):
+            return MQTT_ERR_SUCCESS, FixedEventMids.DROPPED_MID
         rc, mid = self._internal_async_client.publish(topic, payload, qos, retain, ack_callback)
         if MQTT_ERR_SUCCESS != rc:
             self._logger.error("Publish error: %d", rc)
             raise publishError(rc)
         return rc, mid
 
+    def _wait_for_outbound_queue_room(self, qos):
+        # Returns False if the publish should be silently dropped, raises if it should be rejected
+        if OutboundQueueFullPolicyTypes.BLOCK == self._outbound_queue_full_policy:
+            if self._internal_async_client.wait_for_queue_room(self._operation_timeout_sec):
+                return True
+            self._logger.error("Publish timed out in waiting for outbound queue room")
+            raise publishTimeoutException()
+        if OutboundQueueFullPolicyTypes.DROP_QOS0 == self._outbound_queue_full_policy and qos == 0:
+            self._outbound_dropped_count += 1
+            self._logger.warning("Outbound queue full. Dropping QoS0 publish. Total dropped: %d", self._outbound_dropped_count)
+            return False
+        self._logger.error("Outbound queue full")
+        raise publishOutboundQueueFullException()
+
     def subscribe(self, topic, qos, message_callback=None):
         self._logger.info("Performing sync subscribe...")
         ret = False
@@ -316,6 +411,39 @@ class MqttCore(object):
             ret = True
         return ret
 
+    def subscribe_batch(self, subscriptions):
+        # subscriptions: list of (topic, qos, message_callback), sent as one SUBSCRIBE packet and blocking until
+        # its SUBACK arrives
+        self._logger.info("Performing sync batched subscribe...")
+        ret = False
+        if ClientStatus.STABLE != self._client_status.get_status():
+            for topic, qos, message_callback in subscriptions:
+                self._handle_offline_request(RequestTypes.SUBSCRIBE, (topic, qos, message_callback, None))
+        else:
+            suback = SubackPacket()
+            rc, mid = self._subscribe_batch_async(subscriptions,
+                                                  self._create_blocking_batched_suback_callback(suback, len(subscriptions)))
+            if not suback.event.wait(self._operation_timeout_sec):
+                self._internal_async_client.remove_event_callback(mid)
+                self._logger.error("Subscribe timed out")
+                raise subscribeTimeoutException()
+            if SUBACK_ERROR in suback.data:
+                self._logger.error(f"Suback error return codes: {suback.data}")
+                raise subackError(suback=suback.data)
+            ret = True
+        return ret
+
+    def _subscribe_batch_async(self, subscriptions, ack_callback):
+        batch = list()
+        for topic, qos, message_callback in subscriptions:
+            self._subscription_manager.add_record(topic, qos, message_callback, None)
+            batch.append((topic, qos, self._subscription_manager.create_confirming_ack_callback(topic, ack_callback)))
+        rc, mid = self._internal_async_client.subscribe_batch(batch)
+        if MQTT_ERR_SUCCESS != rc:
+            self._logger.error("Subscribe error: %d", rc)
+            raise subscribeError(rc)
+        return rc, mid
+
     def subscribe_async(self, topic, qos, ack_callback=None, message_callback=None):
         self._logger.info("Performing async subscribe...")
         if ClientStatus.STABLE != self._client_status.get_status():
@@ -327,7 +455,8 @@ class MqttCore(object):
 
     def _subscribe_async(self, topic, qos, ack_callback=None, message_callback=None):
         self._subscription_manager.add_record(topic, qos, message_callback, ack_callback)
-        rc, mid = self._internal_async_client.subscribe(topic, qos, ack_callback)
+        rc, mid = self._internal_async_client.subscribe(topic, qos,
+                                                        self._subscription_manager.create_confirming_ack_callback(topic, ack_callback))
         if MQTT_ERR_SUCCESS != rc:
             self._logger.error("Subscribe error: %d", rc)
             raise subscribeError(rc)
@@ -376,6 +505,16 @@ class MqttCore(object):
             ack.event.set()
         return ack_callback
 
+    def _create_blocking_batched_suback_callback(self, ack, topic_count):
+        # The batched SUBACK is split into one callback per topic, collect all granted QoS before waking up
+        granted_qos_list = list()
+        def ack_callback(mid, data=None):
+            granted_qos_list.extend(data)
+            if len(granted_qos_list) == topic_count:
+                ack.data = tuple(granted_qos_list)
+                ack.event.set()
+        return ack_callback
+
     def _handle_offline_request(self, type, data):
         self._logger.info("Offline request detected!")
         offline_request = QueueableRequest(type, data)
@@ -17,6 +17,7 @@ This is an MQTT v3.1 client module. MQTT is a lightweight pub/sub messaging
 protocol that is easy to implement and suitable for low powered devices.
 """
 import errno
+import logging
 import platform
 import random
 import select
@@ -34,6 +35,7 @@ import struct
 import sys
 import threading
 import time
+from collections import OrderedDict, deque
 HAVE_DNS = True
 try:
     import dns.resolver
@@ -48,6 +50,9 @@ else:
 from AWSIoTPythonSDK.core.protocol.connection.cores import ProgressiveBackOffCore
 from AWSIoTPythonSDK.core.protocol.connection.cores import SecuredWebSocketCore
 from AWSIoTPythonSDK.core.protocol.connection.alpn import SSLContextBuilder
+from AWSIoTPythonSDK.core.protocol.paho.matcher import MQTTMatcher
+
+_logger = logging.getLogger(__name__)
 
 MQTTv31 = 3
 MQTTv311 = 4
@@ -141,6 +146,23 @@ if sys.version_info[0] < 3:
 else:
     sockpair_data = b"0"
 
+# Inbound reads ask the socket/TLS layer for up to this many bytes at a time
+READ_CHUNK_SIZE = 65536
+# Queued outbound packets are joined into writes of up to this many bytes
+WRITE_CHUNK_SIZE = 65536
+# Buffers smaller than this may be copied to join them into one TLS write,
+# larger ones (publish payloads) are always written in place
+WRITE_COPY_THRESHOLD = 4096
+# Upper bound on the buffers passed to one sendmsg() call (IOV_MAX is 1024)
+WRITE_MAX_BUFFERS = 512
+
+# Write modes
+# Throughput: the network thread writes all pending packets in as few socket
+# writes as possible.
+# Latency: the publishing thread writes its packet straight to the socket.
+WRITE_MODE_THROUGHPUT = 0
+WRITE_MODE_LATENCY = 1
+
 def error_string(mqtt_errno):
     """Return the error string associated with an mqtt error number."""
     if mqtt_errno == MQTT_ERR_SUCCESS:
@@ -281,6 +303,130 @@ def _socketpair_compat():
     return (sock1, sock2)
 
 
+def _payload_view(payload):
+    """Return a flat byte view of a bytes-like payload without copying it.
+    Buffers that are not C-contiguous cannot be viewed as flat bytes and
+    are copied."""
+    view = memoryview(payload)
+    if not view.c_contiguous:
+        return memoryview(view.tobytes())
+    if view.format == 'B' and view.ndim == 1:
+        return view
+    return view.cast('B')
+
+
+class _InPacketBuffer(object):
+    """Reusable inbound byte buffer that MQTT packets are parsed out of.
+
+    Bytes are received straight into the free space at the tail with
+    recv_into() and complete packets are parsed from the head. Consumed space
+    is reclaimed by moving the unparsed bytes back to the front, so steady
+    state traffic neither allocates nor concatenates. The buffer only grows
+    when a single packet is larger than its capacity, and shrinks back once it
+    has been drained.
+    """
+    def __init__(self, capacity=READ_CHUNK_SIZE):
+        self._capacity = capacity
+        self._allocate(capacity)
+
+    def _allocate(self, capacity):
+        # Never resize in place: a memoryview handed out by next_packet() may
+        # still be alive, so build a new buffer instead.
+        self._buf = bytearray(capacity)
+        self._view = memoryview(self._buf)
+        self._start = 0
+        self._end = 0
+
+    def reset(self):
+        self._start = 0
+        self._end = 0
+
+    def __len__(self):
+        return self._end - self._start
+
+    def missing(self):
+        """Number of bytes still needed to complete the packet at the head of
+        the buffer. Always at least 1."""
+        view = self._view
+        available = self._end - self._start
+        if available < 2:
+            return 2 - available
+        remaining_length = 0
+        multiplier = 1
+        pos = self._start + 1
+        while pos < self._end:
+            byte = view[pos]
+            remaining_length += (byte & 127) * multiplier
+            multiplier *= 128
+            pos += 1
+            if (byte & 128) == 0:
+                return max(1, pos + remaining_length - self._end)
+            if pos - self._start > 4:
+                return 1  # Malformed, let next_packet() report it
+        return 1
+
+    def reserve(self, size):
+        """Return a writable memoryview with room for at least size bytes."""
+        free = len(self._buf) - self._end
+        if free < size:
+            pending = self._end - self._start
+            if pending + size <= len(self._buf):
+                # Enough room once consumed bytes are dropped. memoryview
+                # assignment is a memmove, no resize.
+                self._view[0:pending] = self._view[self._start:self._end]
+                self._start = 0
+                self._end = pending
+            else:
+                old_view, old_start = self._view, self._start
+                self._allocate(max(pending + size, 2 * len(self._buf)))
+                self._view[0:pending] = old_view[old_start:old_start + pending]
+                self._end = pending
+        elif self._start == self._end and len(self._buf) > 4 * self._capacity:
+            self._allocate(self._capacity)  # Give back memory used by a large packet
+        return self._view[self._end:]
+
+    def commit(self, size):
+        self._end += size
+
+    def next_packet(self, in_packet):
+        """Parse the packet at the head of the buffer into in_packet.
+
+        Returns MQTT_ERR_SUCCESS if a complete packet was parsed, in which case
+        in_packet['packet'] is a memoryview on the buffer that stays valid
+        until the next reserve(). Returns MQTT_ERR_AGAIN if more bytes are
+        needed and MQTT_ERR_PROTOCOL if the remaining length is malformed."""
+        view = self._view
+        start = self._start
+        end = self._end
+        if end - start < 2:
+            return MQTT_ERR_AGAIN
+        remaining_length = 0
+        multiplier = 1
+        pos = start + 1
+        while True:
+            if pos >= end:
+                return MQTT_ERR_AGAIN
+            byte = view[pos]
+            pos += 1
+            remaining_length += (byte & 127) * multiplier
+            multiplier *= 128
+            if (byte & 128) == 0:
+                break
+            # Max 4 bytes length for remaining length as defined by protocol.
+            # Anything more likely means a broken/malicious client.
+            if pos - start > 4:
+                return MQTT_ERR_PROTOCOL
+        if end - pos < remaining_length:
+            return MQTT_ERR_AGAIN
+        in_packet['command'] = view[start]
+        in_packet['remaining_length'] = remaining_length
+        in_packet['packet'] = view[pos:pos + remaining_length]
+        self._start = pos + remaining_length
+        if self._start == self._end:
+            self._start = self._end = 0
+        return MQTT_ERR_SUCCESS
+
+
 class MQTTMessage:
     """ This is a class that describes an incoming message. It is passed to the
     on_message callback as the message parameter.
@@ -448,23 +594,27 @@ class Client(object):
         self._password = ""
         self._in_packet = {
             "command": 0,
-            "have_remaining": 0,
-            "remaining_count": [],
-            "remaining_mult": 1,
             "remaining_length": 0,
-            "packet": b"",
-            "to_process": 0,
-            "pos": 0}
-        self._out_packet = []
+            "packet": b""}
+        self._in_buffer = _InPacketBuffer()
+        self._out_packet = deque()
+        # Bytes held by _out_packet plus the unwritten packet in _current_out_packet
+        self._out_packet_bytes = 0
+        self._max_queued_bytes = 0
         self._current_out_packet = None
+        self._write_mode = WRITE_MODE_THROUGHPUT
+        # True while a wakeup byte sent to _sockpairW has not been consumed by loop()
+        self._wakeup_pending = False
+        self._reading_paused = False
         self._last_msg_in = time.time()
         self._last_msg_out = time.time()
         self._ping_t = 0
         self._last_mid = 0
         self._state = mqtt_cs_new
         self._max_inflight_messages = 20
-        self._out_messages = []
-        self._in_messages = []
+        # In-flight QoS>0 messages keyed by mid, kept in insertion order for retry/resend
+        self._out_messages = OrderedDict()
+        self._in_messages = OrderedDict()
         self._inflight_messages = 0
         self._will = False
         self._will_topic = ""
@@ -475,7 +625,7 @@ class Client(object):
         self.on_connect = None
         self.on_publish = None
         self.on_message = None
-        self.on_message_filtered = []
+        self._on_message_filtered = MQTTMatcher()
         self.on_subscribe = None
         self.on_unsubscribe = None
         self.on_log = None
@@ -488,6 +638,7 @@ class Client(object):
         self._callback_mutex = threading.Lock()
         self._state_mutex = threading.Lock()
         self._out_packet_mutex = threading.Lock()
+        self._out_packet_room = threading.Condition(self._out_packet_mutex)
         self._current_out_packet_mutex = threading.Lock()
         self._msgtime_mutex = threading.Lock()
         self._out_message_mutex = threading.Lock()
@@ -495,6 +646,7 @@ class Client(object):
         self._mid_generate_mutex = threading.Lock()
         self._thread = None
         self._thread_terminate = False
+        self._reactor = None
         self._ssl = None
         self._tls_certfile = None
         self._tls_keyfile = None
@@ -747,18 +899,13 @@ class Client(object):
         if self._port <= 0:
             raise ValueError('Invalid port number.')
 
-        self._in_packet = {
-            "command": 0,
-            "have_remaining": 0,
-            "remaining_count": [],
-            "remaining_mult": 1,
-            "remaining_length": 0,
-            "packet": b"",
-            "to_process": 0,
-            "pos": 0}
+        self._in_packet['packet'] = b""
+        self._in_buffer.reset()
 
         self._out_packet_mutex.acquire()
-        self._out_packet = []
+        self._out_packet = deque()
+        self._out_packet_bytes = 0
+        self._out_packet_room.notify_all()
         self._out_packet_mutex.release()
 
         self._current_out_packet_mutex.acquire()
@@ -878,7 +1025,7 @@ class Client(object):
         self._current_out_packet_mutex.acquire()
         self._out_packet_mutex.acquire()
         if self._current_out_packet is None and len(self._out_packet) > 0:
-            self._current_out_packet = self._out_packet.pop(0)
+            self._current_out_packet = self._out_packet.popleft()
 
         if self._current_out_packet:
             wlist = [self.socket()]
@@ -893,12 +1040,17 @@ class Client(object):
             pending_bytes = self.socket().pending()
 
         # if bytes are pending do not wait in select
-        if pending_bytes > 0:
+        if pending_bytes > 0 and self.want_read():
             timeout = 0.0
+        else:
+            pending_bytes = 0
 
         # sockpairR is used to break out of select() before the timeout, on a
-        # call to publish() etc.
-        rlist = [self.socket(), self._sockpairR]
+        # call to publish() etc. or resume_reading()
+        if self.want_read():
+            rlist = [self.socket(), self._sockpairR]
+        else:
+            rlist = [self._sockpairR]
         try:
             socklist = select.select(rlist, wlist, [], timeout)
         except TypeError as e:
@@ -923,12 +1075,7 @@ class Client(object):
             # Stimulate output write even though we didn't ask for it, because
             # at that point the publish or other command wasn't present.
             socklist[1].insert(0, self.socket())
-            # Clear sockpairR - only ever a single byte written.
-            try:
-                self._sockpairR.recv(1)
-            except socket.error as err:
-                if err.errno != EAGAIN:
-                    raise
+            self._consume_wakeup()
 
         if self.socket() in socklist[1]:
             rc = self.loop_write(max_packets)
@@ -948,7 +1095,13 @@ class Client(object):
         zero length message will be used. Passing an int or float will result
         in the payload being converted to a string representing that number. If
         you wish to send a true int/float, use struct.pack() to create the
-        payload you require.
+        payload you require. bytes, bytearray, memoryview and other objects
+        supporting the buffer protocol (array.array, NumPy arrays) are sent
+        without being copied: the client keeps a reference to the buffer and
+        writes it straight to the socket. The buffer must therefore not be
+        modified until the message has been sent, which is when on_publish()
+        is called for it (PUBACK/PUBCOMP for QoS>0, as the buffer is also used
+        for retries).
         qos: The quality of service level to use.
         retain: If set to true, the message will be set as the "last known
         good"/retained message for the topic.
@@ -966,17 +1119,17 @@ class Client(object):
             raise ValueError('Invalid topic.')
         if qos<0 or qos>2:
             raise ValueError('Invalid QoS level.')
-        if isinstance(payload, str) or isinstance(payload, bytearray):
+        if isinstance(payload, (str, bytes, bytearray)):
             local_payload = payload
-        # Client.publish() now accepts bytes() payloads on Python 3.
-        elif sys.version_info[0] == 3 and isinstance(payload, bytes):
-            local_payload = bytearray(payload)
         elif isinstance(payload, int) or isinstance(payload, float):
             local_payload = str(payload)
         elif payload is None:
             local_payload = None
         else:
-            raise TypeError('payload must be a string, bytearray, int, float or None.')
+            try:
+                local_payload = _payload_view(payload)
+            except TypeError:
+                raise TypeError('payload must be a string, bytes-like object, int, float or None.')
 
         if local_payload is not None and len(local_payload) > 268435455:
             raise ValueError('Payload too large.')
@@ -1004,8 +1157,12 @@ class Client(object):
             message.retain = retain
             message.dup = False
 
-            self._out_message_mutex.acquire()                
-            self._out_messages.append(message)
+            self._out_message_mutex.acquire()
+            if message.mid in self._out_messages:
+                # Every mid is taken by an in-flight message
+                self._out_message_mutex.release()
+                return (MQTT_ERR_NOMEM, local_mid)
+            self._out_messages[message.mid] = message
             if self._max_inflight_messages == 0 or self._inflight_messages < self._max_inflight_messages:
                 self._inflight_messages = self._inflight_messages+1
                 if qos == 1:
@@ -1193,6 +1350,8 @@ class Client(object):
             max_packets = 1
 
         for i in range(0, max_packets):
+            if not self.want_read():
+                return MQTT_ERR_SUCCESS  # Paused from within on_message()
             rc = self._packet_read()
             if rc > 0:
                 return self._loop_rc_handle(rc)
@@ -1235,6 +1394,31 @@ class Client(object):
         else:
             return False
 
+    def want_read(self):
+        """Call to determine if the socket should be read from, which is the
+        case unless reading was paused with pause_reading(). Useful if you are
+        calling select() yourself rather than using loop().
+        """
+        return not self._reading_paused
+
+    def pause_reading(self):
+        """Stop reading from the socket until resume_reading() is called,
+        leaving incoming data to the TCP receive window and the broker's
+        flow control. Writes, keepalive pings and retries carry on. Can be
+        called from any thread, including from within on_message()."""
+        self._reading_paused = True
+
+    def resume_reading(self):
+        """Start reading from the socket again after pause_reading(). Can
+        be called from any thread."""
+        if self._reading_paused:
+            self._reading_paused = False
+            if self._ping_t > 0:
+                # The PINGRESP may be sitting unread behind everything received
+                # while paused, give it a keepalive period to come through
+                self._ping_t = time.time()
+            self._wake_up_loop()
+
     def loop_misc(self):
         """Process miscellaneous network events. Use in place of calling loop() if you
         wish to call select() or equivalent on.
@@ -1281,6 +1465,70 @@ class Client(object):
             raise ValueError('Invalid inflight.')
         self._max_inflight_messages = inflight
 
+    def write_mode_set(self, write_mode):
+        """Set how outgoing packets are written to the socket.
+
+        WRITE_MODE_THROUGHPUT (the default) leaves all writes to the network
+        thread, which joins pending packets into as few socket writes as
+        possible and is woken up at most once per batch.
+
+        WRITE_MODE_LATENCY makes publish() and the other send calls write
+        their packet directly from the calling thread when the socket can take
+        it, instead of waiting for the network thread to wake up. Packets that
+        cannot be written immediately are left to the network thread."""
+        if write_mode not in (WRITE_MODE_THROUGHPUT, WRITE_MODE_LATENCY):
+            raise ValueError('Invalid write mode.')
+        self._write_mode = write_mode
+
+    def max_queued_bytes_set(self, queue_bytes):
+        """Set the high-water mark, in bytes, of the outgoing packet queue.
+        queue_full() reports True once this many bytes are waiting to be
+        written to the socket. 0 (the default) means no limit.
+
+        The limit is advisory: packets are never refused by the client itself,
+        it is up to the caller to check queue_full()/wait_for_queue_room()
+        before publishing."""
+        if queue_bytes < 0:
+            raise ValueError('Invalid queue bytes.')
+        self._out_packet_mutex.acquire()
+        self._max_queued_bytes = queue_bytes
+        self._out_packet_room.notify_all()
+        self._out_packet_mutex.release()
+
+    def queued_bytes(self):
+        """Return the number of bytes queued for writing to the socket."""
+        return self._out_packet_bytes
+
+    def queue_full(self):
+        """Return True if the outgoing packet queue is at or above the
+        high-water mark set with max_queued_bytes_set()."""
+        self._out_packet_mutex.acquire()
+        try:
+            return self._queue_full()
+        finally:
+            self._out_packet_mutex.release()
+
+    def wait_for_queue_room(self, timeout=None):
+        """Block until the outgoing packet queue drops below the high-water
+        mark or until timeout seconds have passed. Returns True if there is
+        room in the queue. Must not be called from the network thread, which
+        is the thread that drains the queue."""
+        if timeout is not None:
+            end_time = time.time() + timeout
+        self._out_packet_mutex.acquire()
+        try:
+            while self._queue_full():
+                if timeout is None:
+                    self._out_packet_room.wait()
+                else:
+                    remaining = end_time - time.time()
+                    if remaining <= 0:
+                        return False
+                    self._out_packet_room.wait(remaining)
+            return True
+        finally:
+            self._out_packet_mutex.release()
+
     def message_retry_set(self, retry):
         """Set the timeout in seconds before a message with QoS>0 is retried.
         20 seconds by default."""
@@ -1422,6 +1670,43 @@ class Client(object):
 
         return rc
 
+    def _wake_up_loop(self):
+        # Write a single byte to sockpairW (connected to sockpairR) to break
+        # out of select() if in threaded mode. Packets queued before loop()
+        # consumes that byte are written together, so one byte is enough.
+        self._out_packet_mutex.acquire()
+        wakeup = not self._wakeup_pending
+        self._wakeup_pending = True
+        self._out_packet_mutex.release()
+        if wakeup:
+            try:
+                self._sockpairW.send(sockpair_data)
+            except socket.error as err:
+                if err.errno != EAGAIN:
+                    raise
+
+    def _consume_wakeup(self):
+        self._out_packet_mutex.acquire()
+        self._wakeup_pending = False
+        self._out_packet_mutex.release()
+        # Clear sockpairR - only ever a single byte written.
+        try:
+            self._sockpairR.recv(1)
+        except socket.error as err:
+            if err.errno != EAGAIN:
+                raise
+
+    def reactor_set(self, reactor):
+        """Have loop_start() hand the network loop of this client to reactor,
+        a NetworkReactor shared with other clients, instead of starting a
+        dedicated thread. Must be called before loop_start(). Pass None to go
+        back to a thread per client."""
+        if self._thread is not None:
+            raise ValueError('Network loop already started.')
+        self._reactor = reactor
+        # Reactor clients do not get a stable connection timer thread each
+        self._backoffCore.setStableConnectionTimerEnabled(reactor is None)
+
     def loop_start(self):
         """This is part of the threaded client interface. Call this once to
         start a new thread to process network traffic. This provides an
@@ -1431,6 +1716,9 @@ class Client(object):
             return MQTT_ERR_INVAL
 
         self._thread_terminate = False
+        if self._reactor is not None:
+            self._thread = self._reactor.register(self)
+            return
         self._thread = threading.Thread(target=self._thread_main)
         self._thread.daemon = True
         self._thread.start()
@@ -1448,9 +1736,33 @@ class Client(object):
         self._thread_terminate = True
         # Don't attempt to join() own thread.
         if threading.current_thread() != self._thread:
-            self._thread.join()
+            if self._reactor is not None:
+                self._reactor.unregister(self)
+            else:
+                self._thread.join()
             self._thread = None
 
+    @property
+    def on_message_filtered(self):
+        """Snapshot list of the (sub, callback) pairs registered with
+        message_callback_add(). Changing the returned list has no effect on
+        the client; use message_callback_add()/message_callback_remove(), or
+        assign a list of such pairs to this property to replace all of them."""
+        self._callback_mutex.acquire()
+        try:
+            return self._on_message_filtered.items()
+        finally:
+            self._callback_mutex.release()
+
+    @on_message_filtered.setter
+    def on_message_filtered(self, subs_and_callbacks):
+        on_message_filtered = MQTTMatcher()
+        for sub, callback in subs_and_callbacks:
+            on_message_filtered[sub] = callback
+        self._callback_mutex.acquire()
+        self._on_message_filtered = on_message_filtered
+        self._callback_mutex.release()
+
     def message_callback_add(self, sub, callback):
         """Register a message callback for a specific topic.
         Messages that match 'sub' will be passed to 'callback'. Any
@@ -1466,13 +1778,7 @@ class Client(object):
             raise ValueError("sub and callback must both be defined.")
 
         self._callback_mutex.acquire()
-        for i in range(0, len(self.on_message_filtered)):
-            if self.on_message_filtered[i][0] == sub:
-                self.on_message_filtered[i] = (sub, callback)
-                self._callback_mutex.release()
-                return
-
-        self.on_message_filtered.append((sub, callback))
+        self._on_message_filtered[sub] = callback
         self._callback_mutex.release()
 
     def message_callback_remove(self, sub):
@@ -1482,11 +1788,10 @@ class Client(object):
             raise ValueError("sub must defined.")
 
         self._callback_mutex.acquire()
-        for i in range(0, len(self.on_message_filtered)):
-            if self.on_message_filtered[i][0] == sub:
-                self.on_message_filtered.pop(i)
-                self._callback_mutex.release()
-                return
+        try:
+            del self._on_message_filtered[sub]
+        except KeyError:  # no such subscription
+            pass
         self._callback_mutex.release()
 
     # ============================================================
@@ -1517,119 +1822,73 @@ class Client(object):
 
     def _packet_read(self):
         # This gets called if pselect() indicates that there is network data
-        # available - ie. at least one byte.  What we do depends on what data we
-        # already have.
-        # If we've not got a command, attempt to read one and save it. This should
-        # always work because it's only a single byte.
-        # Then try to read the remaining length. This may fail because it is may
-        # be more than one byte - will need to save data pending next read if it
-        # does fail.
-        # Then try to read the remaining payload, where 'payload' here means the
-        # combined variable header and actual payload. This is the most likely to
-        # fail due to longer length, so save current data and current position.
-        # After all data is read, send to _mqtt_handle_packet() to deal with.
-        # Finally, free the memory and reset everything to starting conditions.
-        if self._in_packet['command'] == 0:
-            try:
-                if self._ssl:
-                    command = self._ssl.read(1)
-                else:
-                    command = self._sock.recv(1)
-            except socket.error as err:
-                if self._ssl and (err.errno == ssl.SSL_ERROR_WANT_READ or err.errno == ssl.SSL_ERROR_WANT_WRITE):
-                    return MQTT_ERR_AGAIN
-                if err.errno == EAGAIN:
-                    return MQTT_ERR_AGAIN
-                print(err)
-                return 1
-            else:
-                if len(command) == 0:
-                    return 1
-                command = struct.unpack("!B", command)
-                self._in_packet['command'] = command[0]
-
-        if self._in_packet['have_remaining'] == 0:
-            # Read remaining
-            # Algorithm for decoding taken from pseudo code at
-            # http://publib.boulder.ibm.com/infocenter/wmbhelp/v6r0m0/topic/com.ibm.etools.mft.doc/ac10870_.htm
-            while True:
-                try:
-                    if self._ssl:
-                        byte = self._ssl.read(1)
-                    else:
-                        byte = self._sock.recv(1)
-                except socket.error as err:
-                    if self._ssl and (err.errno == ssl.SSL_ERROR_WANT_READ or err.errno == ssl.SSL_ERROR_WANT_WRITE):
-                        return MQTT_ERR_AGAIN
-                    if err.errno == EAGAIN:
-                        return MQTT_ERR_AGAIN
-                    print(err)
-                    return 1
-                else:
-                    byte = struct.unpack("!B", byte)
-                    byte = byte[0]
-                    self._in_packet['remaining_count'].append(byte)
-                    # Max 4 bytes length for remaining length as defined by protocol.
-                     # Anything more likely means a broken/malicious client.
-                    if len(self._in_packet['remaining_count']) > 4:
-                        return MQTT_ERR_PROTOCOL
-
-                    self._in_packet['remaining_length'] = self._in_packet['remaining_length'] + (byte & 127)*self._in_packet['remaining_mult']
-                    self._in_packet['remaining_mult'] = self._in_packet['remaining_mult'] * 128
-
-                if (byte & 128) == 0:
-                    break
-
-            self._in_packet['have_remaining'] = 1
-            self._in_packet['to_process'] = self._in_packet['remaining_length']
-
-        while self._in_packet['to_process'] > 0:
-            try:
-                if self._ssl:
-                    data = self._ssl.read(self._in_packet['to_process'])
+        # available - ie. at least one byte.
+        # Pull as many bytes as the socket or TLS layer has available into the
+        # inbound buffer with a single call, then hand every complete packet in
+        # the buffer to _packet_handle(). Partial packets stay in the buffer
+        # until the next call.
+        # MQTT over Websocket only hands out complete reads, so there we ask
+        # for exactly the number of bytes the current packet still needs.
+        want = self._in_buffer.missing()
+        if self._useSecuredWebsocket:
+            size = want
+        else:
+            size = max(want, READ_CHUNK_SIZE // 4)
+        view = self._in_buffer.reserve(size)
+        try:
+            if self._ssl:
+                if self._useSecuredWebsocket:
+                    data = self._ssl.read(size)
+                    received = len(data)
+                    view[:received] = data
                 else:
-                    data = self._sock.recv(self._in_packet['to_process'])
-            except socket.error as err:
-                if self._ssl and (err.errno == ssl.SSL_ERROR_WANT_READ or err.errno == ssl.SSL_ERROR_WANT_WRITE):
-                    return MQTT_ERR_AGAIN
-                if err.errno == EAGAIN:
-                    return MQTT_ERR_AGAIN
-                print(err)
-                return 1
+                    received = self._ssl.recv_into(view, len(view))
             else:
-                self._in_packet['to_process'] = self._in_packet['to_process'] - len(data)
-                self._in_packet['packet'] = self._in_packet['packet'] + data
-
-        # All data for this packet is read.
-        self._in_packet['pos'] = 0
-        rc = self._packet_handle()
-
-        # Free data and reset values
-        self._in_packet = dict(
-            command=0,
-            have_remaining=0,
-            remaining_count=[],
-            remaining_mult=1,
-            remaining_length=0,
-            packet=b"",
-            to_process=0,
-            pos=0)
-
-        self._msgtime_mutex.acquire()
-        self._last_msg_in = time.time()
-        self._msgtime_mutex.release()
+                received = self._sock.recv_into(view, len(view))
+        except socket.error as err:
+            if self._ssl and (err.errno == ssl.SSL_ERROR_WANT_READ or err.errno == ssl.SSL_ERROR_WANT_WRITE):
+                return MQTT_ERR_AGAIN
+            if err.errno == EAGAIN:
+                return MQTT_ERR_AGAIN
+            _logger.warning("Socket error while reading: %s", err)
+            return 1
+        finally:
+            view.release()
+
+        if received == 0:
+            return 1
+        self._in_buffer.commit(received)
+
+        rc = MQTT_ERR_SUCCESS
+        handled = False
+        while rc == MQTT_ERR_SUCCESS:
+            # reconnect() from within a handler resets the buffer, so look it up every time
+            rc = self._in_buffer.next_packet(self._in_packet)
+            if rc != MQTT_ERR_SUCCESS:
+                break
+            handled = True
+            packet = self._in_packet['packet']
+            rc = self._packet_handle()
+            # Handlers copy out what they keep, so the view on the buffer can go
+            packet.release()
+            self._in_packet['packet'] = b""
+
+        if handled:
+            self._msgtime_mutex.acquire()
+            self._last_msg_in = time.time()
+            self._msgtime_mutex.release()
+        if rc == MQTT_ERR_AGAIN:
+            return MQTT_ERR_SUCCESS
         return rc
 
-    def _packet_write(self):
-        self._current_out_packet_mutex.acquire()
+    def _packet_write(self, blocking=True):
+        if not self._current_out_packet_mutex.acquire(blocking):
+            return MQTT_ERR_AGAIN
         while self._current_out_packet:
             packet = self._current_out_packet
 
             try:
-                if self._ssl:
-                    write_length = self._ssl.write(packet['packet'][packet['pos']:])
-                else:
-                    write_length = self._sock.send(packet['packet'][packet['pos']:])
+                write_length = self._write_buffers(self._gather_out_buffers(packet))
             except AttributeError:
                 self._current_out_packet_mutex.release()
                 return MQTT_ERR_SUCCESS
@@ -1639,51 +1898,58 @@ class Client(object):
                     return MQTT_ERR_AGAIN
                 if err.errno == EAGAIN:
                     return MQTT_ERR_AGAIN
-                print(err)
+                _logger.warning("Socket error while writing: %s", err)
                 return 1
 
             if write_length > 0:
-                packet['to_process'] = packet['to_process'] - write_length
-                packet['pos'] = packet['pos'] + write_length
-
-                if packet['to_process'] == 0:
-                    if (packet['command'] & 0xF0) == PUBLISH and packet['qos'] == 0:
-                        self._callback_mutex.acquire()
-                        if self.on_publish:
-                            self._in_callback = True
-                            self.on_publish(self, self._userdata, packet['mid'])
-                            self._in_callback = False
-
-                        self._callback_mutex.release()
-
-                    if (packet['command'] & 0xF0) == DISCONNECT:
-                        self._current_out_packet_mutex.release()
-
-                        self._msgtime_mutex.acquire()
-                        self._last_msg_out = time.time()
-                        self._msgtime_mutex.release()
-
-                        self._callback_mutex.acquire()
-                        if self.on_disconnect:
-                            self._in_callback = True
-                            self.on_disconnect(self, self._userdata, 0)
-                            self._in_callback = False
-                        self._callback_mutex.release()
-
-                        if self._ssl:
-                            self._ssl.close()
-                            self._ssl = None
-                        if self._sock:
-                            self._sock.close()
-                            self._sock = None
-                        return MQTT_ERR_SUCCESS
-
-                    self._out_packet_mutex.acquire()
-                    if len(self._out_packet) > 0:
-                        self._current_out_packet = self._out_packet.pop(0)
-                    else:
-                        self._current_out_packet = None
-                    self._out_packet_mutex.release()
+                # A coalesced write may complete several packets at once
+                while write_length > 0 and self._current_out_packet:
+                    packet = self._current_out_packet
+                    packet_length = min(write_length, packet['to_process'])
+                    write_length = write_length - packet_length
+                    packet['to_process'] = packet['to_process'] - packet_length
+                    packet['pos'] = packet['pos'] + packet_length
+
+                    if packet['to_process'] == 0:
+                        if (packet['command'] & 0xF0) == PUBLISH and packet['qos'] == 0:
+                            self._callback_mutex.acquire()
+                            if self.on_publish:
+                                self._in_callback = True
+                                self.on_publish(self, self._userdata, packet['mid'])
+                                self._in_callback = False
+
+                            self._callback_mutex.release()
+
+                        self._packet_written(packet)
+
+                        if (packet['command'] & 0xF0) == DISCONNECT:
+                            self._current_out_packet_mutex.release()
+
+                            self._msgtime_mutex.acquire()
+                            self._last_msg_out = time.time()
+                            self._msgtime_mutex.release()
+
+                            self._callback_mutex.acquire()
+                            if self.on_disconnect:
+                                self._in_callback = True
+                                self.on_disconnect(self, self._userdata, 0)
+                                self._in_callback = False
+                            self._callback_mutex.release()
+
+                            if self._ssl:
+                                self._ssl.close()
+                                self._ssl = None
+                            if self._sock:
+                                self._sock.close()
+                                self._sock = None
+                            return MQTT_ERR_SUCCESS
+
+                        self._out_packet_mutex.acquire()
+                        if len(self._out_packet) > 0:
+                            self._current_out_packet = self._out_packet.popleft()
+                        else:
+                            self._current_out_packet = None
+                        self._out_packet_mutex.release()
             else:
                 pass  # FIXME
 
@@ -1736,10 +2002,15 @@ class Client(object):
 
     def _mid_generate(self):
         # Make sure mid generation that was thread-safe.
+        # Skip mids that still belong to an in-flight message. If every mid is
+        # taken the next one is returned anyway and the caller has to check.
         with self._mid_generate_mutex:
-            self._last_mid += 1
-            if self._last_mid == 65536:
-                self._last_mid = 1
+            for i in range(65535):
+                self._last_mid += 1
+                if self._last_mid == 65536:
+                    self._last_mid = 1
+                if self._last_mid not in self._out_messages:
+                    break
             return self._last_mid
 
     def _topic_wildcard_len_check(self, topic):
@@ -1817,20 +2088,24 @@ class Client(object):
 
         utopic = topic.encode('utf-8')
         command = PUBLISH | ((dup&0x1)<<3) | (qos<<1) | retain
+        # Only the fixed header, topic and mid are encoded here. The payload
+        # is queued as a separate buffer so that it is never copied.
         packet = bytearray()
-        packet.extend(struct.pack("!B", command))
+        packet.append(command)
         if payload is None:
+            upayload = None
             remaining_length = 2+len(utopic)
             self._easy_log(MQTT_LOG_DEBUG, "Sending PUBLISH (d"+str(dup)+", q"+str(qos)+", r"+str(int(retain))+", m"+str(mid)+", '"+topic+"' (NULL payload)")
         else:
             if isinstance(payload, str):
                 upayload = payload.encode('utf-8')
-                payloadlen = len(upayload)
-            elif isinstance(payload, bytearray):
-                payloadlen = len(payload)
+            elif isinstance(payload, (bytes, bytearray, memoryview)):
+                upayload = payload
             elif isinstance(payload, unicode):
                 upayload = payload.encode('utf-8')
-                payloadlen = len(upayload)
+            else:
+                raise TypeError('payload must be a string, unicode or a bytes-like object.')
+            payloadlen = len(upayload)
 
             remaining_length = 2+len(utopic) + payloadlen
             self._easy_log(MQTT_LOG_DEBUG, "Sending PUBLISH (d"+str(dup)+", q"+str(qos)+", r"+str(int(retain))+", m"+str(mid)+", '"+topic+"', ... ("+str(payloadlen)+" bytes)")
@@ -1840,25 +2115,13 @@ class Client(object):
             remaining_length = remaining_length + 2
 
         self._pack_remaining_length(packet, remaining_length)
-        self._pack_str16(packet, topic)
+        self._pack_str16(packet, utopic)
 
         if qos > 0:
             # For message id
             packet.extend(struct.pack("!H", mid))
 
-        if payload is not None:
-            if isinstance(payload, str):
-                pack_format = str(payloadlen) + "s"
-                packet.extend(struct.pack(pack_format, upayload))
-            elif isinstance(payload, bytearray):
-                packet.extend(payload)
-            elif isinstance(payload, unicode):
-                pack_format = str(payloadlen) + "s"
-                packet.extend(struct.pack(pack_format, upayload))
-            else:
-                raise TypeError('payload must be a string, unicode or a bytearray.')
-
-        return self._packet_queue(PUBLISH, packet, mid, qos)
+        return self._packet_queue(PUBLISH, packet, mid, qos, upayload)
 
     def _send_pubrec(self, mid):
         self._easy_log(MQTT_LOG_DEBUG, "Sending PUBREC (Mid: "+str(mid)+")")
@@ -1972,7 +2235,7 @@ class Client(object):
     def _message_retry_check_actual(self, messages, mutex):
         mutex.acquire()
         now = time.time()
-        for m in messages:
+        for m in messages.values():
             if m.timestamp + self._message_retry < now:
                 if m.state == mqtt_ms_wait_for_puback or m.state == mqtt_ms_wait_for_pubrec:
                     m.timestamp = now
@@ -1995,7 +2258,7 @@ class Client(object):
     def _messages_reconnect_reset_out(self):
         self._out_message_mutex.acquire()
         self._inflight_messages = 0
-        for m in self._out_messages:
+        for m in self._out_messages.values():
             m.timestamp = 0
             if self._max_inflight_messages == 0 or self._inflight_messages < self._max_inflight_messages:
                 if m.qos == 0:
@@ -2020,10 +2283,10 @@ class Client(object):
 
     def _messages_reconnect_reset_in(self):
         self._in_message_mutex.acquire()
-        for m in self._in_messages:
+        for m in list(self._in_messages.values()):
             m.timestamp = 0
             if m.qos != 2:
-                self._in_messages.pop(self._in_messages.index(m))
+                del self._in_messages[m.mid]
             else:
                 # Preserve current state
                 pass
@@ -2033,30 +2296,99 @@ class Client(object):
         self._messages_reconnect_reset_out()
         self._messages_reconnect_reset_in()
 
-    def _packet_queue(self, command, packet, mid, qos):
+    def _unwritten_buffers(self, packet):
+        pos = packet['pos']
+        header_length = len(packet['packet'])
+        payload = packet['payload']
+        if pos >= header_length:
+            if pos == header_length:
+                return [payload]
+            return [memoryview(payload)[pos - header_length:]]
+        buffers = [packet['packet'] if pos == 0 else memoryview(packet['packet'])[pos:]]
+        if payload is not None:
+            buffers.append(payload)
+        return buffers
+
+    def _gather_out_buffers(self, packet):
+        # In throughput mode, follow the unwritten part of the current packet
+        # with the packets queued behind it, so that they go out in a single
+        # socket write.
+        buffers = self._unwritten_buffers(packet)
+        if self._write_mode != WRITE_MODE_THROUGHPUT or (packet['command'] & 0xF0) == DISCONNECT:
+            return buffers
+        length = packet['to_process']
+        self._out_packet_mutex.acquire()
+        for queued in self._out_packet:
+            if length + queued['to_process'] > WRITE_CHUNK_SIZE or len(buffers) + 2 > WRITE_MAX_BUFFERS:
+                break
+            buffers.extend(self._unwritten_buffers(queued))
+            length = length + queued['to_process']
+            if (queued['command'] & 0xF0) == DISCONNECT:
+                break
+        self._out_packet_mutex.release()
+        return buffers
+
+    def _write_buffers(self, buffers):
+        if len(buffers) > 1:
+            if self._ssl is None and hasattr(self._sock, 'sendmsg'):
+                return self._sock.sendmsg(buffers)
+            # TLS has no scatter/gather write. Join the leading small buffers
+            # and leave any large one to be written in place by the next call.
+            data = bytearray()
+            for buf in buffers:
+                if len(buf) >= WRITE_COPY_THRESHOLD:
+                    break
+                data.extend(buf)
+            if len(data) > 0:
+                buffers = [data]
+        if self._ssl:
+            return self._ssl.write(buffers[0])
+        return self._sock.send(buffers[0])
+
+    def _packet_written(self, packet):
+        self._out_packet_mutex.acquire()
+        self._out_packet_bytes -= packet['pos']  # The full packet length once written
+        if self._out_packet_bytes < 0:  # Queue was reset while this packet was being written
+            self._out_packet_bytes = 0
+        if not self._queue_full():
+            self._out_packet_room.notify_all()
+        self._out_packet_mutex.release()
+
+    def _queue_full(self):
+        return self._max_queued_bytes > 0 and self._out_packet_bytes >= self._max_queued_bytes
+
+    def _packet_queue(self, command, packet, mid, qos, payload=None):
+        if payload is not None and len(payload) == 0:
+            payload = None
         mpkt = dict(
             command = command,
             mid = mid,
             qos = qos,
             pos = 0,
-            to_process = len(packet),
-            packet = packet)
+            to_process = len(packet) + (len(payload) if payload is not None else 0),
+            packet = packet,
+            payload = payload)
 
         self._out_packet_mutex.acquire()
         self._out_packet.append(mpkt)
+        self._out_packet_bytes += mpkt['to_process']
         if self._current_out_packet_mutex.acquire(False):
             if self._current_out_packet is None and len(self._out_packet) > 0:
-                self._current_out_packet = self._out_packet.pop(0)
+                self._current_out_packet = self._out_packet.popleft()
             self._current_out_packet_mutex.release()
+        write_inline = (self._write_mode == WRITE_MODE_LATENCY
+                        and self._thread is not None
+                        and threading.current_thread() is not self._thread)
         self._out_packet_mutex.release()
 
-        # Write a single byte to sockpairW (connected to sockpairR) to break
-        # out of select() if in threaded mode.
-        try:
-            self._sockpairW.send(sockpair_data)
-        except socket.error as err:
-            if err.errno != EAGAIN:
-                raise
+        if write_inline:
+            # Leave the packet to the network thread if it is writing already
+            # or if the socket cannot take all of it now.
+            self._packet_write(blocking=False)
+            if not self.want_write():
+                return MQTT_ERR_SUCCESS
+
+        self._wake_up_loop()
 
         if not self._in_callback and self._thread is None:
             return self.loop_write()
@@ -2151,7 +2483,7 @@ class Client(object):
         if result == 0:
             rc = 0
             self._out_message_mutex.acquire()
-            for m in self._out_messages:
+            for m in self._out_messages.values():
                 m.timestamp = time.time()
                 if m.state == mqtt_ms_queued:
                     self.loop_write()  # Process outgoing messages that have just been queued up
@@ -2227,10 +2559,11 @@ class Client(object):
         message.qos = (header & 0x06)>>1
         message.retain = (header & 0x01)
 
-        pack_format = "!H" + str(len(self._in_packet['packet'])-2) + 's'
-        (slen, packet) = struct.unpack(pack_format, self._in_packet['packet'])
-        pack_format = '!' + str(slen) + 's' + str(len(packet)-slen) + 's'
-        (message.topic, packet) = struct.unpack(pack_format, packet)
+        # Slice the received packet so that the payload is copied only once
+        packet = self._in_packet['packet']
+        (slen,) = struct.unpack_from("!H", packet)
+        pos = 2 + slen
+        message.topic = bytes(packet[2:pos])
 
         if len(message.topic) == 0:
             return MQTT_ERR_PROTOCOL
@@ -2239,10 +2572,10 @@ class Client(object):
             message.topic = message.topic.decode('utf-8')
 
         if message.qos > 0:
-            pack_format = "!H" + str(len(packet)-2) + 's'
-            (message.mid, packet) = struct.unpack(pack_format, packet)
+            (message.mid,) = struct.unpack_from("!H", packet, pos)
+            pos += 2
 
-        message.payload = packet
+        message.payload = bytes(packet[pos:])
 
         self._easy_log(
             MQTT_LOG_DEBUG,
@@ -2263,7 +2596,7 @@ class Client(object):
             rc = self._send_pubrec(message.mid)
             message.state = mqtt_ms_wait_for_pubrel
             self._in_message_mutex.acquire()
-            self._in_messages.append(message)
+            self._in_messages[message.mid] = message
             self._in_message_mutex.release()
             return rc
         else:
@@ -2282,31 +2615,29 @@ class Client(object):
         self._easy_log(MQTT_LOG_DEBUG, "Received PUBREL (Mid: "+str(mid)+")")
 
         self._in_message_mutex.acquire()
-        for i in range(len(self._in_messages)):
-            if self._in_messages[i].mid == mid:
-
-                # Only pass the message on if we have removed it from the queue - this
-                # prevents multiple callbacks for the same message.
-                self._handle_on_message(self._in_messages[i])
-                self._in_messages.pop(i)
-                self._inflight_messages = self._inflight_messages - 1
-                if self._max_inflight_messages > 0:
-                    self._out_message_mutex.acquire()
-                    rc = self._update_inflight()
-                    self._out_message_mutex.release()
-                    if rc != MQTT_ERR_SUCCESS:
-                        self._in_message_mutex.release()
-                        return rc
+        message = self._in_messages.pop(mid, None)
+        if message is not None:
+            # Only pass the message on if we have removed it from the queue - this
+            # prevents multiple callbacks for the same message.
+            self._handle_on_message(message)
+            self._inflight_messages = self._inflight_messages - 1
+            if self._max_inflight_messages > 0:
+                self._out_message_mutex.acquire()
+                rc = self._update_inflight()
+                self._out_message_mutex.release()
+                if rc != MQTT_ERR_SUCCESS:
+                    self._in_message_mutex.release()
+                    return rc
 
-                self._in_message_mutex.release()
-                return self._send_pubcomp(mid)
+            self._in_message_mutex.release()
+            return self._send_pubcomp(mid)
 
         self._in_message_mutex.release()
         return MQTT_ERR_SUCCESS
 
     def _update_inflight(self):
         # Dont lock message_mutex here
-        for m in self._out_messages:
+        for m in self._out_messages.values():
             if self._inflight_messages < self._max_inflight_messages:
                 if m.qos > 0 and m.state == mqtt_ms_queued:
                     self._inflight_messages = self._inflight_messages + 1
@@ -2331,12 +2662,12 @@ class Client(object):
         self._easy_log(MQTT_LOG_DEBUG, "Received PUBREC (Mid: "+str(mid)+")")
 
         self._out_message_mutex.acquire()
-        for m in self._out_messages:
-            if m.mid == mid:
-                m.state = mqtt_ms_wait_for_pubcomp
-                m.timestamp = time.time()
-                self._out_message_mutex.release()
-                return self._send_pubrel(mid, False)
+        m = self._out_messages.get(mid)
+        if m is not None:
+            m.state = mqtt_ms_wait_for_pubcomp
+            m.timestamp = time.time()
+            self._out_message_mutex.release()
+            return self._send_pubrel(mid, False)
 
         self._out_message_mutex.release()
         return MQTT_ERR_SUCCESS
@@ -2367,32 +2698,25 @@ class Client(object):
         self._easy_log(MQTT_LOG_DEBUG, "Received "+cmd+" (Mid: "+str(mid)+")")
 
         self._out_message_mutex.acquire()
-        for i in range(len(self._out_messages)):
-            try:
-                if self._out_messages[i].mid == mid:
-                    # Only inform the client the message has been sent once.
-                    self._callback_mutex.acquire()
-                    if self.on_publish:
+        if mid in self._out_messages:
+            # Only inform the client the message has been sent once.
+            self._callback_mutex.acquire()
+            if self.on_publish:
+                self._out_message_mutex.release()
+                self._in_callback = True
+                self.on_publish(self, self._userdata, mid)
+                self._in_callback = False
+                self._out_message_mutex.acquire()
+
+            self._callback_mutex.release()
+            # The entry may have gone while the mutex was released
+            if self._out_messages.pop(mid, None) is not None:
+                self._inflight_messages = self._inflight_messages - 1
+                if self._max_inflight_messages > 0:
+                    rc = self._update_inflight()
+                    if rc != MQTT_ERR_SUCCESS:
                         self._out_message_mutex.release()
-                        self._in_callback = True
-                        self.on_publish(self, self._userdata, mid)
-                        self._in_callback = False
-                        self._out_message_mutex.acquire()
-
-                    self._callback_mutex.release()
-                    self._out_messages.pop(i)
-                    self._inflight_messages = self._inflight_messages - 1
-                    if self._max_inflight_messages > 0:
-                        rc = self._update_inflight()
-                        if rc != MQTT_ERR_SUCCESS:
-                            self._out_message_mutex.release()
-                            return rc
-                    self._out_message_mutex.release()
-                    return MQTT_ERR_SUCCESS
-            except IndexError:
-                # Have removed item so i>count.
-                # Not really an error.
-                pass
+                        return rc
 
         self._out_message_mutex.release()
         return MQTT_ERR_SUCCESS
@@ -2400,12 +2724,11 @@ class Client(object):
     def _handle_on_message(self, message):
         self._callback_mutex.acquire()
         matched = False
-        for t in self.on_message_filtered:
-            if topic_matches_sub(t[0], message.topic):
-                self._in_callback = True
-                t[1](self, self._userdata, message)
-                self._in_callback = False
-                matched = True
+        for callback in self._on_message_filtered.iter_match(message.topic):
+            self._in_callback = True
+            callback(self, self._userdata, message)
+            self._in_callback = False
+            matched = True
 
         if matched == False and self.on_message:
             self._in_callback = True
@@ -0,0 +1,154 @@
+# /*
+# * Copyright 2010-2017 Amazon.com, Inc. or its affiliates. All Rights Reserved.
+# *
+# * Licensed under the Apache License, Version 2.0 (the "License").
+# * You may not use this file except in compliance with the License.
+# * A copy of the License is located at
+# *
+# *  http://aws.amazon.com/apache2.0
+# *
+# * or in the "license" file accompanying this file. This file is distributed
+# * on an "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either
+# * express or implied. See the License for the specific language governing
+# * permissions and limitations under the License.
+# */
+
+"""
+Topic filter index used to route incoming messages to subscriptions.
+"""
+
+
+class MQTTMatcher(object):
+    """Intended to manage topic filters including wildcards.
+
+    Internally, MQTTMatcher keeps filters without wildcards in a plain dict so
+    that the common exact-match case costs a single hash lookup. Filters that
+    contain '+' or '#' are stored in a trie with one node per topic level.
+    Matching a topic therefore costs O(topic depth) instead of O(number of
+    filters).
+
+    Values are stored under their topic filter (matcher[filter] = value) and
+    iter_match(topic) returns every value whose filter matches the topic.
+    """
+
+    class Node(object):
+        __slots__ = '_children', '_content'
+
+        def __init__(self):
+            self._children = {}
+            self._content = None
+
+    def __init__(self):
+        self._exact = {}
+        self._root = self.Node()
+
+    def __len__(self):
+        return len(self._exact) + self._count(self._root)
+
+    def _count(self, node):
+        count = 0 if node._content is None else 1
+        for child in node._children.values():
+            count += self._count(child)
+        return count
+
+    def __setitem__(self, key, value):
+        if value is None:
+            raise ValueError("Value must not be None.")
+        if not _has_wildcard(key):
+            self._exact[key] = value
+            return
+        node = self._root
+        for sym in key.split('/'):
+            node = node._children.setdefault(sym, self.Node())
+        node._content = value
+
+    def __getitem__(self, key):
+        if not _has_wildcard(key):
+            return self._exact[key]
+        try:
+            node = self._root
+            for sym in key.split('/'):
+                node = node._children[sym]
+            if node._content is None:
+                raise KeyError(key)
+            return node._content
+        except KeyError:
+            raise KeyError(key)
+
+    def __delitem__(self, key):
+        if not _has_wildcard(key):
+            del self._exact[key]
+            return
+        lst = []
+        try:
+            parent, node = None, self._root
+            for k in key.split('/'):
+                parent, node = node, node._children[k]
+                lst.append((parent, k, node))
+            if node._content is None:
+                raise KeyError(key)
+            node._content = None
+        except KeyError:
+            raise KeyError(key)
+        else:  # Prune nodes that no longer lead to any filter
+            for parent, k, node in reversed(lst):
+                if node._children or node._content is not None:
+                    break
+                del parent._children[k]
+
+    def __contains__(self, key):
+        try:
+            self[key]
+        except KeyError:
+            return False
+        return True
+
+    def items(self):
+        """Return a list of (filter, value) pairs, exact filters first."""
+        result = list(self._exact.items())
+        stack = [(self._root, [])]
+        while stack:
+            node, path = stack.pop()
+            if node._content is not None:
+                result.append(('/'.join(path), node._content))
+            for sym, child in node._children.items():
+                stack.append((child, path + [sym]))
+        return result
+
+    def iter_match(self, topic):
+        """Return an iterator on all values associated with filters that match
+        the topic. Exact filters are yielded before wildcard filters."""
+        matched = []
+        value = self._exact.get(topic)
+        if value is not None:
+            matched.append(value)
+        if not self._root._children:
+            return iter(matched)
+
+        lst = topic.split('/')
+        depth = len(lst)
+        # Wildcards at the first level must not match topics starting with '$'
+        normal = not topic.startswith('$')
+        stack = [(self._root, 0)]
+        while stack:
+            node, i = stack.pop()
+            children = node._children
+            if normal or i > 0:
+                multi = children.get('#')
+                if multi is not None and multi._content is not None:
+                    matched.append(multi._content)
+            if i == depth:
+                if node._content is not None:
+                    matched.append(node._content)
+                continue
+            single = children.get('+')
+            if single is not None and (normal or i > 0):
+                stack.append((single, i + 1))
+            child = children.get(lst[i])
+            if child is not None:
+                stack.append((child, i + 1))
+        return iter(matched)
+
+
+def _has_wildcard(topic_filter):
+    return '+' in topic_filter or '#' in topic_filter
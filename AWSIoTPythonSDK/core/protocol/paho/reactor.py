@@ -0,0 +1,354 @@
+# /*
+# * Copyright 2010-2017 Amazon.com, Inc. or its affiliates. All Rights Reserved.
+# *
+# * Licensed under the Apache License, Version 2.0 (the "License").
+# * You may not use this file except in compliance with the License.
+# * A copy of the License is located at
+# *
+# *  http://aws.amazon.com/apache2.0
+# *
+# * or in the "license" file accompanying this file. This file is distributed
+# * on an "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either
+# * express or implied. See the License for the specific language governing
+# * permissions and limitations under the License.
+# */
+
+"""
+Shared network loop that drives many clients from a small set of threads.
+"""
+
+import logging
+import selectors
+import socket
+import threading
+import time
+from AWSIoTPythonSDK.core.protocol.paho.client import MQTT_ERR_SUCCESS
+from AWSIoTPythonSDK.core.protocol.paho.client import MQTT_ERR_UNKNOWN
+from AWSIoTPythonSDK.core.protocol.paho.client import mqtt_cs_connect_async
+from AWSIoTPythonSDK.core.protocol.paho.client import mqtt_cs_disconnecting
+from AWSIoTPythonSDK.core.protocol.paho.client import _socketpair_compat
+
+# Longest time a reactor thread sleeps, so that keepalive and message retry
+# checks run at least once a second, as they do in loop_forever()
+MAX_SELECT_TIMEOUT = 1.0
+
+
+class NetworkReactor(object):
+    """Runs the network loop of many Clients on a fixed set of threads.
+
+    Instead of one loop_start() thread per client, each client registered
+    with the reactor is assigned to one of thread_count threads. Each thread
+    waits on the sockets of all its clients with a single selectors call
+    (epoll on Linux) and does for each client what loop_forever() would do:
+    read, write, keepalive, and reconnect with backoff after a connection
+    loss. Reconnects (TCP connect and TLS handshake) run on the reactor
+    thread and hold up the other clients of that thread while they last.
+
+    Clients opt in with Client.reactor_set() before loop_start(). loop_start()
+    then registers the client here and loop_stop() waits until the reactor
+    lets go of it, with the same semantics as joining the network thread.
+    Threads are started when the first client is registered.
+
+    If the network loop of a client raises anything other than a socket
+    error, the reactor stops serving that client for good: its connection
+    is closed, _thread_terminate is set as if loop_stop() had been called,
+    and on_disconnect is invoked with MQTT_ERR_UNKNOWN so that the owner
+    sees the client go offline instead of silently losing its loop.
+    """
+
+    def __init__(self, thread_count=1):
+        if thread_count < 1:
+            raise ValueError('Invalid thread count.')
+        self._lock = threading.Lock()
+        self._threads = [_ReactorThread("NetworkReactor-%d" % i) for i in range(thread_count)]
+
+    def register(self, client):
+        """Start driving the network loop of client. Returns the thread that
+        serves it."""
+        with self._lock:
+            thread = min(self._threads, key=lambda t: t.client_count())
+            if not thread.is_alive():
+                thread.start()
+            thread.add(client)
+            return thread
+
+    def unregister(self, client, timeout=None):
+        """Block until the reactor stops driving client, which happens once
+        loop_stop() has been requested and loop_forever() would have
+        returned. Returns True if the client was released."""
+        for thread in self._threads:
+            done = thread.release(client)
+            if done is not None:
+                return done.wait(timeout)
+        return True
+
+    def client_count(self):
+        return sum(thread.client_count() for thread in self._threads)
+
+    def stop(self):
+        """Stop all reactor threads. Clients still registered stop being
+        serviced without being disconnected."""
+        for thread in self._threads:
+            thread.stop()
+        for thread in self._threads:
+            if thread.is_alive() and thread is not threading.current_thread():
+                thread.join()
+
+
+class _ClientEntry(object):
+
+    __slots__ = ['client', 'sock', 'events', 'reconnect_at', 'done']
+
+    def __init__(self, client):
+        self.client = client
+        self.sock = None
+        self.events = 0
+        self.reconnect_at = None
+        self.done = threading.Event()
+
+
+class _ReactorThread(threading.Thread):
+
+    _logger = logging.getLogger(__name__)
+
+    def __init__(self, name):
+        super(_ReactorThread, self).__init__(name=name)
+        self.daemon = True
+        self._selector = selectors.DefaultSelector()
+        self._wakeup_r, self._wakeup_w = _socketpair_compat()
+        self._selector.register(self._wakeup_r, selectors.EVENT_READ, None)
+        self._lock = threading.Lock()
+        self._added = []
+        self._entries = {}
+        self._reconnecting = set()
+        self._buffered = set()
+        self._count = 0
+        self._running = True
+        self._next_misc = 0
+
+    def client_count(self):
+        return self._count
+
+    def add(self, client):
+        with self._lock:
+            self._added.append(_ClientEntry(client))
+            self._count += 1
+        self._wakeup()
+
+    def release(self, client):
+        with self._lock:
+            entry = self._entries.get(client)
+            if entry is None:
+                for added in self._added:
+                    if added.client is client:
+                        entry = added
+        if entry is None:
+            return None
+        self._wakeup()  # loop_stop() has set _thread_terminate, let the thread notice it
+        return entry.done
+
+    def stop(self):
+        self._running = False
+        self._wakeup()
+
+    def _wakeup(self):
+        try:
+            self._wakeup_w.send(b"0")
+        except socket.error:
+            pass
+
+    def run(self):
+        while self._running:
+            events = self._selector.select(self._select_timeout())
+            now = time.time()
+            serviced = set()
+            check_all = now >= self._next_misc
+            # TLS records already decrypted by the ssl module do not show up in select()
+            buffered, self._buffered = self._buffered, set()
+            for key, mask in events:
+                if key.data is None:
+                    self._drain_wakeups()
+                    check_all = True
+                    continue
+                entry, is_wakeup = key.data
+                if entry.done.is_set():
+                    continue
+                if is_wakeup:
+                    entry.client._consume_wakeup()
+                self._service(entry, now, mask & selectors.EVENT_READ, is_wakeup or mask & selectors.EVENT_WRITE)
+                serviced.add(entry)
+            for entry in buffered - serviced:
+                if not entry.done.is_set():
+                    self._service(entry, now, True, False)
+                    serviced.add(entry)
+            self._add_clients()
+            if check_all:
+                # Keepalive, retries, reconnects and termination requests
+                self._next_misc = now + MAX_SELECT_TIMEOUT
+                for entry in list(self._entries.values()):
+                    if entry not in serviced:
+                        self._service(entry, now, False, False, True)
+            else:
+                for entry in list(self._reconnecting):
+                    if entry.reconnect_at <= now:
+                        self._service(entry, now, False, False)
+        self._selector.close()
+        self._wakeup_r.close()
+        self._wakeup_w.close()
+
+    def _select_timeout(self):
+        if self._buffered:
+            return 0
+        timeout = max(self._next_misc - time.time(), 0)
+        for entry in self._reconnecting:
+            timeout = min(timeout, max(entry.reconnect_at - time.time(), 0))
+        return min(timeout, MAX_SELECT_TIMEOUT)
+
+    def _drain_wakeups(self):
+        try:
+            self._wakeup_r.recv(4096)
+        except socket.error:
+            pass
+
+    def _add_clients(self):
+        with self._lock:
+            added, self._added = self._added, []
+        for entry in added:
+            client = entry.client
+            self._entries[client] = entry
+            self._selector.register(client._sockpairR, selectors.EVENT_READ, (entry, True))
+            if client._state == mqtt_cs_connect_async:
+                # connect_async(): connect now and retry with backoff on failure
+                self._schedule_reconnect(entry, time.time())
+            self._service(entry, time.time(), False, True, True)
+
+    def _has_buffered_data(self, client):
+        if client._ssl is None:
+            return False
+        pending = getattr(client.socket(), 'pending', None)
+        return pending is not None and pending() > 0
+
+    def _service(self, entry, now, readable, writable, misc=False):
+        try:
+            self._service_client(entry, now, readable, writable, misc)
+        except Exception:
+            # A client whose loop raises would lose its network thread, do the same here
+            self._logger.exception("Network loop of client %s failed", entry.client._client_id)
+            self._finish(entry)
+            self._fail(entry.client)
+
+    def _fail(self, client):
+        # Stop the client for good and report it, the way a dead loop_start() thread never did
+        client._thread_terminate = True
+        if client._ssl:
+            client._ssl.close()
+            client._ssl = None
+            client._sock = None
+        elif client._sock:
+            client._sock.close()
+            client._sock = None
+        # A callback that raised may have left the callback lock held
+        if not client._callback_mutex.acquire(True, MAX_SELECT_TIMEOUT):
+            self._logger.error("Unable to notify client %s of its network loop failure", client._client_id)
+            return
+        client._callback_mutex.release()
+        try:
+            client._loop_rc_handle(MQTT_ERR_UNKNOWN)
+        except Exception:
+            self._logger.exception("on_disconnect of client %s failed", client._client_id)
+
+    def _schedule_reconnect(self, entry, reconnect_at):
+        entry.reconnect_at = reconnect_at
+        self._reconnecting.add(entry)
+
+    def _service_client(self, entry, now, readable, writable, misc):
+        client = entry.client
+        if entry.reconnect_at is not None:
+            if entry.reconnect_at > now:
+                return
+            entry.reconnect_at = None
+            self._reconnecting.discard(entry)
+            if self._is_stopping(client):
+                self._finish(entry)
+                return
+            try:
+                client.reconnect()
+            except socket.error:
+                pass
+
+        rc = MQTT_ERR_SUCCESS
+        if client.socket() is not None:
+            if readable and client.want_read():
+                rc = client.loop_read()
+            if not rc and writable and client.socket() is not None:
+                rc = client.loop_write()
+            if not rc and misc and client.socket() is not None:
+                rc = client.loop_misc()
+
+        if rc or client.socket() is None:
+            # Connection lost, loop_forever() would back off and reconnect
+            if self._is_stopping(client):
+                self._finish(entry)
+            else:
+                self._schedule_reconnect(entry, now + client._backoffCore.nextBackOffTimeSecond())
+                self._update_registration(entry)
+            return
+
+        if (client._thread_terminate is True
+                and client._current_out_packet is None
+                and len(client._out_packet) == 0
+                and len(client._out_messages) == 0):
+            self._finish(entry)
+            return
+
+        if client.want_read() and self._has_buffered_data(client):
+            self._buffered.add(entry)
+        self._update_registration(entry)
+
+    def _is_stopping(self, client):
+        return client._state == mqtt_cs_disconnecting or client._thread_terminate is True
+
+    def _update_registration(self, entry):
+        client = entry.client
+        sock = client.socket()
+        if sock is not entry.sock:
+            self._unregister_socket(entry)
+            entry.sock = sock
+        if entry.sock is not None:
+            # Paused reads leave the socket out of the selector unless there is something to write,
+            # resume_reading() wakes the thread up through the client's socket pair
+            events = 0
+            if client.want_read():
+                events |= selectors.EVENT_READ
+            if client.want_write():
+                events |= selectors.EVENT_WRITE
+            if events != entry.events:
+                if entry.events == 0:
+                    self._selector.register(entry.sock, events, (entry, False))
+                elif events == 0:
+                    self._selector.unregister(entry.sock)
+                else:
+                    self._selector.modify(entry.sock, events, (entry, False))
+                entry.events = events
+
+    def _unregister_socket(self, entry):
+        if entry.sock is not None and entry.events != 0:
+            try:
+                self._selector.unregister(entry.sock)
+            except (KeyError, ValueError):
+                pass
+        entry.sock = None
+        entry.events = 0
+
+    def _finish(self, entry):
+        self._unregister_socket(entry)
+        try:
+            self._selector.unregister(entry.client._sockpairR)
+        except (KeyError, ValueError):
+            pass
+        self._reconnecting.discard(entry)
+        self._buffered.discard(entry)
+        if self._entries.pop(entry.client, None) is not None:
+            with self._lock:
+                self._count -= 1
+        entry.done.set()
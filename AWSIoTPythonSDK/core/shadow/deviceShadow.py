@@ -13,10 +13,16 @@
 # * permissions and limitations under the License.
 # */
 
+import copy
 import json
 import logging
+import os
 import uuid
-from threading import Timer, Lock, Thread
+from threading import Lock
+from AWSIoTPythonSDK.core.shadow.shadowExecutor import getSharedTimeoutScheduler
+from AWSIoTPythonSDK.core.shadow.shadowExecutor import getSharedCallbackExecutor
+from AWSIoTPythonSDK.core.shadow.shadowExecutor import getSharedBlockingExecutor
+from AWSIoTPythonSDK.core.shadow.shadowManager import _parseShadowTopic
 
 
 class _shadowRequestToken:
@@ -58,10 +64,116 @@ class _basicJSONParser:
         return True
 
 
+def _mergeState(srcTarget, srcPatch):
+    # Shadow update semantics: objects are merged key by key, null deletes a key, anything else replaces it
+    for key, value in srcPatch.items():
+        if value is None:
+            srcTarget.pop(key, None)
+        elif isinstance(value, dict) and isinstance(srcTarget.get(key), dict):
+            _mergeState(srcTarget[key], value)
+        else:
+            srcTarget[key] = value
+
+
+def _canMergeUpdateDocument(srcTarget, srcPatch):
+    # An object landing on an earlier null cannot be folded in: sent one after the other, the null deletes
+    # the key first and the object starts it afresh, merged, the object would be merged into the old value
+    for key, value in srcPatch.items():
+        if isinstance(value, dict):
+            if key in srcTarget and srcTarget[key] is None:
+                return False
+            if isinstance(srcTarget.get(key), dict) and not _canMergeUpdateDocument(srcTarget[key], value):
+                return False
+    return True
+
+
+def _mergeUpdateDocument(srcTarget, srcPatch):
+    # Folds a later shadow update into an earlier one. Unlike _mergeState, null is kept, it still has to
+    # delete the key on AWS IoT. Only for updates that _canMergeUpdateDocument allows
+    for key, value in srcPatch.items():
+        if isinstance(value, dict) and isinstance(srcTarget.get(key), dict):
+            _mergeUpdateDocument(srcTarget[key], value)
+        else:
+            srcTarget[key] = value
+
+
+class _shadowDocumentCache:
+    # Desired and reported state of the shadow document at a known version. Update accepted and delta
+    # responses are merged in as long as their versions follow on from the cached one.
+
+    def __init__(self):
+        self._state = None
+        self._version = -1
+        self._isFromSnapshot = False  # Loaded from disk, the next get response wins whatever its version
+
+    def isValid(self):
+        return self._state is not None
+
+    def getVersion(self):
+        return self._version
+
+    def getState(self):
+        return copy.deepcopy(self._state) if self._state is not None else None
+
+    def invalidate(self):
+        self._state = None
+        self._version = -1
+        self._isFromSnapshot = False
+
+    def replace(self, srcState, srcVersion):
+        # Get accepted: the whole document. The delta section is derived from desired and reported, drop it
+        if self._state is None or srcVersion >= self._version or self._isFromSnapshot:
+            self._state = dict((key, value) for key, value in (srcState or {}).items() if key != "delta")
+            self._version = srcVersion
+            self._isFromSnapshot = False
+
+    def loadSnapshot(self, srcSnapshotString):
+        snapshot = json.loads(srcSnapshotString)
+        if not isinstance(snapshot, dict) or not isinstance(snapshot.get("state"), dict) \
+                or not isinstance(snapshot.get("version"), int):
+            raise ValueError("Not a shadow snapshot.")
+        self._state = snapshot["state"]
+        self._version = snapshot["version"]
+        self._isFromSnapshot = True
+
+    def dumpSnapshot(self):
+        return json.dumps({"state": self._state, "version": self._version})
+
+    def mergeUpdate(self, srcState, srcVersion):
+        # Returns False when versions were missed and the cache can no longer be trusted
+        if self._state is None or srcVersion < self._version:
+            return True
+        if srcVersion > self._version + 1:
+            return False
+        # Merging the update that produced the cached version again is harmless, and fills in the reported
+        # state when the delta of the same update arrived first
+        _mergeState(self._state, srcState or {})
+        self._version = srcVersion
+        return True
+
+    def mergeDelta(self, srcDeltaState, srcVersion):
+        if self._state is None or srcVersion <= self._version:
+            return True
+        if srcVersion > self._version + 1:
+            return False
+        desiredState = self._state.get("desired")
+        if not isinstance(desiredState, dict):
+            desiredState = self._state["desired"] = dict()
+        _mergeState(desiredState, srcDeltaState or {})
+        self._version = srcVersion
+        return True
+
+
 class deviceShadow:
     _logger = logging.getLogger(__name__)
 
-    def __init__(self, srcShadowName, srcIsPersistentSubscribe, srcShadowManager):
+    _CACHE_REFRESH_TIMEOUT_SEC = 5
+    _SNAPSHOT_WRITE_DELAY_SEC = 1
+    _SNAPSHOT_RECONCILE_BASE_DELAY_SEC = 1
+    _SNAPSHOT_RECONCILE_MAX_DELAY_SEC = 32
+
+    def __init__(self, srcShadowName, srcIsPersistentSubscribe, srcShadowManager, srcTimeoutScheduler=None, srcCallbackExecutor=None,
+                 srcIsCacheEnabled=False, srcSnapshotPath=None, srcUpdateCoalescingWindowSecond=0, srcBlockingExecutor=None):
         """
 
         The class that denotes a local/client-side device shadow instance.
@@ -83,6 +195,20 @@ class deviceShadow:
         This is returned from :code:`AWSIoTPythonSDK.MQTTLib.AWSIoTMQTTShadowClient.createShadowWithName` function call. 
         No need to call directly from user scripts.
 
+        Request timeouts are tracked by a timeout scheduler and user callbacks are run by a callback executor 
+        that keeps the callbacks of one shadow in order. Work that waits on the broker or the disk, such as 
+        non-persistent unsubscribes, runs on a separate blocking executor. All three default to process-wide 
+        instances shared by all shadows, so the number of threads does not grow with the request rate.
+
+        With the cache enabled, the shadow document from get/update accepted responses is kept locally and 
+        patched with delta messages, see :code:`getCachedState`. With a snapshot path, the cache is enabled, 
+        loaded from that file at creation and reconciled with AWS IoT through a get request in the background. 
+        The get request is retried with backoff until AWS IoT answers it, for instance when the shadow is created 
+        before the client is connected. Changes to the cache are written back to the file, batched over one second.
+
+        With an update coalescing window, shadow updates made within the window are merged into one update 
+        request, see :code:`shadowUpdate`.
+
         """
         if srcShadowName is None or srcIsPersistentSubscribe is None or srcShadowManager is None:
             raise TypeError("None type inputs detected.")
@@ -91,6 +217,11 @@ class deviceShadow:
         self._shadowManagerHandler = srcShadowManager
         self._basicJSONParserHandler = _basicJSONParser()
         self._tokenHandler = _shadowRequestToken()
+        self._timeoutScheduler = srcTimeoutScheduler if srcTimeoutScheduler is not None else getSharedTimeoutScheduler()
+        self._callbackExecutor = srcCallbackExecutor if srcCallbackExecutor is not None else getSharedCallbackExecutor()
+        # Unsubscribes, background requests and snapshot writes block on the broker or the disk, keep them off the callback workers
+        self._blockingExecutor = srcBlockingExecutor if srcBlockingExecutor is not None else getSharedBlockingExecutor()
+        self._unsubscribeExecutorKey = (self, "unsubscribe")
         # Properties
         self._isPersistentSubscribe = srcIsPersistentSubscribe
         self._lastVersionInSync = -1  # -1 means not initialized
@@ -108,18 +239,93 @@ class deviceShadow:
         self._shadowSubscribeStatusTable["update"] = 0
         self._tokenPool = dict()
         self._dataStructureLock = Lock()
+        self._documentCache = _shadowDocumentCache() if srcIsCacheEnabled or srcSnapshotPath else None
+        self._cacheRefreshTokens = set()  # Gets sent to refresh the cache, their responses are not for the user callback
+        self._snapshotPath = srcSnapshotPath
+        self._snapshotExecutorKey = (self, "snapshot")  # File writes stay off the callback queue
+        self._isSnapshotWriteScheduled = False
+        self._isSnapshotRemovalRequested = False
+        self._isSnapshotReconciled = srcSnapshotPath is None  # Until a get accepted response replaces the snapshot
+        self._isSnapshotReconcileScheduled = False
+        self._snapshotReconcileDelaySecond = self._SNAPSHOT_RECONCILE_BASE_DELAY_SEC
+        self._updateCoalescingWindowSecond = srcUpdateCoalescingWindowSecond
+        self._pendingCoalescedUpdate = None  # [token, merged document, callbacks, timeout] waiting for the window to close
+        self._coalescedUpdateCallbacks = dict()  # token -> callbacks of every update merged into that request
+        if self._snapshotPath is not None:
+            self._loadSnapshot()
+            self._blockingExecutor.submit(self._unsubscribeExecutorKey, self._reconcileSnapshot)
+
+    def _loadSnapshot(self):
+        try:
+            with open(self._snapshotPath, "r") as snapshotFile:
+                self._documentCache.loadSnapshot(snapshotFile.read())
+            self._logger.info("Loaded shadow snapshot version " + str(self._documentCache.getVersion()) + " for deviceShadow: " + self._shadowName)
+        except (IOError, OSError, ValueError) as e:
+            self._logger.info("No usable shadow snapshot for deviceShadow: " + self._shadowName + ": " + str(e))
+
+    def _reconcileSnapshot(self):
+        with self._dataStructureLock:
+            self._isSnapshotReconcileScheduled = False
+            if self._isSnapshotReconciled:
+                return
+        try:
+            self._sendGetRequest(self._CACHE_REFRESH_TIMEOUT_SEC, True)
+        except Exception as e:  # Likely not connected yet, the snapshot stays in use until a later get
+            self._logger.warning("Failed to reconcile shadow snapshot for deviceShadow: " + self._shadowName + ": " + str(e))
+            with self._dataStructureLock:
+                self._scheduleSnapshotReconcile()
+
+    def _scheduleSnapshotReconcile(self):
+        # Called with the data structure lock held. Retries back off until a get is accepted
+        if not self._isSnapshotReconciled and not self._isSnapshotReconcileScheduled:
+            self._isSnapshotReconcileScheduled = True
+            self._timeoutScheduler.schedule(self._snapshotReconcileDelaySecond, self._snapshotReconcileDue)
+            self._snapshotReconcileDelaySecond = min(self._snapshotReconcileDelaySecond * 2, self._SNAPSHOT_RECONCILE_MAX_DELAY_SEC)
+
+    def _snapshotReconcileDue(self):
+        # Runs on the shared scheduler thread, the get request may block on the broker
+        self._blockingExecutor.submit(self._unsubscribeExecutorKey, self._reconcileSnapshot)
+
+    def _scheduleSnapshotWrite(self):
+        # Called with the data structure lock held. Changes within the delay go out in one write
+        if self._snapshotPath is not None and not self._isSnapshotWriteScheduled:
+            self._isSnapshotWriteScheduled = True
+            self._timeoutScheduler.schedule(self._SNAPSHOT_WRITE_DELAY_SEC, self._snapshotWriteDue)
+
+    def _snapshotWriteDue(self):
+        # Runs on the shared scheduler thread, hand the file I/O over
+        self._blockingExecutor.submit(self._snapshotExecutorKey, self._writeSnapshot)
+
+    def _writeSnapshot(self):
+        with self._dataStructureLock:
+            self._isSnapshotWriteScheduled = False
+            snapshotString = self._documentCache.dumpSnapshot() if self._documentCache.isValid() else None
+            isRemovalRequested = self._isSnapshotRemovalRequested
+        try:
+            if snapshotString is not None:
+                # Written to a temporary file and renamed over the old one, so a crash leaves one or the other
+                with open(self._snapshotPath + ".tmp", "w") as snapshotFile:
+                    snapshotFile.write(snapshotString)
+                    snapshotFile.flush()
+                    os.fsync(snapshotFile.fileno())
+                os.replace(self._snapshotPath + ".tmp", self._snapshotPath)
+            elif isRemovalRequested and os.path.exists(self._snapshotPath):
+                os.remove(self._snapshotPath)
+        except (IOError, OSError) as e:
+            self._logger.error("Failed to write shadow snapshot for deviceShadow: " + self._shadowName + ": " + str(e))
 
     def _doNonPersistentUnsubscribe(self, currentAction):
         self._shadowManagerHandler.basicShadowUnsubscribe(self._shadowName, currentAction)
         self._logger.info("Unsubscribed to " + currentAction + " accepted/rejected topics for deviceShadow: " + self._shadowName)
 
     def generalCallback(self, client, userdata, message):
-        # In Py3.x, message.payload comes in as a bytes(string)
-        # json.loads needs a string input
+        parsedTopic = _parseShadowTopic(message.topic)
+        if parsedTopic is None:
+            return
+        currentShadowName, currentAction, currentType = parsedTopic  # get/delete/update/delta, accepted/rejected/delta
         with self._dataStructureLock:
-            currentTopic = message.topic
-            currentAction = self._parseTopicAction(currentTopic)  # get/delete/update/delta
-            currentType = self._parseTopicType(currentTopic)  # accepted/rejected/delta
+            # In Py3.x, message.payload comes in as a bytes(string)
+            # json.loads needs a string input
             payloadUTF8String = message.payload.decode('utf-8')
             # get/delete/update: Need to deal with token, timer and unsubscribe
             if currentAction in ["get", "delete", "update"]:
@@ -140,49 +346,80 @@ class deviceShadow:
                             # If it is a delete accepted, we need to reset the version
                             else:
                                 self._lastVersionInSync = -1  # The version will always be synced for the next incoming delta/GU-accepted response
+                            if self._documentCache is not None:
+                                self._updateDocumentCache(currentAction, self._basicJSONParserHandler.getAttributeValue(u"state"), incomingVersion)
                         # Cancel the timer and clear the token
-                        self._tokenPool[currentToken].cancel()
-                        del self._tokenPool[currentToken]
+                        currentTimeoutHandle = self._tokenPool.pop(currentToken)
+                        if currentTimeoutHandle is not None:  # None if the response beat the timer start
+                            currentTimeoutHandle.cancel()
                         # Need to unsubscribe?
                         self._shadowSubscribeStatusTable[currentAction] -= 1
                         if not self._isPersistentSubscribe and self._shadowSubscribeStatusTable.get(currentAction) <= 0:
                             self._shadowSubscribeStatusTable[currentAction] = 0
-                            processNonPersistentUnsubscribe = Thread(target=self._doNonPersistentUnsubscribe, args=[currentAction])
-                            processNonPersistentUnsubscribe.start()
+                            self._blockingExecutor.submit(self._unsubscribeExecutorKey, self._doNonPersistentUnsubscribe, [currentAction])
                         # Custom callback
-                        if self._shadowSubscribeCallbackTable.get(currentAction) is not None:
-                            processCustomCallback = Thread(target=self._shadowSubscribeCallbackTable[currentAction], args=[payloadUTF8String, currentType, currentToken])
-                            processCustomCallback.start()
+                        if currentToken in self._cacheRefreshTokens:
+                            self._cacheRefreshTokens.discard(currentToken)
+                            if currentType == "rejected" and self._basicJSONParserHandler.getAttributeValue(u"code") == 404:
+                                self._updateDocumentCache("delete", None, None)  # The shadow is gone, so is the snapshot
+                            elif currentType == "rejected":
+                                self._scheduleSnapshotReconcile()
+                        elif currentToken in self._coalescedUpdateCallbacks:
+                            for currentCallback in self._coalescedUpdateCallbacks.pop(currentToken):
+                                if currentCallback is not None:
+                                    self._callbackExecutor.submit(self, currentCallback, [payloadUTF8String, currentType, currentToken])
+                        elif self._shadowSubscribeCallbackTable.get(currentAction) is not None:
+                            self._callbackExecutor.submit(self, self._shadowSubscribeCallbackTable[currentAction], [payloadUTF8String, currentType, currentToken])
             # delta: Watch for version
             else:
-                currentType += "/" + self._parseTopicShadowName(currentTopic)
+                currentType += "/" + currentShadowName
                 # Sync local version
                 self._basicJSONParserHandler.setString(payloadUTF8String)
                 if self._basicJSONParserHandler.validateJSON():  # Filter out JSON without version
                     incomingVersion = self._basicJSONParserHandler.getAttributeValue(u"version")
+                    if incomingVersion is not None and self._documentCache is not None:
+                        self._updateDocumentCache(currentAction, self._basicJSONParserHandler.getAttributeValue(u"state"), incomingVersion)
                     if incomingVersion is not None and incomingVersion > self._lastVersionInSync:
                         self._lastVersionInSync = incomingVersion
                         # Custom callback
                         if self._shadowSubscribeCallbackTable.get(currentAction) is not None:
-                            processCustomCallback = Thread(target=self._shadowSubscribeCallbackTable[currentAction], args=[payloadUTF8String, currentType, None])
-                            processCustomCallback.start()
-
-    def _parseTopicAction(self, srcTopic):
-        ret = None
-        fragments = srcTopic.split('/')
-        if fragments[5] == "delta":
-            ret = "delta"
+                            self._callbackExecutor.submit(self, self._shadowSubscribeCallbackTable[currentAction], [payloadUTF8String, currentType, None])
+
+    def _updateDocumentCache(self, srcActionName, srcState, srcVersion):
+        # Called with the data structure lock held
+        if srcActionName == "delete":  # The shadow is gone
+            self._documentCache.invalidate()
+            self._isSnapshotRemovalRequested = True
+            self._isSnapshotReconciled = True
+            self._scheduleSnapshotWrite()
+            return
+        if srcVersion is None:
+            return
+        if srcActionName == "get":
+            self._documentCache.replace(srcState, srcVersion)
+            self._isSnapshotRemovalRequested = False
+            self._isSnapshotReconciled = True
+            isInSync = True
+        elif srcActionName == "update":
+            isInSync = self._documentCache.mergeUpdate(srcState, srcVersion)
+        else:
+            isInSync = self._documentCache.mergeDelta(srcState, srcVersion)
+        if isInSync:
+            self._scheduleSnapshotWrite()
         else:
-            ret = fragments[4]
-        return ret
+            self._logger.info("Shadow version gap detected, refreshing cached document for deviceShadow: " + self._shadowName)
+            self._documentCache.invalidate()
+            if not self._cacheRefreshTokens:
+                self._blockingExecutor.submit(self._unsubscribeExecutorKey, self._sendGetRequest, [self._CACHE_REFRESH_TIMEOUT_SEC, True])
 
-    def _parseTopicType(self, srcTopic):
-        fragments = srcTopic.split('/')
-        return fragments[5]
+    def _timerExpired(self, srcActionName, srcToken):
+        # Runs on the shared scheduler thread, hand the work over so it is ordered with the responses
+        self._callbackExecutor.submit(self, self._timerHandler, [srcActionName, srcToken])
 
-    def _parseTopicShadowName(self, srcTopic):
-        fragments = srcTopic.split('/')
-        return fragments[2]
+    def _startTimer(self, srcActionName, srcToken, srcTimeout):
+        with self._dataStructureLock:
+            if srcToken in self._tokenPool:
+                self._tokenPool[srcToken] = self._timeoutScheduler.schedule(srcTimeout, self._timerExpired, [srcActionName, srcToken])
 
     def _timerHandler(self, srcActionName, srcToken):
         with self._dataStructureLock:
@@ -196,11 +433,21 @@ class deviceShadow:
             self._shadowSubscribeStatusTable[srcActionName] -= 1
             if not self._isPersistentSubscribe and self._shadowSubscribeStatusTable.get(srcActionName) <= 0:
                 self._shadowSubscribeStatusTable[srcActionName] = 0
-                self._shadowManagerHandler.basicShadowUnsubscribe(self._shadowName, srcActionName)
-            # Notify time-out issue
-            if self._shadowSubscribeCallbackTable.get(srcActionName) is not None:
+                self._blockingExecutor.submit(self._unsubscribeExecutorKey, self._doNonPersistentUnsubscribe, [srcActionName])
+            if srcToken in self._cacheRefreshTokens:
+                self._cacheRefreshTokens.discard(srcToken)
+                self._logger.warning("Cached document refresh timed out for deviceShadow: " + self._shadowName)
+                self._scheduleSnapshotReconcile()
+                return
+            if srcToken in self._coalescedUpdateCallbacks:
+                timeoutCallbacks = self._coalescedUpdateCallbacks.pop(srcToken)
+            else:
+                timeoutCallbacks = [self._shadowSubscribeCallbackTable.get(srcActionName)]
+        # Notify time-out issue
+        for timeoutCallback in timeoutCallbacks:
+            if timeoutCallback is not None:
                 self._logger.info("Shadow request with token: " + str(srcToken) + " has timed out.")
-                self._shadowSubscribeCallbackTable[srcActionName]("REQUEST TIME OUT", "timeout", srcToken)
+                timeoutCallback("REQUEST TIME OUT", "timeout", srcToken)
 
     def shadowGet(self, srcCallback, srcTimeout):
         """
@@ -237,26 +484,39 @@ class deviceShadow:
         with self._dataStructureLock:
             # Update callback data structure
             self._shadowSubscribeCallbackTable["get"] = srcCallback
+        return self._sendGetRequest(srcTimeout)
+
+    def _sendGetRequest(self, srcTimeout, srcIsCacheRefresh=False):
+        with self._dataStructureLock:
             # Update number of pending feedback
             self._shadowSubscribeStatusTable["get"] += 1
             # clientToken
             currentToken = self._tokenHandler.getNextToken()
-            self._tokenPool[currentToken] = Timer(srcTimeout, self._timerHandler, ["get", currentToken])
+            self._tokenPool[currentToken] = None  # Timer starts once the request is published
+            if srcIsCacheRefresh:
+                self._cacheRefreshTokens.add(currentToken)
             self._basicJSONParserHandler.setString("{}")
             self._basicJSONParserHandler.validateJSON()
             self._basicJSONParserHandler.setAttributeValue("clientToken", currentToken)
             currentPayload = self._basicJSONParserHandler.regenerateString()
-        # Two subscriptions
-        if not self._isPersistentSubscribe or not self._isGetSubscribed:
-            self._shadowManagerHandler.basicShadowSubscribe(self._shadowName, "get", self.generalCallback)
-            self._isGetSubscribed = True
-            self._logger.info("Subscribed to get accepted/rejected topics for deviceShadow: " + self._shadowName)
-        # One publish
-        self._shadowManagerHandler.basicShadowPublish(self._shadowName, "get", currentPayload)
+        try:
+            # Two subscriptions
+            if not self._isPersistentSubscribe or not self._isGetSubscribed:
+                self._shadowManagerHandler.basicShadowSubscribe(self._shadowName, "get", self.generalCallback)
+                self._isGetSubscribed = True
+                self._logger.info("Subscribed to get accepted/rejected topics for deviceShadow: " + self._shadowName)
+            # One publish
+            self._shadowManagerHandler.basicShadowPublish(self._shadowName, "get", currentPayload)
+        except Exception:
+            # Nothing was sent, so no response or timeout will clear the token
+            with self._dataStructureLock:
+                if currentToken in self._tokenPool:
+                    del self._tokenPool[currentToken]
+                    self._shadowSubscribeStatusTable["get"] -= 1
+                self._cacheRefreshTokens.discard(currentToken)
+            raise
         # Start the timer
-        with self._dataStructureLock:
-            if currentToken in self._tokenPool:
-                self._tokenPool[currentToken].start()
+        self._startTimer("get", currentToken, srcTimeout)
         return currentToken
 
     def shadowDelete(self, srcCallback, srcTimeout):
@@ -298,7 +558,7 @@ class deviceShadow:
             self._shadowSubscribeStatusTable["delete"] += 1
             # clientToken
             currentToken = self._tokenHandler.getNextToken()
-            self._tokenPool[currentToken] = Timer(srcTimeout, self._timerHandler, ["delete", currentToken])
+            self._tokenPool[currentToken] = None  # Timer starts once the request is published
             self._basicJSONParserHandler.setString("{}")
             self._basicJSONParserHandler.validateJSON()
             self._basicJSONParserHandler.setAttributeValue("clientToken", currentToken)
@@ -311,9 +571,7 @@ class deviceShadow:
         # One publish
         self._shadowManagerHandler.basicShadowPublish(self._shadowName, "delete", currentPayload)
         # Start the timer
-        with self._dataStructureLock:
-            if currentToken in self._tokenPool:
-                self._tokenPool[currentToken].start()
+        self._startTimer("delete", currentToken, srcTimeout)
         return currentToken
 
     def shadowUpdate(self, srcJSONPayload, srcCallback, srcTimeout):
@@ -345,6 +603,13 @@ class deviceShadow:
         *srcTimeout* - Timeout to determine whether the request is invalid. When a request gets timeout, 
         a timeout notification will be generated and put into the registered callback to notify users.
 
+        With an update coalescing window configured, the update is held back for that long and merged with 
+        the other updates to this shadow made in the meantime, then sent as one request. Every merged update 
+        gets the same token, and each of their callbacks is called with the response to the merged request. 
+        Updates carrying a version are sent on their own, right after the updates held back before them. So 
+        are the updates held back before one that sets an object where they delete it, which then starts a 
+        new window.
+
         **Returns**
 
         The token used for tracing in this shadow request.
@@ -352,31 +617,89 @@ class deviceShadow:
         """
         # Validate JSON
         if _validateJSON(srcJSONPayload):
+            if self._updateCoalescingWindowSecond > 0:
+                updateDocument = json.loads(srcJSONPayload)
+                if isinstance(updateDocument, dict) and "version" not in updateDocument:
+                    return self._coalesceUpdate(updateDocument, srcCallback, srcTimeout)
+                self._flushCoalescedUpdate()  # Keep the order of updates
             with self._dataStructureLock:
-                self._basicJSONParserHandler.setString(srcJSONPayload)
-                self._basicJSONParserHandler.validateJSON()
-                # clientToken
-                currentToken = self._tokenHandler.getNextToken()
-                self._tokenPool[currentToken] = Timer(srcTimeout, self._timerHandler, ["update", currentToken])
-                self._basicJSONParserHandler.setAttributeValue("clientToken", currentToken)
-                JSONPayloadWithToken = self._basicJSONParserHandler.regenerateString()
                 # Update callback data structure
                 self._shadowSubscribeCallbackTable["update"] = srcCallback
-                # Update number of pending feedback
-                self._shadowSubscribeStatusTable["update"] += 1
-            # Two subscriptions
-            if not self._isPersistentSubscribe or not self._isUpdateSubscribed:
-                self._shadowManagerHandler.basicShadowSubscribe(self._shadowName, "update", self.generalCallback)
-                self._isUpdateSubscribed = True
-                self._logger.info("Subscribed to update accepted/rejected topics for deviceShadow: " + self._shadowName)
-            # One publish
-            self._shadowManagerHandler.basicShadowPublish(self._shadowName, "update", JSONPayloadWithToken)
-            # Start the timer
-            with self._dataStructureLock:
-                if currentToken in self._tokenPool:
-                    self._tokenPool[currentToken].start()
+            return self._sendUpdateRequest(srcJSONPayload, srcTimeout)
         else:
             raise ValueError("Invalid JSON file.")
+
+    def _coalesceUpdate(self, srcUpdateDocument, srcCallback, srcTimeout):
+        heldUpdate = None
+        with self._dataStructureLock:
+            if self._pendingCoalescedUpdate is not None \
+                    and not _canMergeUpdateDocument(self._pendingCoalescedUpdate[1], srcUpdateDocument):
+                heldUpdate = self._takePendingCoalescedUpdate()  # Sent first, this update starts a new window
+            if self._pendingCoalescedUpdate is None:
+                self._pendingCoalescedUpdate = [self._tokenHandler.getNextToken(), dict(), [], srcTimeout]
+                self._timeoutScheduler.schedule(self._updateCoalescingWindowSecond, self._coalescingWindowClosed,
+                                                [self._pendingCoalescedUpdate[0]])
+            currentToken, mergedDocument, callbacks, timeout = self._pendingCoalescedUpdate
+            _mergeUpdateDocument(mergedDocument, srcUpdateDocument)
+            callbacks.append(srcCallback)
+            self._pendingCoalescedUpdate[3] = max(timeout, srcTimeout)
+        if heldUpdate is not None:
+            self._sendCoalescedUpdate(*heldUpdate)
+        return currentToken
+
+    def _coalescingWindowClosed(self, srcToken):
+        # Runs on the shared scheduler thread, sending may block on subscribing
+        self._blockingExecutor.submit(self._unsubscribeExecutorKey, self._flushCoalescedUpdate, [srcToken])
+
+    def _flushCoalescedUpdate(self, srcToken=None):
+        # With a token, only flushes the updates held back under it, they may have been sent already
+        with self._dataStructureLock:
+            if self._pendingCoalescedUpdate is None \
+                    or (srcToken is not None and self._pendingCoalescedUpdate[0] != srcToken):
+                return
+            heldUpdate = self._takePendingCoalescedUpdate()
+        self._sendCoalescedUpdate(*heldUpdate)
+
+    def _takePendingCoalescedUpdate(self):
+        # Needs the data structure lock held
+        currentToken, mergedDocument, callbacks, timeout = self._pendingCoalescedUpdate
+        self._pendingCoalescedUpdate = None
+        self._coalescedUpdateCallbacks[currentToken] = callbacks
+        return currentToken, mergedDocument, timeout
+
+    def _sendCoalescedUpdate(self, srcToken, srcMergedDocument, srcTimeout):
+        try:
+            self._sendUpdateRequest(json.dumps(srcMergedDocument), srcTimeout, srcToken)
+        except Exception as e:  # The callers have returned already, this is the only way to let them know
+            self._logger.error("Failed to send coalesced shadow update for deviceShadow: " + self._shadowName + ": " + str(e))
+            with self._dataStructureLock:
+                if self._tokenPool.pop(srcToken, False) is not False:
+                    self._shadowSubscribeStatusTable["update"] -= 1
+                callbacks = self._coalescedUpdateCallbacks.pop(srcToken, [])
+            for currentCallback in callbacks:
+                if currentCallback is not None:
+                    self._callbackExecutor.submit(self, currentCallback, ["REQUEST TIME OUT", "timeout", srcToken])
+
+    def _sendUpdateRequest(self, srcJSONPayload, srcTimeout, srcToken=None):
+        with self._dataStructureLock:
+            self._basicJSONParserHandler.setString(srcJSONPayload)
+            self._basicJSONParserHandler.validateJSON()
+            # clientToken
+            currentToken = srcToken if srcToken is not None else self._tokenHandler.getNextToken()
+            self._tokenPool[currentToken] = None  # Timer starts once the request is published
+            self._basicJSONParserHandler.setAttributeValue("clientToken", currentToken)
+            JSONPayloadWithToken = self._basicJSONParserHandler.regenerateString()
+            # Update number of pending feedback
+            self._shadowSubscribeStatusTable["update"] += 1
+        # Two subscriptions
+        if not self._isPersistentSubscribe or not self._isUpdateSubscribed:
+            self._shadowManagerHandler.basicShadowSubscribe(self._shadowName, "update", self.generalCallback)
+            self._isUpdateSubscribed = True
+            self._logger.info("Subscribed to update accepted/rejected topics for deviceShadow: " + self._shadowName)
+        # One publish
+        self._shadowManagerHandler.basicShadowPublish(self._shadowName, "update", JSONPayloadWithToken)
+        # Start the timer
+        self._startTimer("update", currentToken, srcTimeout)
         return currentToken
 
     def shadowRegisterDeltaCallback(self, srcCallback):
@@ -443,3 +766,35 @@ class deviceShadow:
         # One unsubscription
         self._shadowManagerHandler.basicShadowUnsubscribe(self._shadowName, "delta")
         self._logger.info("Unsubscribed to delta topics for deviceShadow: " + self._shadowName)
+
+    def getCachedState(self):
+        """
+        **Description**
+
+        Return the state of the device shadow JSON document from the local cache, without a round trip to 
+        AWS IoT. The cache is filled in by get accepted responses and kept up to date with update accepted 
+        responses and delta messages, in version order. When a version is missed, the cache is cleared and 
+        refreshed with a get request in the background. Only available when the cache is enabled for this 
+        device shadow.
+
+        **Syntax**
+
+        .. code:: python
+
+          # Read the locally cached desired and reported state of BotShadow
+          cachedState = BotShadow.getCachedState()
+
+        **Parameters**
+
+        None
+
+        **Returns**
+
+        Dictionary with the :code:`desired` and :code:`reported` sections of the shadow state, or None if 
+        no up-to-date document is cached.
+
+        """
+        if self._documentCache is None:
+            raise ValueError("Document cache is not enabled for this device shadow.")
+        with self._dataStructureLock:
+            return self._documentCache.getState()
@@ -0,0 +1,195 @@
+# /*
+# * Copyright 2010-2017 Amazon.com, Inc. or its affiliates. All Rights Reserved.
+# *
+# * Licensed under the Apache License, Version 2.0 (the "License").
+# * You may not use this file except in compliance with the License.
+# * A copy of the License is located at
+# *
+# *  http://aws.amazon.com/apache2.0
+# *
+# * or in the "license" file accompanying this file. This file is distributed
+# * on an "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either
+# * express or implied. See the License for the specific language governing
+# * permissions and limitations under the License.
+# */
+
+import heapq
+import itertools
+import logging
+import time
+from collections import deque
+from threading import Condition, Lock, Thread
+
+
+class _timeoutHandle:
+
+    __slots__ = ["_deadline", "_callback", "_args", "_isCancelled"]
+
+    def __init__(self, srcDeadline, srcCallback, srcArgs):
+        self._deadline = srcDeadline
+        self._callback = srcCallback
+        self._args = srcArgs
+        self._isCancelled = False
+
+    def cancel(self):
+        self._isCancelled = True
+
+    def isCancelled(self):
+        return self._isCancelled
+
+
+class timeoutScheduler:
+    """
+
+    Heap based scheduler for shadow request timeouts. All timeouts of all shadows in the process
+    are served by a single daemon thread, started on the first schedule call. Cancelled timeouts
+    stay in the heap and are discarded when they come due.
+
+    Callbacks run on the scheduler thread and must not block. Hand anything else off to an
+    :code:`orderedCallbackExecutor`.
+
+    """
+
+    _logger = logging.getLogger(__name__)
+
+    def __init__(self):
+        self._heap = []
+        self._sequence = itertools.count()  # Tie breaker so handles never get compared
+        self._condition = Condition(Lock())
+        self._thread = None
+
+    def schedule(self, srcDelaySecond, srcCallback, srcArgs=()):
+        handle = _timeoutHandle(time.time() + srcDelaySecond, srcCallback, srcArgs)
+        with self._condition:
+            heapq.heappush(self._heap, (handle._deadline, next(self._sequence), handle))
+            if self._thread is None:
+                self._thread = Thread(target=self._run, name="AWSIoTShadowTimeoutScheduler")
+                self._thread.daemon = True
+                self._thread.start()
+            elif self._heap[0][2] is handle:  # New earliest deadline, re-arm the wait
+                self._condition.notify()
+        return handle
+
+    def pendingCount(self):
+        with self._condition:
+            return len(self._heap)
+
+    def _run(self):
+        while True:
+            with self._condition:
+                while True:
+                    if not self._heap:
+                        self._condition.wait()
+                        continue
+                    remainingSecond = self._heap[0][0] - time.time()
+                    if remainingSecond <= 0:
+                        handle = heapq.heappop(self._heap)[2]
+                        break
+                    self._condition.wait(remainingSecond)
+            if handle.isCancelled():
+                continue
+            try:
+                handle._callback(*handle._args)
+            except Exception:
+                self._logger.exception("Shadow timeout callback raised an exception")
+
+
+class orderedCallbackExecutor:
+    """
+
+    Fixed size worker pool for shadow callbacks. Tasks submitted under the same key run one at a time,
+    in submission order; tasks under different keys run concurrently on up to srcWorkerCount threads.
+    Workers are started on demand and then kept, so the number of threads never exceeds srcWorkerCount
+    regardless of the request rate.
+
+    A task that blocks holds its worker, so work that waits on the broker or the disk goes to an executor
+    of its own, see :code:`getSharedBlockingExecutor`.
+
+    """
+
+    _logger = logging.getLogger(__name__)
+
+    def __init__(self, srcWorkerCount=2, srcThreadName="AWSIoTShadowCallbackWorker"):
+        if srcWorkerCount < 1:
+            raise ValueError("Worker count must be at least 1.")
+        self._workerCount = srcWorkerCount
+        self._threadName = srcThreadName
+        self._workers = []
+        self._idleWorkerCount = 0
+        self._pendingTasks = dict()  # key -> deque of (callback, args), present while the key is queued or running
+        self._readyKeys = deque()
+        self._condition = Condition(Lock())
+
+    def submit(self, srcKey, srcCallback, srcArgs=()):
+        with self._condition:
+            keyTasks = self._pendingTasks.get(srcKey)
+            if keyTasks is not None:  # Key is queued or running, its worker will pick this up in order
+                keyTasks.append((srcCallback, srcArgs))
+                return
+            self._pendingTasks[srcKey] = deque([(srcCallback, srcArgs)])
+            self._readyKeys.append(srcKey)
+            if self._idleWorkerCount > 0:
+                self._condition.notify()
+            elif len(self._workers) < self._workerCount:
+                worker = Thread(target=self._run, name="%s-%d" % (self._threadName, len(self._workers)))
+                worker.daemon = True
+                self._workers.append(worker)
+                worker.start()
+
+    def workerCount(self):
+        with self._condition:
+            return len(self._workers)
+
+    def _run(self):
+        while True:
+            with self._condition:
+                while not self._readyKeys:
+                    self._idleWorkerCount += 1
+                    self._condition.wait()
+                    self._idleWorkerCount -= 1
+                currentKey = self._readyKeys.popleft()
+                callback, args = self._pendingTasks[currentKey].popleft()
+            try:
+                callback(*args)
+            except Exception:
+                self._logger.exception("Shadow callback raised an exception")
+            with self._condition:
+                if self._pendingTasks[currentKey]:
+                    # Back of the line, so one busy shadow cannot starve the others
+                    self._readyKeys.append(currentKey)
+                    if self._idleWorkerCount > 0:
+                        self._condition.notify()
+                else:
+                    del self._pendingTasks[currentKey]
+
+
+_sharedInstanceLock = Lock()
+_sharedTimeoutScheduler = None
+_sharedCallbackExecutor = None
+_sharedBlockingExecutor = None
+
+
+def getSharedTimeoutScheduler():
+    global _sharedTimeoutScheduler
+    with _sharedInstanceLock:
+        if _sharedTimeoutScheduler is None:
+            _sharedTimeoutScheduler = timeoutScheduler()
+        return _sharedTimeoutScheduler
+
+
+def getSharedCallbackExecutor():
+    global _sharedCallbackExecutor
+    with _sharedInstanceLock:
+        if _sharedCallbackExecutor is None:
+            _sharedCallbackExecutor = orderedCallbackExecutor()
+        return _sharedCallbackExecutor
+
+
+def getSharedBlockingExecutor():
+    # Unsubscribes, requests sent from the background and snapshot writes wait on the broker or the disk.
+    # They run here, so the callback workers are always free for shadow responses and timeouts
+    global _sharedBlockingExecutor
+    with _sharedInstanceLock:
+        if _sharedBlockingExecutor is None:
+            _sharedBlockingExecutor = orderedCallbackExecutor(4, "AWSIoTShadowBlockingWorker")
+        return _sharedBlockingExecutor
@@ -14,8 +14,26 @@
 # */
 
 import logging
-import time
+from functools import lru_cache
 from threading import Lock
+from AWSIoTPythonSDK.core.protocol.paho.client import topic_matches_sub
+
+_SHADOW_RESPONSE_TYPES = ("accepted", "rejected", "delta")
+_PARSED_SHADOW_TOPIC_CACHE_SIZE = 16384
+
+
+@lru_cache(maxsize=_PARSED_SHADOW_TOPIC_CACHE_SIZE)
+def _parseShadowTopic(srcTopic):
+    # $aws/things/<thingName>/shadow/<action>/<accepted|rejected|delta> -> (thingName, action, type)
+    # A gateway keeps seeing the same few topics per shadow, so each topic is only split once
+    fragments = srcTopic.split('/')
+    if len(fragments) != 6 or fragments[0] != "$aws" or fragments[1] != "things" or fragments[3] != "shadow" \
+            or fragments[5] not in _SHADOW_RESPONSE_TYPES:
+        return None
+    if fragments[5] == "delta":
+        return fragments[2], "delta", "delta"
+    return fragments[2], fragments[4], fragments[5]
+
 
 class _shadowAction:
     _actionType = ["get", "update", "delete", "delta"]
@@ -67,9 +85,9 @@ class shadowManager:
             if currentShadowAction.isDelta:
                 self._mqttCoreHandler.subscribe(currentShadowAction.getTopicDelta(), 0, srcCallback)
             else:
-                self._mqttCoreHandler.subscribe(currentShadowAction.getTopicAccept(), 0, srcCallback)
-                self._mqttCoreHandler.subscribe(currentShadowAction.getTopicReject(), 0, srcCallback)
-            time.sleep(2)
+                # One SUBSCRIBE for both response topics, blocks until its SUBACK arrives
+                self._mqttCoreHandler.subscribe_batch([(currentShadowAction.getTopicAccept(), 0, srcCallback),
+                                                       (currentShadowAction.getTopicReject(), 0, srcCallback)])
 
     def basicShadowUnsubscribe(self, srcShadowName, srcShadowAction):
         with self._shadowSubUnsubOperationLock:
@@ -81,3 +99,60 @@ class shadowManager:
                 self._mqttCoreHandler.unsubscribe(currentShadowAction.getTopicAccept())
                 self._logger.debug(currentShadowAction.getTopicReject())
                 self._mqttCoreHandler.unsubscribe(currentShadowAction.getTopicReject())
+
+
+class shadowRouter(shadowManager):
+
+    _DEFAULT_TOPIC_FILTERS = ["$aws/things/+/shadow/#"]
+
+    def __init__(self, srcMQTTCore, srcTopicFilters=None):
+        """
+        Shadow manager for gateways fronting many things. It subscribes once to wildcard topic filters and hands
+        each incoming shadow response to the deviceShadow registered for its thing name and action, instead of
+        subscribing to the accepted/rejected/delta topics of every shadow. Shadow actions whose topics are not
+        covered by the topic filters are subscribed to one by one, as shadowManager does.
+        """
+        shadowManager.__init__(self, srcMQTTCore)
+        self._topicFilters = list(srcTopicFilters) if srcTopicFilters else list(self._DEFAULT_TOPIC_FILTERS)
+        self._isTopicFiltersSubscribed = False
+        self._routeTable = dict()  # (thingName, action) -> message callback
+        self._routeTableLock = Lock()
+
+    def basicShadowSubscribe(self, srcShadowName, srcShadowAction, srcCallback):
+        currentShadowAction = _shadowAction(srcShadowName, srcShadowAction)
+        if not self._isRouted(currentShadowAction):
+            shadowManager.basicShadowSubscribe(self, srcShadowName, srcShadowAction, srcCallback)
+            return
+        with self._shadowSubUnsubOperationLock:
+            if not self._isTopicFiltersSubscribed:
+                self._mqttCoreHandler.subscribe_batch([(topicFilter, 0, self.routeMessage) for topicFilter in self._topicFilters])
+                self._isTopicFiltersSubscribed = True
+        with self._routeTableLock:
+            self._routeTable[(str(srcShadowName), srcShadowAction)] = srcCallback
+
+    def basicShadowUnsubscribe(self, srcShadowName, srcShadowAction):
+        currentShadowAction = _shadowAction(srcShadowName, srcShadowAction)
+        if not self._isRouted(currentShadowAction):
+            shadowManager.basicShadowUnsubscribe(self, srcShadowName, srcShadowAction)
+            return
+        # The topic filters stay subscribed for the other shadows, only stop routing to this one
+        with self._routeTableLock:
+            self._routeTable.pop((str(srcShadowName), srcShadowAction), None)
+
+    def routeMessage(self, client, userdata, message):
+        parsedTopic = _parseShadowTopic(message.topic)
+        if parsedTopic is None:  # Shadow requests and documents also match the topic filters
+            return
+        shadowName, action, responseType = parsedTopic
+        currentCallback = self._routeTable.get((shadowName, action))  # Writers hold the lock, a single get is atomic
+        if currentCallback is None:
+            self._logger.debug("No deviceShadow registered for " + action + " on: " + shadowName)
+            return
+        currentCallback(client, userdata, message)
+
+    def _isRouted(self, srcShadowAction):
+        if srcShadowAction.isDelta:
+            topics = [srcShadowAction.getTopicDelta()]
+        else:
+            topics = [srcShadowAction.getTopicAccept(), srcShadowAction.getTopicReject()]
+        return all(any(topic_matches_sub(topicFilter, topic) for topicFilter in self._topicFilters) for topic in topics)
@@ -17,3 +17,15 @@
 class DropBehaviorTypes(object):
     DROP_OLDEST = 0
     DROP_NEWEST = 1
+
+
+class OutboundQueueFullPolicyTypes(object):
+    BLOCK = 0
+    FAIL_FAST = 1
+    DROP_QOS0 = 2
+
+
+class InboundQueueFullPolicyTypes(object):
+    DROP_OLDEST_QOS0 = 0
+    DROP_NEWEST_QOS0 = 1
+    PAUSE_READING = 2
@@ -70,6 +70,11 @@ class publishQueueFullException(operationError.operationError):
         self.message = "Internal Publish Queue Full"
 
 
+class publishOutboundQueueFullException(operationError.operationError):
+    def __init__(self):
+        self.message = "Outbound publish queue is above its high-water mark"
+
+
 class publishQueueDisabledException(operationError.operationError):
     def __init__(self):
         self.message = "Offline publish request dropped because queueing is disabled"
@@ -0,0 +1,150 @@
+'''
+/*
+ * Copyright 2010-2017 Amazon.com, Inc. or its affiliates. All Rights Reserved.
+ *
+ * Licensed under the Apache License, Version 2.0 (the "License").
+ * You may not use this file except in compliance with the License.
+ * A copy of the License is located at
+ *
+ *  http://aws.amazon.com/apache2.0
+ *
+ * or in the "license" file accompanying this file. This file is distributed
+ * on an "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either
+ * express or implied. See the License for the specific language governing
+ * permissions and limitations under the License.
+ */
+ '''
+
+# Drains a queue of QoS1 publishes through EventConsumer against a stand-in
+# broker that acknowledges at most --broker-rate publishes per second, after
+# --latency-ms of round trip. Publishes beyond that rate wait in the broker's
+# backlog, the way a throttled connection behaves. Reports the drain time and
+# average rate with the fixed interval (one request, then a sleep) and with
+# adaptive draining, plus the peak PUBACK latency seen. The fixed interval
+# run drains only --fixed-count requests, and its time for the full queue is
+# extrapolated.
+
+import argparse
+import heapq
+import logging
+import threading
+import time
+from AWSIoTPythonSDK.core.protocol.internal.clients import ClientStatus
+from AWSIoTPythonSDK.core.protocol.internal.clients import ClientStatusContainer
+from AWSIoTPythonSDK.core.protocol.internal.events import EventTypes
+from AWSIoTPythonSDK.core.protocol.internal.events import FixedEventMids
+from AWSIoTPythonSDK.core.protocol.internal.requests import QueueableRequest
+from AWSIoTPythonSDK.core.protocol.internal.requests import RequestTypes
+from AWSIoTPythonSDK.core.protocol.internal.workers import DrainRateController
+from AWSIoTPythonSDK.core.protocol.internal.workers import EventConsumer
+from AWSIoTPythonSDK.core.protocol.internal.workers import OfflineRequestsManager
+from AWSIoTPythonSDK.core.protocol.internal.workers import SubscriptionManager
+from AWSIoTPythonSDK.core.util.enums import DropBehaviorTypes
+try:
+    from queue import Queue
+except ImportError:
+    from Queue import Queue
+
+
+class ThrottledBrokerClient(object):
+    # Stands in for InternalAsyncMqttClient. PUBACKs go through the event queue like real ones
+
+    def __init__(self, event_queue, broker_rate, latency_sec):
+        self._event_queue = event_queue
+        self._service_sec = 1.0 / broker_rate
+        self._latency_sec = latency_sec
+        self._lock = threading.Condition()
+        self._next_mid = 1
+        self._broker_free_time = 0
+        self._pending_acks = []  # (ack time, mid)
+        self._ack_callbacks = {}
+        self._send_times = {}
+        self.acked_count = 0
+        self.peak_latency_sec = 0
+        worker = threading.Thread(target=self._send_acks)
+        worker.daemon = True
+        worker.start()
+
+    def publish(self, topic, payload, qos, retain=False, ack_callback=None):
+        with self._lock:
+            now = time.time()
+            mid = self._next_mid
+            self._next_mid += 1
+            self._broker_free_time = max(self._broker_free_time, now) + self._service_sec
+            heapq.heappush(self._pending_acks, (self._broker_free_time + self._latency_sec, mid))
+            self._send_times[mid] = now
+            if ack_callback:
+                self._ack_callbacks[mid] = ack_callback
+            self._lock.notify()
+        return 0, mid
+
+    def invoke_event_callback(self, mid, data=None):
+        ack_callback = self._ack_callbacks.pop(mid, None)
+        if ack_callback:
+            ack_callback(mid=mid)
+        if isinstance(mid, int) and mid > 0:
+            latency_sec = time.time() - self._send_times.pop(mid)
+            self.peak_latency_sec = max(self.peak_latency_sec, latency_sec)
+            self.acked_count += 1
+
+    def stop_background_network_io(self):
+        pass
+
+    def clean_up_event_callbacks(self):
+        pass
+
+    def _send_acks(self):
+        while True:
+            with self._lock:
+                while not self._pending_acks or self._pending_acks[0][0] > time.time():
+                    self._lock.wait(self._pending_acks[0][0] - time.time() if self._pending_acks else None)
+                ack_time, mid = heapq.heappop(self._pending_acks)
+            self._event_queue.put((mid, EventTypes.PUBACK, None))
+
+
+def measure(request_count, broker_rate, latency_sec, draining_interval_sec, drain_rate_controller):
+    event_queue = Queue()
+    client = ThrottledBrokerClient(event_queue, broker_rate, latency_sec)
+    offline_requests_manager = OfflineRequestsManager(-1, DropBehaviorTypes.DROP_NEWEST)
+    for i in range(request_count):
+        offline_requests_manager.add_one(QueueableRequest(RequestTypes.PUBLISH, ("telemetry/device-1", "%d" % i, 1, False)))
+    client_status = ClientStatusContainer()
+    client_status.set_status(ClientStatus.CONNECT)
+    consumer = EventConsumer(event_queue, client, SubscriptionManager(), offline_requests_manager, client_status)
+    consumer.update_draining_interval_sec(draining_interval_sec)
+    consumer.update_drain_rate_controller(drain_rate_controller)
+    consumer.start()
+
+    start = time.time()
+    event_queue.put((FixedEventMids.CONNACK_MID, EventTypes.CONNACK, (0, False)))
+    while client.acked_count < request_count:
+        time.sleep(0.01)
+    elapsed = time.time() - start
+    consumer.stop()
+    consumer.wait_until_it_stops(1)
+    return elapsed, client.peak_latency_sec
+
+
+parser = argparse.ArgumentParser()
+parser.add_argument("-n", "--count", action="store", dest="count", type=int, default=3000,
+                    help="Number of queued QoS1 publishes")
+parser.add_argument("-f", "--fixed-count", action="store", dest="fixed_count", type=int, default=10,
+                    help="Number of queued publishes actually drained with the fixed interval")
+parser.add_argument("-r", "--broker-rate", action="store", dest="broker_rate", type=float, default=100,
+                    help="Publishes per second the broker stand-in acknowledges at most")
+parser.add_argument("-l", "--latency-ms", action="store", dest="latency_ms", type=float, default=50,
+                    help="PUBACK round trip in milliseconds, on top of the broker backlog")
+parser.add_argument("-c", "--cap-hz", action="store", dest="cap_hz", type=float, default=1000,
+                    help="Draining frequency for the adaptive runs, the highest rate they may reach")
+args = parser.parse_args()
+logging.getLogger("AWSIoTPythonSDK").setLevel(logging.ERROR)
+latency_sec = args.latency_ms / 1000.0
+
+elapsed, peak_latency_sec = measure(args.fixed_count, args.broker_rate, latency_sec, 0.5, None)
+print("fixed 0.5 s interval         | %8.1f s for %d (extrapolated) | %7.1f requests/s | peak PUBACK latency %6.3f s"
+      % (elapsed * args.count / args.fixed_count, args.count, args.fixed_count / elapsed, peak_latency_sec))
+for max_in_flight in (1, 10, 50):
+    drain_rate_controller = DrainRateController(max_in_flight, 10, 10, 4 * latency_sec)
+    elapsed, peak_latency_sec = measure(args.count, args.broker_rate, latency_sec, 1 / args.cap_hz, drain_rate_controller)
+    print("adaptive, %2d in flight       | %8.1f s for %d                | %7.1f requests/s | peak PUBACK latency %6.3f s"
+          % (max_in_flight, elapsed, args.count, args.count / elapsed, peak_latency_sec))
@@ -0,0 +1,153 @@
+'''
+/*
+ * Copyright 2010-2017 Amazon.com, Inc. or its affiliates. All Rights Reserved.
+ *
+ * Licensed under the Apache License, Version 2.0 (the "License").
+ * You may not use this file except in compliance with the License.
+ * A copy of the License is located at
+ *
+ *  http://aws.amazon.com/apache2.0
+ *
+ * or in the "license" file accompanying this file. This file is distributed
+ * on an "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either
+ * express or implied. See the License for the specific language governing
+ * permissions and limitations under the License.
+ */
+ '''
+
+# Measures the EventProducer -> EventConsumer handoff on its own: the CPU
+# time an idle consumer burns per second, and the number of message events
+# per second a producer thread can push through to a trivial subscription
+# callback. "polling" is the previous consumer, which waited on a Condition
+# layered over the queue with a 10 ms timeout; "blocking" is the current one,
+# which blocks on the queue itself.
+
+import argparse
+import resource
+import threading
+import time
+from AWSIoTPythonSDK.core.protocol.internal.clients import ClientStatus
+from AWSIoTPythonSDK.core.protocol.internal.clients import ClientStatusContainer
+from AWSIoTPythonSDK.core.protocol.internal.workers import EventConsumer
+from AWSIoTPythonSDK.core.protocol.internal.workers import EventProducer
+from AWSIoTPythonSDK.core.protocol.internal.workers import OfflineRequestsManager
+from AWSIoTPythonSDK.core.protocol.internal.workers import SubscriptionManager
+from AWSIoTPythonSDK.core.protocol.paho.client import MQTTMessage
+from AWSIoTPythonSDK.core.util.enums import DropBehaviorTypes
+try:
+    from queue import Queue
+except ImportError:
+    from Queue import Queue
+
+TOPIC = "telemetry/device"
+
+
+class PollingEventProducer(EventProducer):
+
+    def __init__(self, cv, event_queue):
+        EventProducer.__init__(self, event_queue)
+        self._cv = cv
+
+    def _add_to_queue(self, mid, event_type, data):
+        with self._cv:
+            self._event_queue.put((mid, event_type, data))
+            self._cv.notify()
+
+
+class PollingEventConsumer(EventConsumer):
+
+    MAX_DISPATCH_INTERNAL_SEC = 0.01
+
+    def __init__(self, cv, *args):
+        EventConsumer.__init__(self, *args)
+        self._cv = cv
+
+    def _dispatch(self):
+        while self._is_running:
+            with self._cv:
+                if self._event_queue.empty():
+                    self._cv.wait(self.MAX_DISPATCH_INTERNAL_SEC)
+                else:
+                    while not self._event_queue.empty():
+                        self._dispatch_one(self._event_queue.get())
+        self._stopper.set()
+
+
+class NullInternalAsyncClient(object):
+
+    def invoke_event_callback(self, mid, data=None):
+        pass
+
+    def stop_background_network_io(self):
+        pass
+
+    def clean_up_event_callbacks(self):
+        pass
+
+
+def create(mode, on_message):
+    event_queue = Queue()
+    subscription_manager = SubscriptionManager()
+    subscription_manager.add_record(TOPIC, 0, on_message, None)
+    client_status = ClientStatusContainer()
+    client_status.set_status(ClientStatus.STABLE)
+    args = (event_queue, NullInternalAsyncClient(), subscription_manager,
+            OfflineRequestsManager(-1, DropBehaviorTypes.DROP_NEWEST), client_status)
+    if mode == "polling":
+        cv = threading.Condition()
+        return PollingEventProducer(cv, event_queue), PollingEventConsumer(cv, *args)
+    return EventProducer(event_queue), EventConsumer(*args)
+
+
+def cpu_seconds():
+    usage = resource.getrusage(resource.RUSAGE_SELF)
+    return usage.ru_utime + usage.ru_stime
+
+
+def measure_idle(mode, window):
+    producer, consumer = create(mode, lambda client, userdata, message: None)
+    consumer.start()
+    time.sleep(0.1)
+    cpu_start = cpu_seconds()
+    time.sleep(window)
+    cpu = cpu_seconds() - cpu_start
+    consumer.stop()
+    consumer.wait_until_it_stops(1)
+    return cpu / window * 1000
+
+
+def measure_throughput(mode, count):
+    done = threading.Event()
+    received = [0]
+
+    def on_message(client, userdata, message):
+        received[0] += 1
+        if received[0] == count:
+            done.set()
+
+    producer, consumer = create(mode, on_message)
+    message = MQTTMessage()
+    message.topic = TOPIC
+    message.payload = b"x" * 64
+    consumer.start()
+    start = time.time()
+    for i in range(count):
+        producer.on_message(None, None, message)
+    done.wait()
+    elapsed = time.time() - start
+    consumer.stop()
+    consumer.wait_until_it_stops(1)
+    return count / elapsed
+
+
+parser = argparse.ArgumentParser()
+parser.add_argument("-w", "--window", action="store", dest="window", type=float, default=5.0,
+                    help="Idle measurement window in seconds")
+parser.add_argument("-n", "--events", action="store", dest="events", type=int, default=200000,
+                    help="Number of message events pushed through for the throughput measurement")
+args = parser.parse_args()
+
+for mode in ("polling", "blocking"):
+    idle_cpu_ms = measure_idle(mode, args.window)
+    events_per_sec = measure_throughput(mode, args.events)
+    print("%8s | idle CPU %7.3f ms/s | %9.0f events/s" % (mode, idle_cpu_ms, events_per_sec))
@@ -0,0 +1,189 @@
+'''
+/*
+ * Copyright 2010-2017 Amazon.com, Inc. or its affiliates. All Rights Reserved.
+ *
+ * Licensed under the Apache License, Version 2.0 (the "License").
+ * You may not use this file except in compliance with the License.
+ * A copy of the License is located at
+ *
+ *  http://aws.amazon.com/apache2.0
+ *
+ * or in the "license" file accompanying this file. This file is distributed
+ * on an "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either
+ * express or implied. See the License for the specific language governing
+ * permissions and limitations under the License.
+ */
+ '''
+
+# Points a plain TCP paho client at a local broker stand-in (a separate
+# process that streams QoS0 PUBLISHes as fast as the socket takes them) and
+# feeds the received messages through an InboundEventQueue to an
+# EventConsumer whose callback is slower than the stream. Reports, for each
+# inbound queue configuration, the messages delivered per second, the
+# messages dropped, the peak number and size of queued messages and the
+# resident set size. Each configuration runs in a fresh process so RSS
+# figures do not leak into each other.
+
+import argparse
+import logging
+import multiprocessing
+import resource
+import socket
+import struct
+import threading
+import time
+from AWSIoTPythonSDK.core.protocol.internal.clients import ClientStatus
+from AWSIoTPythonSDK.core.protocol.internal.clients import ClientStatusContainer
+from AWSIoTPythonSDK.core.protocol.internal.queues import InboundEventQueue
+from AWSIoTPythonSDK.core.protocol.internal.workers import EventConsumer
+from AWSIoTPythonSDK.core.protocol.internal.workers import EventProducer
+from AWSIoTPythonSDK.core.protocol.internal.workers import OfflineRequestsManager
+from AWSIoTPythonSDK.core.protocol.internal.workers import SubscriptionManager
+from AWSIoTPythonSDK.core.protocol.paho.client import Client
+from AWSIoTPythonSDK.core.protocol.paho.client import CONNACK
+from AWSIoTPythonSDK.core.protocol.paho.client import PUBLISH
+from AWSIoTPythonSDK.core.util.enums import DropBehaviorTypes
+from AWSIoTPythonSDK.core.util.enums import InboundQueueFullPolicyTypes
+
+TOPIC = "benchmark/firehose"
+CONFIGURATIONS = [
+    ("unbounded", None),
+    ("drop oldest QoS0", InboundQueueFullPolicyTypes.DROP_OLDEST_QOS0),
+    ("drop newest QoS0", InboundQueueFullPolicyTypes.DROP_NEWEST_QOS0),
+    ("pause reading", InboundQueueFullPolicyTypes.PAUSE_READING),
+]
+
+
+def run_broker(port_queue, payload_size):
+    listener = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    listener.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    listener.bind(("127.0.0.1", 0))
+    listener.listen(16)
+    port_queue.put(listener.getsockname()[1])
+    topic = TOPIC.encode("utf-8")
+    packet = struct.pack("!B", PUBLISH) + encode_remaining_length(2 + len(topic) + payload_size) \
+        + struct.pack("!H", len(topic)) + topic + b"x" * payload_size
+    burst = packet * 100
+    while True:
+        conn, address = listener.accept()
+        try:
+            conn.recv(1024)  # CONNECT
+            conn.sendall(struct.pack("!BBBB", CONNACK, 2, 0, 0))
+            while True:
+                conn.sendall(burst)
+        except socket.error:
+            conn.close()
+
+
+def encode_remaining_length(length):
+    encoded = b""
+    while True:
+        byte = length % 128
+        length //= 128
+        if length > 0:
+            byte |= 0x80
+        encoded += struct.pack("!B", byte)
+        if length == 0:
+            return encoded
+
+
+def current_rss_kb():
+    try:
+        with open("/proc/self/status") as status:
+            for line in status:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1])
+    except IOError:
+        pass
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss  # Peak, where /proc is unavailable
+
+
+class NullInternalAsyncClient(object):
+
+    def invoke_event_callback(self, mid, data=None):
+        pass
+
+    def stop_background_network_io(self):
+        pass
+
+    def clean_up_event_callbacks(self):
+        pass
+
+
+def measure(policy, port, window, handler_us, max_messages, max_bytes, result_queue):
+    logging.getLogger("AWSIoTPythonSDK").setLevel(logging.ERROR)  # Every dropped message logs a warning
+    state = {"delivered": 0}
+
+    def on_message(client, userdata, message):
+        end = time.time() + handler_us / 1000000.0
+        while time.time() < end:
+            pass
+        state["delivered"] += 1
+
+    event_queue = InboundEventQueue()
+    if policy is not None:
+        event_queue.configure_limits(max_messages, max_bytes, policy)
+    subscription_manager = SubscriptionManager()
+    subscription_manager.add_record(TOPIC, 0, on_message, None)
+    client_status = ClientStatusContainer()
+    client_status.set_status(ClientStatus.STABLE)
+    producer = EventProducer(event_queue)
+    consumer = EventConsumer(event_queue, NullInternalAsyncClient(), subscription_manager,
+                             OfflineRequestsManager(-1, DropBehaviorTypes.DROP_NEWEST), client_status)
+    consumer.start()
+
+    client = Client("benchmark")
+    event_queue.set_read_controls(client.pause_reading, client.resume_reading)
+    client.on_message = producer.on_message
+    client.connect("127.0.0.1", port, 60)
+    client.loop_start()
+
+    peak = {"messages": 0, "bytes": 0}
+    start = time.time()
+    while time.time() - start < window:
+        peak["messages"] = max(peak["messages"], event_queue.get_message_count())
+        peak["bytes"] = max(peak["bytes"], event_queue.get_byte_count())
+        time.sleep(0.01)
+    elapsed = time.time() - start
+    result_queue.put((state["delivered"] / elapsed, event_queue.get_dropped_message_count(),
+                      peak["messages"], peak["bytes"] / 1024.0 / 1024.0, current_rss_kb() / 1024.0))
+    client.disconnect()
+    client.loop_stop()
+    consumer.stop()
+
+
+def run(name, policy, port, args):
+    result_queue = multiprocessing.Queue()
+    process = multiprocessing.Process(target=measure,
+                                      args=(policy, port, args.window, args.handler_us, args.max_messages,
+                                            args.max_bytes, result_queue))
+    process.start()
+    delivered_per_sec, dropped, peak_messages, peak_mb, rss_mb = result_queue.get()
+    process.join()
+    print("%-16s | %8.1f delivered/s | %8d dropped | peak queue %8d messages %7.1f MB | RSS %7.1f MB"
+          % (name, delivered_per_sec, dropped, peak_messages, peak_mb, rss_mb))
+
+
+parser = argparse.ArgumentParser()
+parser.add_argument("-w", "--window", action="store", dest="window", type=float, default=5.0,
+                    help="Measurement window in seconds")
+parser.add_argument("-u", "--handler-us", action="store", dest="handler_us", type=float, default=50.0,
+                    help="Time the message callback spends on each message, in microseconds")
+parser.add_argument("-p", "--payload-size", action="store", dest="payload_size", type=int, default=1024,
+                    help="Payload size of the streamed messages in bytes")
+parser.add_argument("-m", "--max-messages", action="store", dest="max_messages", type=int, default=1000,
+                    help="Inbound queue limit in messages, 0 for none")
+parser.add_argument("-b", "--max-bytes", action="store", dest="max_bytes", type=int, default=0,
+                    help="Inbound queue limit in bytes, 0 for none")
+args = parser.parse_args()
+
+port_queue = multiprocessing.Queue()
+broker = multiprocessing.Process(target=run_broker, args=(port_queue, args.payload_size))
+broker.daemon = True
+broker.start()
+broker_port = port_queue.get()
+
+for name, policy in CONFIGURATIONS:
+    run(name, policy, broker_port, args)
+
+broker.terminate()
@@ -0,0 +1,147 @@
+'''
+/*
+ * Copyright 2010-2017 Amazon.com, Inc. or its affiliates. All Rights Reserved.
+ *
+ * Licensed under the Apache License, Version 2.0 (the "License").
+ * You may not use this file except in compliance with the License.
+ * A copy of the License is located at
+ *
+ *  http://aws.amazon.com/apache2.0
+ *
+ * or in the "license" file accompanying this file. This file is distributed
+ * on an "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either
+ * express or implied. See the License for the specific language governing
+ * permissions and limitations under the License.
+ */
+ '''
+
+# Feeds bursts of QoS0 PUBLISH packets through a socketpair into the paho client
+# read path and reports socket reads per packet and packets per second. The
+# "legacy" column replays the previous reader, which read the fixed header one
+# byte per call and grew the body by concatenation. Over TLS every read is also
+# a record decrypt call, so the read count is the number to watch.
+
+import argparse
+import socket
+import struct
+import threading
+import time
+from AWSIoTPythonSDK.core.protocol.paho.client import Client
+from AWSIoTPythonSDK.core.protocol.paho.client import PUBLISH
+from AWSIoTPythonSDK.core.protocol.paho.client import MQTT_ERR_AGAIN
+from AWSIoTPythonSDK.core.protocol.paho.client import MQTT_ERR_PROTOCOL
+from AWSIoTPythonSDK.core.protocol.paho.client import EAGAIN
+
+
+class CountingSocket(object):
+
+    def __init__(self, sock):
+        self._sock = sock
+        self.calls = 0
+
+    def recv(self, size):
+        self.calls += 1
+        return self._sock.recv(size)
+
+    def recv_into(self, buffer, size):
+        self.calls += 1
+        return self._sock.recv_into(buffer, size)
+
+
+class LegacyReadClient(Client):
+    """Client with the previous byte-at-a-time _packet_read, for comparison."""
+
+    def __init__(self, *args, **kwargs):
+        super(LegacyReadClient, self).__init__(*args, **kwargs)
+        self._reset_in_packet()
+
+    def _reset_in_packet(self):
+        self._in_packet = dict(command=0, have_remaining=0, remaining_count=[], remaining_mult=1,
+                               remaining_length=0, packet=b"", to_process=0, pos=0)
+
+    def _packet_read(self):
+        try:
+            if self._in_packet['command'] == 0:
+                command = self._sock.recv(1)
+                if len(command) == 0:
+                    return 1
+                self._in_packet['command'] = struct.unpack("!B", command)[0]
+            if self._in_packet['have_remaining'] == 0:
+                while True:
+                    byte = struct.unpack("!B", self._sock.recv(1))[0]
+                    self._in_packet['remaining_count'].append(byte)
+                    if len(self._in_packet['remaining_count']) > 4:
+                        return MQTT_ERR_PROTOCOL
+                    self._in_packet['remaining_length'] += (byte & 127) * self._in_packet['remaining_mult']
+                    self._in_packet['remaining_mult'] *= 128
+                    if (byte & 128) == 0:
+                        break
+                self._in_packet['have_remaining'] = 1
+                self._in_packet['to_process'] = self._in_packet['remaining_length']
+            while self._in_packet['to_process'] > 0:
+                data = self._sock.recv(self._in_packet['to_process'])
+                self._in_packet['to_process'] -= len(data)
+                self._in_packet['packet'] = self._in_packet['packet'] + data
+        except socket.error as err:
+            if err.errno == EAGAIN:
+                return MQTT_ERR_AGAIN
+            return 1
+        rc = self._packet_handle()
+        self._reset_in_packet()
+        return rc
+
+
+def publish_packet(topic, payload):
+    utopic = topic.encode("utf-8")
+    body = struct.pack("!H", len(utopic)) + utopic + payload
+    remaining_length = len(body)
+    header = bytearray([PUBLISH])
+    while True:
+        byte = remaining_length % 128
+        remaining_length //= 128
+        header.append(byte | (0x80 if remaining_length else 0))
+        if not remaining_length:
+            break
+    return bytes(header) + body
+
+
+def measure(client_class, data, count):
+    local_sock, remote_sock = socket.socketpair()
+    local_sock.setblocking(0)
+    counting_sock = CountingSocket(local_sock)
+    received = []
+    client = client_class("benchmark")
+    client._sock = counting_sock
+    client.on_message = lambda c, u, m: received.append(len(m.payload))
+
+    feeder = threading.Thread(target=remote_sock.sendall, args=[data])
+    start = time.time()
+    feeder.start()
+    while len(received) < count:
+        client._packet_read()
+    elapsed = time.time() - start
+    feeder.join()
+
+    client._sock = None
+    local_sock.close()
+    remote_sock.close()
+    return counting_sock.calls / float(count), count / elapsed
+
+
+def run(payload_size, count):
+    data = publish_packet("telemetry/device", b"x" * payload_size) * count
+    legacy = measure(LegacyReadClient, data, count)
+    current = measure(Client, data, count)
+    print("%8d B payload | legacy %6.2f reads/pkt %9.0f pkt/s | current %6.3f reads/pkt %9.0f pkt/s"
+          % (payload_size, legacy[0], legacy[1], current[0], current[1]))
+
+
+parser = argparse.ArgumentParser()
+parser.add_argument("-n", "--count", action="store", dest="count", type=int, default=20000,
+                    help="Packets per burst for small payloads")
+parser.add_argument("-s", "--sizes", action="store", dest="sizes", default="16,256,4096,102400",
+                    help="Comma separated payload sizes in bytes")
+args = parser.parse_args()
+
+for size in [int(s) for s in args.sizes.split(",")]:
+    run(size, args.count if size < 4096 else max(100, args.count // 50))
@@ -0,0 +1,62 @@
+'''
+/*
+ * Copyright 2010-2017 Amazon.com, Inc. or its affiliates. All Rights Reserved.
+ *
+ * Licensed under the Apache License, Version 2.0 (the "License").
+ * You may not use this file except in compliance with the License.
+ * A copy of the License is located at
+ *
+ *  http://aws.amazon.com/apache2.0
+ *
+ * or in the "license" file accompanying this file. This file is distributed
+ * on an "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either
+ * express or implied. See the License for the specific language governing
+ * permissions and limitations under the License.
+ */
+ '''
+
+# Measures how many PUBACKs per second the paho client handles with a given
+# number of QoS1 publishes in flight. Acks are delivered in reverse order of
+# publishing, which is the worst case for a linear scan of the in-flight list.
+
+import argparse
+import struct
+import time
+from AWSIoTPythonSDK.core.protocol.paho.client import Client
+from AWSIoTPythonSDK.core.protocol.paho.client import PUBACK
+
+
+class SinkSocket(object):
+
+    def send(self, data):
+        return len(data)
+
+
+def run(depth, order):
+    client = Client("benchmark")
+    client._sock = SinkSocket()
+    client.max_inflight_messages_set(0)  # Everything in flight
+    mids = [client.publish("telemetry/device", "payload", 1)[1] for i in range(depth)]
+    if order == "reverse":
+        mids.reverse()
+
+    start = time.time()
+    for mid in mids:
+        client._in_packet['command'] = PUBACK
+        client._in_packet['remaining_length'] = 2
+        client._in_packet['packet'] = struct.pack("!H", mid)
+        client._packet_handle()
+    elapsed = time.time() - start
+    assert len(client._out_messages) == 0
+    client._sock = None
+    print("%8d in flight | %-7s acks | %10.0f acks/s" % (depth, order, depth / elapsed))
+
+
+parser = argparse.ArgumentParser()
+parser.add_argument("-d", "--depths", action="store", dest="depths", default="100,1000,10000,60000",
+                    help="Comma separated in-flight depths (at most 65535)")
+args = parser.parse_args()
+
+for in_flight_depth in [int(d) for d in args.depths.split(",")]:
+    for ack_order in ("forward", "reverse"):
+        run(in_flight_depth, ack_order)
@@ -0,0 +1,138 @@
+'''
+/*
+ * Copyright 2010-2017 Amazon.com, Inc. or its affiliates. All Rights Reserved.
+ *
+ * Licensed under the Apache License, Version 2.0 (the "License").
+ * You may not use this file except in compliance with the License.
+ * A copy of the License is located at
+ *
+ *  http://aws.amazon.com/apache2.0
+ *
+ * or in the "license" file accompanying this file. This file is distributed
+ * on an "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either
+ * express or implied. See the License for the specific language governing
+ * permissions and limitations under the License.
+ */
+ '''
+
+# Feeds QoS0 message events at a fixed rate (10k/s by default) through the
+# EventProducer -> EventConsumer path into a subscription that stores every
+# message in an in-memory sqlite table, once with a per-message callback
+# (one INSERT and commit per message) and once with MessageBatcher batch
+# callbacks of various sizes (one executemany and commit per batch). Reports
+# the delivered rate, callback invocations, process CPU time per message and
+# p50/p99 time from the event being queued to its row being committed.
+
+import argparse
+import sqlite3
+import threading
+import time
+from AWSIoTPythonSDK.core.protocol.internal.clients import ClientStatus
+from AWSIoTPythonSDK.core.protocol.internal.clients import ClientStatusContainer
+from AWSIoTPythonSDK.core.protocol.internal.workers import EventConsumer
+from AWSIoTPythonSDK.core.protocol.internal.workers import EventProducer
+from AWSIoTPythonSDK.core.protocol.internal.workers import MessageBatcher
+from AWSIoTPythonSDK.core.protocol.internal.workers import OfflineRequestsManager
+from AWSIoTPythonSDK.core.protocol.internal.workers import SubscriptionManager
+from AWSIoTPythonSDK.core.protocol.paho.client import MQTTMessage
+from AWSIoTPythonSDK.core.util.enums import DropBehaviorTypes
+try:
+    from queue import Queue
+except ImportError:
+    from Queue import Queue
+
+
+class NullInternalAsyncClient(object):
+
+    def invoke_event_callback(self, mid, data=None):
+        pass
+
+    def stop_background_network_io(self):
+        pass
+
+    def clean_up_event_callbacks(self):
+        pass
+
+
+def percentile(sorted_values, fraction):
+    return sorted_values[min(int(len(sorted_values) * fraction), len(sorted_values) - 1)]
+
+
+def measure(batch_size, latency_ms, rate, message_count):
+    database = sqlite3.connect(":memory:", check_same_thread=False)
+    database.execute("CREATE TABLE telemetry (topic TEXT, payload BLOB)")
+    done = threading.Event()
+    latencies = []
+    state = {"calls": 0}
+
+    def on_stored(messages):
+        now = time.time()
+        latencies.extend(now - message.timestamp for message in messages)
+        state["calls"] += 1
+        if len(latencies) == message_count:
+            done.set()
+
+    def on_message(client, userdata, message):
+        database.execute("INSERT INTO telemetry VALUES (?, ?)", (message.topic, message.payload))
+        database.commit()
+        on_stored([message])
+
+    def on_message_batch(client, userdata, messages):
+        database.executemany("INSERT INTO telemetry VALUES (?, ?)",
+                             [(message.topic, message.payload) for message in messages])
+        database.commit()
+        on_stored(messages)
+
+    subscription_manager = SubscriptionManager()
+    if batch_size > 0:
+        subscription_manager.add_record("telemetry/#", 0, MessageBatcher(on_message_batch, batch_size, latency_ms / 1000.0), None)
+    else:
+        subscription_manager.add_record("telemetry/#", 0, on_message, None)
+    event_queue = Queue()
+    client_status = ClientStatusContainer()
+    client_status.set_status(ClientStatus.STABLE)
+    producer = EventProducer(event_queue)
+    consumer = EventConsumer(event_queue, NullInternalAsyncClient(), subscription_manager,
+                             OfflineRequestsManager(-1, DropBehaviorTypes.DROP_NEWEST), client_status)
+    consumer.start()
+
+    payload = b"x" * 64
+    start_cpu = time.process_time()
+    start = time.time()
+    for i in range(message_count):
+        next_send = start + float(i) / rate
+        delay = next_send - time.time()
+        if delay > 0:
+            time.sleep(delay)
+        message = MQTTMessage()
+        message.topic = "telemetry/device-%d" % (i % 16)
+        message.payload = payload
+        message.timestamp = time.time()  # Stands in for the time the network thread read it
+        producer.on_message(None, None, message)
+    done.wait()
+    elapsed = time.time() - start
+    cpu_per_message_us = (time.process_time() - start_cpu) * 1000000.0 / message_count
+    consumer.stop()
+    consumer.wait_until_it_stops(1)
+    latencies.sort()
+    return (message_count / elapsed, state["calls"], cpu_per_message_us,
+            percentile(latencies, 0.5) * 1000, percentile(latencies, 0.99) * 1000)
+
+
+parser = argparse.ArgumentParser()
+parser.add_argument("-r", "--rate", action="store", dest="rate", type=float, default=10000,
+                    help="Messages per second fed into the event queue")
+parser.add_argument("-d", "--duration", action="store", dest="duration", type=float, default=3.0,
+                    help="Duration of each run in seconds")
+parser.add_argument("-b", "--batch-sizes", action="store", dest="batch_sizes", default="0,100,1000",
+                    help="Comma separated max batch sizes, 0 for the per-message callback")
+parser.add_argument("-l", "--latency-ms", action="store", dest="latency_ms", type=float, default=10,
+                    help="Max batch latency in milliseconds")
+args = parser.parse_args()
+
+message_count = int(args.rate * args.duration)
+for batch_size in [int(b) for b in args.batch_sizes.split(",")]:
+    messages_per_sec, calls, cpu_per_message_us, p50_ms, p99_ms = measure(batch_size, args.latency_ms, args.rate, message_count)
+    print("%-16s | %8.1f messages/s | %6d callbacks | %6.1f us CPU/message | p50 %7.2f ms | p99 %7.2f ms"
+          % ("per message" if batch_size == 0 else "batches of %d" % batch_size,
+             messages_per_sec, calls, cpu_per_message_us, p50_ms, p99_ms))
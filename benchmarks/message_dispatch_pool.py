@@ -0,0 +1,117 @@
+'''
+/*
+ * Copyright 2010-2017 Amazon.com, Inc. or its affiliates. All Rights Reserved.
+ *
+ * Licensed under the Apache License, Version 2.0 (the "License").
+ * You may not use this file except in compliance with the License.
+ * A copy of the License is located at
+ *
+ *  http://aws.amazon.com/apache2.0
+ *
+ * or in the "license" file accompanying this file. This file is distributed
+ * on an "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either
+ * express or implied. See the License for the specific language governing
+ * permissions and limitations under the License.
+ */
+ '''
+
+# Pushes message events spread over a number of topics through the
+# EventProducer -> EventConsumer path and reports the messages per second
+# delivered to a subscription callback that sleeps for a fixed time, with the
+# callbacks run on the event consumer thread (0 workers) or on a
+# MessageDispatchPool of various sizes. Also checks that every topic's
+# messages arrived in order.
+
+import argparse
+import threading
+import time
+from AWSIoTPythonSDK.core.protocol.internal.clients import ClientStatus
+from AWSIoTPythonSDK.core.protocol.internal.clients import ClientStatusContainer
+from AWSIoTPythonSDK.core.protocol.internal.workers import EventConsumer
+from AWSIoTPythonSDK.core.protocol.internal.workers import EventProducer
+from AWSIoTPythonSDK.core.protocol.internal.workers import MessageDispatchPool
+from AWSIoTPythonSDK.core.protocol.internal.workers import OfflineRequestsManager
+from AWSIoTPythonSDK.core.protocol.internal.workers import SubscriptionManager
+from AWSIoTPythonSDK.core.protocol.paho.client import MQTTMessage
+from AWSIoTPythonSDK.core.util.enums import DropBehaviorTypes
+try:
+    from queue import Queue
+except ImportError:
+    from Queue import Queue
+
+
+class NullInternalAsyncClient(object):
+
+    def invoke_event_callback(self, mid, data=None):
+        pass
+
+    def stop_background_network_io(self):
+        pass
+
+    def clean_up_event_callbacks(self):
+        pass
+
+
+def measure(worker_count, handler_ms, message_count, topic_count, queue_size):
+    lock = threading.Lock()
+    done = threading.Event()
+    last_index = {}
+    state = {"received": 0, "in_order": True}
+
+    def on_message(client, userdata, message):
+        time.sleep(handler_ms / 1000.0)
+        with lock:
+            if last_index.get(message.topic, -1) > message.payload:
+                state["in_order"] = False
+            last_index[message.topic] = message.payload
+            state["received"] += 1
+            if state["received"] == message_count:
+                done.set()
+
+    event_queue = Queue()
+    subscription_manager = SubscriptionManager()
+    subscription_manager.add_record("telemetry/#", 0, on_message, None)
+    client_status = ClientStatusContainer()
+    client_status.set_status(ClientStatus.STABLE)
+    producer = EventProducer(event_queue)
+    consumer = EventConsumer(event_queue, NullInternalAsyncClient(), subscription_manager,
+                             OfflineRequestsManager(-1, DropBehaviorTypes.DROP_NEWEST), client_status)
+    if worker_count > 0:
+        consumer.update_message_dispatch_pool(MessageDispatchPool(worker_count, queue_size))
+    consumer.start()
+
+    messages = []
+    for i in range(message_count):
+        message = MQTTMessage()
+        message.topic = "telemetry/device-%d" % (i % topic_count)
+        message.payload = i
+        messages.append(message)
+    start = time.time()
+    for message in messages:
+        producer.on_message(None, None, message)
+    done.wait()
+    elapsed = time.time() - start
+    consumer.stop()
+    consumer.wait_until_it_stops(1)
+    return message_count / elapsed, state["in_order"]
+
+
+parser = argparse.ArgumentParser()
+parser.add_argument("-m", "--handler-ms", action="store", dest="handler_ms", default="1,10",
+                    help="Comma separated handler sleep times in milliseconds")
+parser.add_argument("-w", "--workers", action="store", dest="workers", default="0,4,16",
+                    help="Comma separated worker counts, 0 for no pool")
+parser.add_argument("-d", "--duration", action="store", dest="duration", type=float, default=2.0,
+                    help="Approximate duration of each run on the event consumer thread, in seconds")
+parser.add_argument("-t", "--topics", action="store", dest="topics", type=int, default=64,
+                    help="Number of topics the messages are spread over")
+parser.add_argument("-q", "--queue-size", action="store", dest="queue_size", type=int, default=100,
+                    help="Max queued messages per worker")
+args = parser.parse_args()
+
+for handler_ms in [float(m) for m in args.handler_ms.split(",")]:
+    message_count = int(args.duration * 1000 / handler_ms)
+    for worker_count in [int(w) for w in args.workers.split(",")]:
+        messages_per_sec, in_order = measure(worker_count, handler_ms, message_count, args.topics, args.queue_size)
+        print("handler %5.1f ms | %3d workers | %8.1f messages/s | per-topic order %s"
+              % (handler_ms, worker_count, messages_per_sec, "kept" if in_order else "BROKEN"))
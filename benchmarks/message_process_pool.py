@@ -0,0 +1,103 @@
+'''
+/*
+ * Copyright 2010-2017 Amazon.com, Inc. or its affiliates. All Rights Reserved.
+ *
+ * Licensed under the Apache License, Version 2.0 (the "License").
+ * You may not use this file except in compliance with the License.
+ * A copy of the License is located at
+ *
+ *  http://aws.amazon.com/apache2.0
+ *
+ * or in the "license" file accompanying this file. This file is distributed
+ * on an "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either
+ * express or implied. See the License for the specific language governing
+ * permissions and limitations under the License.
+ */
+ '''
+
+# Runs a CPU-bound handler (zlib decompress plus JSON decode and a checksum
+# over the decoded readings) over a stream of compressed telemetry messages
+# and reports messages per second, either in the subscription callback on the
+# calling thread (0 processes) or through a MessageProcessPool of various
+# sizes and batch sizes. Worker processes are started before timing. Gains
+# need more than one core; on a single core the pool only adds IPC cost.
+
+import argparse
+import json
+import threading
+import time
+import zlib
+from AWSIoTPythonSDK.core.protocol.internal.processes import MessageProcessPool
+from AWSIoTPythonSDK.core.protocol.paho.client import MQTTMessage
+
+
+def handle_telemetry(topic, payload):
+    readings = json.loads(zlib.decompress(payload).decode("utf-8"))["readings"]
+    checksum = 0
+    for reading in readings:
+        checksum = (checksum * 31 + int(reading * 1000)) % 1000000007
+    return checksum
+
+
+def create_messages(message_count, reading_count):
+    payload = zlib.compress(json.dumps({"readings": [i * 0.5 for i in range(reading_count)]}).encode("utf-8"))
+    messages = []
+    for i in range(message_count):
+        message = MQTTMessage()
+        message.mid = i
+        message.topic = "telemetry/device-%d" % (i % 16)
+        message.payload = payload
+        messages.append(message)
+    return messages
+
+
+def measure_in_thread(messages):
+    start = time.time()
+    for message in messages:
+        handle_telemetry(message.topic, message.payload)
+    return len(messages) / (time.time() - start)
+
+
+def measure_pool(messages, process_count, batch_size):
+    done = threading.Event()
+    state = {"received": 0}
+
+    def on_result(client, userdata, message):
+        state["received"] += 1
+        if state["received"] == len(messages):
+            done.set()
+
+    pool = MessageProcessPool(process_count, batch_size, 0.01)
+    message_callback = pool.create_message_callback(handle_telemetry, on_result)
+    warm_up = threading.Event()
+    pool.create_message_callback(handle_telemetry, lambda client, userdata, message: warm_up.set())(None, None, messages[0])
+    warm_up.wait()
+
+    start = time.time()
+    for message in messages:
+        message_callback(None, None, message)
+    done.wait()
+    elapsed = time.time() - start
+    pool.close()
+    return len(messages) / elapsed
+
+
+parser = argparse.ArgumentParser()
+parser.add_argument("-n", "--messages", action="store", dest="messages", type=int, default=5000,
+                    help="Number of messages per run")
+parser.add_argument("-r", "--readings", action="store", dest="readings", type=int, default=200,
+                    help="Number of readings in each message payload")
+parser.add_argument("-p", "--processes", action="store", dest="processes", default="0,1,2,4",
+                    help="Comma separated process counts, 0 for the calling thread")
+parser.add_argument("-b", "--batch-sizes", action="store", dest="batch_sizes", default="1,100",
+                    help="Comma separated batch sizes for the process pool runs")
+args = parser.parse_args()
+
+messages = create_messages(args.messages, args.readings)
+for process_count in [int(p) for p in args.processes.split(",")]:
+    if process_count == 0:
+        print("in thread               | %8.1f messages/s" % measure_in_thread(messages))
+        continue
+    for batch_size in [int(b) for b in args.batch_sizes.split(",")]:
+        print("%2d processes, batch %3d | %8.1f messages/s"
+              % (process_count, batch_size, measure_pool(messages, process_count, batch_size)))
@@ -0,0 +1,196 @@
+'''
+/*
+ * Copyright 2010-2017 Amazon.com, Inc. or its affiliates. All Rights Reserved.
+ *
+ * Licensed under the Apache License, Version 2.0 (the "License").
+ * You may not use this file except in compliance with the License.
+ * A copy of the License is located at
+ *
+ *  http://aws.amazon.com/apache2.0
+ *
+ * or in the "license" file accompanying this file. This file is distributed
+ * on an "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either
+ * express or implied. See the License for the specific language governing
+ * permissions and limitations under the License.
+ */
+ '''
+
+# Connects N plain TCP paho clients to a local broker stand-in (a separate
+# process that acks CONNECT, PINGREQ and QoS1 PUBLISH) and reports, for the
+# client process, the CPU time spent over a measurement window in which the
+# clients publish at a low aggregate rate, the resident set size and the
+# thread count. "threads" uses one loop_start() thread per client, "reactor"
+# drives all clients from a NetworkReactor. Each configuration runs in a
+# fresh process so RSS figures do not leak into each other.
+
+import argparse
+import multiprocessing
+import resource
+import selectors
+import socket
+import struct
+import threading
+import time
+from AWSIoTPythonSDK.core.protocol.paho.client import Client
+from AWSIoTPythonSDK.core.protocol.paho.client import CONNECT
+from AWSIoTPythonSDK.core.protocol.paho.client import CONNACK
+from AWSIoTPythonSDK.core.protocol.paho.client import PUBLISH
+from AWSIoTPythonSDK.core.protocol.paho.client import PUBACK
+from AWSIoTPythonSDK.core.protocol.paho.client import PINGREQ
+from AWSIoTPythonSDK.core.protocol.paho.client import PINGRESP
+from AWSIoTPythonSDK.core.protocol.paho.reactor import NetworkReactor
+
+TOPIC = "telemetry/device"
+
+
+def run_broker(port_queue):
+    listener = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    listener.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    listener.bind(("127.0.0.1", 0))
+    listener.listen(4096)
+    listener.setblocking(False)
+    port_queue.put(listener.getsockname()[1])
+    selector = selectors.DefaultSelector()
+    selector.register(listener, selectors.EVENT_READ, None)
+    buffers = {}
+    while True:
+        for key, mask in selector.select():
+            if key.data is None:
+                conn, address = listener.accept()
+                conn.setblocking(True)
+                buffers[conn] = bytearray()
+                selector.register(conn, selectors.EVENT_READ, conn)
+                continue
+            conn = key.data
+            try:
+                data = conn.recv(65536)
+                if data:
+                    buffers[conn].extend(data)
+                    serve_packets(conn, buffers[conn])
+                    continue
+            except socket.error:
+                pass
+            selector.unregister(conn)
+            del buffers[conn]
+            conn.close()
+
+
+def serve_packets(conn, buffer):
+    while len(buffer) >= 2:
+        remaining_length, multiplier, pos = 0, 1, 1
+        while True:
+            if pos >= len(buffer):
+                return
+            byte = buffer[pos]
+            pos += 1
+            remaining_length += (byte & 127) * multiplier
+            multiplier *= 128
+            if byte & 128 == 0:
+                break
+        if len(buffer) < pos + remaining_length:
+            return
+        command = buffer[0] & 0xF0
+        qos = (buffer[0] & 0x06) >> 1
+        body = bytes(buffer[pos:pos + remaining_length])
+        del buffer[:pos + remaining_length]
+        if command == CONNECT:
+            conn.sendall(struct.pack("!BBBB", CONNACK, 2, 0, 0))
+        elif command == PINGREQ:
+            conn.sendall(struct.pack("!BB", PINGRESP, 0))
+        elif command == PUBLISH and qos == 1:
+            topic_length = struct.unpack("!H", body[:2])[0]
+            conn.sendall(struct.pack("!BB", PUBACK, 2) + body[2 + topic_length:4 + topic_length])
+
+
+def current_rss_kb():
+    try:
+        with open("/proc/self/status") as status:
+            for line in status:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1])
+    except IOError:
+        pass
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss  # Peak, where /proc is unavailable
+
+
+def cpu_seconds():
+    usage = resource.getrusage(resource.RUSAGE_SELF)
+    return usage.ru_utime + usage.ru_stime
+
+
+def measure(mode, client_count, port, window, rate, qos, connect_timeout, result_queue):
+    reactor = NetworkReactor() if mode == "reactor" else None
+    clients = []
+    connected = threading.Semaphore(0)
+    for i in range(client_count):
+        client = Client("benchmark-%d" % i)
+        if reactor is not None:
+            client.reactor_set(reactor)
+        client.on_connect = lambda client, userdata, flags, rc: connected.release()
+        client.connect("127.0.0.1", port, 60)
+        client.loop_start()
+        clients.append(client)
+    # Per-client network threads wait with select(), which cannot watch descriptors
+    # past FD_SETSIZE (1024), so beyond a few hundred clients some never connect
+    connected_count = 0
+    deadline = time.time() + connect_timeout
+    while connected_count < client_count and connected.acquire(timeout=max(deadline - time.time(), 0)):
+        connected_count += 1
+    time.sleep(1)  # Let connection setup settle
+
+    cpu_start = cpu_seconds()
+    start = time.time()
+    published = 0
+    interval = 1.0 / rate if rate > 0 else window
+    while time.time() - start < window:
+        if rate > 0:
+            clients[published % client_count].publish(TOPIC, "x" * 64, qos)
+            published += 1
+        time.sleep(interval)
+    elapsed = time.time() - start
+    cpu = cpu_seconds() - cpu_start
+    result_queue.put((connected_count, cpu / elapsed * 100, current_rss_kb() / 1024.0, threading.active_count(), published))
+
+    for client in clients:
+        client.disconnect()
+    for client in clients:
+        client.loop_stop()
+    if reactor is not None:
+        reactor.stop()
+
+
+def run(mode, client_count, port, args):
+    result_queue = multiprocessing.Queue()
+    process = multiprocessing.Process(target=measure,
+                                      args=(mode, client_count, port, args.window, args.rate, args.qos,
+                                            args.connect_timeout, result_queue))
+    process.start()
+    connected, cpu, rss, threads, published = result_queue.get()
+    process.join()
+    print("%7s | %5d/%5d clients connected | CPU %6.2f %% | RSS %8.1f MB | %5d threads | %d publishes"
+          % (mode, connected, client_count, cpu, rss, threads, published))
+
+
+parser = argparse.ArgumentParser()
+parser.add_argument("-c", "--clients", action="store", dest="clients", default="1,100,1000",
+                    help="Comma separated client counts")
+parser.add_argument("-w", "--window", action="store", dest="window", type=float, default=5.0,
+                    help="Measurement window in seconds")
+parser.add_argument("-r", "--rate", action="store", dest="rate", type=float, default=50.0,
+                    help="Aggregate publish rate in messages/sec during the window, 0 for idle")
+parser.add_argument("-t", "--connect-timeout", action="store", dest="connect_timeout", type=float, default=20.0,
+                    help="Time in seconds to wait for all clients to connect")
+parser.add_argument("-q", "--qos", action="store", dest="qos", type=int, default=1, help="QoS of the publishes")
+args = parser.parse_args()
+
+port_queue = multiprocessing.Queue()
+broker = multiprocessing.Process(target=run_broker, args=(port_queue,))
+broker.daemon = True
+broker.start()
+broker_port = port_queue.get()
+
+for count in [int(c) for c in args.clients.split(",")]:
+    for mode in ("threads", "reactor"):
+        run(mode, count, broker_port, args)
+
+broker.terminate()
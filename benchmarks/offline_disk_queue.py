@@ -0,0 +1,83 @@
+'''
+/*
+ * Copyright 2010-2017 Amazon.com, Inc. or its affiliates. All Rights Reserved.
+ *
+ * Licensed under the Apache License, Version 2.0 (the "License").
+ * You may not use this file except in compliance with the License.
+ * A copy of the License is located at
+ *
+ *  http://aws.amazon.com/apache2.0
+ *
+ * or in the "license" file accompanying this file. This file is distributed
+ * on an "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either
+ * express or implied. See the License for the specific language governing
+ * permissions and limitations under the License.
+ */
+ '''
+
+# Measures the persistent offline publish queue: enqueue and drain rates in
+# MB/s of topics and payloads through PersistentOfflineRequestsManager, the
+# time to reopen a queue left full by a previous process (the recovery scan),
+# and the disk space left behind once it is drained. Run with --megabytes
+# 2048 or more to see it well past memory-sized queues.
+
+import argparse
+import logging
+import os
+import shutil
+import tempfile
+import time
+from AWSIoTPythonSDK.core.protocol.internal.requests import QueueableRequest
+from AWSIoTPythonSDK.core.protocol.internal.requests import RequestTypes
+from AWSIoTPythonSDK.core.protocol.internal.workers import PersistentOfflineRequestsManager
+from AWSIoTPythonSDK.core.util.enums import DropBehaviorTypes
+
+
+def get_directory_size(directory):
+    return sum(os.path.getsize(os.path.join(directory, file_name)) for file_name in os.listdir(directory))
+
+
+def measure(directory, payload_size, total_bytes):
+    payload = os.urandom(payload_size)
+    request = QueueableRequest(RequestTypes.PUBLISH, ("telemetry/device-1", payload, 1, False))
+    request_count = total_bytes // payload_size
+    megabytes = request_count * (len("telemetry/device-1") + payload_size) / (1024.0 * 1024.0)
+
+    manager = PersistentOfflineRequestsManager(directory, 0, DropBehaviorTypes.DROP_NEWEST)
+    start = time.time()
+    for i in range(request_count):
+        manager.add_one(request)
+    manager.close()
+    enqueue_sec = time.time() - start
+
+    start = time.time()
+    manager = PersistentOfflineRequestsManager(directory, 0, DropBehaviorTypes.DROP_NEWEST)
+    reopen_sec = time.time() - start
+
+    start = time.time()
+    while manager.has_more():
+        manager.get_next()
+    drain_sec = time.time() - start
+    manager.close()
+    return megabytes / enqueue_sec, megabytes / drain_sec, reopen_sec, get_directory_size(directory)
+
+
+parser = argparse.ArgumentParser()
+parser.add_argument("-s", "--payload-sizes", action="store", dest="payload_sizes", default="100,1024,65536",
+                    help="Comma separated payload sizes in bytes")
+parser.add_argument("-m", "--megabytes", action="store", dest="megabytes", type=int, default=256,
+                    help="Megabytes of payloads queued per run")
+parser.add_argument("-d", "--directory", action="store", dest="directory", default=None,
+                    help="Directory to put the queue files under, a temporary one by default")
+args = parser.parse_args()
+logging.getLogger("AWSIoTPythonSDK").setLevel(logging.ERROR)
+
+for payload_size in [int(s) for s in args.payload_sizes.split(",")]:
+    directory = tempfile.mkdtemp(dir=args.directory)
+    try:
+        enqueue_rate, drain_rate, reopen_sec, leftover_bytes = measure(directory, payload_size,
+                                                                       args.megabytes * 1024 * 1024)
+    finally:
+        shutil.rmtree(directory)
+    print("payload %6d B | enqueue %7.1f MB/s | drain %7.1f MB/s | reopen %6.2f s | left on disk %d B"
+          % (payload_size, enqueue_rate, drain_rate, reopen_sec, leftover_bytes))
@@ -0,0 +1,105 @@
+'''
+/*
+ * Copyright 2010-2017 Amazon.com, Inc. or its affiliates. All Rights Reserved.
+ *
+ * Licensed under the Apache License, Version 2.0 (the "License").
+ * You may not use this file except in compliance with the License.
+ * A copy of the License is located at
+ *
+ *  http://aws.amazon.com/apache2.0
+ *
+ * or in the "license" file accompanying this file. This file is distributed
+ * on an "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either
+ * express or implied. See the License for the specific language governing
+ * permissions and limitations under the License.
+ */
+ '''
+
+# Measures offline request queue throughput at 1k, 100k and 1M queued publish
+# requests: enqueueing N requests, draining them the way the event consumer
+# does (OfflineRequestsManager.get_next() until empty), and appending N more
+# to a full DROP_OLDEST queue of N. "list" is the previous list-based queue,
+# which took requests off the front with pop(0); it is skipped above
+# --list-max entries, as its drain time grows with the square of N.
+
+import argparse
+import logging
+import time
+from AWSIoTPythonSDK.core.protocol.internal.queues import AppendResults
+from AWSIoTPythonSDK.core.protocol.internal.queues import OfflineRequestQueue
+from AWSIoTPythonSDK.core.protocol.internal.requests import QueueableRequest
+from AWSIoTPythonSDK.core.protocol.internal.requests import RequestTypes
+from AWSIoTPythonSDK.core.util.enums import DropBehaviorTypes
+
+
+class ListOfflineRequestQueue(list):
+    # The previous queue, including its eagerly formatted log messages
+    _logger = logging.getLogger("AWSIoTPythonSDK.core.protocol.internal.queues")
+
+    def __init__(self, max_size, drop_behavior):
+        list.__init__(self)
+        self._max_size = max_size
+        self._drop_behavior = drop_behavior
+
+    def append(self, data):
+        if 0 < self._max_size <= len(self):
+            if DropBehaviorTypes.DROP_NEWEST == self._drop_behavior:
+                self._logger.warn("append: Full queue. Drop the newest: " + str(data))
+                return AppendResults.APPEND_FAILURE_QUEUE_FULL
+            current_oldest = self.pop(0)
+            self._logger.warn("append: Full queue. Drop the oldest: " + str(current_oldest))
+            list.append(self, data)
+            return AppendResults.APPEND_FAILURE_QUEUE_FULL
+        self._logger.debug("append: Add new element: " + str(data))
+        list.append(self, data)
+        return AppendResults.APPEND_SUCCESS
+
+    def popleft(self):
+        return self.pop(0)
+
+
+def create_queue(kind, max_size, drop_behavior):
+    if kind == "list":
+        return ListOfflineRequestQueue(max_size, drop_behavior)
+    return OfflineRequestQueue(max_size, drop_behavior)
+
+
+def measure(kind, count, requests):
+    queue = create_queue(kind, -1, DropBehaviorTypes.DROP_NEWEST)
+    start = time.time()
+    for request in requests:
+        queue.append(request)
+    enqueue_sec = time.time() - start
+
+    start = time.time()
+    while len(queue) > 0:
+        queue.popleft()
+    drain_sec = time.time() - start
+
+    queue = create_queue(kind, count, DropBehaviorTypes.DROP_OLDEST)
+    for request in requests:
+        queue.append(request)
+    start = time.time()
+    for request in requests:
+        queue.append(request)
+    drop_oldest_sec = time.time() - start
+    return count / enqueue_sec, count / drain_sec, count / drop_oldest_sec
+
+
+parser = argparse.ArgumentParser()
+parser.add_argument("-n", "--counts", action="store", dest="counts", default="1000,100000,1000000",
+                    help="Comma separated numbers of queued requests")
+parser.add_argument("-l", "--list-max", action="store", dest="list_max", type=int, default=100000,
+                    help="Largest count to run the list-based queue at")
+args = parser.parse_args()
+
+logging.getLogger("AWSIoTPythonSDK").setLevel(logging.ERROR)  # Every dropped request logs a warning
+for count in [int(c) for c in args.counts.split(",")]:
+    requests = [QueueableRequest(RequestTypes.PUBLISH, ("telemetry/device", b"x" * 64, 1, False)) for i in range(count)]
+    for kind in ("list", "deque"):
+        if kind == "list" and count > args.list_max:
+            print("%5s | %8d requests | skipped" % (kind, count))
+            continue
+        enqueue_per_sec, drain_per_sec, drop_oldest_per_sec = measure(kind, count, requests)
+        print("%5s | %8d requests | enqueue %10.1f /s | drain %10.1f /s | drop oldest %10.1f /s"
+              % (kind, count, enqueue_per_sec, drain_per_sec, drop_oldest_per_sec))
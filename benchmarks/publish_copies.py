@@ -0,0 +1,101 @@
+'''
+/*
+ * Copyright 2010-2017 Amazon.com, Inc. or its affiliates. All Rights Reserved.
+ *
+ * Licensed under the Apache License, Version 2.0 (the "License").
+ * You may not use this file except in compliance with the License.
+ * A copy of the License is located at
+ *
+ *  http://aws.amazon.com/apache2.0
+ *
+ * or in the "license" file accompanying this file. This file is distributed
+ * on an "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either
+ * express or implied. See the License for the specific language governing
+ * permissions and limitations under the License.
+ */
+ '''
+
+# Publishes bytes payloads of various sizes through the paho client into a
+# socket that discards what it is given, and reports the bytes allocated per
+# publish (as traced by tracemalloc, i.e. payload copies plus bookkeeping) and
+# the time per publish. The "legacy" column replays the previous encoder,
+# which converted bytes to a bytearray, copied it into the packet and sliced
+# the packet again on write.
+
+import argparse
+import struct
+import time
+import tracemalloc
+from AWSIoTPythonSDK.core.protocol.paho.client import Client
+from AWSIoTPythonSDK.core.protocol.paho.client import PUBLISH
+
+TOPIC = "telemetry/device"
+
+
+class DiscardingSocket(object):
+
+    def send(self, data):
+        return len(data)
+
+
+class LegacyPublishClient(Client):
+    """Client with the previous copying publish encoder, for comparison."""
+
+    def publish(self, topic, payload=None, qos=0, retain=False):
+        if isinstance(payload, bytes):
+            payload = bytearray(payload)
+        return super(LegacyPublishClient, self).publish(topic, payload, qos, retain)
+
+    def _send_publish(self, mid, topic, payload=None, qos=0, retain=False, dup=False):
+        command = PUBLISH | ((dup & 0x1) << 3) | (qos << 1) | retain
+        packet = bytearray()
+        packet.extend(struct.pack("!B", command))
+        remaining_length = 2 + len(topic.encode('utf-8')) + len(payload) + (2 if qos > 0 else 0)
+        self._pack_remaining_length(packet, remaining_length)
+        self._pack_str16(packet, topic)
+        if qos > 0:
+            packet.extend(struct.pack("!H", mid))
+        packet.extend(payload)
+        return self._packet_queue(PUBLISH, packet, mid, qos)
+
+    def _unwritten_buffers(self, packet):
+        return [packet['packet'][packet['pos']:]]
+
+
+def measure(client_class, payload, count):
+    client = client_class("benchmark")
+    client._sock = DiscardingSocket()
+    tracemalloc.start()
+    allocated = 0
+    for i in range(count):
+        tracemalloc.reset_peak()
+        before = tracemalloc.get_traced_memory()[0]
+        client.publish(TOPIC, payload, 0)
+        allocated += tracemalloc.get_traced_memory()[1] - before
+    tracemalloc.stop()
+
+    start = time.time()
+    for i in range(count):
+        client.publish(TOPIC, payload, 0)
+    elapsed = time.time() - start
+    client._sock = None
+    return allocated / float(count), elapsed / count
+
+
+def run(payload_size, count):
+    payload = b"x" * payload_size
+    legacy = measure(LegacyPublishClient, payload, count)
+    current = measure(Client, payload, count)
+    print("%8d B payload | legacy %10.0f B/publish %8.1f us | current %8.0f B/publish %8.1f us"
+          % (payload_size, legacy[0], legacy[1] * 1e6, current[0], current[1] * 1e6))
+
+
+parser = argparse.ArgumentParser()
+parser.add_argument("-n", "--count", action="store", dest="count", type=int, default=2000,
+                    help="Publishes per payload size")
+parser.add_argument("-s", "--sizes", action="store", dest="sizes", default="64,1024,16384,102400,1048576",
+                    help="Comma separated payload sizes in bytes")
+args = parser.parse_args()
+
+for size in [int(s) for s in args.sizes.split(",")]:
+    run(size, args.count)
@@ -0,0 +1,199 @@
+'''
+/*
+ * Copyright 2010-2017 Amazon.com, Inc. or its affiliates. All Rights Reserved.
+ *
+ * Licensed under the Apache License, Version 2.0 (the "License").
+ * You may not use this file except in compliance with the License.
+ * A copy of the License is located at
+ *
+ *  http://aws.amazon.com/apache2.0
+ *
+ * or in the "license" file accompanying this file. This file is distributed
+ * on an "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either
+ * express or implied. See the License for the specific language governing
+ * permissions and limitations under the License.
+ */
+ '''
+
+# Reconnects a client holding 10, 100 and 1000 subscription records to a
+# broker stand-in and reports the time from CONNACK to the STABLE status and
+# to the last SUBACK, with one topic per SUBSCRIBE packet, with up to 8, and
+# with the CONNACK reporting a session present that holds every subscription.
+# Like AWS IoT, the stand-in handles at most --subscribe-rate SUBSCRIBE
+# packets per second per connection, and answers each after --rtt-ms.
+
+import argparse
+import heapq
+import logging
+import socket
+import struct
+import threading
+import time
+from AWSIoTPythonSDK.core.protocol.internal.clients import ClientStatus
+from AWSIoTPythonSDK.core.protocol.internal.clients import ClientStatusContainer
+from AWSIoTPythonSDK.core.protocol.internal.clients import InternalAsyncMqttClient
+from AWSIoTPythonSDK.core.protocol.internal.workers import EventConsumer
+from AWSIoTPythonSDK.core.protocol.internal.workers import EventProducer
+from AWSIoTPythonSDK.core.protocol.internal.workers import OfflineRequestsManager
+from AWSIoTPythonSDK.core.protocol.internal.workers import SubscriptionManager
+from AWSIoTPythonSDK.core.protocol.paho.client import CONNACK
+from AWSIoTPythonSDK.core.protocol.paho.client import CONNECT
+from AWSIoTPythonSDK.core.protocol.paho.client import MQTTv311
+from AWSIoTPythonSDK.core.protocol.paho.client import SUBACK
+from AWSIoTPythonSDK.core.protocol.paho.client import SUBSCRIBE
+from AWSIoTPythonSDK.core.util.enums import DropBehaviorTypes
+from AWSIoTPythonSDK.core.util.providers import EndpointProvider
+try:
+    from queue import Queue
+except ImportError:
+    from Queue import Queue
+
+
+class ThrottledSubscribeBroker(object):
+
+    def __init__(self, subscribe_rate, rtt_sec, session_present):
+        self._session_present = session_present
+        self._service_sec = 1.0 / subscribe_rate
+        self._rtt_sec = rtt_sec
+        self._listener = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        self._listener.bind(("127.0.0.1", 0))
+        self._listener.listen(1)
+        self.port = self._listener.getsockname()[1]
+        self._cv = threading.Condition()
+        self._replies = []  # (send time, sequence, bytes)
+        self._free_time = 0
+        self.subscribe_packet_count = 0
+        for target in (self._serve, self._send_replies):
+            worker = threading.Thread(target=target)
+            worker.daemon = True
+            worker.start()
+
+    def _serve(self):
+        self._conn, address = self._listener.accept()
+        buffer = bytearray()
+        while True:
+            data = self._conn.recv(65536)
+            if not data:
+                return
+            buffer.extend(data)
+            self._serve_packets(buffer)
+
+    def _serve_packets(self, buffer):
+        while len(buffer) >= 2:
+            remaining_length, multiplier, pos = 0, 1, 1
+            while True:
+                if pos >= len(buffer):
+                    return
+                byte = buffer[pos]
+                pos += 1
+                remaining_length += (byte & 127) * multiplier
+                multiplier *= 128
+                if byte & 128 == 0:
+                    break
+            if len(buffer) < pos + remaining_length:
+                return
+            command = buffer[0] & 0xF0
+            body = bytes(buffer[pos:pos + remaining_length])
+            del buffer[:pos + remaining_length]
+            if command == CONNECT:
+                self._reply(0, struct.pack("!BBBB", CONNACK, 2, 1 if self._session_present else 0, 0))
+            elif command == SUBSCRIBE:
+                granted_qos = []
+                offset = 2
+                while offset < len(body):
+                    topic_length = struct.unpack_from("!H", body, offset)[0]
+                    granted_qos.append(body[offset + 2 + topic_length])
+                    offset += 3 + topic_length
+                now = time.time()
+                self._free_time = max(self._free_time, now) + self._service_sec
+                self.subscribe_packet_count += 1
+                self._reply(self._free_time + self._rtt_sec - now,
+                            struct.pack("!BB", SUBACK, 2 + len(granted_qos)) + body[:2] + bytes(granted_qos))
+
+    def _reply(self, delay_sec, packet):
+        with self._cv:
+            heapq.heappush(self._replies, (time.time() + delay_sec, len(self._replies), packet))
+            self._cv.notify()
+
+    def _send_replies(self):
+        while True:
+            with self._cv:
+                while not self._replies or self._replies[0][0] > time.time():
+                    self._cv.wait(self._replies[0][0] - time.time() if self._replies else None)
+                send_time, sequence, packet = heapq.heappop(self._replies)
+            self._conn.sendall(packet)
+
+    def close(self):
+        self._listener.close()
+
+
+def measure(subscription_count, max_topics_per_subscribe, session_present, subscribe_rate, rtt_sec):
+    broker = ThrottledSubscribeBroker(subscribe_rate, rtt_sec, session_present)
+    lock = threading.Lock()
+    all_acked = threading.Event()
+    acked = [0]
+
+    def on_suback(mid, data):
+        with lock:
+            acked[0] += 1
+            if acked[0] == subscription_count:
+                all_acked.set()
+
+    event_queue = Queue()
+    client = InternalAsyncMqttClient("resubscribe-benchmark", True, MQTTv311, False)
+    endpoint_provider = EndpointProvider()
+    endpoint_provider.set_host("127.0.0.1")
+    endpoint_provider.set_port(broker.port)
+    client.set_endpoint_provider(endpoint_provider)
+    producer = EventProducer(event_queue)
+    connack_times = []
+
+    def on_connect(client, user_data, flags, rc):
+        connack_times.append(time.time())
+        producer.on_connect(client, user_data, flags, rc)
+
+    client.register_internal_event_callbacks(on_connect, producer.on_disconnect, producer.on_publish,
+                                             producer.on_subscribe, producer.on_unsubscribe, producer.on_message)
+    subscription_manager = SubscriptionManager()
+    for i in range(subscription_count):
+        subscription_manager.add_record("devices/%d/commands" % i, 1, None, on_suback)
+        if session_present:
+            subscription_manager.confirm_record("devices/%d/commands" % i)  # Acknowledged on the last connection
+    client_status = ClientStatusContainer()
+    client_status.set_status(ClientStatus.CONNECT)
+    consumer = EventConsumer(event_queue, client, subscription_manager,
+                             OfflineRequestsManager(-1, DropBehaviorTypes.DROP_NEWEST), client_status)
+    consumer.update_max_topics_per_subscribe(max_topics_per_subscribe)
+    consumer.start()
+
+    client.connect(600)
+    while client_status.get_status() != ClientStatus.STABLE:
+        time.sleep(0.0005)
+    stable_sec = time.time() - connack_times[0]
+    if not session_present:
+        all_acked.wait()
+    acked_sec = time.time() - connack_times[0]
+
+    client.disconnect()
+    consumer.wait_until_it_stops(2)
+    broker.close()
+    return stable_sec, acked_sec, broker.subscribe_packet_count
+
+
+parser = argparse.ArgumentParser()
+parser.add_argument("-s", "--subscriptions", action="store", dest="subscriptions", default="10,100,1000",
+                    help="Comma separated subscription counts")
+parser.add_argument("-r", "--subscribe-rate", action="store", dest="subscribe_rate", type=float, default=50,
+                    help="SUBSCRIBE packets per second the broker stand-in handles at most")
+parser.add_argument("-t", "--rtt-ms", action="store", dest="rtt_ms", type=float, default=50,
+                    help="Round trip time in milliseconds")
+args = parser.parse_args()
+logging.getLogger("AWSIoTPythonSDK").setLevel(logging.ERROR)
+
+for subscription_count in [int(s) for s in args.subscriptions.split(",")]:
+    for max_topics_per_subscribe, session_present in ((1, False), (8, False), (8, True)):
+        stable_sec, acked_sec, packet_count = measure(subscription_count, max_topics_per_subscribe, session_present,
+                                                      args.subscribe_rate, args.rtt_ms / 1000.0)
+        print("%4d subscriptions | %d topics/packet | session present %-5s | %4d SUBSCRIBE packets | STABLE after %7.3f s"
+              " | last SUBACK after %7.3f s"
+              % (subscription_count, max_topics_per_subscribe, session_present, packet_count, stable_sec, acked_sec))
@@ -0,0 +1,159 @@
+'''
+/*
+ * Copyright 2010-2017 Amazon.com, Inc. or its affiliates. All Rights Reserved.
+ *
+ * Licensed under the Apache License, Version 2.0 (the "License").
+ * You may not use this file except in compliance with the License.
+ * A copy of the License is located at
+ *
+ *  http://aws.amazon.com/apache2.0
+ *
+ * or in the "license" file accompanying this file. This file is distributed
+ * on an "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either
+ * express or implied. See the License for the specific language governing
+ * permissions and limitations under the License.
+ */
+ '''
+# Reads the state of a device shadow while a remote controller keeps changing
+# its desired state, and reports the p50/p99 read latency, the shadow GET
+# requests sent and whether the last read matches the shadow document once the
+# changes stop. "shadowGet" reads with a shadowGet round trip, "cache" with
+# getCachedState on a shadow created with the document cache enabled. The
+# shadow document lives in an in-process loopback in place of shadowManager,
+# which answers gets after a fixed round trip time and publishes a delta for
+# every desired change. Every --gap-every-th change is made without a delta,
+# like a reported-only update from another client, so the cache has to refresh.
+
+import argparse
+import json
+import threading
+import time
+from collections import deque
+from AWSIoTPythonSDK.core.protocol.paho.client import MQTTMessage
+from AWSIoTPythonSDK.core.shadow.deviceShadow import deviceShadow
+
+
+class LoopbackShadowManager(object):
+
+    def __init__(self, round_trip_sec):
+        self._round_trip_sec = round_trip_sec
+        self._callbacks = {}
+        self._responses = deque()
+        self._condition = threading.Condition()
+        self._document = {"state": {"desired": {"n": 0}, "reported": {"n": 0}}, "version": 1}
+        self.get_count = 0
+        responder = threading.Thread(target=self._respond)
+        responder.daemon = True
+        responder.start()
+
+    def basicShadowSubscribe(self, shadow_name, action, callback):
+        self._callbacks[shadow_name] = callback
+
+    def basicShadowUnsubscribe(self, shadow_name, action):
+        pass
+
+    def basicShadowPublish(self, shadow_name, action, payload):
+        with self._condition:
+            self.get_count += 1
+            self._responses.append((time.time() + self._round_trip_sec, shadow_name, json.loads(payload)["clientToken"]))
+            self._condition.notify()
+
+    def change_desired(self, shadow_name, value, with_delta):
+        with self._condition:
+            self._document["state"]["desired"]["n"] = value
+            self._document["version"] += 1
+            payload = {"state": {"n": value}, "version": self._document["version"]}
+        if with_delta:
+            self._deliver(shadow_name, "update/delta", payload)
+
+    def get_desired(self):
+        with self._condition:
+            return dict(self._document["state"]["desired"])
+
+    def _respond(self):
+        while True:
+            with self._condition:
+                while not self._responses:
+                    self._condition.wait()
+                due, shadow_name, token = self._responses.popleft()
+            time.sleep(max(due - time.time(), 0))
+            with self._condition:
+                payload = json.loads(json.dumps(self._document))
+            payload["clientToken"] = token
+            self._deliver(shadow_name, "get/accepted", payload)
+
+    def _deliver(self, shadow_name, suffix, payload):
+        message = MQTTMessage()
+        message.topic = "$aws/things/%s/shadow/%s" % (shadow_name, suffix)
+        message.payload = json.dumps(payload).encode("utf-8")
+        self._callbacks[shadow_name](None, None, message)
+
+
+def run(mode, args):
+    manager = LoopbackShadowManager(args.round_trip_ms / 1000.0)
+    shadow = deviceShadow("benchmark", True, manager, srcIsCacheEnabled=(mode == "cache"))
+    shadow.shadowRegisterDeltaCallback(lambda payload, response_status, token: None)
+    responded = threading.Event()
+    last_read = [None]
+
+    def on_get(payload, response_status, token):
+        last_read[0] = json.loads(payload)["state"]["desired"]
+        responded.set()
+
+    def read():
+        if mode == "cache":
+            cached_state = shadow.getCachedState()
+            last_read[0] = cached_state["desired"] if cached_state else None
+        else:
+            responded.clear()
+            shadow.shadowGet(on_get, 5)
+            responded.wait()
+
+    if mode == "cache":  # Fill the cache once
+        shadow.shadowGet(lambda payload, response_status, token: responded.set(), 5)
+        responded.wait()
+
+    stop = [False]
+
+    def controller():
+        value = 0
+        while not stop[0]:
+            value += 1
+            manager.change_desired("benchmark", value, value % args.gap_every != 0)
+            time.sleep(1.0 / args.change_rate)
+
+    changer = threading.Thread(target=controller)
+    changer.start()
+    latencies = []
+    for i in range(args.reads):
+        start = time.time()
+        read()
+        latencies.append(time.time() - start)
+        time.sleep(1.0 / args.read_rate)
+    stop[0] = True
+    changer.join()
+    time.sleep(args.round_trip_ms / 1000.0 * 3)  # Let a pending refresh land
+    read()
+
+    latencies.sort()
+    p50 = latencies[len(latencies) // 2] * 1e6
+    p99 = latencies[min(int(len(latencies) * 0.99), len(latencies) - 1)] * 1e6
+    print("%-9s | read p50 %9.1f us | read p99 %9.1f us | %4d GET requests | final read up to date: %s"
+          % (mode, p50, p99, manager.get_count, last_read[0] == manager.get_desired()))
+
+
+parser = argparse.ArgumentParser()
+parser.add_argument("-n", "--reads", action="store", dest="reads", type=int, default=500,
+                    help="State reads per run")
+parser.add_argument("-r", "--read-rate", action="store", dest="read_rate", type=float, default=100,
+                    help="State reads per second")
+parser.add_argument("-c", "--change-rate", action="store", dest="change_rate", type=float, default=20,
+                    help="Desired state changes per second")
+parser.add_argument("-g", "--gap-every", action="store", dest="gap_every", type=int, default=50,
+                    help="Every n-th change publishes no delta")
+parser.add_argument("-t", "--round-trip-ms", action="store", dest="round_trip_ms", type=float, default=50,
+                    help="Round trip time of a shadow get in milliseconds")
+args = parser.parse_args()
+
+for mode in ("shadowGet", "cache"):
+    run(mode, args)
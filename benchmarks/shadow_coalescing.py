@@ -0,0 +1,133 @@
+'''
+/*
+ * Copyright 2010-2017 Amazon.com, Inc. or its affiliates. All Rights Reserved.
+ *
+ * Licensed under the Apache License, Version 2.0 (the "License").
+ * You may not use this file except in compliance with the License.
+ * A copy of the License is located at
+ *
+ *  http://aws.amazon.com/apache2.0
+ *
+ * or in the "license" file accompanying this file. This file is distributed
+ * on an "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either
+ * express or implied. See the License for the specific language governing
+ * permissions and limitations under the License.
+ */
+ '''
+# Reports the reported state of a device shadow --rate times per second, one
+# sensor reading per update, and counts the update requests published, the
+# update callbacks that got accepted or rejected and the p50/p99 time from
+# shadowUpdate to the accepted callback. The shadow service is an in-process
+# loopback in place of shadowManager, which answers after a fixed round trip
+# time and, like the service's per-thing throttling, rejects the update
+# requests beyond --limit per second. Runs without coalescing and with the
+# update coalescing windows given by --windows-ms.
+
+import argparse
+import json
+import threading
+import time
+from collections import deque
+from AWSIoTPythonSDK.core.protocol.paho.client import MQTTMessage
+from AWSIoTPythonSDK.core.shadow.deviceShadow import deviceShadow
+
+
+class ThrottlingShadowManager(object):
+
+    def __init__(self, round_trip_sec, limit_per_sec):
+        self._round_trip_sec = round_trip_sec
+        self._limit_per_sec = limit_per_sec
+        self._callbacks = {}
+        self._responses = deque()
+        self._accepted_times = deque()
+        self._condition = threading.Condition()
+        self._version = 0
+        self.publish_count = 0
+        responder = threading.Thread(target=self._respond)
+        responder.daemon = True
+        responder.start()
+
+    def basicShadowSubscribe(self, shadow_name, action, callback):
+        self._callbacks[shadow_name] = callback
+
+    def basicShadowUnsubscribe(self, shadow_name, action):
+        pass
+
+    def basicShadowPublish(self, shadow_name, action, payload):
+        now = time.time()
+        with self._condition:
+            self.publish_count += 1
+            while self._accepted_times and self._accepted_times[0] <= now - 1:
+                self._accepted_times.popleft()
+            if len(self._accepted_times) < self._limit_per_sec:
+                self._accepted_times.append(now)
+                self._version += 1
+                suffix, response = "update/accepted", {"version": self._version}
+            else:
+                suffix, response = "update/rejected", {"code": 429, "message": "Too Many Requests"}
+            response["clientToken"] = json.loads(payload)["clientToken"]
+            self._responses.append((now + self._round_trip_sec, shadow_name, suffix, response))
+            self._condition.notify()
+
+    def _respond(self):
+        while True:
+            with self._condition:
+                while not self._responses:
+                    self._condition.wait()
+                due, shadow_name, suffix, response = self._responses.popleft()
+            time.sleep(max(due - time.time(), 0))
+            message = MQTTMessage()
+            message.topic = "$aws/things/%s/shadow/%s" % (shadow_name, suffix)
+            message.payload = json.dumps(response).encode("utf-8")
+            self._callbacks[shadow_name](None, None, message)
+
+
+def run(window_ms, args):
+    manager = ThrottlingShadowManager(args.round_trip_ms / 1000.0, args.limit)
+    shadow = deviceShadow("benchmark", True, manager, srcUpdateCoalescingWindowSecond=window_ms / 1000.0)
+    lock = threading.Lock()
+    counts = {"accepted": 0, "rejected": 0, "timeout": 0}
+    start_times = {}
+    latencies = []
+
+    def on_update(payload, response_status, token):
+        # Without a window every update overwrites the one update callback, so the
+        # token, not the callback, tells which update a response belongs to
+        with lock:
+            counts[response_status] += 1
+            start = start_times[token].pop()
+            if response_status == "accepted":
+                latencies.append(time.time() - start)
+
+    for i in range(args.updates):
+        payload = json.dumps({"state": {"reported": {"sensor%d" % (i % 10): i}}})
+        with lock:  # Hold responses back until the start time is recorded
+            start = time.time()
+            token = shadow.shadowUpdate(payload, on_update, 5)
+            start_times.setdefault(token, []).append(start)
+        time.sleep(1.0 / args.rate)
+    time.sleep(window_ms / 1000.0 + args.round_trip_ms / 1000.0 * 3)  # Let the last responses land
+
+    latencies.sort()
+    p50 = latencies[len(latencies) // 2] * 1e3 if latencies else float("nan")
+    p99 = latencies[min(int(len(latencies) * 0.99), len(latencies) - 1)] * 1e3 if latencies else float("nan")
+    label = "window %d ms" % window_ms if window_ms else "no window"
+    print("%-13s | %4d publishes | %4d accepted | %4d rejected | %4d timed out | accepted p50 %7.1f ms | p99 %7.1f ms"
+          % (label, manager.publish_count, counts["accepted"], counts["rejected"], counts["timeout"], p50, p99))
+
+
+parser = argparse.ArgumentParser()
+parser.add_argument("-n", "--updates", action="store", dest="updates", type=int, default=250,
+                    help="Shadow updates per run")
+parser.add_argument("-r", "--rate", action="store", dest="rate", type=float, default=50,
+                    help="Shadow updates per second")
+parser.add_argument("-l", "--limit", action="store", dest="limit", type=int, default=10,
+                    help="Update requests per second the loopback accepts")
+parser.add_argument("-t", "--round-trip-ms", action="store", dest="round_trip_ms", type=float, default=50,
+                    help="Round trip time of a shadow update in milliseconds")
+parser.add_argument("-w", "--windows-ms", action="store", dest="windows_ms", type=int, nargs="+", default=[100, 500],
+                    help="Update coalescing windows in milliseconds")
+args = parser.parse_args()
+
+for window_ms in [0] + args.windows_ms:
+    run(window_ms, args)
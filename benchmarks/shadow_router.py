@@ -0,0 +1,108 @@
+'''
+/*
+ * Copyright 2010-2017 Amazon.com, Inc. or its affiliates. All Rights Reserved.
+ *
+ * Licensed under the Apache License, Version 2.0 (the "License").
+ * You may not use this file except in compliance with the License.
+ * A copy of the License is located at
+ *
+ *  http://aws.amazon.com/apache2.0
+ *
+ * or in the "license" file accompanying this file. This file is distributed
+ * on an "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either
+ * express or implied. See the License for the specific language governing
+ * permissions and limitations under the License.
+ */
+ '''
+# Registers get and delta handlers for 100 and 2000 device shadows, the way a
+# gateway fronting that many things would, and reports the subscription records
+# the client holds, the SUBSCRIBE round trips spent registering them, and the
+# shadow responses per second dispatched from the subscription records to the
+# deviceShadow handlers. "per-shadow" uses shadowManager, which subscribes to
+# the response topics of every shadow; "router" uses shadowRouter with one
+# $aws/things/+/shadow/# subscription.
+
+import argparse
+import json
+import random
+import timeit
+from AWSIoTPythonSDK.core.protocol.internal.workers import SubscriptionManager
+from AWSIoTPythonSDK.core.protocol.paho.client import MQTTMessage
+from AWSIoTPythonSDK.core.shadow.deviceShadow import deviceShadow
+from AWSIoTPythonSDK.core.shadow.shadowManager import shadowManager
+from AWSIoTPythonSDK.core.shadow.shadowManager import shadowRouter
+
+
+class RecordingMqttCore(object):
+    # Records subscriptions the way MqttCore does, without a connection
+
+    def __init__(self, subscription_manager):
+        self._subscription_manager = subscription_manager
+        self.subscribe_count = 0
+
+    def subscribe(self, topic, qos, message_callback=None):
+        self.subscribe_batch([(topic, qos, message_callback)])
+
+    def subscribe_batch(self, subscriptions):
+        self.subscribe_count += 1
+        for topic, qos, message_callback in subscriptions:
+            self._subscription_manager.add_record(topic, qos, message_callback, None)
+
+    def publish(self, topic, payload, qos, retain=False):
+        pass
+
+
+class DiscardingCallbackExecutor(object):
+
+    def submit(self, key, callback, args=()):
+        pass
+
+
+def create_messages(thing_count, message_count):
+    messages = []
+    for i in range(message_count):
+        message = MQTTMessage()
+        thing_name = "thing%d" % random.randrange(thing_count)
+        if i % 2:
+            message.topic = "$aws/things/%s/shadow/update/delta" % thing_name
+            message.payload = json.dumps({"version": i, "state": {"on": True}}).encode("utf-8")
+        else:
+            message.topic = "$aws/things/%s/shadow/get/accepted" % thing_name
+            message.payload = json.dumps({"version": i, "state": {}, "clientToken": "unknown"}).encode("utf-8")
+        messages.append(message)
+    return messages
+
+
+def dispatch(subscription_manager, messages):
+    # Same lookup as EventConsumer._dispatch_message
+    for message in messages:
+        for qos, message_callback, _ in subscription_manager.match_records(message.topic):
+            message_callback(None, None, message)
+
+
+def measure(shadow_manager_class, thing_count, messages):
+    subscription_manager = SubscriptionManager()
+    mqtt_core = RecordingMqttCore(subscription_manager)
+    manager = shadow_manager_class(mqtt_core)
+    executor = DiscardingCallbackExecutor()
+    for i in range(thing_count):
+        shadow = deviceShadow("thing%d" % i, True, manager, srcCallbackExecutor=executor)
+        manager.basicShadowSubscribe("thing%d" % i, "get", shadow.generalCallback)
+        manager.basicShadowSubscribe("thing%d" % i, "delta", shadow.generalCallback)
+    elapsed_sec = min(timeit.repeat(lambda: dispatch(subscription_manager, messages), number=1, repeat=5))
+    return len(subscription_manager.list_records()), mqtt_core.subscribe_count, len(messages) / elapsed_sec
+
+
+parser = argparse.ArgumentParser()
+parser.add_argument("-t", "--things", action="store", dest="things", default="100,2000",
+                    help="Comma separated thing counts")
+parser.add_argument("-m", "--messages", action="store", dest="messages", type=int, default=100000,
+                    help="Shadow responses to dispatch per run")
+args = parser.parse_args()
+
+for thing_count in [int(t) for t in args.things.split(",")]:
+    messages = create_messages(thing_count, args.messages)
+    for name, shadow_manager_class in (("per-shadow", shadowManager), ("router", shadowRouter)):
+        record_count, subscribe_count, rate = measure(shadow_manager_class, thing_count, messages)
+        print("%5d things | %-10s | %5d subscription records | %5d SUBSCRIBE round trips | %8.0f responses/s"
+              % (thing_count, name, record_count, subscribe_count, rate))
@@ -0,0 +1,155 @@
+'''
+/*
+ * Copyright 2010-2017 Amazon.com, Inc. or its affiliates. All Rights Reserved.
+ *
+ * Licensed under the Apache License, Version 2.0 (the "License").
+ * You may not use this file except in compliance with the License.
+ * A copy of the License is located at
+ *
+ *  http://aws.amazon.com/apache2.0
+ *
+ * or in the "license" file accompanying this file. This file is distributed
+ * on an "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either
+ * express or implied. See the License for the specific language governing
+ * permissions and limitations under the License.
+ */
+ '''
+# Boots 1 and 20 device shadows and reports the time until the application
+# knows the state of every shadow: "cold" sends a shadowGet per shadow over a
+# slow link, "warm" creates the shadows with a snapshot file written on the
+# previous run and reads getCachedState. Also reports the snapshot files
+# written while 1000 deltas arrive over two seconds, to show the batching.
+# Responses come from an in-process loopback in place of shadowManager, which
+# answers gets after --round-trip-ms.
+
+import argparse
+import json
+import os
+import shutil
+import tempfile
+import threading
+import time
+from collections import deque
+import AWSIoTPythonSDK.core.shadow.deviceShadow as deviceShadowModule
+from AWSIoTPythonSDK.core.protocol.paho.client import MQTTMessage
+from AWSIoTPythonSDK.core.shadow.deviceShadow import deviceShadow
+
+
+class LoopbackShadowManager(object):
+
+    def __init__(self, round_trip_sec):
+        self._round_trip_sec = round_trip_sec
+        self._callbacks = {}
+        self._responses = deque()
+        self._condition = threading.Condition()
+        responder = threading.Thread(target=self._respond)
+        responder.daemon = True
+        responder.start()
+
+    def basicShadowSubscribe(self, shadow_name, action, callback):
+        self._callbacks[shadow_name] = callback
+
+    def basicShadowUnsubscribe(self, shadow_name, action):
+        pass
+
+    def basicShadowPublish(self, shadow_name, action, payload):
+        with self._condition:
+            self._responses.append((time.time() + self._round_trip_sec, shadow_name, json.loads(payload)["clientToken"]))
+            self._condition.notify()
+
+    def deliver_delta(self, shadow_name, version):
+        self._deliver(shadow_name, "update/delta", {"state": {"n": version}, "version": version})
+
+    def _respond(self):
+        while True:
+            with self._condition:
+                while not self._responses:
+                    self._condition.wait()
+                due, shadow_name, token = self._responses.popleft()
+            time.sleep(max(due - time.time(), 0))
+            self._deliver(shadow_name, "get/accepted", {"state": {"desired": {"n": 1}, "reported": {"n": 1}},
+                                                        "version": 1, "clientToken": token})
+
+    def _deliver(self, shadow_name, suffix, payload):
+        message = MQTTMessage()
+        message.topic = "$aws/things/%s/shadow/%s" % (shadow_name, suffix)
+        message.payload = json.dumps(payload).encode("utf-8")
+        self._callbacks[shadow_name](None, None, message)
+
+
+def boot(mode, shadow_count, directory, round_trip_sec):
+    manager = LoopbackShadowManager(round_trip_sec)
+    lock = threading.Lock()
+    all_known = threading.Event()
+    known = [0]
+
+    def on_get(payload, response_status, token):
+        with lock:
+            known[0] += 1
+            if known[0] == shadow_count:
+                all_known.set()
+
+    start = time.time()
+    for i in range(shadow_count):
+        if mode == "cold":
+            deviceShadow("thing%d" % i, True, manager).shadowGet(on_get, 10)
+        else:
+            shadow = deviceShadow("thing%d" % i, True, manager, srcSnapshotPath=os.path.join(directory, "thing%d.json" % i))
+            if shadow.getCachedState() is not None:
+                on_get(None, None, None)
+    all_known.wait()
+    return time.time() - start
+
+
+def seed_snapshots(shadow_count, directory, round_trip_sec):
+    # Previous run: the background get fills in the cache, which is then written out
+    manager = LoopbackShadowManager(round_trip_sec)
+    paths = [os.path.join(directory, "thing%d.json" % i) for i in range(shadow_count)]
+    shadows = [deviceShadow("thing%d" % i, True, manager, srcSnapshotPath=paths[i]) for i in range(shadow_count)]
+    while not all(os.path.exists(path) for path in paths):
+        time.sleep(0.05)
+    return shadows
+
+
+def count_snapshot_writes(directory, delta_count, window_sec):
+    manager = LoopbackShadowManager(0)
+    shadow_path = os.path.join(directory, "writer.json")
+    shadow = deviceShadow("writer", True, manager, srcSnapshotPath=shadow_path)
+    shadow.shadowRegisterDeltaCallback(lambda payload, response_status, token: None)
+    time.sleep(0.1)  # Reconciled
+    writes = [0]
+    original_replace = deviceShadowModule.os.replace
+
+    def counting_replace(source, destination):
+        if destination == shadow_path:
+            writes[0] += 1
+        original_replace(source, destination)
+
+    deviceShadowModule.os.replace = counting_replace
+    for i in range(delta_count):
+        manager.deliver_delta("writer", i + 2)
+        time.sleep(window_sec / delta_count)
+    time.sleep(deviceShadow._SNAPSHOT_WRITE_DELAY_SEC * 1.5)  # Last batch
+    deviceShadowModule.os.replace = original_replace
+    return writes[0]
+
+
+parser = argparse.ArgumentParser()
+parser.add_argument("-s", "--shadows", action="store", dest="shadows", default="1,20",
+                    help="Comma separated shadow counts")
+parser.add_argument("-t", "--round-trip-ms", action="store", dest="round_trip_ms", type=float, default=800,
+                    help="Round trip time of a shadow get in milliseconds")
+args = parser.parse_args()
+
+directory = tempfile.mkdtemp()
+try:
+    for shadow_count in [int(s) for s in args.shadows.split(",")]:
+        boot_directory = os.path.join(directory, str(shadow_count))  # One deviceShadow per snapshot file at a time
+        os.mkdir(boot_directory)
+        seed_snapshots(shadow_count, boot_directory, args.round_trip_ms / 1000.0)
+        for mode in ("cold", "warm"):
+            elapsed_sec = boot(mode, shadow_count, boot_directory, args.round_trip_ms / 1000.0)
+            print("%3d shadows | %-4s boot | state of every shadow known after %8.3f ms" % (shadow_count, mode, elapsed_sec * 1000))
+    print("1000 deltas in 2 s | %d snapshot writes" % count_snapshot_writes(directory, 1000, 2.0))
+finally:
+    shutil.rmtree(directory)
@@ -0,0 +1,195 @@
+'''
+/*
+ * Copyright 2010-2017 Amazon.com, Inc. or its affiliates. All Rights Reserved.
+ *
+ * Licensed under the Apache License, Version 2.0 (the "License").
+ * You may not use this file except in compliance with the License.
+ * A copy of the License is located at
+ *
+ *  http://aws.amazon.com/apache2.0
+ *
+ * or in the "license" file accompanying this file. This file is distributed
+ * on an "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either
+ * express or implied. See the License for the specific language governing
+ * permissions and limitations under the License.
+ */
+ '''
+# Brings up 1 and 100 device shadows against a broker stand-in and reports the
+# time from the first shadowGet to the first shadow response, and to the first
+# response of the last shadow. Each shadowGet subscribes to its accepted and
+# rejected topics before publishing. The stand-in answers each SUBSCRIBE and
+# each shadow get request after --rtt-ms. "legacy" plugs in a shadowManager
+# that subscribes one topic at a time and then sleeps for 2 seconds, as it
+# used to; "batched" uses one SUBSCRIBE for both topics and waits only for its
+# SUBACK.
+
+import argparse
+import json
+import logging
+import socket
+import struct
+import threading
+import time
+from AWSIoTPythonSDK.core.protocol.mqtt_core import MqttCore
+from AWSIoTPythonSDK.core.protocol.paho.client import CONNACK
+from AWSIoTPythonSDK.core.protocol.paho.client import CONNECT
+from AWSIoTPythonSDK.core.protocol.paho.client import MQTTv311
+from AWSIoTPythonSDK.core.protocol.paho.client import PUBLISH
+from AWSIoTPythonSDK.core.protocol.paho.client import SUBACK
+from AWSIoTPythonSDK.core.protocol.paho.client import SUBSCRIBE
+from AWSIoTPythonSDK.core.protocol.paho.client import UNSUBACK
+from AWSIoTPythonSDK.core.protocol.paho.client import UNSUBSCRIBE
+from AWSIoTPythonSDK.core.shadow.deviceShadow import deviceShadow
+from AWSIoTPythonSDK.core.shadow.shadowManager import _shadowAction
+from AWSIoTPythonSDK.core.shadow.shadowManager import shadowManager
+from AWSIoTPythonSDK.core.util.providers import EndpointProvider
+
+
+class LegacyShadowManager(shadowManager):
+
+    def basicShadowSubscribe(self, srcShadowName, srcShadowAction, srcCallback):
+        with self._shadowSubUnsubOperationLock:
+            currentShadowAction = _shadowAction(srcShadowName, srcShadowAction)
+            if currentShadowAction.isDelta:
+                self._mqttCoreHandler.subscribe(currentShadowAction.getTopicDelta(), 0, srcCallback)
+            else:
+                self._mqttCoreHandler.subscribe(currentShadowAction.getTopicAccept(), 0, srcCallback)
+                self._mqttCoreHandler.subscribe(currentShadowAction.getTopicReject(), 0, srcCallback)
+            time.sleep(2)
+
+
+def _encode_remaining_length(length):
+    encoded = bytearray()
+    while True:
+        byte = length % 128
+        length //= 128
+        encoded.append(byte | 128 if length else byte)
+        if not length:
+            return bytes(encoded)
+
+
+class ShadowBroker(object):
+
+    def __init__(self, rtt_sec):
+        self._rtt_sec = rtt_sec
+        self._listener = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        self._listener.bind(("127.0.0.1", 0))
+        self._listener.listen(1)
+        self.port = self._listener.getsockname()[1]
+        self._send_lock = threading.Lock()
+        worker = threading.Thread(target=self._serve)
+        worker.daemon = True
+        worker.start()
+
+    def _serve(self):
+        self._conn, address = self._listener.accept()
+        buffer = bytearray()
+        while True:
+            try:
+                data = self._conn.recv(65536)
+            except socket.error:
+                return
+            if not data:
+                return
+            buffer.extend(data)
+            self._serve_packets(buffer)
+
+    def _serve_packets(self, buffer):
+        while len(buffer) >= 2:
+            remaining_length, multiplier, pos = 0, 1, 1
+            while True:
+                if pos >= len(buffer):
+                    return
+                byte = buffer[pos]
+                pos += 1
+                remaining_length += (byte & 127) * multiplier
+                multiplier *= 128
+                if byte & 128 == 0:
+                    break
+            if len(buffer) < pos + remaining_length:
+                return
+            command = buffer[0] & 0xF0
+            body = bytes(buffer[pos:pos + remaining_length])
+            del buffer[:pos + remaining_length]
+            if command == CONNECT:
+                self._reply(0, struct.pack("!BBBB", CONNACK, 2, 0, 0))
+            elif command == SUBSCRIBE:
+                granted_qos = []
+                offset = 2
+                while offset < len(body):
+                    topic_length = struct.unpack_from("!H", body, offset)[0]
+                    granted_qos.append(body[offset + 2 + topic_length])
+                    offset += 3 + topic_length
+                self._reply(self._rtt_sec, struct.pack("!BB", SUBACK, 2 + len(granted_qos)) + body[:2] + bytes(granted_qos))
+            elif command == UNSUBSCRIBE:
+                self._reply(self._rtt_sec, struct.pack("!BB", UNSUBACK, 2) + body[:2])
+            elif command == PUBLISH:  # QoS0 shadow get request
+                topic_length = struct.unpack_from("!H", body, 0)[0]
+                topic = body[2:2 + topic_length].decode("utf-8")
+                client_token = json.loads(body[2 + topic_length:].decode("utf-8"))["clientToken"]
+                response_topic = (topic + "/accepted").encode("utf-8")
+                response_payload = json.dumps({"state": {}, "version": 1, "clientToken": client_token}).encode("utf-8")
+                variable_part = struct.pack("!H", len(response_topic)) + response_topic + response_payload
+                self._reply(self._rtt_sec, struct.pack("!B", PUBLISH) + _encode_remaining_length(len(variable_part))
+                            + variable_part)
+
+    def _reply(self, delay_sec, packet):
+        timer = threading.Timer(delay_sec, self._send, [packet])
+        timer.daemon = True
+        timer.start()
+
+    def _send(self, packet):
+        with self._send_lock:
+            try:
+                self._conn.sendall(packet)
+            except socket.error:
+                pass
+
+    def close(self):
+        self._listener.close()
+
+
+def measure(shadow_manager_class, shadow_count, rtt_sec):
+    broker = ShadowBroker(rtt_sec)
+    mqtt_core = MqttCore("shadow-subscribe-benchmark", True, MQTTv311, False)
+    endpoint_provider = EndpointProvider()
+    endpoint_provider.set_host("127.0.0.1")
+    endpoint_provider.set_port(broker.port)
+    mqtt_core.configure_endpoint(endpoint_provider)
+    mqtt_core.connect(600)
+    manager = shadow_manager_class(mqtt_core)
+
+    lock = threading.Lock()
+    all_responded = threading.Event()
+    response_times = []
+
+    def on_response(payload, response_status, token):
+        with lock:
+            response_times.append(time.time())
+            if len(response_times) == shadow_count:
+                all_responded.set()
+
+    shadows = [deviceShadow("shadow-%d" % i, True, manager) for i in range(shadow_count)]
+    start = time.time()
+    for shadow in shadows:
+        shadow.shadowGet(on_response, 60)
+    all_responded.wait()
+
+    mqtt_core.disconnect()
+    broker.close()
+    return response_times[0] - start, response_times[-1] - start
+
+
+parser = argparse.ArgumentParser()
+parser.add_argument("-s", "--shadows", action="store", dest="shadows", default="1,100",
+                    help="Comma separated shadow counts")
+parser.add_argument("-t", "--rtt-ms", action="store", dest="rtt_ms", type=float, default=50,
+                    help="Round trip time in milliseconds")
+args = parser.parse_args()
+logging.getLogger("AWSIoTPythonSDK").setLevel(logging.ERROR)
+
+for shadow_count in [int(s) for s in args.shadows.split(",")]:
+    for name, shadow_manager_class in (("legacy", LegacyShadowManager), ("batched", shadowManager)):
+        first_sec, last_sec = measure(shadow_manager_class, shadow_count, args.rtt_ms / 1000.0)
+        print("%3d shadows | %-7s | first response after %7.3f s | last shadow's first response after %7.3f s"
+              % (shadow_count, name, first_sec, last_sec))
@@ -0,0 +1,163 @@
+'''
+/*
+ * Copyright 2010-2017 Amazon.com, Inc. or its affiliates. All Rights Reserved.
+ *
+ * Licensed under the Apache License, Version 2.0 (the "License").
+ * You may not use this file except in compliance with the License.
+ * A copy of the License is located at
+ *
+ *  http://aws.amazon.com/apache2.0
+ *
+ * or in the "license" file accompanying this file. This file is distributed
+ * on an "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either
+ * express or implied. See the License for the specific language governing
+ * permissions and limitations under the License.
+ */
+ '''
+
+# Drives sustained shadowUpdate calls at a fixed rate over a number of device
+# shadows and reports the completed updates per second, the p50/p99 time from
+# shadowUpdate to the accepted callback and the peak thread count sampled
+# during the run. Responses come from an in-process loopback in place of
+# shadowManager, answered after a fixed round trip time on a single thread
+# like the MQTT event consumer. "legacy" plugs in a scheduler and executor
+# that start a threading.Timer per request and a Thread per callback, as
+# deviceShadow used to; "shared" uses the shared timeout scheduler and an
+# ordered callback executor.
+
+import argparse
+import json
+import threading
+import time
+from collections import deque
+from AWSIoTPythonSDK.core.protocol.paho.client import MQTTMessage
+from AWSIoTPythonSDK.core.shadow.deviceShadow import deviceShadow
+from AWSIoTPythonSDK.core.shadow.shadowExecutor import orderedCallbackExecutor
+
+
+class LegacyTimeoutScheduler(object):
+
+    def schedule(self, delay_sec, callback, args=()):
+        timer = threading.Timer(delay_sec, callback, args)
+        timer.start()
+        return timer
+
+
+class LegacyCallbackExecutor(object):
+
+    def submit(self, key, callback, args=()):
+        threading.Thread(target=callback, args=args).start()
+
+
+class LoopbackShadowManager(object):
+
+    def __init__(self, round_trip_sec):
+        self._round_trip_sec = round_trip_sec
+        self._callbacks = {}
+        self._responses = deque()
+        self._condition = threading.Condition()
+        self._version = 0
+        responder = threading.Thread(target=self._respond)
+        responder.daemon = True
+        responder.start()
+
+    def basicShadowSubscribe(self, shadow_name, action, callback):
+        self._callbacks[shadow_name] = callback
+
+    def basicShadowUnsubscribe(self, shadow_name, action):
+        pass
+
+    def basicShadowPublish(self, shadow_name, action, payload):
+        with self._condition:
+            self._responses.append((time.time() + self._round_trip_sec, shadow_name, action,
+                                    json.loads(payload)["clientToken"]))
+            self._condition.notify()
+
+    def _respond(self):
+        while True:
+            with self._condition:
+                while not self._responses:
+                    self._condition.wait()
+                due, shadow_name, action, token = self._responses.popleft()
+            time.sleep(max(due - time.time(), 0))
+            self._version += 1
+            message = MQTTMessage()
+            message.topic = "$aws/things/%s/shadow/%s/accepted" % (shadow_name, action)
+            message.payload = json.dumps({"clientToken": token, "version": self._version}).encode("utf-8")
+            self._callbacks[shadow_name](None, None, message)
+
+
+def run(mode, args):
+    manager = LoopbackShadowManager(args.round_trip_ms / 1000.0)
+    if mode == "legacy":
+        scheduler, executor = LegacyTimeoutScheduler(), LegacyCallbackExecutor()
+    else:
+        scheduler, executor = None, orderedCallbackExecutor(args.workers)
+    shadows = [deviceShadow("benchmark-%d" % i, True, manager, scheduler, executor) for i in range(args.shadows)]
+    sent_at = {}
+    latencies = []
+    lock = threading.Lock()
+
+    def on_response(payload, response_status, token):
+        if args.callback_ms:
+            time.sleep(args.callback_ms / 1000.0)
+        with lock:
+            latencies.append(time.time() - sent_at.pop(token))
+
+    peak_threads = [threading.active_count()]
+    sampling = [True]
+
+    def sample_threads():
+        while sampling[0]:
+            peak_threads[0] = max(peak_threads[0], threading.active_count())
+            time.sleep(0.001)
+
+    sampler = threading.Thread(target=sample_threads)
+    sampler.start()
+
+    interval = 1.0 / args.rate
+    start = time.time()
+    next_send = start
+    sent = 0
+    while time.time() - start < args.window:
+        with lock:
+            token = shadows[sent % len(shadows)].shadowUpdate('{"state":{"reported":{"n":%d}}}' % sent,
+                                                             on_response, args.timeout)
+            sent_at[token] = time.time()
+        sent += 1
+        next_send += interval
+        time.sleep(max(next_send - time.time(), 0))
+    deadline = time.time() + args.timeout
+    while len(latencies) < sent and time.time() < deadline:
+        time.sleep(0.01)
+    elapsed = time.time() - start
+    sampling[0] = False
+    sampler.join()
+
+    latencies.sort()
+    completed = len(latencies)
+    p50 = latencies[completed // 2] * 1000 if completed else 0
+    p99 = latencies[min(int(completed * 0.99), completed - 1)] * 1000 if completed else 0
+    print("%6s | %5d/%5d updates | %8.1f updates/s | p50 %7.2f ms | p99 %7.2f ms | peak %4d threads"
+          % (mode, completed, sent, completed / elapsed, p50, p99, peak_threads[0]))
+
+
+parser = argparse.ArgumentParser()
+parser.add_argument("-r", "--rate", action="store", dest="rate", type=float, default=50.0,
+                    help="Target shadow updates per second")
+parser.add_argument("-w", "--window", action="store", dest="window", type=float, default=5.0,
+                    help="Measurement window in seconds")
+parser.add_argument("-s", "--shadows", action="store", dest="shadows", type=int, default=4,
+                    help="Number of device shadows the updates are spread over")
+parser.add_argument("-l", "--round-trip-ms", action="store", dest="round_trip_ms", type=float, default=50.0,
+                    help="Time from publishing a shadow request to its accepted response, in milliseconds")
+parser.add_argument("-n", "--workers", action="store", dest="workers", type=int, default=2,
+                    help="Callback executor worker threads of the shared mode")
+parser.add_argument("-c", "--callback-ms", action="store", dest="callback_ms", type=float, default=0.0,
+                    help="Time spent in each user callback, in milliseconds")
+parser.add_argument("-t", "--timeout", action="store", dest="timeout", type=float, default=5.0,
+                    help="Shadow request timeout in seconds")
+args = parser.parse_args()
+
+for mode in ("legacy", "shared"):
+    run(mode, args)
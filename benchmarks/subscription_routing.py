@@ -0,0 +1,85 @@
+'''
+/*
+ * Copyright 2010-2017 Amazon.com, Inc. or its affiliates. All Rights Reserved.
+ *
+ * Licensed under the Apache License, Version 2.0 (the "License").
+ * You may not use this file except in compliance with the License.
+ * A copy of the License is located at
+ *
+ *  http://aws.amazon.com/apache2.0
+ *
+ * or in the "license" file accompanying this file. This file is distributed
+ * on an "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either
+ * express or implied. See the License for the specific language governing
+ * permissions and limitations under the License.
+ */
+ '''
+
+# Compares the per-message cost of routing an inbound PUBLISH by scanning every
+# subscription with topic_matches_sub against the MQTTMatcher topic index.
+
+import argparse
+import random
+import timeit
+from AWSIoTPythonSDK.core.protocol.paho.client import topic_matches_sub
+from AWSIoTPythonSDK.core.protocol.paho.matcher import MQTTMatcher
+
+
+def build_filters(count):
+    filters = []
+    for i in range(count):
+        kind = i % 4
+        if kind == 0:
+            filters.append("devices/%d/telemetry" % i)
+        elif kind == 1:
+            filters.append("devices/%d/+/status" % i)
+        elif kind == 2:
+            filters.append("$aws/things/thing%d/shadow/#" % i)
+        else:
+            filters.append("fleet/%d/#" % i)
+    return filters
+
+
+def build_topics(filters, count):
+    topics = []
+    for topic_filter in random.sample(filters, min(count, len(filters))):
+        topics.append(topic_filter.replace("+", "sensor").replace("#", "update/accepted"))
+    topics.append("unmatched/topic/for/everyone")
+    return topics
+
+
+def linear_scan(records, topic):
+    return [record for topic_filter, record in records if topic_matches_sub(topic_filter, topic)]
+
+
+def run(count, iterations):
+    filters = build_filters(count)
+    topics = build_topics(filters, 50)
+    subscription_map = dict((topic_filter, (0, None, None)) for topic_filter in filters)
+    matcher = MQTTMatcher()
+    for topic_filter in filters:
+        matcher[topic_filter] = (0, None, None)
+
+    def scan():
+        for topic in topics:
+            linear_scan(list(subscription_map.items()), topic)
+
+    def match():
+        for topic in topics:
+            list(matcher.iter_match(topic))
+
+    scan_sec = min(timeit.repeat(scan, number=iterations, repeat=3)) / (iterations * len(topics))
+    match_sec = min(timeit.repeat(match, number=iterations, repeat=3)) / (iterations * len(topics))
+    print("%8d subscriptions | linear scan %12.2f us/msg | matcher %8.2f us/msg | speedup %8.1fx"
+          % (count, scan_sec * 1e6, match_sec * 1e6, scan_sec / match_sec))
+
+
+parser = argparse.ArgumentParser()
+parser.add_argument("-c", "--counts", action="store", dest="counts", default="10,100,1000,10000",
+                    help="Comma separated subscription counts")
+parser.add_argument("-n", "--iterations", action="store", dest="iterations", type=int, default=5,
+                    help="Routing rounds per measurement")
+args = parser.parse_args()
+
+for subscription_count in [int(c) for c in args.counts.split(",")]:
+    run(subscription_count, args.iterations)
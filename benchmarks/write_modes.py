@@ -0,0 +1,157 @@
+'''
+/*
+ * Copyright 2010-2017 Amazon.com, Inc. or its affiliates. All Rights Reserved.
+ *
+ * Licensed under the Apache License, Version 2.0 (the "License").
+ * You may not use this file except in compliance with the License.
+ * A copy of the License is located at
+ *
+ *  http://aws.amazon.com/apache2.0
+ *
+ * or in the "license" file accompanying this file. This file is distributed
+ * on an "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either
+ * express or implied. See the License for the specific language governing
+ * permissions and limitations under the License.
+ */
+ '''
+
+# Publishes QoS0 messages through a paho client whose network thread writes to
+# a socketpair, and reads them back on the other end. For each write mode it
+# reports:
+# - burst: messages per second and socket writes per message when publishing
+#   as fast as possible;
+# - paced: p50/p99 enqueue-to-wire latency when publishing at a fixed rate.
+# Each payload carries the time it was handed to publish(), so latency is
+# measured from publish() to the moment the bytes can be read off the socket.
+
+import argparse
+import socket
+import struct
+import threading
+import time
+from AWSIoTPythonSDK.core.protocol.paho.client import Client
+from AWSIoTPythonSDK.core.protocol.paho.client import WRITE_MODE_THROUGHPUT
+from AWSIoTPythonSDK.core.protocol.paho.client import WRITE_MODE_LATENCY
+
+TOPIC = "telemetry/device"
+clock = getattr(time, "perf_counter", time.time)
+
+
+class CountingSocket(object):
+
+    def __init__(self, sock):
+        self._sock = sock
+        self.sends = 0
+
+    def send(self, data):
+        self.sends += 1
+        return self._sock.send(data)
+
+    def __getattr__(self, name):
+        return getattr(self._sock, name)
+
+
+class Receiver(threading.Thread):
+
+    def __init__(self, sock, count):
+        super(Receiver, self).__init__()
+        self._sock = sock
+        self._count = count
+        self.latencies = []
+
+    def run(self):
+        buf = bytearray()
+        while len(self.latencies) < self._count:
+            data = self._sock.recv(262144)
+            now = clock()
+            if not data:
+                return
+            buf.extend(data)
+            pos = 0
+            while True:
+                # Fixed header: command byte + remaining length varint
+                if len(buf) - pos < 2:
+                    break
+                remaining_length, multiplier, i = 0, 1, pos + 1
+                while i < len(buf):
+                    byte = buf[i]
+                    remaining_length += (byte & 127) * multiplier
+                    multiplier *= 128
+                    i += 1
+                    if not byte & 128:
+                        break
+                else:
+                    break
+                if len(buf) - i < remaining_length:
+                    break
+                topic_length = struct.unpack_from("!H", buf, i)[0]
+                sent_at = struct.unpack_from("!d", buf, i + 2 + topic_length)[0]
+                self.latencies.append(now - sent_at)
+                pos = i + remaining_length
+            del buf[:pos]
+
+
+def percentile(values, p):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * p))]
+
+
+def measure(write_mode, count, payload_size, rate):
+    local_sock, remote_sock = socket.socketpair()
+    local_sock.setblocking(0)
+    counting_sock = CountingSocket(local_sock)
+    client = Client("benchmark")
+    client.write_mode_set(write_mode)
+    client._sock = counting_sock
+    running = [True]
+
+    def network_loop():
+        while running[0]:
+            client.loop(0.1)
+
+    client._thread = threading.Thread(target=network_loop)
+    client._thread.daemon = True
+    receiver = Receiver(remote_sock, count)
+    receiver.start()
+    client._thread.start()
+
+    padding = b"x" * max(0, payload_size - 8)
+    interval = 1.0 / rate if rate else 0
+    start = clock()
+    for i in range(count):
+        if interval:
+            delay = start + i * interval - clock()
+            if delay > 0:
+                time.sleep(delay)
+        client.publish(TOPIC, bytearray(struct.pack("!d", clock()) + padding), 0)
+    receiver.join()
+    elapsed = clock() - start
+
+    running[0] = False
+    client._thread.join()
+    client._sock = None
+    local_sock.close()
+    remote_sock.close()
+    return count / elapsed, counting_sock.sends / float(count), receiver.latencies
+
+
+def run(write_mode, name, args):
+    rate, sends, _ = measure(write_mode, args.count, args.size, 0)
+    _, _, latencies = measure(write_mode, args.paced_count, args.size, args.rate)
+    print("%-10s | burst %9.0f msg/s %6.3f writes/msg | paced @%d msg/s p50 %7.1f us p99 %7.1f us"
+          % (name, rate, sends, args.rate, percentile(latencies, 0.5) * 1e6, percentile(latencies, 0.99) * 1e6))
+
+
+parser = argparse.ArgumentParser()
+parser.add_argument("-n", "--count", action="store", dest="count", type=int, default=100000,
+                    help="Messages in the burst run")
+parser.add_argument("-p", "--pacedCount", action="store", dest="paced_count", type=int, default=5000,
+                    help="Messages in the paced run")
+parser.add_argument("-r", "--rate", action="store", dest="rate", type=int, default=2000,
+                    help="Publish rate of the paced run, in messages/second")
+parser.add_argument("-s", "--size", action="store", dest="size", type=int, default=64,
+                    help="Payload size in bytes")
+args = parser.parse_args()
+
+run(WRITE_MODE_THROUGHPUT, "throughput", args)
+run(WRITE_MODE_LATENCY, "latency", args)
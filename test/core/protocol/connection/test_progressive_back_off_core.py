@@ -72,3 +72,25 @@ class TestProgressiveBackOffCore():
         # Now "disconnect"
         self._dummyBackOffCore.backOff()
         assert self._dummyBackOffCore._currentBackoffTimeSecond == self._dummyBackOffCore._baseReconnectTimeSecond * 2 * 2
+
+    # Check that nextBackOffTimeSecond returns the backoff time instead of blocking
+    def test_nextBackOffTimeSecondDoesNotBlock(self):
+        self._dummyBackOffCore.configTime(1, 32, 20)
+        start = time.time()
+        assert self._dummyBackOffCore.nextBackOffTimeSecond() == 1
+        assert self._dummyBackOffCore.nextBackOffTimeSecond() == 2
+        assert time.time() - start < 1
+        assert self._dummyBackOffCore._currentBackoffTimeSecond == 4
+
+    # Check that a connection tracked without a timer resets the backoff time once stable
+    def test_markedConnectionResetsBackoffTimeWhenStable(self):
+        self._dummyBackOffCore.configTime(1, 32, 5)
+        self._dummyBackOffCore.nextBackOffTimeSecond()
+        self._dummyBackOffCore.nextBackOffTimeSecond()
+        self._dummyBackOffCore.markConnectionStart()  # Called when CONNACK arrives
+        self._dummyBackOffCore._connectedSinceTimeSecond -= self._dummyBackOffCore._minimumConnectTimeSecond + 1
+        # Connection was stable, the next backoff starts over from base
+        assert self._dummyBackOffCore.nextBackOffTimeSecond() == self._dummyBackOffCore._baseReconnectTimeSecond
+        # Now simulate an unstable connection
+        self._dummyBackOffCore.markConnectionStart()
+        assert self._dummyBackOffCore.nextBackOffTimeSecond() == self._dummyBackOffCore._baseReconnectTimeSecond * 2
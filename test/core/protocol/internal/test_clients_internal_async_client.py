@@ -8,6 +8,7 @@ from AWSIoTPythonSDK.core.protocol.paho.client import MQTTv311
 from AWSIoTPythonSDK.core.protocol.paho.client import Client
 from AWSIoTPythonSDK.core.protocol.paho.client import MQTT_ERR_SUCCESS
 from AWSIoTPythonSDK.core.protocol.paho.client import MQTT_ERR_ERRNO
+from AWSIoTPythonSDK.core.protocol.paho.client import SUBACK_ERROR
 try:
     from mock import patch
     from mock import MagicMock
@@ -270,6 +271,36 @@ class TestClientsInternalAsyncClient:
         assert actual_rc == expected_rc
         assert actual_mid == expected_mid
 
+    def test_subscribe_batch_sends_one_packet(self):
+        self.mock_paho_client.subscribe.return_value = DUMMY_SUCCESS_RC, DUMMY_REQUEST_MID
+        subscriptions = [(DUMMY_TOPIC + str(i), DUMMY_QOS, MagicMock()) for i in range(3)]
+
+        actual_rc, actual_mid = self.internal_async_client.subscribe_batch(subscriptions)
+
+        self.mock_paho_client.subscribe.assert_called_once_with([(DUMMY_TOPIC + str(i), DUMMY_QOS) for i in range(3)])
+        assert actual_rc == DUMMY_SUCCESS_RC
+        assert actual_mid == DUMMY_REQUEST_MID
+        assert len(self.internal_async_client.get_event_callback_map()) == 1
+
+    def test_subscribe_batch_splits_suback(self):
+        self.mock_paho_client.subscribe.return_value = DUMMY_SUCCESS_RC, DUMMY_REQUEST_MID
+        subscriptions = [(DUMMY_TOPIC + str(i), DUMMY_QOS, MagicMock()) for i in range(3)]
+        self.internal_async_client.subscribe_batch(subscriptions)
+
+        self.internal_async_client.invoke_event_callback(DUMMY_REQUEST_MID, data=(1, SUBACK_ERROR, 0))
+
+        for (topic, qos, ack_callback), granted_qos in zip(subscriptions, (1, SUBACK_ERROR, 0)):
+            ack_callback.assert_called_once_with(mid=DUMMY_REQUEST_MID, data=(granted_qos,))
+        assert len(self.internal_async_client.get_event_callback_map()) == 0
+
+    def test_subscribe_batch_failure_rc(self):
+        self.mock_paho_client.subscribe.return_value = DUMMY_FAILURE_RC, None
+
+        actual_rc, actual_mid = self.internal_async_client.subscribe_batch([(DUMMY_TOPIC, DUMMY_QOS, MagicMock())])
+
+        assert actual_rc == DUMMY_FAILURE_RC
+        assert len(self.internal_async_client.get_event_callback_map()) == 0
+
     def test_unsubscribe_success_rc(self):
         self._internal_test_unsubscribe_with(DUMMY_REQUEST_MID, DUMMY_SUCCESS_RC)
         self._internal_test_unsubscribe_with(DUMMY_REQUEST_MID, DUMMY_SUCCESS_RC, NonCallableMagicMock())
@@ -1,5 +1,7 @@
 import AWSIoTPythonSDK.core.protocol.internal.queues as Q
 from AWSIoTPythonSDK.core.protocol.internal.queues import AppendResults
+from AWSIoTPythonSDK.core.protocol.internal.requests import QueueableRequest
+from AWSIoTPythonSDK.core.protocol.internal.requests import RequestTypes
 import pytest
 
 
@@ -19,7 +21,7 @@ class TestOfflineRequestQueue():
         answer = list(range(0, numberOfMessages))
         for i in range(0, numberOfMessages):
             coolQueue.append(i)
-        assert answer == coolQueue
+        assert answer == list(coolQueue)
 
     # Check that new elements are dropped for DROPNEWEST configuration
     def test_DropNewest(self):
@@ -30,7 +32,7 @@ class TestOfflineRequestQueue():
         for i in range(0, numberOfMessages):
             if coolQueue.append(i) == AppendResults.APPEND_FAILURE_QUEUE_FULL:
                 fullCount += 1
-        assert answer == coolQueue
+        assert answer == list(coolQueue)
         assert 7 == fullCount
 
     # Check that old elements are dropped for DROPOLDEST configuration
@@ -42,7 +44,7 @@ class TestOfflineRequestQueue():
         for i in range(0, numberOfMessages):
             if coolQueue.append(i) == AppendResults.APPEND_FAILURE_QUEUE_FULL:
                 fullCount += 1
-        assert answer == coolQueue
+        assert answer == list(coolQueue)
         assert 7 == fullCount
 
     # Check infinite queue
@@ -52,7 +54,7 @@ class TestOfflineRequestQueue():
         answer = list(range(0, numberOfMessages))
         for i in range(0, numberOfMessages):
             coolQueue.append(i)
-        assert answer == coolQueue  # Nothing should be dropped since response section is infinite
+        assert answer == list(coolQueue)  # Nothing should be dropped since response section is infinite
 
     # Check disabled queue
     def test_Disabled(self):
@@ -63,5 +65,42 @@ class TestOfflineRequestQueue():
         for i in range(0, numberOfMessages):
             if coolQueue.append(i) == AppendResults.APPEND_FAILURE_QUEUE_DISABLED:
                 disableFailureCount += 1
-        assert answer == coolQueue  # Nothing should be appended since the queue is disabled
+        assert answer == list(coolQueue)  # Nothing should be appended since the queue is disabled
         assert numberOfMessages == disableFailureCount
+
+    # Check that requests are dropped once the queue is full in bytes, for DROPNEWEST configuration
+    def test_DropNewestBytes(self):
+        coolQueue = Q.OfflineRequestQueue(-1, 1, 30)  # Infinite in number, 30 bytes of topics and payloads
+        for i in range(0, 5):
+            coolQueue.append(self._createPublishRequest(i, "0123456789"))  # 11 bytes each
+        assert [request.data[0] for request in coolQueue] == ["0", "1"]
+        assert 22 == coolQueue.get_byte_count()
+
+    # Check that as many old requests as needed are dropped to make room in bytes, for DROPOLDEST configuration
+    def test_DropOldestBytes(self):
+        coolQueue = Q.OfflineRequestQueue(-1, 0, 30)
+        for i in range(0, 3):
+            coolQueue.append(self._createPublishRequest(i, "0123456789"))
+        assert [request.data[0] for request in coolQueue] == ["1", "2"]
+        assert AppendResults.APPEND_FAILURE_QUEUE_FULL == coolQueue.append(self._createPublishRequest(3, "0" * 20))
+        assert [request.data[0] for request in coolQueue] == ["3"]
+        assert 21 == coolQueue.get_byte_count()
+
+    # Check that a request larger than the whole queue is dropped without emptying the queue
+    def test_DropOversized(self):
+        coolQueue = Q.OfflineRequestQueue(-1, 0, 30)
+        coolQueue.append(self._createPublishRequest(0, "0123456789"))
+        assert AppendResults.APPEND_FAILURE_QUEUE_FULL == coolQueue.append(self._createPublishRequest(1, "0" * 30))
+        assert [request.data[0] for request in coolQueue] == ["0"]
+
+    # Check that taking requests off the queue gives their bytes back
+    def test_PopleftBytes(self):
+        coolQueue = Q.OfflineRequestQueue(-1, 1, 30)
+        coolQueue.append(self._createPublishRequest(0, b"0123456789"))
+        coolQueue.append(QueueableRequest(RequestTypes.SUBSCRIBE, ("topic", 1, None, None)))
+        assert 16 == coolQueue.get_byte_count()
+        assert "0" == coolQueue.popleft().data[0]
+        assert 5 == coolQueue.get_byte_count()
+
+    def _createPublishRequest(self, index, payload):
+        return QueueableRequest(RequestTypes.PUBLISH, (str(index), payload, 0, False))
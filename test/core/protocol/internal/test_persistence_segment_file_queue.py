@@ -0,0 +1,204 @@
+from AWSIoTPythonSDK.core.protocol.internal.persistence import SegmentFileQueue
+import os
+import pytest
+
+
+RECORD_COUNT = 100
+
+
+def _create_record(index):
+    return ("record %d" % index).encode("utf-8")
+
+
+def _pop_and_ack(queue):
+    record_id, record = queue.pop()
+    queue.ack(record_id)
+    return record
+
+
+def _list_segments(directory):
+    return sorted(file_name for file_name in os.listdir(str(directory)) if file_name.endswith(".seg"))
+
+
+class TestSegmentFileQueue:
+
+    def _open(self, directory, segment_size_bytes=1024):
+        return SegmentFileQueue(str(directory), segment_size_bytes, 1000, 1000)
+
+    def test_invalid_segment_size(self, tmpdir):
+        with pytest.raises(ValueError):
+            self._open(tmpdir, 0)
+
+    def test_records_come_out_in_order(self, tmpdir):
+        queue = self._open(tmpdir)
+        for i in range(RECORD_COUNT):
+            queue.append(_create_record(i))
+
+        assert len(queue) == RECORD_COUNT
+        assert queue.get_byte_count() == sum(len(_create_record(i)) for i in range(RECORD_COUNT))
+        assert [queue.pop()[1] for i in range(RECORD_COUNT)] == [_create_record(i) for i in range(RECORD_COUNT)]
+        assert queue.pop() is None
+        assert queue.get_byte_count() == 0
+
+    def test_records_survive_reopen(self, tmpdir):
+        queue = self._open(tmpdir)
+        for i in range(RECORD_COUNT):
+            queue.append(_create_record(i))
+        for i in range(10):
+            _pop_and_ack(queue)
+        queue.close()
+
+        queue = self._open(tmpdir)
+
+        assert len(queue) == RECORD_COUNT - 10
+        assert queue.pop()[1] == _create_record(10)
+
+    def test_unacked_records_are_redelivered_after_reopen(self, tmpdir):
+        queue = self._open(tmpdir)
+        for i in range(RECORD_COUNT):
+            queue.append(_create_record(i))
+        record_ids = [queue.pop()[0] for i in range(3)]
+        queue.ack(record_ids[1])
+        queue.ack(record_ids[2])
+        queue.close()
+
+        queue = self._open(tmpdir)
+
+        assert len(queue) == RECORD_COUNT  # Acked records after the oldest unacked one come again too
+        record_ids = [queue.pop()[0] for i in range(3)]
+        for record_id in record_ids:
+            queue.ack(record_id)
+        queue.close()
+        assert len(self._open(tmpdir)) == RECORD_COUNT - 3
+
+    def test_nacked_record_is_handed_out_again(self, tmpdir):
+        queue = self._open(tmpdir)
+        for i in range(3):
+            queue.append(_create_record(i))
+        first_id, first_record = queue.pop()
+        queue.pop()
+
+        queue.nack(first_id)
+
+        assert len(queue) == 2
+        assert queue.get_byte_count() == len(_create_record(0)) + len(_create_record(2))
+        assert queue.pop() == (first_id, first_record)
+        assert queue.pop()[1] == _create_record(2)
+
+    def test_popped_records_are_redelivered_after_crash(self, tmpdir):
+        queue = self._open(tmpdir)
+        for i in range(RECORD_COUNT):
+            queue.append(_create_record(i))
+        queue.flush()
+        for i in range(10):
+            _pop_and_ack(queue)
+        # No close, the checkpoint after the flush is lost
+
+        queue = self._open(tmpdir)
+
+        assert len(queue) == RECORD_COUNT
+        assert queue.pop()[1] == _create_record(0)
+
+    def test_torn_record_is_truncated(self, tmpdir):
+        queue = self._open(tmpdir, 1024 * 1024)
+        for i in range(10):
+            queue.append(_create_record(i))
+        queue.close()
+        segment_path = os.path.join(str(tmpdir), _list_segments(tmpdir)[-1])
+        with open(segment_path, "ab") as segment_file:
+            segment_file.write(b"\x00\x00\x01\x00torn")  # Header promising more bytes than were written
+
+        queue = self._open(tmpdir, 1024 * 1024)
+        queue.append(_create_record(10))
+
+        assert [queue.pop()[1] for i in range(11)] == [_create_record(i) for i in range(11)]
+
+    def test_corrupt_record_is_truncated(self, tmpdir):
+        queue = self._open(tmpdir, 1024 * 1024)
+        for i in range(10):
+            queue.append(_create_record(i))
+        queue.close()
+        segment_path = os.path.join(str(tmpdir), _list_segments(tmpdir)[-1])
+        with open(segment_path, "r+b") as segment_file:
+            segment_file.seek(-1, os.SEEK_END)
+            segment_file.write(b"X")
+
+        queue = self._open(tmpdir, 1024 * 1024)
+
+        assert len(queue) == 9
+        assert queue.pop()[1] == _create_record(0)
+
+    def test_record_corrupted_after_append_is_skipped(self, tmpdir):
+        queue = self._open(tmpdir, 1024 * 1024)
+        for i in range(3):
+            queue.append(_create_record(i))
+        queue.flush()
+        segment_path = os.path.join(str(tmpdir), _list_segments(tmpdir)[-1])
+        with open(segment_path, "r+b") as segment_file:
+            segment_file.seek(8 + len(_create_record(0)) - 1)  # Last byte of the first record
+            segment_file.write(b"X")
+
+        assert _pop_and_ack(queue) == _create_record(1)
+        assert _pop_and_ack(queue) == _create_record(2)
+        assert queue.pop() is None
+        assert len(queue) == 0
+        assert queue.get_byte_count() == 0
+
+    def test_corrupt_record_length_skips_rest_of_segment(self, tmpdir):
+        queue = self._open(tmpdir, 64)
+        for i in range(10):
+            queue.append(_create_record(i))
+        queue.flush()
+        segments = _list_segments(tmpdir)
+        assert len(segments) > 2
+        records_per_segment = 64 // (8 + len(_create_record(0)))
+        with open(os.path.join(str(tmpdir), segments[0]), "r+b") as segment_file:
+            segment_file.write(b"\xff\xff\xff\xff")  # Length of the first record
+
+        assert [_pop_and_ack(queue) for i in range(10 - records_per_segment)] == \
+            [_create_record(i) for i in range(records_per_segment, 10)]
+        assert queue.pop() is None
+
+    def test_corrupt_record_length_in_last_segment_drops_the_rest(self, tmpdir):
+        queue = self._open(tmpdir, 1024 * 1024)
+        for i in range(3):
+            queue.append(_create_record(i))
+        queue.flush()
+        segment_path = os.path.join(str(tmpdir), _list_segments(tmpdir)[-1])
+        with open(segment_path, "r+b") as segment_file:
+            segment_file.write(b"\xff\xff\xff\xff")
+
+        assert queue.pop() is None
+        assert len(queue) == 0
+        queue.append(_create_record(3))
+        assert _pop_and_ack(queue) == _create_record(3)
+
+    def test_acked_segments_are_deleted(self, tmpdir):
+        queue = self._open(tmpdir, 256)
+        for i in range(RECORD_COUNT):
+            queue.append(_create_record(i))
+        segment_count = len(_list_segments(tmpdir))
+        assert segment_count > 2
+
+        record_ids = [queue.pop()[0] for i in range(RECORD_COUNT // 2)]
+        assert len(_list_segments(tmpdir)) == segment_count  # Read through, but not acked
+        for record_id in record_ids:
+            queue.ack(record_id)
+
+        assert 1 < len(_list_segments(tmpdir)) < segment_count
+
+    def test_drained_queue_leaves_one_empty_segment(self, tmpdir):
+        queue = self._open(tmpdir, 256)
+        for i in range(RECORD_COUNT):
+            queue.append(_create_record(i))
+        record_ids = [queue.pop()[0] for i in range(RECORD_COUNT)]
+        assert len(_list_segments(tmpdir)) > 1  # Drained, but the last record is not acked yet
+        for record_id in record_ids:
+            queue.ack(record_id)
+
+        segments = _list_segments(tmpdir)
+        assert len(segments) == 1
+        assert os.path.getsize(os.path.join(str(tmpdir), segments[0])) == 0
+
+        queue.close()
+        assert len(self._open(tmpdir, 256)) == 0
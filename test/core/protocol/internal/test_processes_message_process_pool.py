@@ -0,0 +1,152 @@
+from AWSIoTPythonSDK.core.protocol.internal.processes import MessageProcessPool
+from AWSIoTPythonSDK.core.protocol.paho.client import MQTTMessage
+from threading import Event
+from threading import Lock
+import json
+import os
+import threading
+import time
+import pytest
+
+
+DUMMY_TOPIC = "topic/cool"
+MESSAGE_COUNT = 100
+TIMEOUT_SEC = 10
+
+
+# Handlers have to be picklable, so they live at module level
+def _decode_with_pid(topic, payload):
+    return topic, json.loads(payload.decode("utf-8"))["index"], os.getpid()
+
+
+def _trouble_maker(topic, payload):
+    if json.loads(payload.decode("utf-8"))["index"] % 2:
+        raise ValueError("Odd one out")
+    return json.loads(payload.decode("utf-8"))["index"]
+
+
+def _create_message(index):
+    message = MQTTMessage()
+    message.mid = index
+    message.topic = DUMMY_TOPIC
+    message.qos = 1
+    message.payload = json.dumps({"index": index}).encode("utf-8")
+    return message
+
+
+class TestMessageProcessPool:
+
+    def setup_method(self, test_method):
+        self.message_process_pool = MessageProcessPool(2, 10, 0.01)
+        self.lock = Lock()
+        self.results = []
+        self.done = Event()
+
+    def teardown_method(self, test_method):
+        self.message_process_pool.close()
+
+    def _result_callback(self, client, userdata, message):
+        with self.lock:
+            self.results.append(message)
+            if len(self.results) == self.expected_count:
+                self.done.set()
+
+    def test_invalid_process_count(self):
+        with pytest.raises(ValueError):
+            MessageProcessPool(0, 10, 0.01)
+
+    def test_invalid_batch_size(self):
+        with pytest.raises(ValueError):
+            MessageProcessPool(1, 0, 0.01)
+
+    def test_results_come_back_in_order(self):
+        self.expected_count = MESSAGE_COUNT
+        message_callback = self.message_process_pool.create_message_callback(_decode_with_pid, self._result_callback)
+
+        for i in range(MESSAGE_COUNT):
+            message_callback(None, None, _create_message(i))
+
+        assert self.done.wait(TIMEOUT_SEC)
+        assert [message.payload[1] for message in self.results] == list(range(MESSAGE_COUNT))
+        assert [message.mid for message in self.results] == list(range(MESSAGE_COUNT))
+        assert all(message.topic == DUMMY_TOPIC and message.qos == 1 for message in self.results)
+        assert all(message.payload[2] != os.getpid() for message in self.results)  # Ran in worker processes
+
+    def test_handler_exception_skips_only_that_message(self):
+        self.expected_count = MESSAGE_COUNT // 2
+        message_callback = self.message_process_pool.create_message_callback(_trouble_maker, self._result_callback)
+
+        for i in range(MESSAGE_COUNT):
+            message_callback(None, None, _create_message(i))
+
+        assert self.done.wait(TIMEOUT_SEC)
+        assert [message.payload for message in self.results] == list(range(0, MESSAGE_COUNT, 2))
+
+    def test_partial_batch_is_sent_after_latency(self):
+        self.expected_count = 1
+        message_callback = self.message_process_pool.create_message_callback(_decode_with_pid, self._result_callback)
+
+        message_callback(None, None, _create_message(0))  # Far from a full batch
+
+        assert self.done.wait(TIMEOUT_SEC)
+
+    def test_close_flushes_pending_messages(self):
+        self.expected_count = MESSAGE_COUNT - 5
+        self.message_process_pool = MessageProcessPool(2, 10, 5)  # Batches would otherwise wait 5 seconds
+        message_callback = self.message_process_pool.create_message_callback(_decode_with_pid, self._result_callback)
+        for i in range(MESSAGE_COUNT - 5):  # Last batch is not full
+            message_callback(None, None, _create_message(i))
+
+        self.message_process_pool.close()
+
+        assert self.done.wait(TIMEOUT_SEC)
+
+    def test_messages_after_close_are_dropped(self):
+        self.expected_count = 1
+        message_callback = self.message_process_pool.create_message_callback(_decode_with_pid, self._result_callback)
+        message_callback(None, None, _create_message(0))
+        assert self.done.wait(TIMEOUT_SEC)
+
+        self.message_process_pool.close()
+        message_callback(None, None, _create_message(1))
+
+        assert len(self.results) == 1
+
+    def test_messages_after_close_before_use_are_dropped(self):
+        self.message_process_pool.close()
+        message_callback = self.message_process_pool.create_message_callback(_decode_with_pid, self._result_callback)
+
+        message_callback(None, None, _create_message(0))
+
+        time.sleep(0.1)
+        assert self.results == []
+
+    def test_reopen_after_close(self):
+        self.expected_count = 2
+        message_callback = self.message_process_pool.create_message_callback(_decode_with_pid, self._result_callback)
+        message_callback(None, None, _create_message(0))
+        self.message_process_pool.close()
+
+        self.message_process_pool.open()
+        message_callback(None, None, _create_message(1))
+
+        assert self.done.wait(TIMEOUT_SEC)
+        assert [message.payload[1] for message in self.results] == [0, 1]
+
+    def test_message_waiting_for_room_during_close_is_dropped(self):
+        self.message_process_pool.close()
+        for worker in self.message_process_pool._workers:
+            worker.join(TIMEOUT_SEC)
+        self.message_process_pool._is_closed = False  # Running, with a batching thread that is stuck
+        for i in range(self.message_process_pool._max_pending_messages):
+            self.message_process_pool._pending_messages.append((_decode_with_pid, self._result_callback, _create_message(i)))
+        message_callback = self.message_process_pool.create_message_callback(_decode_with_pid, self._result_callback)
+        submitter = threading.Thread(target=message_callback, args=(None, None, _create_message(-1)))
+        submitter.start()
+        time.sleep(0.1)
+
+        self.message_process_pool.close()
+
+        submitter.join(TIMEOUT_SEC)
+        assert not submitter.is_alive()
+        assert all(message.mid != -1 for handler, callback, message in self.message_process_pool._pending_messages)
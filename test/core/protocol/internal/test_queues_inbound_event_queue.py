@@ -0,0 +1,144 @@
+from AWSIoTPythonSDK.core.protocol.internal.queues import InboundEventQueue
+from AWSIoTPythonSDK.core.protocol.internal.events import EventTypes
+from AWSIoTPythonSDK.core.protocol.internal.events import FixedEventMids
+from AWSIoTPythonSDK.core.protocol.paho.client import MQTTMessage
+from AWSIoTPythonSDK.core.util.enums import InboundQueueFullPolicyTypes
+try:
+    from mock import MagicMock
+except:
+    from unittest.mock import MagicMock
+
+
+DUMMY_TOPIC = "topic/cool"
+DUMMY_PAYLOAD = b"0123456789"
+DUMMY_MESSAGE_SIZE = len(DUMMY_TOPIC) + len(DUMMY_PAYLOAD)
+DUMMY_PUBACK_MID = 89757
+
+
+def _create_message_event(index, qos=0):
+    message = MQTTMessage()
+    message.mid = index
+    message.topic = DUMMY_TOPIC
+    message.payload = DUMMY_PAYLOAD
+    message.qos = qos
+    return FixedEventMids.MESSAGE_MID, EventTypes.MESSAGE, message
+
+
+class TestInboundEventQueue:
+
+    def setup_method(self, test_method):
+        self.pause_reading = MagicMock()
+        self.resume_reading = MagicMock()
+        self.event_queue = InboundEventQueue()
+        self.event_queue.set_read_controls(self.pause_reading, self.resume_reading)
+
+    def _queued_mids(self):
+        return [event[2].mid for event in self.event_queue.queue if event[1] == EventTypes.MESSAGE]
+
+    def _take_all(self):
+        # The way the event consumer drains the queue
+        with self.event_queue.mutex:
+            events = list(self.event_queue.queue)
+            self.event_queue.queue.clear()
+        return events
+
+    def test_unbounded_by_default(self):
+        for i in range(1000):
+            self.event_queue.put(_create_message_event(i))
+
+        assert self.event_queue.get_message_count() == 1000
+        assert self.event_queue.get_byte_count() == 1000 * DUMMY_MESSAGE_SIZE
+        assert self.event_queue.get_dropped_message_count() == 0
+
+    def test_drop_newest_qos0(self):
+        self.event_queue.configure_limits(3, 0, InboundQueueFullPolicyTypes.DROP_NEWEST_QOS0)
+
+        for i in range(5):
+            self.event_queue.put(_create_message_event(i))
+
+        assert self._queued_mids() == [0, 1, 2]
+        assert self.event_queue.get_dropped_message_count() == 2
+        assert self.event_queue.get_dropped_byte_count() == 2 * DUMMY_MESSAGE_SIZE
+        self.pause_reading.assert_not_called()
+
+    def test_drop_oldest_qos0_keeps_qos1(self):
+        self.event_queue.configure_limits(3, 0, InboundQueueFullPolicyTypes.DROP_OLDEST_QOS0)
+
+        self.event_queue.put(_create_message_event(0, qos=1))
+        for i in range(1, 5):
+            self.event_queue.put(_create_message_event(i))
+
+        assert self._queued_mids() == [0, 3, 4]
+        assert self.event_queue.get_dropped_message_count() == 2
+
+    def test_byte_limit(self):
+        self.event_queue.configure_limits(0, 2 * DUMMY_MESSAGE_SIZE, InboundQueueFullPolicyTypes.DROP_NEWEST_QOS0)
+
+        for i in range(3):
+            self.event_queue.put(_create_message_event(i))
+
+        assert self._queued_mids() == [0, 1]
+        assert self.event_queue.get_byte_count() == 2 * DUMMY_MESSAGE_SIZE
+
+    def test_oversized_message_into_empty_queue(self):
+        self.event_queue.configure_limits(0, 1, InboundQueueFullPolicyTypes.DROP_NEWEST_QOS0)
+
+        self.event_queue.put(_create_message_event(0))
+
+        assert self._queued_mids() == [0]
+
+    def test_other_events_are_never_dropped(self):
+        self.event_queue.configure_limits(1, 0, InboundQueueFullPolicyTypes.DROP_NEWEST_QOS0)
+        self.event_queue.put(_create_message_event(0))
+
+        self.event_queue.put((DUMMY_PUBACK_MID, EventTypes.PUBACK, None))
+        self.event_queue.put((FixedEventMids.DISCONNECT_MID, EventTypes.DISCONNECT, 1))
+
+        assert self.event_queue.qsize() == 3
+        assert self.event_queue.get_message_count() == 1
+
+    def test_qos1_overflow_pauses_reading_under_drop_policy(self):
+        self.event_queue.configure_limits(1, 0, InboundQueueFullPolicyTypes.DROP_NEWEST_QOS0)
+        self.event_queue.put(_create_message_event(0))
+
+        self.event_queue.put(_create_message_event(1, qos=1))
+
+        assert self._queued_mids() == [0, 1]
+        assert self.event_queue.is_reading_paused() is True
+        self.pause_reading.assert_called_once_with()
+
+    def test_pause_reading_until_half_empty(self):
+        self.event_queue.configure_limits(4, 0, InboundQueueFullPolicyTypes.PAUSE_READING)
+
+        for i in range(5):
+            self.event_queue.put(_create_message_event(i))
+
+        assert self.event_queue.get_message_count() == 5
+        assert self.event_queue.get_dropped_message_count() == 0
+        self.pause_reading.assert_called_once_with()
+        for i in range(2):
+            self.event_queue.get()
+        self.resume_reading.assert_not_called()
+        self.event_queue.get()
+        self.resume_reading.assert_called_once_with()
+        assert self.event_queue.is_reading_paused() is False
+
+    def test_bulk_take_resumes_reading(self):
+        self.event_queue.configure_limits(1, 0, InboundQueueFullPolicyTypes.PAUSE_READING)
+        for i in range(3):
+            self.event_queue.put(_create_message_event(i))
+
+        assert len(self._take_all()) == 3
+
+        self.resume_reading.assert_called_once_with()
+        assert self.event_queue.get_message_count() == 0
+        assert self.event_queue.get_byte_count() == 0
+
+    def test_raising_limits_resumes_reading(self):
+        self.event_queue.configure_limits(1, 0, InboundQueueFullPolicyTypes.PAUSE_READING)
+        for i in range(2):
+            self.event_queue.put(_create_message_event(i))
+
+        self.event_queue.configure_limits(0, 0, InboundQueueFullPolicyTypes.PAUSE_READING)
+
+        self.resume_reading.assert_called_once_with()
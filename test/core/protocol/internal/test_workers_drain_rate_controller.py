@@ -0,0 +1,108 @@
+from AWSIoTPythonSDK.core.protocol.internal.workers import DrainRateController
+import time
+import pytest
+
+
+WAIT_SEC = 0.05
+
+
+class TestDrainRateController:
+
+    def setup_method(self, test_method):
+        self.drain_rate_controller = DrainRateController(2, 100, 100, 1.0)
+
+    def _send_publish(self, mid):
+        assert self.drain_rate_controller.wait_for_send_slot(0, 1)
+        self.drain_rate_controller.on_publish_sent(mid, self.drain_rate_controller.on_send())
+
+    def test_invalid_arguments(self):
+        with pytest.raises(ValueError):
+            DrainRateController(0, 100, 100, 1.0)
+        with pytest.raises(ValueError):
+            DrainRateController(2, 0, 100, 1.0)
+        with pytest.raises(ValueError):
+            DrainRateController(2, 100, -1, 1.0)
+        with pytest.raises(ValueError):
+            DrainRateController(2, 100, 100, 0)
+
+    def test_full_window_holds_back_sends(self):
+        self._send_publish(1)
+        self._send_publish(2)
+
+        assert self.drain_rate_controller.get_in_flight_count() == 2
+        assert self.drain_rate_controller.wait_for_send_slot(0, WAIT_SEC) is False
+
+        self.drain_rate_controller.on_puback(1)
+
+        assert self.drain_rate_controller.wait_for_send_slot(0, 1)
+
+    def test_timely_acks_raise_the_rate(self):
+        for mid in range(1, 11):
+            self._send_publish(mid)
+            self.drain_rate_controller.on_puback(mid)
+
+        assert self.drain_rate_controller.get_rate() == pytest.approx(110, abs=1)
+
+    def test_slow_ack_halves_the_rate_once(self):
+        self.drain_rate_controller = DrainRateController(2, 10, 100, 0.01)
+        for mid in range(1, 11):
+            self._send_publish(mid)
+            self.drain_rate_controller.on_puback(mid)
+        rate_per_sec = self.drain_rate_controller.get_rate()
+        self._send_publish(11)
+        self._send_publish(12)
+        time.sleep(2 * 0.01)
+
+        self.drain_rate_controller.on_puback(11)
+        self.drain_rate_controller.on_puback(12)  # Same slow burst
+
+        assert self.drain_rate_controller.get_rate() == pytest.approx(rate_per_sec / 2)
+
+    def test_rate_never_drops_below_initial_rate(self):
+        self.drain_rate_controller.on_disconnect()
+
+        assert self.drain_rate_controller.get_rate() == 100
+
+    def test_disconnect_frees_the_window(self):
+        self._send_publish(1)
+        self._send_publish(2)
+
+        self.drain_rate_controller.on_disconnect()
+        self.drain_rate_controller.on_puback(1)  # Late PUBACK from the old connection
+
+        assert self.drain_rate_controller.get_in_flight_count() == 0
+        assert self.drain_rate_controller.wait_for_send_slot(0, 1)
+
+    def test_ack_before_publish_sent_is_counted(self):
+        send_time = self.drain_rate_controller.on_send()
+        self.drain_rate_controller.on_puback(1)
+
+        self.drain_rate_controller.on_publish_sent(1, send_time)
+
+        assert self.drain_rate_controller.get_in_flight_count() == 0
+        assert self.drain_rate_controller.get_rate() > 100
+
+    def test_draining_interval_caps_the_rate(self):
+        assert self.drain_rate_controller.get_rate(0.1) == 10
+
+        start = time.time()
+        for i in range(3):
+            assert self.drain_rate_controller.wait_for_send_slot(0.1, 1)
+            self.drain_rate_controller.on_send()
+            self.drain_rate_controller.on_sent_without_ack()
+
+        assert time.time() - start >= 0.15
+
+    def test_draining_interval_cap_leaves_the_rate_alone(self):
+        assert self.drain_rate_controller.wait_for_send_slot(0.1, 1)
+
+        assert self.drain_rate_controller.get_rate(0.1) == 10
+        assert self.drain_rate_controller.get_rate() == 100  # Back to the full rate once the cap is lifted
+
+    def test_slow_ack_halves_a_capped_rate(self):
+        self.drain_rate_controller = DrainRateController(2, 10, 100, 1.0)
+        assert self.drain_rate_controller.wait_for_send_slot(0.5, 1)  # Caps the rate at 2/s, below the initial rate
+
+        self.drain_rate_controller.on_disconnect()
+
+        assert self.drain_rate_controller.get_rate(0.5) == 1
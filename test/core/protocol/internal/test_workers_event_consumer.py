@@ -4,8 +4,12 @@ from AWSIoTPythonSDK.core.protocol.internal.clients import ClientStatus
 from AWSIoTPythonSDK.core.protocol.internal.events import FixedEventMids
 from AWSIoTPythonSDK.core.protocol.internal.events import EventTypes
 from AWSIoTPythonSDK.core.protocol.paho.client import MQTTMessage
+from AWSIoTPythonSDK.core.protocol.paho.client import MQTT_ERR_NO_CONN
 from AWSIoTPythonSDK.core.protocol.internal.workers import SubscriptionManager
 from AWSIoTPythonSDK.core.protocol.internal.workers import OfflineRequestsManager
+from AWSIoTPythonSDK.core.protocol.internal.workers import MessageDispatchPool
+from AWSIoTPythonSDK.core.protocol.internal.workers import MessageBatcher
+from AWSIoTPythonSDK.core.protocol.internal.workers import DrainRateController
 from AWSIoTPythonSDK.core.protocol.internal.clients import InternalAsyncMqttClient
 from AWSIoTPythonSDK.core.protocol.internal.requests import QueueableRequest
 from AWSIoTPythonSDK.core.protocol.internal.requests import RequestTypes
@@ -18,8 +22,8 @@ except:
     from unittest.mock import patch
     from unittest.mock import MagicMock
     from unittest.mock import call
-from threading import Condition
 import time
+import pytest
 import sys
 if sys.version_info[0] < 3:
     from Queue import Queue
@@ -41,11 +45,21 @@ KEY_CLEAN_UP_EVENT_CBS_CALL_COUNT = "clean_up_event_callbacks_call_count"
 KEY_IS_EVENT_Q_EMPTY = "is_event_queue_empty"
 KEY_IS_EVENT_CONSUMER_UP = "is_event_consumer_running"
 
+
+class _GetCountingQueue(Queue):
+
+    def __init__(self):
+        Queue.__init__(self)
+        self.get_count = 0
+
+    def get(self, *args, **kwargs):
+        self.get_count += 1
+        return Queue.get(self, *args, **kwargs)
+
 class TestWorkersEventConsumer:
 
     def setup_method(self, test_method):
-        self.cv = Condition()
-        self.event_queue = Queue()
+        self.event_queue = _GetCountingQueue()
         self.client_status = ClientStatusContainer()
         self.internal_async_client = MagicMock(spec=InternalAsyncMqttClient)
         self.subscription_manager = MagicMock(spec=SubscriptionManager)
@@ -66,15 +80,85 @@ class TestWorkersEventConsumer:
         self.event_consumer.update_draining_interval_sec(EXPECTED_DRAINING_INTERVAL_SEC)
         assert self.event_consumer.get_draining_interval_sec() == EXPECTED_DRAINING_INTERVAL_SEC
 
+    def test_idle_consumer_does_not_wake_up(self):
+        self.load_mocks_into_test_target()
+        self._start_consumer()
+
+        assert self.event_queue.get_count == 1  # Still blocked in its first get
+        assert self.event_consumer.is_running() is True
+
+    def test_stop_wakes_up_idle_consumer(self):
+        self.load_mocks_into_test_target()
+        self._start_consumer()
+
+        self.event_consumer.stop()
+
+        assert self.event_consumer.wait_until_it_stops(2) is True
+        self.internal_async_client.invoke_event_callback.assert_not_called()
+
     def test_dispatch_message_event(self):
         expected_message_event = self._configure_mocks_message_event()
         self._start_consumer()
         self._verify_message_event_dispatch(expected_message_event)
 
+    def test_dispatch_message_event_on_message_dispatch_pool(self):
+        expected_message_event = self._configure_mocks_message_event()
+        message_dispatch_pool = MessageDispatchPool(2)
+        self.event_consumer.update_message_dispatch_pool(message_dispatch_pool)
+        self._start_consumer()
+        self._verify_message_event_dispatch(expected_message_event)
+        assert message_dispatch_pool.is_running() is True
+
+        self.event_consumer.stop()
+        assert message_dispatch_pool.is_running() is False
+
+    def test_message_batcher_invalid_arguments(self):
+        with pytest.raises(ValueError):
+            MessageBatcher(self.message_callback, 0, 0.01)
+        with pytest.raises(ValueError):
+            MessageBatcher(self.message_callback, 10, -1)
+
+    def test_dispatch_message_batches_by_count(self):
+        messages = self._configure_mocks_message_batch_events(5, MessageBatcher(self.message_callback, 2, 60))
+        self._start_consumer()
+
+        assert self.message_callback.call_args_list == [call(None, None, messages[0:2]), call(None, None, messages[2:4])]
+
+        self.event_consumer.stop()
+        self.event_consumer.wait_until_it_stops(2)
+        self.message_callback.assert_called_with(None, None, messages[4:])  # Held back message still delivered
+
+    def test_dispatch_message_batches_by_latency(self):
+        messages = self._configure_mocks_message_batch_events(3, MessageBatcher(self.message_callback, 100, 0.1))
+        self._start_consumer()
+
+        self.message_callback.assert_called_once_with(None, None, messages)
+        assert self.event_consumer.is_running() is True
+
+    def test_dispatch_message_batches_without_latency(self):
+        messages = self._configure_mocks_message_batch_events(3, MessageBatcher(self.message_callback, 100, 0))
+        self._start_consumer()
+
+        self.message_callback.assert_called_once_with(None, None, messages)  # Everything taken in one wakeup
+
+    def test_dispatch_message_batches_on_message_dispatch_pool(self):
+        messages = self._configure_mocks_message_batch_events(3, MessageBatcher(self.message_callback, 100, 0))
+        self.event_consumer.update_message_dispatch_pool(MessageDispatchPool(2))
+        self._start_consumer()
+
+        self.message_callback.assert_called_once_with(None, None, messages)
+
+    def _configure_mocks_message_batch_events(self, message_count, message_batcher):
+        message_events = [self._create_message_event(DUMMY_TOPIC, i, DUMMY_QOS) for i in range(message_count)]
+        self._fill_in_fake_events(message_events)
+        self.subscription_manager.match_records.return_value = [(DUMMY_QOS, message_batcher, self.subscribe_callback)]
+        self.load_mocks_into_test_target()
+        return [message_event[2] for message_event in message_events]
+
     def _configure_mocks_message_event(self):
         message_event = self._create_message_event(DUMMY_TOPIC, DUMMY_MESSAGE, DUMMY_QOS)
         self._fill_in_fake_events([message_event])
-        self.subscription_manager.list_records.return_value = [(DUMMY_TOPIC, (DUMMY_QOS, self.message_callback, self.subscribe_callback))]
+        self.subscription_manager.match_records.return_value = [(DUMMY_QOS, self.message_callback, self.subscribe_callback)]
         self.load_mocks_into_test_target()
         return message_event
 
@@ -172,6 +256,72 @@ class TestWorkersEventConsumer:
         self._start_consumer()
         self._verify_connack_event_dispatch(resubscribe_records=resub_records)
 
+    def test_dispatch_connack_event_resubscribe_in_batches(self):
+        resub_records = [(DUMMY_TOPIC + str(i), (DUMMY_QOS, self.message_callback, self.subscribe_callback))
+                         for i in range(20)]
+        self._configure_mocks_connack_event(resubscribe_records=resub_records)
+        self.event_consumer.update_max_topics_per_subscribe(8)
+        self._start_consumer()
+
+        batch_sizes = [len(batch_call[0][0]) for batch_call in self.internal_async_client.subscribe_batch.call_args_list]
+        assert batch_sizes == [8, 8, 4]
+        assert self.internal_async_client.subscribe.call_count == 0
+
+    def test_dispatch_connack_event_resubscribe_one_topic_per_packet(self):
+        resub_records = [(DUMMY_TOPIC + str(i), (DUMMY_QOS, self.message_callback, self.subscribe_callback))
+                         for i in range(3)]
+        self._configure_mocks_connack_event(resubscribe_records=resub_records)
+        self.event_consumer.update_max_topics_per_subscribe(1)
+        self._start_consumer()
+
+        confirming_ack_callback = self.subscription_manager.create_confirming_ack_callback.return_value
+        self.internal_async_client.subscribe.assert_has_calls(
+            [call(topic, qos, confirming_ack_callback) for topic, (qos, message_callback, subscribe_callback) in resub_records])
+        self.subscription_manager.create_confirming_ack_callback.assert_has_calls(
+            [call(topic, subscribe_callback) for topic, (qos, message_callback, subscribe_callback) in resub_records])
+        assert self.internal_async_client.subscribe_batch.call_count == 0
+
+    def test_dispatch_connack_event_without_session_resubscribes_everything(self):
+        self._configure_mocks_connack_event()
+        self._start_consumer()
+
+        self.subscription_manager.unconfirm_all_records.assert_called_once_with()
+
+    def test_dispatch_connack_event_session_present_skips_resubscribe(self):
+        self.event_queue.put((FixedEventMids.CONNACK_MID, EventTypes.CONNACK, (DUMMY_SUCCESS_RC, True)))
+        self.client_status.set_status(ClientStatus.CONNECT)
+        self.subscription_manager.list_unconfirmed_records.return_value = []  # Broker acknowledged them all
+        self.offline_requests_manager.has_more.return_value = False
+        self.load_mocks_into_test_target()
+        self._start_consumer()
+
+        assert self.client_status.get_status() == ClientStatus.STABLE
+        self.subscription_manager.unconfirm_all_records.assert_not_called()
+        assert self.internal_async_client.subscribe.call_count == 0
+        assert self.internal_async_client.subscribe_batch.call_count == 0
+        self.internal_async_client.invoke_event_callback.assert_called_once_with(FixedEventMids.CONNACK_MID,
+                                                                                 data=DUMMY_SUCCESS_RC)
+
+    def test_dispatch_connack_event_session_present_resubscribes_unconfirmed(self):
+        subscription_manager = SubscriptionManager()
+        for topic in (DUMMY_TOPIC + "1", DUMMY_TOPIC + "2"):
+            subscription_manager.add_record(topic, DUMMY_QOS, self.message_callback, None)
+        subscription_manager.confirm_record(DUMMY_TOPIC + "1")
+        self.subscription_manager = subscription_manager
+        self.event_queue.put((FixedEventMids.CONNACK_MID, EventTypes.CONNACK, (DUMMY_SUCCESS_RC, True)))
+        self.client_status.set_status(ClientStatus.CONNECT)
+        self.offline_requests_manager.has_more.return_value = False
+        self.internal_async_client.subscribe.return_value = DUMMY_SUCCESS_RC, DUMMY_SUBACK_MID
+        self.load_mocks_into_test_target()
+        self._start_consumer()
+
+        assert self.internal_async_client.subscribe.call_count == 1
+        assert self.internal_async_client.subscribe.call_args[0][0:2] == (DUMMY_TOPIC + "2", DUMMY_QOS)
+
+        confirming_ack_callback = self.internal_async_client.subscribe.call_args[0][2]
+        confirming_ack_callback(mid=DUMMY_SUBACK_MID, data=(DUMMY_QOS,))
+        assert subscription_manager.list_unconfirmed_records() == []
+
     def test_dispatch_connack_event_need_draining(self):
         self._configure_mocks_connack_event(need_draining=True)
         self._start_consumer()
@@ -187,10 +337,80 @@ class TestWorkersEventConsumer:
         self._start_consumer()
         self._verify_connack_event_dispatch(resubscribe_records=resub_records, need_draining=True)
 
+    def test_pipelined_draining_sends_ahead_of_pubacks(self):
+        request_count = 10
+        queued_requests = [QueueableRequest(RequestTypes.PUBLISH, (DUMMY_TOPIC, DUMMY_MESSAGE, DUMMY_QOS, False))
+                           for i in range(request_count)]
+        sent_publishes = []  # (mid, ack_callback)
+        self.client_status.set_status(ClientStatus.CONNECT)
+        self._fill_in_fake_events([self._create_connack_event()])
+        self.subscription_manager.list_unconfirmed_records.return_value = []
+        self.offline_requests_manager.has_more.side_effect = lambda: len(queued_requests) > 0
+        self.offline_requests_manager.get_next.side_effect = lambda: queued_requests.pop(0)
+        self.offline_requests_manager.get_queued_count.side_effect = lambda: len(queued_requests)
+
+        def publish(topic, payload, qos, retain, ack_callback, ack_on_write):
+            sent_publishes.append((len(sent_publishes) + 1, ack_callback))
+            return DUMMY_SUCCESS_RC, len(sent_publishes)
+
+        self.internal_async_client.publish.side_effect = publish
+        self.load_mocks_into_test_target()
+        self.event_consumer.update_draining_interval_sec(0.001)
+        self.event_consumer.update_drain_rate_controller(DrainRateController(4, 1000, 100, 1.0))
+
+        self._start_consumer()
+
+        # Four out without a single PUBACK, then held back by the window
+        assert len(sent_publishes) == 4
+        progress = self.event_consumer.get_draining_progress()
+        assert progress["drained"] == 4
+        assert progress["remaining"] == request_count - 4
+        assert progress["in_flight"] == 4
+        assert progress["rate"] == 1000
+        assert self.client_status.get_status() == ClientStatus.DRAINING
+
+        acked_count = 0
+        deadline = time.time() + 5
+        while acked_count < request_count and time.time() < deadline:
+            for mid, ack_callback in sent_publishes[acked_count:]:
+                ack_callback(mid=mid)
+                acked_count += 1
+            time.sleep(0.01)
+        time.sleep(0.1)
+
+        assert self.client_status.get_status() == ClientStatus.STABLE
+
+        assert self.event_consumer.get_draining_progress()["drained"] == request_count
+
+    def test_persisted_offline_publish_is_acked_on_puback(self):
+        record_id = (0, 0)
+        self.internal_async_client.publish.return_value = DUMMY_SUCCESS_RC, DUMMY_PUBACK_MID
+        self.load_mocks_into_test_target()
+
+        self.event_consumer._handle_offline_publish(
+            QueueableRequest(RequestTypes.PUBLISH, (DUMMY_TOPIC, DUMMY_MESSAGE, DUMMY_QOS, False), record_id))
+
+        topic, payload, qos, retain, ack_callback, ack_on_write = self.internal_async_client.publish.call_args[0]
+        assert ack_on_write is True
+        assert self.offline_requests_manager.ack.call_count == 0
+        ack_callback(mid=DUMMY_PUBACK_MID)
+        self.offline_requests_manager.ack.assert_called_once_with(record_id)
+
+    def test_persisted_offline_publish_is_nacked_when_not_sent(self):
+        record_id = (0, 0)
+        self.internal_async_client.publish.return_value = MQTT_ERR_NO_CONN, DUMMY_PUBACK_MID
+        self.load_mocks_into_test_target()
+
+        self.event_consumer._handle_offline_publish(
+            QueueableRequest(RequestTypes.PUBLISH, (DUMMY_TOPIC, DUMMY_MESSAGE, DUMMY_QOS, False), record_id))
+
+        self.offline_requests_manager.nack.assert_called_once_with(record_id)
+        assert self.offline_requests_manager.ack.call_count == 0
+
     def _configure_mocks_connack_event(self, resubscribe_records=list(), need_draining=False):
         self.client_status.set_status(ClientStatus.CONNECT)
         self._fill_in_fake_events([self._create_connack_event()])
-        self.subscription_manager.list_records.return_value = resubscribe_records
+        self.subscription_manager.list_unconfirmed_records.return_value = resubscribe_records
         if need_draining:  # We pack publish, subscribe and unsubscribe requests into the offline queue
             if resubscribe_records:
                 has_more_side_effect_list = 4 * [True]
@@ -203,26 +423,26 @@ class TestWorkersEventConsumer:
                 QueueableRequest(RequestTypes.SUBSCRIBE, (DUMMY_TOPIC, DUMMY_QOS, self.message_callback, self.subscribe_callback)),
                 QueueableRequest(RequestTypes.UNSUBSCRIBE, (DUMMY_TOPIC, self.unsubscribe_callback))
             ]
+            self.internal_async_client.publish.return_value = DUMMY_SUCCESS_RC, DUMMY_PUBACK_MID
         else:
             self.offline_requests_manager.has_more.return_value = False
         self.load_mocks_into_test_target()
 
     def _create_connack_event(self):
-        return FixedEventMids.CONNACK_MID, EventTypes.CONNACK, DUMMY_SUCCESS_RC
+        return FixedEventMids.CONNACK_MID, EventTypes.CONNACK, (DUMMY_SUCCESS_RC, False)
 
     def _verify_connack_event_dispatch(self, resubscribe_records=list(), need_draining=False):
         time.sleep(3 * DEFAULT_DRAINING_INTERNAL_SEC)  # Make sure resubscribe/draining finishes
         assert self.event_consumer.is_running() is True
         self.internal_async_client.invoke_event_callback.assert_called_once_with(FixedEventMids.CONNACK_MID, data=DUMMY_SUCCESS_RC)
         if resubscribe_records:
-            resub_call_sequence = []
-            for topic, (qos, message_callback, subscribe_callback) in resubscribe_records:
-                resub_call_sequence.append(call(topic, qos, subscribe_callback))
-            self.internal_async_client.subscribe.assert_has_calls(resub_call_sequence)
+            confirming_ack_callback = self.subscription_manager.create_confirming_ack_callback.return_value
+            batch = [(topic, qos, confirming_ack_callback) for topic, (qos, message_callback, subscribe_callback) in resubscribe_records]
+            self.internal_async_client.subscribe_batch.assert_called_once_with(batch)
         if need_draining:
             assert self.internal_async_client.publish.call_count == 1
             assert self.internal_async_client.unsubscribe.call_count == 1
-            assert self.internal_async_client.subscribe.call_count == len(resubscribe_records) + 1
+            assert self.internal_async_client.subscribe.call_count == 1
         assert self.event_consumer.is_fully_stopped() is False
 
     def test_dispatch_puback_suback_unsuback_events(self):
@@ -256,8 +476,7 @@ class TestWorkersEventConsumer:
         time.sleep(1)  # Make sure the event gets picked up by the consumer
 
     def load_mocks_into_test_target(self):
-        self.event_consumer = EventConsumer(self.cv,
-                                            self.event_queue,
+        self.event_consumer = EventConsumer(self.event_queue,
                                             self.internal_async_client,
                                             self.subscription_manager,
                                             self.offline_requests_manager,
@@ -0,0 +1,154 @@
+# Stress the event consumer with slow message callbacks and make sure the network thread keeps up with keepalive
+
+from AWSIoTPythonSDK.core.protocol.mqtt_core import MqttCore
+from AWSIoTPythonSDK.core.protocol.internal.clients import ClientStatus
+from AWSIoTPythonSDK.core.protocol.paho.client import MQTTv311
+from AWSIoTPythonSDK.core.protocol.paho.client import CONNECT
+from AWSIoTPythonSDK.core.protocol.paho.client import CONNACK
+from AWSIoTPythonSDK.core.protocol.paho.client import PUBLISH
+from AWSIoTPythonSDK.core.protocol.paho.client import SUBSCRIBE
+from AWSIoTPythonSDK.core.protocol.paho.client import SUBACK
+from AWSIoTPythonSDK.core.protocol.paho.client import PINGREQ
+from AWSIoTPythonSDK.core.protocol.paho.client import PINGRESP
+from AWSIoTPythonSDK.core.util.providers import EndpointProvider
+from threading import Event
+from threading import Thread
+import socket
+import struct
+import time
+
+
+DUMMY_CLIENT_ID = "CoolClientId"
+DUMMY_TOPIC = "topic/cool"
+KEEP_ALIVE_SEC = 1
+SLOW_CALLBACK_SEC = 2.5  # Longer than the keepalive interval
+PUBLISH_INTERVAL_SEC = 0.25  # Messages keep arriving while callbacks are busy
+OBSERVATION_SEC = 4
+TIMEOUT_SEC = 5
+
+
+class _StandInBroker(object):
+    """Plain TCP endpoint that acks CONNECT, SUBSCRIBE and PINGREQ and keeps publishing to every new subscription."""
+
+    def __init__(self):
+        self._listener = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        self._listener.bind(("127.0.0.1", 0))
+        self._listener.listen(4)
+        self.port = self._listener.getsockname()[1]
+        self.connect_count = 0
+        self.ping_times = []
+        self.publish_count = 0
+        self._connections = []
+        self._closed = Event()
+        self._thread = Thread(target=self._accept)
+        self._thread.daemon = True
+        self._thread.start()
+
+    def _accept(self):
+        while True:
+            try:
+                conn, address = self._listener.accept()
+            except socket.error:
+                return
+            self._connections.append(conn)
+            serve = Thread(target=self._serve, args=(conn,))
+            serve.daemon = True
+            serve.start()
+
+    def _recv_exactly(self, conn, length):
+        data = b""
+        while len(data) < length:
+            chunk = conn.recv(length - len(data))
+            if not chunk:
+                raise socket.error("closed")
+            data += chunk
+        return data
+
+    def _serve(self, conn):
+        try:
+            while True:
+                command = ord(self._recv_exactly(conn, 1))
+                remaining_length, multiplier = 0, 1
+                while True:
+                    byte = ord(self._recv_exactly(conn, 1))
+                    remaining_length += (byte & 127) * multiplier
+                    multiplier *= 128
+                    if byte & 128 == 0:
+                        break
+                body = self._recv_exactly(conn, remaining_length)
+                if command & 0xF0 == CONNECT:
+                    self.connect_count += 1
+                    conn.sendall(struct.pack("!BBBB", CONNACK, 2, 0, 0))
+                elif command & 0xF0 == PINGREQ:
+                    self.ping_times.append(time.time())
+                    conn.sendall(struct.pack("!BB", PINGRESP, 0))
+                elif command & 0xF0 == SUBSCRIBE:
+                    conn.sendall(struct.pack("!BB", SUBACK, 3) + body[:2] + struct.pack("!B", body[-1]))
+                    topic_length = struct.unpack("!H", body[2:4])[0]
+                    publish = struct.pack("!H", topic_length) + body[4:4 + topic_length] + b"payload"
+                    flood = Thread(target=self._flood, args=(conn, struct.pack("!BB", PUBLISH, len(publish)) + publish))
+                    flood.daemon = True
+                    flood.start()
+        except socket.error:
+            pass
+        finally:
+            conn.close()
+
+    def _flood(self, conn, packet):
+        try:
+            while not self._closed.wait(PUBLISH_INTERVAL_SEC):
+                conn.sendall(packet)
+                self.publish_count += 1
+        except socket.error:
+            pass
+
+    def close(self):
+        self._closed.set()
+        self._listener.close()
+        for conn in self._connections:
+            try:
+                conn.shutdown(socket.SHUT_RDWR)
+            except socket.error:
+                pass
+
+
+class TestEventConsumerSlowCallbacks:
+
+    def setup_method(self, test_method):
+        self.broker = _StandInBroker()
+        self.callback_count = 0
+        self.stop_being_slow = Event()
+        endpoint_provider = EndpointProvider()
+        endpoint_provider.set_host("127.0.0.1")
+        endpoint_provider.set_port(self.broker.port)
+        self.mqtt_core = MqttCore(DUMMY_CLIENT_ID, True, MQTTv311, False)
+        self.mqtt_core.configure_endpoint(endpoint_provider)
+        self.mqtt_core.configure_connect_disconnect_timeout_sec(TIMEOUT_SEC)
+        self.mqtt_core.configure_operation_timeout_sec(TIMEOUT_SEC)
+
+    def teardown_method(self, test_method):
+        self.stop_being_slow.set()
+        try:
+            self.mqtt_core.disconnect()
+        finally:
+            self.broker.close()
+
+    def _slow_message_callback(self, client, userdata, message):
+        self.callback_count += 1
+        self.stop_being_slow.wait(SLOW_CALLBACK_SEC)
+
+    def test_keepalive_is_on_time_while_callbacks_are_slow(self):
+        assert self.mqtt_core.connect(KEEP_ALIVE_SEC) is True
+        assert self.mqtt_core.subscribe(DUMMY_TOPIC, 0, self._slow_message_callback) is True
+        observation_start = time.time()
+
+        time.sleep(OBSERVATION_SEC)
+
+        # Callbacks fall further and further behind the incoming messages...
+        assert 0 < self.callback_count < self.broker.publish_count // 2
+        # ...but the network thread kept pinging and reading PINGRESP, so the connection never dropped
+        ping_times = [observation_start] + self.broker.ping_times
+        assert len(ping_times) - 1 >= OBSERVATION_SEC // KEEP_ALIVE_SEC - 1
+        assert max(b - a for a, b in zip(ping_times, ping_times[1:])) < KEEP_ALIVE_SEC * 2
+        assert self.broker.connect_count == 1
+        assert self.mqtt_core._client_status.get_status() == ClientStatus.STABLE
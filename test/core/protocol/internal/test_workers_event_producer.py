@@ -1,5 +1,4 @@
 import pytest
-from threading import Condition
 from AWSIoTPythonSDK.core.protocol.internal.workers import EventProducer
 from AWSIoTPythonSDK.core.protocol.internal.events import FixedEventMids
 from AWSIoTPythonSDK.core.protocol.internal.events import EventTypes
@@ -26,7 +25,11 @@ class TestWorkersEventProducer:
 
     def test_produce_on_connect_event(self):
         self.event_producer.on_connect(DUMMY_PAHO_CLIENT, DUMMY_USER_DATA, DUMMY_FLAGS, SUCCESS_RC)
-        self._verify_queued_event(self.event_queue, (FixedEventMids.CONNACK_MID, EventTypes.CONNACK, SUCCESS_RC))
+        self._verify_queued_event(self.event_queue, (FixedEventMids.CONNACK_MID, EventTypes.CONNACK, (SUCCESS_RC, False)))
+
+    def test_produce_on_connect_event_session_present(self):
+        self.event_producer.on_connect(DUMMY_PAHO_CLIENT, DUMMY_USER_DATA, {"session present": 1}, SUCCESS_RC)
+        self._verify_queued_event(self.event_queue, (FixedEventMids.CONNACK_MID, EventTypes.CONNACK, (SUCCESS_RC, True)))
 
     def test_produce_on_disconnect_event(self):
         self.event_producer.on_disconnect(DUMMY_PAHO_CLIENT, DUMMY_USER_DATA, SUCCESS_RC)
@@ -53,9 +56,8 @@ class TestWorkersEventProducer:
         self._verify_queued_event(self.event_queue, (FixedEventMids.MESSAGE_MID, EventTypes.MESSAGE, dummy_message))
 
     def _generate_test_targets(self):
-        self.cv = Condition()
         self.event_queue = Queue()
-        self.event_producer = EventProducer(self.cv, self.event_queue)
+        self.event_producer = EventProducer(self.event_queue)
 
     def _verify_queued_event(self, queue, expected_results):
         expected_mid, expected_event_type, expected_data = expected_results
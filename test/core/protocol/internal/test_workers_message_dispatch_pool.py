@@ -0,0 +1,134 @@
+from AWSIoTPythonSDK.core.protocol.internal.workers import MessageDispatchPool
+from AWSIoTPythonSDK.core.protocol.paho.client import MQTTMessage
+from threading import Event
+from threading import Lock
+from threading import Timer
+from threading import current_thread
+import time
+import pytest
+
+
+DUMMY_TOPICS = ["topic/%d" % i for i in range(8)]
+MESSAGES_PER_TOPIC = 50
+TIMEOUT_SEC = 5
+
+
+def _create_message(topic, index):
+    message = MQTTMessage()
+    message.topic = topic
+    message.payload = index
+    return message
+
+
+class TestMessageDispatchPool:
+
+    def setup_method(self, test_method):
+        self.lock = Lock()
+        self.received = dict((topic, []) for topic in DUMMY_TOPICS)
+        self.threads = set()
+        self.all_received = Event()
+        self.message_dispatch_pool = MessageDispatchPool(4)
+
+    def teardown_method(self, test_method):
+        self.message_dispatch_pool.stop()
+
+    def _message_callback(self, client, userdata, message):
+        time.sleep(0.001 * (message.payload % 3))  # Uneven callback durations to shake up the interleaving
+        with self.lock:
+            self.received[message.topic].append(message.payload)
+            self.threads.add(current_thread())
+            if sum(len(payloads) for payloads in self.received.values()) == len(DUMMY_TOPICS) * MESSAGES_PER_TOPIC:
+                self.all_received.set()
+
+    def _submit_all(self):
+        for index in range(MESSAGES_PER_TOPIC):
+            for topic in DUMMY_TOPICS:
+                self.message_dispatch_pool.submit(topic, self._message_callback, _create_message(topic, index))
+
+    def test_invalid_worker_count(self):
+        with pytest.raises(ValueError):
+            MessageDispatchPool(0)
+
+    def test_messages_on_one_topic_stay_in_order(self):
+        self.message_dispatch_pool.start()
+
+        self._submit_all()
+
+        assert self.all_received.wait(TIMEOUT_SEC)
+        for topic in DUMMY_TOPICS:
+            assert self.received[topic] == list(range(MESSAGES_PER_TOPIC))
+        assert 1 < len(self.threads) <= 4
+
+    def test_bounded_queue_holds_back_submit(self):
+        self.message_dispatch_pool = MessageDispatchPool(1, 1)
+        self.message_dispatch_pool.start()
+        release = Event()
+        started = Event()
+
+        def blocking_callback(client, userdata, message):
+            started.set()
+            release.wait(TIMEOUT_SEC)
+
+        self.message_dispatch_pool.submit(DUMMY_TOPICS[0], blocking_callback, _create_message(DUMMY_TOPICS[0], 0))
+        assert started.wait(TIMEOUT_SEC)
+        self.message_dispatch_pool.submit(DUMMY_TOPICS[0], blocking_callback, _create_message(DUMMY_TOPICS[0], 1))
+        Timer(0.5, release.set).start()
+
+        self.message_dispatch_pool.submit(DUMMY_TOPICS[0], blocking_callback, _create_message(DUMMY_TOPICS[0], 2))
+
+        assert release.is_set()  # The third submit had to wait for the worker to make room
+
+    def test_callback_exception_does_not_kill_worker(self):
+        self.message_dispatch_pool = MessageDispatchPool(1)
+        self.message_dispatch_pool.start()
+        done = Event()
+
+        def trouble_maker(client, userdata, message):
+            raise RuntimeError("Boom")
+
+        self.message_dispatch_pool.submit(DUMMY_TOPICS[0], trouble_maker, _create_message(DUMMY_TOPICS[0], 0))
+        self.message_dispatch_pool.submit(DUMMY_TOPICS[0], lambda client, userdata, message: done.set(),
+                                          _create_message(DUMMY_TOPICS[0], 1))
+
+        assert done.wait(TIMEOUT_SEC)
+
+    def test_stop_lets_queued_messages_finish(self):
+        self.message_dispatch_pool.start()
+        self._submit_all()
+
+        self.message_dispatch_pool.stop()
+
+        assert self.all_received.wait(TIMEOUT_SEC)
+        assert self.message_dispatch_pool.is_running() is False
+
+    def test_stop_does_not_block_on_full_queue(self):
+        self.message_dispatch_pool = MessageDispatchPool(1, 1)
+        self.message_dispatch_pool.start()
+        release = Event()
+        started = Event()
+        calls = []
+
+        def stuck_callback(client, userdata, message):
+            calls.append(message.payload)
+            started.set()
+            release.wait(TIMEOUT_SEC)
+
+        self.message_dispatch_pool.submit(DUMMY_TOPICS[0], stuck_callback, _create_message(DUMMY_TOPICS[0], 0))
+        assert started.wait(TIMEOUT_SEC)
+        self.message_dispatch_pool.submit(DUMMY_TOPICS[0], stuck_callback, _create_message(DUMMY_TOPICS[0], 1))
+
+        start = time.time()
+        self.message_dispatch_pool.stop()
+
+        assert time.time() - start < 1
+        assert self.message_dispatch_pool.is_running() is False
+        release.set()
+        time.sleep(0.1)
+        assert calls == [0]  # The backlog of the stuck worker is dropped
+
+    def test_submit_while_stopped_is_dropped(self):
+        self.message_dispatch_pool.submit(DUMMY_TOPICS[0], self._message_callback, _create_message(DUMMY_TOPICS[0], 0))
+        self.message_dispatch_pool.start()
+        time.sleep(0.1)
+
+        assert self.received[DUMMY_TOPICS[0]] == []
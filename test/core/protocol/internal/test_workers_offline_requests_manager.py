@@ -1,5 +1,8 @@
 import pytest
 from AWSIoTPythonSDK.core.protocol.internal.workers import OfflineRequestsManager
+from AWSIoTPythonSDK.core.protocol.internal.workers import PersistentOfflineRequestsManager
+from AWSIoTPythonSDK.core.protocol.internal.requests import QueueableRequest
+from AWSIoTPythonSDK.core.protocol.internal.requests import RequestTypes
 from AWSIoTPythonSDK.core.util.enums import DropBehaviorTypes
 from AWSIoTPythonSDK.core.protocol.internal.queues import AppendResults
 
@@ -67,3 +70,72 @@ def test_get_next_normal():
 def test_get_next_empty():
     offline_requests_manager = OfflineRequestsManager(DEFAULT_QUEUE_SIZE, DropBehaviorTypes.DROP_NEWEST)
     assert offline_requests_manager.get_next() is None
+
+
+def _create_publish_request(topic, payload):
+    return QueueableRequest(RequestTypes.PUBLISH, (topic, payload, 1, False))
+
+
+def test_persistent_publish_requests_survive_reopen(tmpdir):
+    offline_requests_manager = PersistentOfflineRequestsManager(str(tmpdir), 0, DropBehaviorTypes.DROP_NEWEST)
+    offline_requests_manager.add_one(_create_publish_request("topic/text", "text payload"))
+    offline_requests_manager.add_one(_create_publish_request("topic/bytes", b"\x00\x01"))
+    offline_requests_manager.close()
+
+    offline_requests_manager = PersistentOfflineRequestsManager(str(tmpdir), 0, DropBehaviorTypes.DROP_NEWEST)
+
+    assert offline_requests_manager.has_more()
+    assert offline_requests_manager.get_next().data == ("topic/text", "text payload", 1, False)
+    assert offline_requests_manager.get_next().data == ("topic/bytes", b"\x00\x01", 1, False)
+    assert offline_requests_manager.get_next() is None
+
+
+def test_persistent_subscribe_requests_go_first(tmpdir):
+    offline_requests_manager = PersistentOfflineRequestsManager(str(tmpdir), 0, DropBehaviorTypes.DROP_NEWEST)
+    subscribe_request = QueueableRequest(RequestTypes.SUBSCRIBE, ("topic", 1, len, None))
+    offline_requests_manager.add_one(_create_publish_request("topic", "payload"))
+    offline_requests_manager.add_one(subscribe_request)
+
+    assert offline_requests_manager.get_next() is subscribe_request
+    assert offline_requests_manager.get_next().type == RequestTypes.PUBLISH
+
+
+def test_persistent_full_drop_newest(tmpdir):
+    offline_requests_manager = PersistentOfflineRequestsManager(str(tmpdir), 40, DropBehaviorTypes.DROP_NEWEST)
+    for i in range(2):
+        assert offline_requests_manager.add_one(_create_publish_request("topic", "payload %d" % i)) \
+            == AppendResults.APPEND_SUCCESS
+
+    append_result = offline_requests_manager.add_one(_create_publish_request("topic", "payload 2"))
+
+    assert append_result == AppendResults.APPEND_FAILURE_QUEUE_FULL
+    assert offline_requests_manager.get_next().data[1] == "payload 0"
+
+
+def test_persistent_full_drop_oldest(tmpdir):
+    offline_requests_manager = PersistentOfflineRequestsManager(str(tmpdir), 40, DropBehaviorTypes.DROP_OLDEST)
+    for i in range(2):
+        assert offline_requests_manager.add_one(_create_publish_request("topic", "payload %d" % i)) \
+            == AppendResults.APPEND_SUCCESS
+
+    append_result = offline_requests_manager.add_one(_create_publish_request("topic", "payload 2"))
+
+    assert append_result == AppendResults.APPEND_FAILURE_QUEUE_FULL  # Same as the in-memory queue
+    assert offline_requests_manager.get_next().data[1] == "payload 1"
+    assert offline_requests_manager.get_next().data[1] == "payload 2"
+    assert offline_requests_manager.get_next() is None
+
+
+@pytest.mark.parametrize("payload, expected_payload", [
+    (memoryview(b"xyz"), b"xyz"),
+    (bytearray(b"\x00\x01"), b"\x00\x01"),
+    (5, "5"),
+    (2.5, "2.5"),
+    (None, b""),
+])
+def test_persistent_publish_payload_types(tmpdir, payload, expected_payload):
+    offline_requests_manager = PersistentOfflineRequestsManager(str(tmpdir), 0, DropBehaviorTypes.DROP_NEWEST)
+
+    assert offline_requests_manager.add_one(_create_publish_request("topic", payload)) == AppendResults.APPEND_SUCCESS
+
+    assert offline_requests_manager.get_next().data == ("topic", expected_payload, 1, False)
@@ -39,3 +39,44 @@ def test_remove_record():
     assert qos == 0
     assert message_callback == _dummy_callback
     assert ack_callback == _dummy_callback
+
+
+def test_match_records():
+    subscription_manager = SubscriptionManager()
+    subscription_manager.add_record(DUMMY_TOPIC1, 1, _dummy_callback, None)
+    subscription_manager.add_record("topic1/#", 0, _dummy_callback, None)
+    subscription_manager.add_record("+/sub", 0, _dummy_callback, None)
+
+    assert list(subscription_manager.match_records(DUMMY_TOPIC1)) == [(1, _dummy_callback, None), (0, _dummy_callback, None)]
+    assert list(subscription_manager.match_records(DUMMY_TOPIC2 + "/sub")) == [(0, _dummy_callback, None)]
+
+    subscription_manager.remove_record("topic1/#")
+    assert list(subscription_manager.match_records(DUMMY_TOPIC1)) == [(1, _dummy_callback, None)]
+    assert list(subscription_manager.match_records(DUMMY_TOPIC2)) == []
+
+
+def test_new_records_are_unconfirmed():
+    subscription_manager = SubscriptionManager()
+    subscription_manager.add_record(DUMMY_TOPIC1, 1, _dummy_callback, None)
+    subscription_manager.add_record(DUMMY_TOPIC2, 0, _dummy_callback, None)
+
+    subscription_manager.confirm_record(DUMMY_TOPIC1)
+
+    assert [topic for topic, record in subscription_manager.list_unconfirmed_records()] == [DUMMY_TOPIC2]
+
+    subscription_manager.unconfirm_all_records()
+
+    assert [topic for topic, record in subscription_manager.list_unconfirmed_records()] == [DUMMY_TOPIC1, DUMMY_TOPIC2]
+
+
+def test_confirming_ack_callback():
+    acks = []
+    subscription_manager = SubscriptionManager()
+    subscription_manager.add_record(DUMMY_TOPIC1, 1, _dummy_callback, None)
+    subscription_manager.add_record(DUMMY_TOPIC2, 1, _dummy_callback, None)
+
+    subscription_manager.create_confirming_ack_callback(DUMMY_TOPIC1, lambda mid, data: acks.append((mid, data)))(mid=1, data=(1,))
+    subscription_manager.create_confirming_ack_callback(DUMMY_TOPIC2, None)(mid=2, data=(0x80,))  # Refused
+
+    assert acks == [(1, (1,))]
+    assert [topic for topic, record in subscription_manager.list_unconfirmed_records()] == [DUMMY_TOPIC2]
@@ -0,0 +1,129 @@
+from AWSIoTPythonSDK.core.protocol.paho.client import Client
+from AWSIoTPythonSDK.core.protocol.paho.client import MQTTMessage
+from AWSIoTPythonSDK.core.protocol.paho.client import MQTT_ERR_SUCCESS
+from AWSIoTPythonSDK.core.protocol.paho.client import MQTT_ERR_NOMEM
+from AWSIoTPythonSDK.core.protocol.paho.client import mqtt_ms_queued
+from AWSIoTPythonSDK.core.protocol.paho.client import mqtt_ms_wait_for_puback
+from AWSIoTPythonSDK.core.protocol.paho.client import mqtt_ms_wait_for_pubcomp
+from AWSIoTPythonSDK.core.protocol.paho.client import mqtt_ms_wait_for_pubrel
+import struct
+
+
+DUMMY_CLIENT_ID = "CoolClientId"
+DUMMY_TOPIC = "topic/cool"
+DUMMY_PAYLOAD = "CoolPayload"
+
+
+class _SinkSocket(object):
+
+    def __init__(self):
+        self.sent = bytearray()
+
+    def send(self, data):
+        self.sent.extend(data)
+        return len(data)
+
+
+class TestClientInflight:
+
+    def setup_method(self, test_method):
+        self.published_mids = []
+        self.messages = []
+        self.client = Client(DUMMY_CLIENT_ID)
+        self.client._sock = _SinkSocket()
+        self.client.on_publish = lambda client, userdata, mid: self.published_mids.append(mid)
+        self.client.on_message = lambda client, userdata, message: self.messages.append(message)
+
+    def teardown_method(self, test_method):
+        self.client._sock = None
+
+    def _receive(self, command, mid):
+        self.client._in_packet['command'] = command
+        self.client._in_packet['remaining_length'] = 2
+        self.client._in_packet['packet'] = struct.pack("!H", mid)
+        return self.client._packet_handle()
+
+    def test_out_of_order_puback(self):
+        mids = [self.client.publish(DUMMY_TOPIC, DUMMY_PAYLOAD, 1)[1] for i in range(5)]
+
+        assert self._receive(0x40, mids[3]) == MQTT_ERR_SUCCESS
+        assert self._receive(0x40, mids[0]) == MQTT_ERR_SUCCESS
+        assert self._receive(0x40, mids[0]) == MQTT_ERR_SUCCESS  # Duplicate ack is ignored
+
+        assert self.published_mids == [mids[3], mids[0]]
+        assert list(self.client._out_messages.keys()) == [mids[1], mids[2], mids[4]]
+        assert self.client._inflight_messages == 3
+
+    def test_queued_messages_sent_in_order_on_ack(self):
+        self.client.max_inflight_messages_set(2)
+        mids = [self.client.publish(DUMMY_TOPIC, DUMMY_PAYLOAD, 1)[1] for i in range(4)]
+        states = [m.state for m in self.client._out_messages.values()]
+        assert states == [mqtt_ms_wait_for_puback, mqtt_ms_wait_for_puback, mqtt_ms_queued, mqtt_ms_queued]
+
+        self._receive(0x40, mids[1])
+
+        assert self.client._out_messages[mids[2]].state == mqtt_ms_wait_for_puback
+        assert self.client._out_messages[mids[3]].state == mqtt_ms_queued
+        assert self.client._inflight_messages == 2
+
+    def test_qos2_outbound_flow(self):
+        rc, mid = self.client.publish(DUMMY_TOPIC, DUMMY_PAYLOAD, 2)
+
+        self._receive(0x50, mid)  # PUBREC
+        assert self.client._out_messages[mid].state == mqtt_ms_wait_for_pubcomp
+        self._receive(0x70, mid)  # PUBCOMP
+        assert self.published_mids == [mid]
+        assert len(self.client._out_messages) == 0
+
+    def test_qos2_inbound_flow(self):
+        message = MQTTMessage()
+        message.mid = 42
+        message.qos = 2
+        message.topic = DUMMY_TOPIC
+        message.state = mqtt_ms_wait_for_pubrel
+        self.client._in_messages[message.mid] = message
+        self.client._inflight_messages = 1
+
+        self._receive(0x62, 41)  # PUBREL for an unknown mid
+        assert self.messages == []
+        self._receive(0x62, 42)
+        assert self.messages == [message]
+        assert len(self.client._in_messages) == 0
+
+    def test_mid_generate_skips_inflight_mids(self):
+        for mid in (1, 2, 4):
+            self.client._out_messages[mid] = MQTTMessage()
+        assert self.client._mid_generate() == 3
+        assert self.client._mid_generate() == 5
+
+    def test_mid_generate_wraps(self):
+        self.client._last_mid = 65534
+        self.client._out_messages[1] = MQTTMessage()
+        assert self.client._mid_generate() == 65535
+        assert self.client._mid_generate() == 2
+
+    def test_publish_fails_when_every_mid_is_in_flight(self):
+        for mid in range(1, 65536):
+            self.client._out_messages[mid] = MQTTMessage()
+        rc, mid = self.client.publish(DUMMY_TOPIC, DUMMY_PAYLOAD, 1)
+        assert rc == MQTT_ERR_NOMEM
+        assert len(self.client._out_messages) == 65535
+
+    def test_publish_checks_mid_under_out_message_mutex(self):
+        taken = MQTTMessage()
+        self.client._out_messages[7] = taken
+        self.client._mid_generate = lambda: 7  # Mid taken after it was generated
+        rc, mid = self.client.publish(DUMMY_TOPIC, DUMMY_PAYLOAD, 1)
+        assert rc == MQTT_ERR_NOMEM
+        assert self.client._out_messages[7] is taken
+        assert self.client._out_message_mutex.acquire(False)
+        self.client._out_message_mutex.release()
+
+    def test_reconnect_reset_drops_non_qos2_inbound(self):
+        for mid, qos in ((1, 1), (2, 2), (3, 1)):
+            message = MQTTMessage()
+            message.mid = mid
+            message.qos = qos
+            self.client._in_messages[mid] = message
+        self.client._messages_reconnect_reset_in()
+        assert list(self.client._in_messages.keys()) == [2]
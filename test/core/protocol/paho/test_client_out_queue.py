@@ -0,0 +1,98 @@
+from AWSIoTPythonSDK.core.protocol.paho.client import Client
+from AWSIoTPythonSDK.core.protocol.paho.client import MQTT_ERR_SUCCESS
+from threading import Thread
+import errno
+import socket
+import pytest
+
+
+DUMMY_CLIENT_ID = "CoolClientId"
+DUMMY_TOPIC = "topic/cool"
+DUMMY_PAYLOAD = "CoolPayload"
+
+
+class _BlockedSocket(object):
+
+    def send(self, data):
+        raise socket.error(errno.EAGAIN, "Resource temporarily unavailable")
+
+
+class _SinkSocket(object):
+
+    def __init__(self):
+        self.sent = bytearray()
+
+    def send(self, data):
+        self.sent.extend(data)
+        return len(data)
+
+
+class TestClientOutQueue:
+
+    def setup_method(self, test_method):
+        self.client = Client(DUMMY_CLIENT_ID)
+        self.client._sock = _BlockedSocket()
+
+    def teardown_method(self, test_method):
+        self.client._sock = None
+
+    def _queued_packet_lengths(self):
+        packets = list(self.client._out_packet)
+        if self.client._current_out_packet is not None:
+            packets.append(self.client._current_out_packet)
+        return [packet['to_process'] for packet in packets]
+
+    def _drain(self):
+        sink = _SinkSocket()
+        self.client._sock = sink
+        assert self.client.loop_write() == MQTT_ERR_SUCCESS
+        return sink
+
+    def test_queued_bytes_tracks_unsent_packets(self):
+        for i in range(3):
+            assert self.client.publish(DUMMY_TOPIC, DUMMY_PAYLOAD, 0)[0] == MQTT_ERR_SUCCESS
+
+        lengths = self._queued_packet_lengths()
+        assert len(lengths) == 3
+        assert self.client.queued_bytes() == sum(lengths)
+
+        sink = self._drain()
+
+        assert self.client.queued_bytes() == 0
+        assert len(sink.sent) == sum(lengths)
+        assert self.client._current_out_packet is None
+
+    def test_queue_full_at_high_water_mark(self):
+        assert self.client.queue_full() is False  # No limit by default
+        self.client.publish(DUMMY_TOPIC, DUMMY_PAYLOAD, 0)
+        packet_length = self.client.queued_bytes()
+
+        self.client.max_queued_bytes_set(packet_length * 2)
+        assert self.client.queue_full() is False
+        self.client.publish(DUMMY_TOPIC, DUMMY_PAYLOAD, 0)
+        assert self.client.queue_full() is True
+
+        self._drain()
+        assert self.client.queue_full() is False
+
+    def test_invalid_max_queued_bytes(self):
+        with pytest.raises(ValueError):
+            self.client.max_queued_bytes_set(-1)
+
+    def test_wait_for_queue_room_times_out(self):
+        self.client.max_queued_bytes_set(1)
+        self.client.publish(DUMMY_TOPIC, DUMMY_PAYLOAD, 0)
+
+        assert self.client.wait_for_queue_room(0.01) is False
+
+    def test_wait_for_queue_room_wakes_up_on_drain(self):
+        self.client.max_queued_bytes_set(1)
+        self.client.publish(DUMMY_TOPIC, DUMMY_PAYLOAD, 0)
+        results = []
+        waiter = Thread(target=lambda: results.append(self.client.wait_for_queue_room(5)))
+        waiter.start()
+
+        self._drain()
+        waiter.join(5)
+
+        assert results == [True]
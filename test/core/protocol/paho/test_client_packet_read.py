@@ -0,0 +1,121 @@
+from AWSIoTPythonSDK.core.protocol.paho.client import Client
+from AWSIoTPythonSDK.core.protocol.paho.client import MQTT_ERR_SUCCESS
+from AWSIoTPythonSDK.core.protocol.paho.client import MQTT_ERR_AGAIN
+from AWSIoTPythonSDK.core.protocol.paho.client import MQTT_ERR_PROTOCOL
+from AWSIoTPythonSDK.core.protocol.paho.client import PUBLISH
+from AWSIoTPythonSDK.core.protocol.paho.client import PINGRESP
+import errno
+import socket
+import struct
+
+
+DUMMY_CLIENT_ID = "CoolClientId"
+DUMMY_TOPIC = "topic/cool"
+
+
+def _encode_remaining_length(remaining_length):
+    encoded = bytearray()
+    while True:
+        byte = remaining_length % 128
+        remaining_length = remaining_length // 128
+        if remaining_length > 0:
+            byte |= 0x80
+        encoded.append(byte)
+        if remaining_length == 0:
+            return encoded
+
+
+def _publish_packet(topic, payload):
+    utopic = topic.encode("utf-8")
+    body = struct.pack("!H", len(utopic)) + utopic + payload
+    return bytes(bytearray([PUBLISH]) + _encode_remaining_length(len(body)) + body)
+
+
+class _CountingSocket(object):
+
+    def __init__(self, sock):
+        self._sock = sock
+        self.recv_calls = 0
+
+    def recv_into(self, buffer, nbytes):
+        self.recv_calls += 1
+        return self._sock.recv_into(buffer, nbytes)
+
+
+class _FailingSocket(object):
+
+    def recv_into(self, buffer, nbytes):
+        raise socket.error(errno.ECONNRESET, "Connection reset by peer")
+
+
+class TestClientPacketRead:
+
+    def setup_method(self, test_method):
+        self.messages = []
+        self.client = Client(DUMMY_CLIENT_ID)
+        self.client.on_message = lambda client, userdata, message: self.messages.append(message)
+        self.local_sock, self.remote_sock = socket.socketpair()
+        self.local_sock.setblocking(0)
+        self.counting_sock = _CountingSocket(self.local_sock)
+        self.client._sock = self.counting_sock
+
+    def teardown_method(self, test_method):
+        self.client._sock = None
+        self.local_sock.close()
+        self.remote_sock.close()
+
+    def test_burst_of_packets_in_one_read(self):
+        data = b"".join(_publish_packet(DUMMY_TOPIC, b"payload%d" % i) for i in range(100))
+        self.client._ping_t = 1
+        self.remote_sock.sendall(data + bytes(bytearray([PINGRESP, 0])))
+
+        assert self.client._packet_read() == MQTT_ERR_SUCCESS
+        assert self.counting_sock.recv_calls == 1
+        assert [m.payload for m in self.messages] == [b"payload%d" % i for i in range(100)]
+        assert all(m.topic == DUMMY_TOPIC for m in self.messages)
+        assert self.client._ping_t == 0
+
+    def test_packet_split_across_reads(self):
+        data = _publish_packet(DUMMY_TOPIC, b"split payload")
+        for i in range(len(data)):
+            self.remote_sock.sendall(data[i:i + 1])
+            assert self.client._packet_read() == MQTT_ERR_SUCCESS
+        assert len(self.messages) == 1
+        assert self.messages[0].payload == b"split payload"
+
+    def test_large_payload(self):
+        payload = bytes(bytearray(i % 256 for i in range(300 * 1024)))
+        data = _publish_packet(DUMMY_TOPIC, payload) + _publish_packet(DUMMY_TOPIC, b"after")
+        self.remote_sock.setblocking(0)
+        sent = 0
+        while len(self.messages) < 2:
+            try:
+                sent += self.remote_sock.send(data[sent:])
+            except socket.error:
+                pass
+            assert self.client._packet_read() in (MQTT_ERR_SUCCESS, MQTT_ERR_AGAIN)
+        assert self.messages[0].payload == payload
+        assert self.messages[1].payload == b"after"
+        # The buffer gives back the memory used by the large packet once drained
+        self.remote_sock.sendall(_publish_packet(DUMMY_TOPIC, b"small"))
+        self.client._packet_read()
+        assert len(self.client._in_buffer._buf) < len(payload)
+
+    def test_nothing_to_read(self):
+        assert self.client._packet_read() == MQTT_ERR_AGAIN
+
+    def test_connection_closed(self):
+        self.remote_sock.close()
+        assert self.client._packet_read() == 1
+
+    def test_socket_error_is_logged(self, caplog, capsys):
+        self.client._sock = _FailingSocket()
+
+        assert self.client._packet_read() == 1
+
+        assert "Connection reset by peer" in caplog.text
+        assert capsys.readouterr().out == ""
+
+    def test_malformed_remaining_length(self):
+        self.remote_sock.sendall(bytes(bytearray([PUBLISH, 0xff, 0xff, 0xff, 0xff, 0x01])))
+        assert self.client._packet_read() == MQTT_ERR_PROTOCOL
@@ -0,0 +1,95 @@
+from AWSIoTPythonSDK.core.protocol.paho.client import Client
+from AWSIoTPythonSDK.core.protocol.paho.client import MQTT_ERR_SUCCESS
+from AWSIoTPythonSDK.core.protocol.paho.client import CONNACK
+from AWSIoTPythonSDK.core.protocol.paho.client import PUBLISH
+from AWSIoTPythonSDK.core.protocol.paho.reactor import NetworkReactor
+from threading import Event
+from threading import Lock
+from threading import Thread
+import socket
+import struct
+import time
+import pytest
+
+
+DUMMY_CLIENT_ID = "CoolClientId"
+DUMMY_TOPIC = "topic/cool"
+MESSAGE_COUNT = 20
+TIMEOUT_SEC = 5
+
+
+class _FirehoseBroker(object):
+    """Plain TCP endpoint that acks the CONNECT and then sends QoS0 PUBLISHes one after another."""
+
+    def __init__(self):
+        self._listener = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        self._listener.bind(("127.0.0.1", 0))
+        self._listener.listen(1)
+        self.port = self._listener.getsockname()[1]
+        self._conn = None
+        self._thread = Thread(target=self._serve)
+        self._thread.daemon = True
+        self._thread.start()
+
+    def _serve(self):
+        try:
+            self._conn, address = self._listener.accept()
+            self._conn.recv(1024)  # CONNECT
+            self._conn.sendall(struct.pack("!BBBB", CONNACK, 2, 0, 0))
+            topic = DUMMY_TOPIC.encode("utf-8")
+            for i in range(MESSAGE_COUNT):
+                payload = str(i).encode("utf-8")
+                self._conn.sendall(struct.pack("!BBH", PUBLISH, 2 + len(topic) + len(payload), len(topic))
+                                   + topic + payload)
+                time.sleep(0.01)  # One packet per read
+        except socket.error:
+            pass
+
+    def close(self):
+        self._listener.close()
+        if self._conn:
+            self._conn.close()
+
+
+class TestClientPauseReading:
+
+    def setup_method(self, test_method):
+        self.broker = _FirehoseBroker()
+        self.reactor = None
+        self.lock = Lock()
+        self.received = []
+        self.all_received = Event()
+        self.client = Client(DUMMY_CLIENT_ID)
+        self.client.on_message = self._on_message
+
+    def teardown_method(self, test_method):
+        self.client.disconnect()
+        self.client.loop_stop()
+        if self.reactor:
+            self.reactor.stop()
+        self.broker.close()
+
+    def _on_message(self, client, userdata, message):
+        with self.lock:
+            self.received.append(int(message.payload))
+            if len(self.received) == 1:
+                client.pause_reading()
+            if len(self.received) == MESSAGE_COUNT:
+                self.all_received.set()
+
+    @pytest.mark.parametrize("use_reactor", [False, True])
+    def test_pause_and_resume_reading(self, use_reactor):
+        if use_reactor:
+            self.reactor = NetworkReactor()
+            self.client.reactor_set(self.reactor)
+        assert self.client.connect("127.0.0.1", self.broker.port, 60) == MQTT_ERR_SUCCESS
+        self.client.loop_start()
+
+        time.sleep(MESSAGE_COUNT * 0.01 + 0.5)  # Everything has been sent by now
+        assert self.received == [0]
+        assert self.client.want_read() is False
+
+        self.client.resume_reading()
+
+        assert self.all_received.wait(TIMEOUT_SEC)
+        assert self.received == list(range(MESSAGE_COUNT))
@@ -0,0 +1,111 @@
+from AWSIoTPythonSDK.core.protocol.paho.client import Client
+from AWSIoTPythonSDK.core.protocol.paho.client import PUBLISH
+from AWSIoTPythonSDK.core.protocol.paho.client import MQTT_ERR_SUCCESS
+from array import array
+import errno
+import socket
+import struct
+import pytest
+
+
+DUMMY_CLIENT_ID = "CoolClientId"
+DUMMY_TOPIC = "topic/cool"
+
+
+class _BlockedSocket(object):
+
+    def send(self, data):
+        raise socket.error(errno.EAGAIN, "Resource temporarily unavailable")
+
+
+def _publish_packet(topic, payload, qos=0, mid=0):
+    utopic = topic.encode("utf-8")
+    body = struct.pack("!H", len(utopic)) + utopic
+    if qos > 0:
+        body += struct.pack("!H", mid)
+    body += payload
+    return struct.pack("!BB", PUBLISH | (qos << 1), len(body)) + body
+
+
+class TestClientPublishPayloads:
+
+    def setup_method(self, test_method):
+        self.client = Client(DUMMY_CLIENT_ID)
+        self.client._sock = _BlockedSocket()
+
+    def teardown_method(self, test_method):
+        self.client._sock = None
+
+    def _queued_payload(self):
+        return self.client._current_out_packet['payload']
+
+    @pytest.mark.parametrize("payload", [b"CoolPayload", bytearray(b"CoolPayload")])
+    def test_bytes_payload_is_not_copied(self, payload):
+        self.client.publish(DUMMY_TOPIC, payload, 0)
+
+        assert self._queued_payload() is payload
+
+    def test_buffer_payload_is_viewed_in_place(self):
+        payload = array("h", [1, 2, 3, 4])
+
+        self.client.publish(DUMMY_TOPIC, payload, 0)
+
+        view = self._queued_payload()
+        assert view.obj is payload
+        assert view.tobytes() == payload.tobytes()
+
+    def test_non_contiguous_buffer_payload_is_copied(self):
+        payload = memoryview(bytearray(b"abcdef"))[::2]
+
+        self.client.publish(DUMMY_TOPIC, payload, 0)
+
+        assert self._queued_payload().tobytes() == b"ace"
+
+    def test_invalid_payload_type(self):
+        with pytest.raises(TypeError):
+            self.client.publish(DUMMY_TOPIC, object(), 0)
+
+    def test_qos1_retry_resends_same_buffer(self):
+        payload = bytearray(b"CoolPayload")
+        rc, mid = self.client.publish(DUMMY_TOPIC, payload, 1)
+
+        assert self.client._out_messages[mid].payload is payload
+        assert self._queued_payload() is payload
+
+    def test_header_and_payload_sent_with_one_sendmsg(self):
+        local_sock, remote_sock = socket.socketpair()
+        try:
+            sendmsg_calls = []
+
+            class _ScatterSocket(object):
+                def send(self, data):
+                    return local_sock.send(data)
+
+                def sendmsg(self, buffers):
+                    sendmsg_calls.append(len(buffers))
+                    return local_sock.sendmsg(buffers)
+
+            payload = memoryview(b"x" * 100000)
+            self.client.publish(DUMMY_TOPIC, payload, 0)
+            expected = bytes(self.client._current_out_packet['packet']) + payload.tobytes()
+            self.client._sock = _ScatterSocket()
+
+            received = bytearray()
+            while self.client.want_write():
+                assert self.client.loop_write() == MQTT_ERR_SUCCESS
+                received += remote_sock.recv(262144)
+            while len(received) < len(expected):
+                received += remote_sock.recv(262144)
+
+            assert bytes(received) == expected
+            assert sendmsg_calls[0] == 2
+        finally:
+            local_sock.close()
+            remote_sock.close()
+
+    def test_qos1_packet_encoding(self):
+        payload = array("B", b"CoolPayload")
+        rc, mid = self.client.publish(DUMMY_TOPIC, payload, 1)
+        packet = self.client._current_out_packet
+
+        assert bytes(packet['packet']) + bytes(packet['payload']) == _publish_packet(DUMMY_TOPIC, b"CoolPayload", 1, mid)
@@ -0,0 +1,147 @@
+from AWSIoTPythonSDK.core.protocol.paho.client import Client
+from AWSIoTPythonSDK.core.protocol.paho.client import MQTT_ERR_SUCCESS
+from AWSIoTPythonSDK.core.protocol.paho.client import WRITE_CHUNK_SIZE
+from AWSIoTPythonSDK.core.protocol.paho.client import WRITE_COPY_THRESHOLD
+from AWSIoTPythonSDK.core.protocol.paho.client import WRITE_MODE_LATENCY
+from threading import Thread
+import errno
+import socket
+import pytest
+
+
+DUMMY_CLIENT_ID = "CoolClientId"
+DUMMY_TOPIC = "topic/cool"
+DUMMY_PAYLOAD = "CoolPayload"
+
+
+class _RecordingSocket(object):
+
+    def __init__(self, max_write=None, blocked=False):
+        self.writes = []
+        self.max_write = max_write
+        self.blocked = blocked
+
+    def send(self, data):
+        if self.blocked:
+            raise socket.error(errno.EAGAIN, "Resource temporarily unavailable")
+        data = bytes(data[:self.max_write] if self.max_write else data)
+        self.writes.append(data)
+        return len(data)
+
+    @property
+    def sent(self):
+        return b"".join(self.writes)
+
+
+class TestClientWriteModes:
+
+    def setup_method(self, test_method):
+        self.published_mids = []
+        self.client = Client(DUMMY_CLIENT_ID)
+        self.client.on_publish = lambda client, userdata, mid: self.published_mids.append(mid)
+
+    def teardown_method(self, test_method):
+        self.client._sock = None
+        self.client._thread = None
+
+    def _queue_publishes(self, count, payload=DUMMY_PAYLOAD):
+        self.client._sock = _RecordingSocket(blocked=True)
+        mids = [self.client.publish(DUMMY_TOPIC, payload, 0)[1] for i in range(count)]
+        packets = [self.client._current_out_packet] + list(self.client._out_packet)
+        expected = b"".join(bytes(packet['packet']) + bytes(packet['payload'] or b"") for packet in packets)
+        return mids, expected
+
+    def _use_background_thread(self):
+        # Any thread other than the current one makes the client behave as if loop_start() was called
+        self.client._thread = Thread(target=lambda: None)
+
+    def _read_wakeup_bytes(self):
+        try:
+            return len(self.client._sockpairR.recv(64))
+        except socket.error:
+            return 0
+
+    def test_throughput_mode_coalesces_pending_packets(self):
+        mids, expected = self._queue_publishes(3)
+        sock = _RecordingSocket()
+        self.client._sock = sock
+
+        assert self.client.loop_write() == MQTT_ERR_SUCCESS
+
+        assert sock.writes == [expected]
+        assert self.published_mids == mids
+        assert self.client.queued_bytes() == 0
+
+    def test_throughput_mode_writes_are_capped(self):
+        payload = "x" * (WRITE_COPY_THRESHOLD // 4)
+        count = 4 * WRITE_CHUNK_SIZE // len(payload)
+        mids, expected = self._queue_publishes(count, payload)
+        sock = _RecordingSocket()
+        self.client._sock = sock
+
+        self.client.loop_write()
+
+        assert sock.sent == expected
+        assert 4 <= len(sock.writes) < count
+        assert max(len(data) for data in sock.writes) <= WRITE_CHUNK_SIZE
+        assert self.published_mids == mids
+
+    def test_large_payloads_are_written_in_place(self):
+        payload = bytearray(b"x" * WRITE_COPY_THRESHOLD)
+        mids, expected = self._queue_publishes(2, payload)
+        sock = _RecordingSocket()
+        self.client._sock = sock
+
+        self.client.loop_write()
+
+        assert sock.sent == expected
+        assert [len(data) for data in sock.writes[1::2]] == [len(payload)] * 2
+        assert self.published_mids == mids
+
+    def test_partial_writes_across_packet_boundaries(self):
+        mids, expected = self._queue_publishes(5)
+        sock = _RecordingSocket(max_write=7)
+        self.client._sock = sock
+
+        self.client.loop_write()
+
+        assert sock.sent == expected
+        assert self.published_mids == mids
+        assert self.client._current_out_packet is None
+
+    def test_throughput_mode_sends_one_wakeup(self):
+        self._use_background_thread()
+        self.client._sock = _RecordingSocket()
+        for i in range(3):
+            self.client.publish(DUMMY_TOPIC, DUMMY_PAYLOAD, 0)
+
+        assert self._read_wakeup_bytes() == 1
+        assert self.client.want_write() is True
+
+    def test_latency_mode_writes_from_caller(self):
+        self.client.write_mode_set(WRITE_MODE_LATENCY)
+        self._use_background_thread()
+        sock = _RecordingSocket()
+        self.client._sock = sock
+
+        rc, mid = self.client.publish(DUMMY_TOPIC, DUMMY_PAYLOAD, 0)
+
+        assert rc == MQTT_ERR_SUCCESS
+        assert len(sock.writes) == 1
+        assert self.published_mids == [mid]
+        assert self.client.want_write() is False
+        assert self._read_wakeup_bytes() == 0
+
+    def test_latency_mode_falls_back_to_network_thread(self):
+        self.client.write_mode_set(WRITE_MODE_LATENCY)
+        self._use_background_thread()
+        self.client._sock = _RecordingSocket(blocked=True)
+
+        self.client.publish(DUMMY_TOPIC, DUMMY_PAYLOAD, 0)
+
+        assert self.client.want_write() is True
+        assert self._read_wakeup_bytes() == 1
+
+    def test_invalid_write_mode(self):
+        with pytest.raises(ValueError):
+            self.client.write_mode_set(5)
@@ -0,0 +1,118 @@
+from AWSIoTPythonSDK.core.protocol.paho.matcher import MQTTMatcher
+from AWSIoTPythonSDK.core.protocol.paho.client import topic_matches_sub
+from AWSIoTPythonSDK.core.protocol.paho.client import Client
+import pytest
+
+
+TOPIC_FILTERS = [
+    "a/b/c",
+    "a/+/c",
+    "a/#",
+    "+/b/+",
+    "#",
+    "+",
+    "a/b/#",
+    "$aws/things/+/shadow/#",
+    "$aws/things/Bot/shadow/update/delta",
+]
+
+TOPICS = [
+    "a",
+    "a/b",
+    "a/b/c",
+    "a/x/c",
+    "x/b/y",
+    "a/b/c/d",
+    "b",
+    "$aws/things/Bot/shadow/update/delta",
+    "$aws/things/Bot/shadow/get/accepted",
+    "$SYS/broker",
+]
+
+
+def _create_matcher():
+    matcher = MQTTMatcher()
+    for topic_filter in TOPIC_FILTERS:
+        matcher[topic_filter] = topic_filter
+    return matcher
+
+
+@pytest.mark.parametrize("topic", TOPICS)
+def test_iter_match_agrees_with_topic_matches_sub(topic):
+    matcher = _create_matcher()
+
+    expected = set(f for f in TOPIC_FILTERS if topic_matches_sub(f, topic))
+    matched = list(matcher.iter_match(topic))
+
+    assert len(matched) == len(expected)
+    assert set(matched) == expected
+
+
+def test_empty_level_matches_wildcards():
+    matcher = _create_matcher()
+    # MQTT-4.7.1: "a/#" and "a/+" both match the topic "a/" which has an empty last level
+    matcher["a/+"] = "a/+"
+    assert set(matcher.iter_match("a/")) == {"a/#", "#", "a/+"}
+
+
+def test_exact_match_comes_first():
+    matcher = _create_matcher()
+    assert next(matcher.iter_match("a/b/c")) == "a/b/c"
+
+
+def test_get_set_delete():
+    matcher = _create_matcher()
+    assert len(matcher) == len(TOPIC_FILTERS)
+    assert matcher["a/+/c"] == "a/+/c"
+
+    matcher["a/+/c"] = "replaced"
+    assert matcher["a/+/c"] == "replaced"
+    assert len(matcher) == len(TOPIC_FILTERS)
+
+    del matcher["a/+/c"]
+    del matcher["a/b/c"]
+    assert "a/+/c" not in matcher
+    assert "a/b/c" not in matcher
+    assert "a/b/#" in matcher
+    assert set(matcher.iter_match("a/b/c")) == {"a/#", "+/b/+", "#", "a/b/#"}
+
+
+def test_delete_missing_filter():
+    matcher = _create_matcher()
+    with pytest.raises(KeyError):
+        del matcher["a/+"]
+    with pytest.raises(KeyError):
+        del matcher["not/there"]
+    with pytest.raises(KeyError):
+        matcher["a/+/+"]
+
+
+def test_delete_prunes_empty_nodes():
+    matcher = MQTTMatcher()
+    matcher["a/+/c/d"] = 1
+    del matcher["a/+/c/d"]
+    assert len(matcher) == 0
+    assert not matcher._root._children
+
+
+def test_items():
+    matcher = _create_matcher()
+
+    assert sorted(matcher.items()) == sorted((topic_filter, topic_filter) for topic_filter in TOPIC_FILTERS)
+
+
+def test_client_on_message_filtered_is_still_public():
+    client = Client("CoolClientId")
+    client.message_callback_add("a/+/c", len)
+    client.message_callback_add("a/b/c", str)
+
+    assert sorted(client.on_message_filtered) == [("a/+/c", len), ("a/b/c", str)]
+
+    client.on_message_filtered.append(("y/#", len))  # A snapshot, changing it does nothing
+
+    assert len(client.on_message_filtered) == 2
+
+    client.on_message_filtered = [("x/#", len)]
+
+    assert client.on_message_filtered == [("x/#", len)]
+    assert list(client._on_message_filtered.iter_match("x/y")) == [len]
@@ -0,0 +1,194 @@
+from AWSIoTPythonSDK.core.protocol.paho.client import Client
+from AWSIoTPythonSDK.core.protocol.paho.client import MQTT_ERR_SUCCESS
+from AWSIoTPythonSDK.core.protocol.paho.client import MQTT_ERR_UNKNOWN
+from AWSIoTPythonSDK.core.protocol.paho.client import CONNECT
+from AWSIoTPythonSDK.core.protocol.paho.client import CONNACK
+from AWSIoTPythonSDK.core.protocol.paho.client import PUBLISH
+from AWSIoTPythonSDK.core.protocol.paho.client import PUBACK
+from AWSIoTPythonSDK.core.protocol.paho.client import PINGREQ
+from AWSIoTPythonSDK.core.protocol.paho.client import PINGRESP
+from AWSIoTPythonSDK.core.protocol.paho.reactor import NetworkReactor
+from threading import Event
+from threading import Thread
+import socket
+import struct
+import pytest
+
+
+DUMMY_CLIENT_ID = "CoolClientId"
+DUMMY_TOPIC = "topic/cool"
+DUMMY_PAYLOAD = "CoolPayload"
+TIMEOUT_SEC = 5
+
+
+class _StandInBroker(object):
+    """Plain TCP endpoint that acks CONNECT, PINGREQ and QoS1 PUBLISH."""
+
+    def __init__(self):
+        self._listener = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        self._listener.bind(("127.0.0.1", 0))
+        self._listener.listen(16)
+        self.port = self._listener.getsockname()[1]
+        self.connections = []
+        self.connect_count = 0
+        self._thread = Thread(target=self._accept)
+        self._thread.daemon = True
+        self._thread.start()
+
+    def _accept(self):
+        while True:
+            try:
+                conn, address = self._listener.accept()
+            except socket.error:
+                return
+            self.connections.append(conn)
+            serve = Thread(target=self._serve, args=(conn,))
+            serve.daemon = True
+            serve.start()
+
+    def _recv_exactly(self, conn, length):
+        data = b""
+        while len(data) < length:
+            chunk = conn.recv(length - len(data))
+            if not chunk:
+                raise socket.error("closed")
+            data += chunk
+        return data
+
+    def _serve(self, conn):
+        try:
+            while True:
+                command = ord(self._recv_exactly(conn, 1))
+                remaining_length, multiplier = 0, 1
+                while True:
+                    byte = ord(self._recv_exactly(conn, 1))
+                    remaining_length += (byte & 127) * multiplier
+                    multiplier *= 128
+                    if byte & 128 == 0:
+                        break
+                body = self._recv_exactly(conn, remaining_length)
+                if command & 0xF0 == CONNECT:
+                    self.connect_count += 1
+                    conn.sendall(struct.pack("!BBBB", CONNACK, 2, 0, 0))
+                elif command & 0xF0 == PINGREQ:
+                    conn.sendall(struct.pack("!BB", PINGRESP, 0))
+                elif command & 0xF0 == PUBLISH and (command & 0x06) >> 1 == 1:
+                    topic_length = struct.unpack("!H", body[:2])[0]
+                    conn.sendall(struct.pack("!BB", PUBACK, 2) + body[2 + topic_length:4 + topic_length])
+        except socket.error:
+            pass
+        finally:
+            conn.close()
+
+    def drop_connections(self):
+        for conn in self.connections:
+            try:
+                conn.shutdown(socket.SHUT_RDWR)
+            except socket.error:
+                pass
+
+    def close(self):
+        self._listener.close()
+        self.drop_connections()
+
+
+class TestNetworkReactor:
+
+    def setup_method(self, test_method):
+        self.broker = _StandInBroker()
+        self.reactor = NetworkReactor()
+        self.clients = []
+
+    def teardown_method(self, test_method):
+        for client in self.clients:
+            client._thread_terminate = True
+        self.reactor.stop()
+        self.broker.close()
+
+    def _create_client(self, index=0):
+        client = Client(DUMMY_CLIENT_ID + str(index))
+        client.reactor_set(self.reactor)
+        client.connected = Event()
+        client.published = Event()
+        client.on_connect = lambda client, userdata, flags, rc: client.connected.set()
+        client.on_publish = lambda client, userdata, mid: client.published.set()
+        self.clients.append(client)
+        return client
+
+    def _connect(self, client):
+        assert client.connect("127.0.0.1", self.broker.port, 60) == MQTT_ERR_SUCCESS
+        client.loop_start()
+        assert client.connected.wait(TIMEOUT_SEC)
+
+    def test_clients_share_one_thread(self):
+        clients = [self._create_client(i) for i in range(3)]
+
+        for client in clients:
+            self._connect(client)
+
+        assert len(set(client._thread for client in clients)) == 1
+        assert self.reactor.client_count() == 3
+
+    def test_publish_qos1_is_acked(self):
+        client = self._create_client()
+        self._connect(client)
+
+        rc, mid = client.publish(DUMMY_TOPIC, DUMMY_PAYLOAD, 1)
+
+        assert rc == MQTT_ERR_SUCCESS
+        assert client.published.wait(TIMEOUT_SEC)
+        assert len(client._out_messages) == 0
+
+    def test_loop_stop_releases_client(self):
+        client = self._create_client()
+        self._connect(client)
+
+        client.disconnect()
+        client.loop_stop()
+
+        assert client._thread is None
+        assert self.reactor.client_count() == 0
+
+    def test_reconnect_after_connection_loss(self):
+        client = self._create_client()
+        client._backoffCore._currentBackoffTimeSecond = 0.05
+        self._connect(client)
+        client.connected.clear()
+
+        self.broker.drop_connections()
+
+        assert client.connected.wait(TIMEOUT_SEC)
+        assert self.broker.connect_count == 2
+
+    def test_loop_failure_disconnects_client(self):
+        client = self._create_client()
+        disconnect_rcs = []
+        disconnected = Event()
+
+        def on_disconnect(client, userdata, rc):
+            disconnect_rcs.append(rc)
+            disconnected.set()
+
+        def failing_loop_misc():
+            raise RuntimeError("Boom")
+
+        client.on_disconnect = on_disconnect
+        self._connect(client)
+        client.loop_misc = failing_loop_misc
+
+        assert disconnected.wait(TIMEOUT_SEC)
+        assert disconnect_rcs == [MQTT_ERR_UNKNOWN]
+        assert client._thread_terminate is True
+        assert client.socket() is None
+        assert self.reactor.client_count() == 0
+
+    def test_reactor_set_after_loop_start(self):
+        client = self._create_client()
+        self._connect(client)
+
+        with pytest.raises(ValueError):
+            client.reactor_set(None)
+
+    def test_invalid_thread_count(self):
+        with pytest.raises(ValueError):
+            NetworkReactor(0)
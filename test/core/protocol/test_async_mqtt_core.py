@@ -0,0 +1,318 @@
+from AWSIoTPythonSDK.core.protocol.async_mqtt_core import AsyncMqttCore
+from AWSIoTPythonSDK.core.protocol.internal.clients import ClientStatus
+from AWSIoTPythonSDK.core.protocol.internal.requests import RequestTypes
+from AWSIoTPythonSDK.core.protocol.internal.workers import PersistentOfflineRequestsManager
+from AWSIoTPythonSDK.core.protocol.paho.client import MQTTv311
+from AWSIoTPythonSDK.core.protocol.paho.client import CONNECT
+from AWSIoTPythonSDK.core.protocol.paho.client import CONNACK
+from AWSIoTPythonSDK.core.protocol.paho.client import PUBLISH
+from AWSIoTPythonSDK.core.protocol.paho.client import PUBACK
+from AWSIoTPythonSDK.core.protocol.paho.client import SUBSCRIBE
+from AWSIoTPythonSDK.core.protocol.paho.client import SUBACK
+from AWSIoTPythonSDK.core.protocol.paho.client import UNSUBSCRIBE
+from AWSIoTPythonSDK.core.protocol.paho.client import UNSUBACK
+from AWSIoTPythonSDK.core.protocol.paho.client import DISCONNECT
+from AWSIoTPythonSDK.core.protocol.paho.client import topic_matches_sub
+from AWSIoTPythonSDK.core.util.providers import EndpointProvider
+from AWSIoTPythonSDK.core.util.enums import DropBehaviorTypes
+from AWSIoTPythonSDK.exception.AWSIoTExceptions import connectError
+from AWSIoTPythonSDK.exception.AWSIoTExceptions import publishQueueDisabledException
+import asyncio
+import struct
+import threading
+import pytest
+
+
+DUMMY_CLIENT_ID = "CoolClientId"
+DUMMY_TOPIC = "topic/cool"
+DUMMY_TOPIC_REJECTED = "topic/rejected"
+DUMMY_PAYLOAD = b"CoolPayload"
+TIMEOUT_SEC = 5
+
+
+class _StandInBroker(object):
+    """Minimal asyncio MQTT broker: acks everything and routes publishes back to subscribed connections."""
+
+    def __init__(self, connack_rc=0):
+        self.connack_rc = connack_rc
+        self.session_present = 0
+        self.suback_rcs = {}  # Topic -> return code other than the requested QoS
+        self.held_subacks = None  # SUBACKs wait here until released when set to a list
+        self.is_puback_enabled = True
+        self.received = []
+        self.writers = []
+        self._subscriptions = {}
+        self._server = None
+
+    async def start(self):
+        self._server = await asyncio.start_server(self._serve, "127.0.0.1", 0)
+        self.port = self._server.sockets[0].getsockname()[1]
+
+    async def stop(self):
+        self.drop_connections()
+        self._server.close()
+        await self._server.wait_closed()
+
+    def drop_connections(self):
+        for writer in self.writers:
+            writer.close()
+        self.writers = []
+
+    def release_subacks(self):
+        for writer, suback in self.held_subacks:
+            writer.write(suback)
+        self.held_subacks = None
+
+    def received_commands(self, command):
+        return [body for cmd, body in self.received if cmd == command]
+
+    async def _serve(self, reader, writer):
+        self.writers.append(writer)
+        self._subscriptions[writer] = []
+        try:
+            while True:
+                header = await reader.readexactly(1)
+                remaining_length, multiplier = 0, 1
+                while True:
+                    byte = (await reader.readexactly(1))[0]
+                    remaining_length += (byte & 127) * multiplier
+                    multiplier *= 128
+                    if byte & 128 == 0:
+                        break
+                body = await reader.readexactly(remaining_length)
+                self._handle(writer, header[0], body)
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        finally:
+            writer.close()
+
+    def _handle(self, writer, command, body):
+        self.received.append((command & 0xF0, body))
+        if command & 0xF0 == CONNECT:
+            writer.write(struct.pack("!BBBB", CONNACK, 2, self.session_present, self.connack_rc))
+        elif command & 0xF0 == SUBSCRIBE:
+            granted_qos, position = b"", 2
+            while position < len(body):
+                topic_length = struct.unpack("!H", body[position:position + 2])[0]
+                topic = body[position + 2:position + 2 + topic_length].decode("utf-8")
+                self._subscriptions[writer].append(topic)
+                granted_qos += struct.pack("!B", self.suback_rcs.get(topic, body[position + 2 + topic_length]))
+                position += 3 + topic_length
+            suback = struct.pack("!BB", SUBACK, 2 + len(granted_qos)) + body[:2] + granted_qos
+            if self.held_subacks is None:
+                writer.write(suback)
+            else:
+                self.held_subacks.append((writer, suback))
+        elif command & 0xF0 == UNSUBSCRIBE:
+            writer.write(struct.pack("!BB", UNSUBACK, 2) + body[:2])
+        elif command & 0xF0 == PUBLISH:
+            qos = (command & 0x06) >> 1
+            topic_length = struct.unpack("!H", body[:2])[0]
+            topic = body[2:2 + topic_length]
+            payload = body[2 + topic_length + (2 if qos else 0):]
+            if qos and self.is_puback_enabled:
+                writer.write(struct.pack("!BB", PUBACK, 2) + body[2 + topic_length:4 + topic_length])
+            for subscriber, topic_filters in self._subscriptions.items():
+                if any(topic_matches_sub(f, topic.decode("utf-8")) for f in topic_filters):
+                    echo = struct.pack("!H", topic_length) + topic + payload
+                    subscriber.write(struct.pack("!BB", PUBLISH, len(echo)) + echo)
+
+
+class TestAsyncMqttCore:
+
+    def setup_method(self, test_method):
+        self.broker = _StandInBroker()
+        self.core = AsyncMqttCore(DUMMY_CLIENT_ID, True, MQTTv311)
+        self.core.configure_operation_timeout_sec(TIMEOUT_SEC)
+        self.core.configure_connect_disconnect_timeout_sec(TIMEOUT_SEC)
+        self.core.configure_draining_interval_sec(0)
+
+    def _run(self, test_coroutine):
+        async def run_with_broker():
+            await self.broker.start()
+            endpoint_provider = EndpointProvider()
+            endpoint_provider.set_host("127.0.0.1")
+            endpoint_provider.set_port(self.broker.port)
+            self.core.configure_endpoint(endpoint_provider)
+            try:
+                await asyncio.wait_for(test_coroutine(), TIMEOUT_SEC * 2)
+            finally:
+                await self.broker.stop()
+        asyncio.run(run_with_broker())
+
+    def test_connect_publish_disconnect(self):
+        async def test():
+            assert await self.core.connect(60) is True
+            assert await self.core.publish(DUMMY_TOPIC, DUMMY_PAYLOAD, 1) is True
+            assert await self.core.publish(DUMMY_TOPIC, DUMMY_PAYLOAD, 0) is True
+            assert await self.core.disconnect() is True
+            await asyncio.sleep(0.1)
+            assert len(self.broker.received_commands(PUBLISH)) == 2
+            assert len(self.broker.received_commands(DISCONNECT)) == 1
+        self._run(test)
+
+    def test_no_threads_are_started(self):
+        async def test():
+            thread_count = threading.active_count()
+            await self.core.connect(60)
+            await self.core.subscribe(DUMMY_TOPIC, 1)
+            await self.core.publish(DUMMY_TOPIC, DUMMY_PAYLOAD, 1)
+            await self.core.disconnect()
+            assert threading.active_count() == thread_count
+        self._run(test)
+
+    def test_messages_reach_callbacks_and_streams(self):
+        async def test():
+            received = []
+
+            async def message_callback(client, userdata, message):
+                received.append(message.payload)
+
+            await self.core.connect(60)
+            assert await self.core.subscribe(DUMMY_TOPIC, 1, message_callback) is True
+            async with self.core.message_stream("topic/#") as stream:
+                await self.core.publish(DUMMY_TOPIC, DUMMY_PAYLOAD, 0)
+                message = await stream.__anext__()
+            assert message.topic == DUMMY_TOPIC
+            assert message.payload == DUMMY_PAYLOAD
+            await asyncio.sleep(0)
+            assert received == [DUMMY_PAYLOAD]
+            assert await self.core.unsubscribe(DUMMY_TOPIC) is True
+            await self.core.disconnect()
+        self._run(test)
+
+    def test_offline_requests_are_drained_on_connect(self):
+        async def test():
+            assert await self.core.publish(DUMMY_TOPIC, DUMMY_PAYLOAD, 1) is False
+            assert await self.core.subscribe(DUMMY_TOPIC, 1) is False
+            await self.core.connect(60)
+            for i in range(50):
+                if self.broker.received_commands(SUBSCRIBE):
+                    break
+                await asyncio.sleep(0.05)
+            assert len(self.broker.received_commands(PUBLISH)) == 1
+            assert len(self.broker.received_commands(SUBSCRIBE)) == 1
+            await self.core.disconnect()
+        self._run(test)
+
+    def test_persisted_offline_publishes_are_acked(self, tmpdir):
+        async def test():
+            self.core.configure_persistent_offline_requests_queue(str(tmpdir), 0, DropBehaviorTypes.DROP_NEWEST)
+            self.broker.is_puback_enabled = False
+            for qos in (0, 1, 1):
+                assert await self.core.publish(DUMMY_TOPIC, DUMMY_PAYLOAD, qos) is False
+            await self.core.connect(60)
+            for i in range(50):
+                if len(self.broker.received_commands(PUBLISH)) == 3:
+                    break
+                await asyncio.sleep(0.05)
+            mid = struct.unpack("!H", self.broker.received_commands(PUBLISH)[-1][2 + len(DUMMY_TOPIC):][:2])[0]
+            self.core._on_publish(None, None, mid)  # PUBACK of the last publish only
+            await self.core.disconnect()
+            self.core._offline_requests_manager.close()
+        self._run(test)
+
+        # The QoS0 publish is acked, the first QoS1 one is not, so it comes again along with the one after it
+        offline_requests_manager = PersistentOfflineRequestsManager(str(tmpdir), 0, DropBehaviorTypes.DROP_NEWEST)
+        assert offline_requests_manager.get_queued_count() == 2
+        offline_requests_manager.close()
+
+    def test_offline_queue_disabled(self):
+        async def test():
+            self.core.configure_offline_requests_queue(0, DropBehaviorTypes.DROP_NEWEST)
+            with pytest.raises(publishQueueDisabledException):
+                await self.core.publish(DUMMY_TOPIC, DUMMY_PAYLOAD, 1)
+        self._run(test)
+
+    def test_reconnect_and_resubscribe_after_connection_loss(self):
+        async def test():
+            self.core._paho_client._backoffCore._currentBackoffTimeSecond = 0.05
+            online = asyncio.Event()
+            self.core.on_online = online.set
+            await self.core.connect(60)
+            await self.core.subscribe(DUMMY_TOPIC, 1)
+            online.clear()
+
+            self.broker.drop_connections()
+
+            await asyncio.wait_for(online.wait(), TIMEOUT_SEC)
+            for i in range(50):
+                if len(self.broker.received_commands(SUBSCRIBE)) == 2:
+                    break
+                await asyncio.sleep(0.05)
+            assert len(self.broker.received_commands(CONNECT)) == 2
+            assert len(self.broker.received_commands(SUBSCRIBE)) == 2
+            await self.core.disconnect()
+        self._run(test)
+
+    def test_present_session_keeps_confirmed_subscriptions(self):
+        async def test():
+            self.core._paho_client._backoffCore._currentBackoffTimeSecond = 0.05
+            await self.core.connect(60)
+            await self.core.subscribe(DUMMY_TOPIC, 1)
+            await self.core.subscribe(DUMMY_TOPIC_REJECTED, 1)
+            self.broker.suback_rcs[DUMMY_TOPIC_REJECTED] = 0x80
+
+            await self._drop_and_wait_for_resubscribe(3)  # No session, both records are sent again
+            self.broker.session_present = 1
+            del self.broker.suback_rcs[DUMMY_TOPIC_REJECTED]
+            await self._drop_and_wait_for_resubscribe(4)
+
+            assert DUMMY_TOPIC_REJECTED.encode("utf-8") in self.broker.received_commands(SUBSCRIBE)[-1]
+            assert DUMMY_TOPIC.encode("utf-8") not in self.broker.received_commands(SUBSCRIBE)[-1]
+            assert self.core._subscription_manager.list_unconfirmed_records() == []
+            await self.core.disconnect()
+        self._run(test)
+
+    def test_resubscribe_batches_are_acked_before_draining(self):
+        async def test():
+            self.core._paho_client._backoffCore._currentBackoffTimeSecond = 0.05
+            self.core.configure_max_topics_per_subscribe(2)
+            await self.core.connect(60)
+            for i in range(3):
+                await self.core.subscribe(DUMMY_TOPIC + str(i), 1)
+            self.core._handle_offline_request(RequestTypes.PUBLISH, (DUMMY_TOPIC, DUMMY_PAYLOAD, 1, False))
+            self.broker.held_subacks = []
+
+            self.broker.drop_connections()
+            for i in range(50):
+                if len(self.broker.received_commands(SUBSCRIBE)) == 5:
+                    break
+                await asyncio.sleep(0.05)
+            await asyncio.sleep(0.1)
+            assert [body.count(DUMMY_TOPIC.encode("utf-8")) for body in self.broker.received_commands(SUBSCRIBE)[3:]] == [2, 1]
+            assert self.broker.received_commands(PUBLISH) == []  # Draining waits for the SUBACKs
+            self.broker.release_subacks()
+            for i in range(50):
+                if self.broker.received_commands(PUBLISH):
+                    break
+                await asyncio.sleep(0.05)
+            assert len(self.broker.received_commands(PUBLISH)) == 1
+            assert self.core._subscription_manager.list_unconfirmed_records() == []
+            await self.core.disconnect()
+        self._run(test)
+
+    async def _drop_and_wait_for_resubscribe(self, subscribe_count):
+        online = asyncio.Event()
+        self.core.on_online = online.set
+        self.broker.drop_connections()
+        await asyncio.wait_for(online.wait(), TIMEOUT_SEC)
+        for i in range(50):
+            if self.core._client_status.get_status() == ClientStatus.STABLE:
+                break
+            await asyncio.sleep(0.05)
+        await asyncio.sleep(0.1)  # Nothing more is sent once stable
+        assert len(self.broker.received_commands(SUBSCRIBE)) == subscribe_count
+
+    def test_connect_refused(self):
+        online_calls = []
+        self.core.on_online = lambda: online_calls.append(True)
+
+        async def test():
+            with pytest.raises(connectError):
+                await self.core.connect(60)
+            await asyncio.sleep(0.05)
+        self.broker.connack_rc = 5
+        self._run(test)
+
+        assert online_calls == []  # Refused, never online
@@ -8,10 +8,15 @@ from AWSIoTPythonSDK.core.protocol.internal.workers import EventProducer
 from AWSIoTPythonSDK.core.protocol.internal.workers import EventConsumer
 from AWSIoTPythonSDK.core.protocol.internal.workers import SubscriptionManager
 from AWSIoTPythonSDK.core.protocol.internal.workers import OfflineRequestsManager
+from AWSIoTPythonSDK.core.protocol.internal.workers import MessageBatcher
+from AWSIoTPythonSDK.core.protocol.internal.workers import DrainRateController
+from AWSIoTPythonSDK.core.protocol.internal.workers import PersistentOfflineRequestsManager
 from AWSIoTPythonSDK.core.protocol.internal.events import FixedEventMids
+from AWSIoTPythonSDK.core.protocol.internal.events import EventTypes
 from AWSIoTPythonSDK.core.protocol.internal.queues import AppendResults
 from AWSIoTPythonSDK.core.protocol.internal.requests import RequestTypes
 from AWSIoTPythonSDK.core.protocol.internal.defaults import METRICS_PREFIX
+from AWSIoTPythonSDK.core.util.enums import DropBehaviorTypes
 from AWSIoTPythonSDK.exception.AWSIoTExceptions import connectError
 from AWSIoTPythonSDK.exception.AWSIoTExceptions import connectTimeoutException
 from AWSIoTPythonSDK.exception.AWSIoTExceptions import disconnectError
@@ -20,6 +25,7 @@ from AWSIoTPythonSDK.exception.AWSIoTExceptions import publishError
 from AWSIoTPythonSDK.exception.AWSIoTExceptions import publishTimeoutException
 from AWSIoTPythonSDK.exception.AWSIoTExceptions import publishQueueFullException
 from AWSIoTPythonSDK.exception.AWSIoTExceptions import publishQueueDisabledException
+from AWSIoTPythonSDK.exception.AWSIoTExceptions import publishOutboundQueueFullException
 from AWSIoTPythonSDK.exception.AWSIoTExceptions import subscribeError
 from AWSIoTPythonSDK.exception.AWSIoTExceptions import subackError
 from AWSIoTPythonSDK.exception.AWSIoTExceptions import subscribeTimeoutException
@@ -33,7 +39,10 @@ from AWSIoTPythonSDK.core.protocol.paho.client import MQTT_ERR_SUCCESS
 from AWSIoTPythonSDK.core.protocol.paho.client import MQTT_ERR_ERRNO
 from AWSIoTPythonSDK.core.protocol.paho.client import SUBACK_ERROR
 from AWSIoTPythonSDK.core.protocol.paho.client import MQTTv311
+from AWSIoTPythonSDK.core.protocol.paho.client import MQTTMessage
 from AWSIoTPythonSDK.core.protocol.internal.defaults import ALPN_PROTCOLS
+from AWSIoTPythonSDK.core.util.enums import OutboundQueueFullPolicyTypes
+from AWSIoTPythonSDK.core.util.enums import InboundQueueFullPolicyTypes
 try:
     from mock import patch
     from mock import MagicMock
@@ -208,7 +217,9 @@ class TestMqttCore:
                                                                         False, ack_callback)
 
     def _verify_mqtt_core_subscribe_async(self, ack_callback, message_callback):
-        self.internal_async_client_mock.subscribe.assert_called_once_with(DUMMY_TOPIC, DUMMY_QOS, ack_callback)
+        confirming_ack_callback = self.subscription_manager_mock.create_confirming_ack_callback.return_value
+        self.internal_async_client_mock.subscribe.assert_called_once_with(DUMMY_TOPIC, DUMMY_QOS, confirming_ack_callback)
+        self.subscription_manager_mock.create_confirming_ack_callback.assert_called_once_with(DUMMY_TOPIC, ack_callback)
         self.subscription_manager_mock.add_record.assert_called_once_with(DUMMY_TOPIC, DUMMY_QOS, message_callback, ack_callback)
 
     def _verify_mqtt_core_unsubscribe_async(self, ack_callback, message_callback):
@@ -447,6 +458,143 @@ class TestMqttCore:
     def test_unsubscribe_async_queue_disabled(self):
         self._internal_test_async_api_with(RequestTypes.UNSUBSCRIBE, QUEUE_DISABLED_EXPECTED_VALUES)
 
+    def test_configure_outbound_queue_limit(self):
+        self.mqtt_core.configure_outbound_queue_limit(1024, OutboundQueueFullPolicyTypes.FAIL_FAST)
+        self.internal_async_client_mock.configure_max_queued_bytes.assert_called_once_with(1024)
+
+    def test_configure_inbound_queue_limit_drop_newest_qos0(self):
+        self.mqtt_core.configure_inbound_queue_limit(1, 0, InboundQueueFullPolicyTypes.DROP_NEWEST_QOS0)
+        self._fill_inbound_queue(2)
+        assert self.mqtt_core.get_inbound_dropped_message_count() == 1
+        assert self.mqtt_core.get_inbound_dropped_byte_count() == len(DUMMY_TOPIC) + len(DUMMY_PAYLOAD)
+
+    def test_configure_inbound_queue_limit_pause_reading(self):
+        self.mqtt_core.configure_inbound_queue_limit(1, 0, InboundQueueFullPolicyTypes.PAUSE_READING)
+        self._fill_inbound_queue(2)
+        assert self.mqtt_core.get_inbound_dropped_message_count() == 0
+        self.internal_async_client_mock.pause_reading.assert_called_once_with()
+
+    def _fill_inbound_queue(self, message_count):
+        event_queue = self.mock_event_producer_constructor.call_args[0][0]
+        for i in range(message_count):
+            message = MQTTMessage()
+            message.topic = DUMMY_TOPIC
+            message.payload = DUMMY_PAYLOAD
+            event_queue.put((FixedEventMids.MESSAGE_MID, EventTypes.MESSAGE, message))
+
+    def test_configure_persistent_offline_requests_queue(self, tmpdir):
+        self.mqtt_core.configure_persistent_offline_requests_queue(str(tmpdir), 1024, DropBehaviorTypes.DROP_OLDEST)
+
+        self.offline_requests_manager_mock.close.assert_called_once_with()
+        offline_requests_manager = self.event_consumer_mock.update_offline_requests_manager.call_args[0][0]
+        assert isinstance(offline_requests_manager, PersistentOfflineRequestsManager)
+        offline_requests_manager.close()
+
+    def test_configure_max_topics_per_subscribe(self):
+        self.mqtt_core.configure_max_topics_per_subscribe(4)
+        self.event_consumer_mock.update_max_topics_per_subscribe.assert_called_once_with(4)
+
+    def test_configure_adaptive_draining(self):
+        self.mqtt_core.configure_adaptive_draining(20, 10, 10, 1.0)
+        drain_rate_controller = self.event_consumer_mock.update_drain_rate_controller.call_args[0][0]
+        assert isinstance(drain_rate_controller, DrainRateController)
+
+        self.mqtt_core.configure_adaptive_draining(0, 10, 10, 1.0)
+        self.event_consumer_mock.update_drain_rate_controller.assert_called_with(None)
+
+    def test_configure_message_dispatch_pool(self):
+        self.mqtt_core.configure_message_dispatch_pool(4, 10)
+        message_dispatch_pool = self.event_consumer_mock.update_message_dispatch_pool.call_args[0][0]
+        assert message_dispatch_pool.get_worker_count() == 4
+
+    def test_configure_message_dispatch_pool_disabled(self):
+        self.mqtt_core.configure_message_dispatch_pool(0, 0)
+        self.event_consumer_mock.update_message_dispatch_pool.assert_called_once_with(None)
+
+    def test_create_message_batch_callback(self):
+        message_batcher = self.mqtt_core.create_message_batch_callback(len, 10, 0.01)
+        assert isinstance(message_batcher, MessageBatcher)
+        assert message_batcher.batch_callback is len
+
+    def test_create_message_process_callback_without_pool(self):
+        with pytest.raises(ValueError):
+            self.mqtt_core.create_message_process_callback(len)
+
+    def test_configure_message_process_pool(self):
+        self.mqtt_core.configure_message_process_pool(2, 10, 0.01)
+        message_callback = self.mqtt_core.create_message_process_callback(len)
+        assert callable(message_callback)
+
+        self.mqtt_core.configure_message_process_pool(0, 10, 0.01)
+        with pytest.raises(ValueError):
+            self.mqtt_core.create_message_process_callback(len)
+
+    def test_disconnect_async_closes_message_process_pool(self):
+        message_process_pool_mock = MagicMock()
+        self.mqtt_core._message_process_pool = message_process_pool_mock
+        self.internal_async_client_mock.disconnect.return_value = DUMMY_SUCCESS_RC
+
+        self.mqtt_core.disconnect_async()
+
+        message_process_pool_mock.close.assert_called_once_with()
+
+    def test_connect_async_opens_message_process_pool(self):
+        message_process_pool_mock = MagicMock()
+        self.mqtt_core._message_process_pool = message_process_pool_mock
+        self.internal_async_client_mock.connect.return_value = DUMMY_SUCCESS_RC
+
+        self.mqtt_core.connect_async(DUMMY_KEEP_ALIVE_SEC)
+
+        message_process_pool_mock.open.assert_called_once_with()
+
+    def test_publish_async_outbound_queue_not_full(self):
+        self._use_full_outbound_queue(False)
+        self.mqtt_core.configure_outbound_queue_limit(1024, OutboundQueueFullPolicyTypes.FAIL_FAST)
+
+        assert self._invoke_mqtt_core_publish_async(None, None) == DUMMY_REQUEST_MID
+        self.internal_async_client_mock.wait_for_queue_room.assert_not_called()
+
+    def test_publish_async_outbound_queue_full_block(self):
+        self._use_full_outbound_queue(True)
+        self.internal_async_client_mock.wait_for_queue_room.return_value = True
+        self.mqtt_core.configure_operation_timeout_sec(3)
+        self.mqtt_core.configure_outbound_queue_limit(1024, OutboundQueueFullPolicyTypes.BLOCK)
+
+        assert self._invoke_mqtt_core_publish_async(None, None) == DUMMY_REQUEST_MID
+        self.internal_async_client_mock.wait_for_queue_room.assert_called_once_with(3)
+
+    def test_publish_async_outbound_queue_full_block_timeout(self):
+        self._use_full_outbound_queue(True)
+        self.internal_async_client_mock.wait_for_queue_room.return_value = False
+        self.mqtt_core.configure_outbound_queue_limit(1024, OutboundQueueFullPolicyTypes.BLOCK)
+
+        with pytest.raises(publishTimeoutException):
+            self._invoke_mqtt_core_publish_async(None, None)
+        self.internal_async_client_mock.publish.assert_not_called()
+
+    def test_publish_async_outbound_queue_full_fail_fast(self):
+        self._use_full_outbound_queue(True)
+        self.mqtt_core.configure_outbound_queue_limit(1024, OutboundQueueFullPolicyTypes.FAIL_FAST)
+
+        with pytest.raises(publishOutboundQueueFullException):
+            self._invoke_mqtt_core_publish_async(None, None)
+        self.internal_async_client_mock.publish.assert_not_called()
+
+    def test_publish_outbound_queue_full_drop_qos0(self):
+        self._use_full_outbound_queue(True)
+        self.mqtt_core.configure_outbound_queue_limit(1024, OutboundQueueFullPolicyTypes.DROP_QOS0)
+
+        assert self.mqtt_core.publish_async(DUMMY_TOPIC, DUMMY_PAYLOAD, 0) == FixedEventMids.DROPPED_MID
+        assert self.mqtt_core.publish(DUMMY_TOPIC, DUMMY_PAYLOAD, 0) is False
+        with pytest.raises(publishOutboundQueueFullException):
+            self.mqtt_core.publish_async(DUMMY_TOPIC, DUMMY_PAYLOAD, 1)
+        self.internal_async_client_mock.publish.assert_not_called()
+
+    def _use_full_outbound_queue(self, is_full):
+        self._configure_internal_async_client_publish(DUMMY_SUCCESS_RC, DUMMY_REQUEST_MID)
+        self.client_status_mock.get_status.return_value = ClientStatus.STABLE
+        self.internal_async_client_mock.is_queue_full.return_value = is_full
+
     def _internal_test_async_api_with(self, request_type, expected_values):
         expected_rc = expected_values.get(KEY_EXPECTED_REQUEST_RC)
         expected_append_result = expected_values.get(KEY_EXPECTED_QUEUE_APPEND_RESULT)
@@ -542,6 +690,54 @@ class TestMqttCore:
     def test_subscribe_queue_disabled(self):
         self._internal_test_sync_api_with(RequestTypes.SUBSCRIBE, QUEUE_DISABLED_EXPECTED_VALUES)
 
+    def test_subscribe_batch_success(self):
+        self._configure_internal_async_client_subscribe_batch((DUMMY_QOS, 0))
+        self.client_status_mock.get_status.return_value = ClientStatus.STABLE
+        message_callback = NonCallableMagicMock()
+
+        assert self.mqtt_core.subscribe_batch([(DUMMY_TOPIC, DUMMY_QOS, message_callback),
+                                               (DUMMY_TOPIC + "/2", 0, message_callback)]) is True
+
+        assert self.internal_async_client_mock.subscribe_batch.call_count == 1
+        assert [subscription[:2] for subscription in self.internal_async_client_mock.subscribe_batch.call_args[0][0]] \
+            == [(DUMMY_TOPIC, DUMMY_QOS), (DUMMY_TOPIC + "/2", 0)]
+        self.subscription_manager_mock.add_record.assert_has_calls([call(DUMMY_TOPIC, DUMMY_QOS, message_callback, None),
+                                                                     call(DUMMY_TOPIC + "/2", 0, message_callback, None)])
+
+    def test_subscribe_batch_error_suback(self):
+        self._configure_internal_async_client_subscribe_batch((DUMMY_QOS, SUBACK_ERROR))
+        self.client_status_mock.get_status.return_value = ClientStatus.STABLE
+
+        with pytest.raises(subackError):
+            self.mqtt_core.subscribe_batch([(DUMMY_TOPIC, DUMMY_QOS, None), (DUMMY_TOPIC + "/2", 0, None)])
+
+    def test_subscribe_batch_timeout(self):
+        self.internal_async_client_mock.subscribe_batch.return_value = DUMMY_SUCCESS_RC, DUMMY_REQUEST_MID
+        self.client_status_mock.get_status.return_value = ClientStatus.STABLE
+        self._use_mock_python_event()
+        self.python_event_mock.wait.return_value = False
+
+        with pytest.raises(subscribeTimeoutException):
+            self.mqtt_core.subscribe_batch([(DUMMY_TOPIC, DUMMY_QOS, None), (DUMMY_TOPIC + "/2", 0, None)])
+        self.internal_async_client_mock.remove_event_callback.assert_called_once_with(DUMMY_REQUEST_MID)
+        self.python_event_patcher.stop()
+
+    def test_subscribe_batch_queued(self):
+        self.client_status_mock.get_status.return_value = ClientStatus.ABNORMAL_DISCONNECT
+        self.offline_requests_manager_mock.add_one.return_value = AppendResults.APPEND_SUCCESS
+
+        assert self.mqtt_core.subscribe_batch([(DUMMY_TOPIC, DUMMY_QOS, None), (DUMMY_TOPIC + "/2", 0, None)]) is False
+        assert self.offline_requests_manager_mock.add_one.call_count == 2
+        self.internal_async_client_mock.subscribe_batch.assert_not_called()
+
+    def _configure_internal_async_client_subscribe_batch(self, granted_qos_list):
+        self.subscription_manager_mock.create_confirming_ack_callback.side_effect = lambda topic, ack_callback: ack_callback
+        def subscribe_batch(subscriptions):  # SUBACK arrives right away, split per topic
+            for (topic, qos, ack_callback), granted_qos in zip(subscriptions, granted_qos_list):
+                ack_callback(mid=DUMMY_REQUEST_MID, data=(granted_qos,))
+            return DUMMY_SUCCESS_RC, DUMMY_REQUEST_MID
+        self.internal_async_client_mock.subscribe_batch.side_effect = subscribe_batch
+
     def test_unsubscribe_success(self):
         self._internal_test_sync_api_with(RequestTypes.UNSUBSCRIBE, NO_TIMEOUT_EXPECTED_VALUES)
 
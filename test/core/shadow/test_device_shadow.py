@@ -3,8 +3,10 @@
 from AWSIoTPythonSDK.core.shadow.deviceShadow import deviceShadow
 from AWSIoTPythonSDK.core.shadow.shadowManager import shadowManager
 from AWSIoTPythonSDK.core.protocol.paho.client import MQTTMessage
+import threading
 import time
 import json
+import pytest
 try:
     from mock import MagicMock
 except:
@@ -122,6 +124,27 @@ class TestDeviceShadow:
 
         assert self.shadow_callback.call_count == 0
 
+    def test_thread_count_does_not_grow_with_request_rate(self):
+        self.device_shadow_handler.shadowRegisterDeltaCallback(self.shadow_callback)
+        self._invoke_shadow_update()  # Warm up the shared scheduler and executor threads
+        time.sleep(0.1)
+        thread_count = threading.active_count()
+
+        for i in range(100):
+            token = self._invoke_shadow_update()
+            fake_response = self._create_fake_shadow_response(SHADOW_TOPIC_UPDATE_ACCEPTED,
+                                                              self._create_simple_payload(token, version=i + 1))
+            self.device_shadow_handler.generalCallback(None, None, fake_response)
+            self.device_shadow_handler.generalCallback(None, None,
+                                                       self._create_fake_shadow_response(SHADOW_TOPIC_UPDATE_DELTA,
+                                                                                         self._create_simple_payload(None, version=i + 101)))
+            assert threading.active_count() <= thread_count + 1  # At most one more lazily started worker
+
+        time.sleep(1)
+        assert self.shadow_callback.call_count == 200
+        delta_versions = [json.loads(c[0][0])["version"] for c in self.shadow_callback.call_args_list if c[0][2] is None]
+        assert delta_versions == sorted(delta_versions)  # Callbacks of one shadow stay in order
+
     def _fake_incoming_delta_message_with(self, version):
         fake_delta_message = self._create_fake_shadow_response(SHADOW_TOPIC_UPDATE_DELTA,
                                                                self._create_simple_payload(token=None, version=version))
@@ -295,3 +318,414 @@ class TestDeviceShadow:
         if version is not None:
             payload_object["version"] = version
         return json.dumps(payload_object).encode("utf-8")
+
+
+class DeferredCallbackExecutor(object):
+    # Runs submitted callbacks on demand, after the shadow has released its lock
+
+    def __init__(self):
+        self._pending = []
+
+    def submit(self, key, callback, args=()):
+        self._pending.append((callback, args))
+
+    def run_pending(self):
+        while self._pending:
+            callback, args = self._pending.pop(0)
+            callback(*args)
+
+
+class TestDeviceShadowBlockingWork:
+
+    def setup_method(self, method):
+        self.shadow_manager_mock = MagicMock(spec=shadowManager)
+        self.shadow_callback = MagicMock()
+        self.callback_executor = DeferredCallbackExecutor()
+        self.blocking_executor = DeferredCallbackExecutor()
+        self.device_shadow_handler = deviceShadow(DUMMY_THING_NAME, False, self.shadow_manager_mock,
+                                                  srcTimeoutScheduler=MagicMock(),
+                                                  srcCallbackExecutor=self.callback_executor,
+                                                  srcBlockingExecutor=self.blocking_executor)
+
+    def test_non_persistent_unsubscribe_runs_on_blocking_executor(self):
+        token = self.device_shadow_handler.shadowGet(self.shadow_callback, DUMMY_SHADOW_OP_TIME_OUT_SEC)
+        message = MQTTMessage()
+        message.topic = SHADOW_TOPIC_GET_ACCEPTED
+        message.payload = json.dumps({"version": 1, "clientToken": token}).encode("utf-8")
+        self.device_shadow_handler.generalCallback(None, None, message)
+
+        self.callback_executor.run_pending()
+        self.shadow_callback.assert_called_once()
+        self.shadow_manager_mock.basicShadowUnsubscribe.assert_not_called()  # Callback workers never wait on UNSUBACK
+
+        self.blocking_executor.run_pending()
+        self.shadow_manager_mock.basicShadowUnsubscribe.assert_called_once_with(DUMMY_THING_NAME, "get")
+
+
+class TestDeviceShadowCache:
+
+    def setup_method(self, method):
+        self.shadow_manager_mock = MagicMock(spec=shadowManager)
+        self.shadow_callback = MagicMock()
+        self.callback_executor = DeferredCallbackExecutor()
+        self.device_shadow_handler = deviceShadow(DUMMY_THING_NAME, True, self.shadow_manager_mock,
+                                                  srcTimeoutScheduler=MagicMock(),
+                                                  srcCallbackExecutor=self.callback_executor,
+                                                  srcBlockingExecutor=self.callback_executor,
+                                                  srcIsCacheEnabled=True)
+        self.device_shadow_handler.shadowRegisterDeltaCallback(self.shadow_callback)
+
+    def test_cache_disabled_should_raise(self):
+        device_shadow_handler = deviceShadow(DUMMY_THING_NAME, True, self.shadow_manager_mock)
+        with pytest.raises(ValueError):
+            device_shadow_handler.getCachedState()
+
+    def test_nothing_cached_before_get(self):
+        self._fake_incoming_message(SHADOW_TOPIC_UPDATE_DELTA, {"state": {"color": "red"}, "version": 2})
+        assert self.device_shadow_handler.getCachedState() is None
+
+    def test_get_accepted_populates_cache(self):
+        self._populate_cache(version=1)
+
+        assert self.device_shadow_handler.getCachedState() == {"desired": {"color": "blue", "size": 1},
+                                                               "reported": {"color": "green", "size": 1}}
+        self.shadow_callback.assert_called_once()  # The get callback still gets the response
+
+    def test_cached_state_is_a_copy(self):
+        self._populate_cache(version=1)
+
+        self.device_shadow_handler.getCachedState()["desired"]["color"] = "black"
+
+        assert self.device_shadow_handler.getCachedState()["desired"]["color"] == "blue"
+
+    def test_delta_in_order_merges_desired(self):
+        self._populate_cache(version=1)
+
+        self._fake_incoming_message(SHADOW_TOPIC_UPDATE_DELTA, {"state": {"color": "red"}, "version": 2})
+        self._fake_incoming_message(SHADOW_TOPIC_UPDATE_DELTA, {"state": {"color": "white"}, "version": 2})  # Stale
+
+        assert self.device_shadow_handler.getCachedState()["desired"] == {"color": "red", "size": 1}
+
+    def test_update_accepted_merges_and_null_deletes(self):
+        self._populate_cache(version=1)
+
+        token = self.device_shadow_handler.shadowUpdate("{}", self.shadow_callback, DUMMY_SHADOW_OP_TIME_OUT_SEC)
+        self._fake_incoming_message(SHADOW_TOPIC_UPDATE_ACCEPTED, {"state": {"reported": {"color": "blue", "size": None}},
+                                                                   "version": 2, "clientToken": token})
+
+        assert self.device_shadow_handler.getCachedState()["reported"] == {"color": "blue"}
+
+    def test_update_accepted_after_delta_of_same_version_fills_in_reported(self):
+        self._populate_cache(version=1)
+
+        token = self.device_shadow_handler.shadowUpdate("{}", self.shadow_callback, DUMMY_SHADOW_OP_TIME_OUT_SEC)
+        self._fake_incoming_message(SHADOW_TOPIC_UPDATE_DELTA, {"state": {"size": 2}, "version": 2})
+        self._fake_incoming_message(SHADOW_TOPIC_UPDATE_ACCEPTED, {"state": {"desired": {"size": 2}, "reported": {"color": "blue"}},
+                                                                   "version": 2, "clientToken": token})
+
+        assert self.device_shadow_handler.getCachedState() == {"desired": {"color": "blue", "size": 2},
+                                                               "reported": {"color": "blue", "size": 1}}
+
+    def test_version_gap_refreshes_cache(self):
+        self._populate_cache(version=1)
+        self.shadow_callback.reset_mock()
+        self.shadow_manager_mock.basicShadowPublish.reset_mock()
+
+        self._fake_incoming_message(SHADOW_TOPIC_UPDATE_DELTA, {"state": {"color": "red"}, "version": 5})
+
+        assert self.device_shadow_handler.getCachedState() is None
+        shadow_name, action, payload = self.shadow_manager_mock.basicShadowPublish.call_args[0]
+        assert action == SHADOW_OP_TYPE_GET
+        self._fake_incoming_message(SHADOW_TOPIC_GET_ACCEPTED, {"state": {"desired": {"color": "red"}}, "version": 5,
+                                                                "clientToken": json.loads(payload)["clientToken"]})
+        assert self.device_shadow_handler.getCachedState() == {"desired": {"color": "red"}}
+        assert self.shadow_callback.call_count == 1  # Only the delta, the refresh response is not for the user
+
+    def test_delete_accepted_clears_cache(self):
+        self._populate_cache(version=1)
+
+        token = self.device_shadow_handler.shadowDelete(self.shadow_callback, DUMMY_SHADOW_OP_TIME_OUT_SEC)
+        self._fake_incoming_message(SHADOW_TOPIC_DELETE_ACCEPTED, {"version": 1, "clientToken": token})
+
+        assert self.device_shadow_handler.getCachedState() is None
+
+    def _populate_cache(self, version):
+        token = self.device_shadow_handler.shadowGet(self.shadow_callback, DUMMY_SHADOW_OP_TIME_OUT_SEC)
+        self._fake_incoming_message(SHADOW_TOPIC_GET_ACCEPTED, {"state": {"desired": {"color": "blue", "size": 1},
+                                                                          "reported": {"color": "green", "size": 1},
+                                                                          "delta": {"color": "blue"}},
+                                                                "version": version, "clientToken": token})
+
+    def _fake_incoming_message(self, topic, payload_object):
+        message = MQTTMessage()
+        message.topic = topic
+        message.payload = json.dumps(payload_object).encode("utf-8")
+        self.device_shadow_handler.generalCallback(None, None, message)
+        self.callback_executor.run_pending()
+
+
+class TestDeviceShadowSnapshot:
+
+    def setup_method(self, method):
+        self.shadow_manager_mock = MagicMock(spec=shadowManager)
+        self.shadow_callback = MagicMock()
+        self.timeout_scheduler = MagicMock()
+        self.callback_executor = DeferredCallbackExecutor()
+
+    def test_snapshot_loaded_at_creation_and_reconciled(self, tmpdir):
+        snapshot_path = self._write_snapshot(tmpdir, {"state": {"desired": {"color": "blue"}}, "version": 7})
+
+        self._create_device_shadow_handler(snapshot_path)
+
+        assert self.device_shadow_handler.getCachedState() == {"desired": {"color": "blue"}}
+        assert self.shadow_manager_mock.basicShadowPublish.call_count == 0
+        self.callback_executor.run_pending()  # Reconcile in the background
+        shadow_name, action, payload = self.shadow_manager_mock.basicShadowPublish.call_args[0]
+        assert action == SHADOW_OP_TYPE_GET
+        # The shadow was recreated since, its version restarted
+        self._fake_incoming_message(SHADOW_TOPIC_GET_ACCEPTED, {"state": {"desired": {"color": "red"}}, "version": 2,
+                                                                "clientToken": json.loads(payload)["clientToken"]})
+        assert self.device_shadow_handler.getCachedState() == {"desired": {"color": "red"}}
+
+    def test_unusable_snapshot_is_ignored(self, tmpdir):
+        snapshot_path = str(tmpdir.join("snapshot.json"))
+        with open(snapshot_path, "w") as snapshot_file:
+            snapshot_file.write('{"state": {"desired": ')  # Torn write
+
+        self._create_device_shadow_handler(snapshot_path)
+
+        assert self.device_shadow_handler.getCachedState() is None
+
+    def test_reconcile_failure_keeps_snapshot(self, tmpdir):
+        snapshot_path = self._write_snapshot(tmpdir, {"state": {"desired": {"color": "blue"}}, "version": 7})
+        self._create_device_shadow_handler(snapshot_path)
+        self.shadow_manager_mock.basicShadowSubscribe.side_effect = Exception("Not connected")
+        self.callback_executor.run_pending()
+
+        assert self.device_shadow_handler.getCachedState() == {"desired": {"color": "blue"}}
+
+    def test_reconcile_failure_is_retried_with_backoff(self, tmpdir):
+        snapshot_path = self._write_snapshot(tmpdir, {"state": {"desired": {"color": "blue"}}, "version": 7})
+        self._create_device_shadow_handler(snapshot_path)
+        self.shadow_manager_mock.basicShadowSubscribe.side_effect = Exception("Not connected")
+        self.callback_executor.run_pending()
+        self._get_reconcile_schedules()[-1]()
+        self.callback_executor.run_pending()
+
+        assert [c[0][0] for c in self._get_reconcile_schedule_calls()] == [1, 2]
+        assert self.device_shadow_handler._tokenPool == {}  # Failed attempts leave no token behind
+        self.shadow_manager_mock.basicShadowSubscribe.side_effect = None
+        self._get_reconcile_schedules()[-1]()
+        self.callback_executor.run_pending()
+        payload = self.shadow_manager_mock.basicShadowPublish.call_args[0][2]
+        self._fake_incoming_message(SHADOW_TOPIC_GET_ACCEPTED, {"state": {"desired": {"color": "red"}}, "version": 8,
+                                                                "clientToken": json.loads(payload)["clientToken"]})
+        assert self.device_shadow_handler.getCachedState() == {"desired": {"color": "red"}}
+        assert len(self._get_reconcile_schedules()) == 2
+
+    def test_reconcile_timeout_is_retried(self, tmpdir):
+        snapshot_path = self._write_snapshot(tmpdir, {"state": {"desired": {"color": "blue"}}, "version": 7})
+        self._create_device_shadow_handler(snapshot_path)
+        self.callback_executor.run_pending()
+        payload = self.shadow_manager_mock.basicShadowPublish.call_args[0][2]
+
+        self.device_shadow_handler._timerHandler("get", json.loads(payload)["clientToken"])
+        self._get_reconcile_schedules()[-1]()
+        self.callback_executor.run_pending()
+
+        assert self.shadow_manager_mock.basicShadowPublish.call_count == 2
+
+    def test_reconcile_not_found_removes_snapshot(self, tmpdir):
+        snapshot_path = self._write_snapshot(tmpdir, {"state": {"desired": {"color": "blue"}}, "version": 7})
+        self._create_device_shadow_handler(snapshot_path)
+        self.callback_executor.run_pending()
+        payload = self.shadow_manager_mock.basicShadowPublish.call_args[0][2]
+
+        self._fake_incoming_message(SHADOW_TOPIC_GET_REJECTED, {"code": 404, "message": "No shadow exists",
+                                                                "clientToken": json.loads(payload)["clientToken"]})
+        self._get_snapshot_write_schedules()[-1]()
+        self.callback_executor.run_pending()
+
+        assert self.device_shadow_handler.getCachedState() is None
+        assert not tmpdir.join("snapshot.json").check()
+        assert self._get_reconcile_schedules() == []
+
+    def test_changes_are_written_in_one_batch(self, tmpdir):
+        snapshot_path = self._write_snapshot(tmpdir, {"state": {"desired": {"color": "blue"}}, "version": 7})
+        self._create_device_shadow_handler(snapshot_path)
+
+        self._fake_incoming_message(SHADOW_TOPIC_UPDATE_DELTA, {"state": {"color": "red"}, "version": 8})
+        self._fake_incoming_message(SHADOW_TOPIC_UPDATE_DELTA, {"state": {"size": 2}, "version": 9})
+
+        snapshot_write_schedules = self._get_snapshot_write_schedules()
+        assert len(snapshot_write_schedules) == 1
+        snapshot_write_schedules[0]()
+        self.callback_executor.run_pending()
+        assert self._read_snapshot(snapshot_path) == {"state": {"desired": {"color": "red", "size": 2}}, "version": 9}
+        assert not tmpdir.join("snapshot.json.tmp").check()
+
+    def test_delete_accepted_removes_snapshot(self, tmpdir):
+        snapshot_path = self._write_snapshot(tmpdir, {"state": {"desired": {"color": "blue"}}, "version": 7})
+        self._create_device_shadow_handler(snapshot_path)
+
+        token = self.device_shadow_handler.shadowDelete(self.shadow_callback, DUMMY_SHADOW_OP_TIME_OUT_SEC)
+        self._fake_incoming_message(SHADOW_TOPIC_DELETE_ACCEPTED, {"version": 7, "clientToken": token})
+        self._get_snapshot_write_schedules()[-1]()
+        self.callback_executor.run_pending()
+
+        assert not tmpdir.join("snapshot.json").check()
+
+    def _create_device_shadow_handler(self, snapshot_path):
+        self.device_shadow_handler = deviceShadow(DUMMY_THING_NAME, True, self.shadow_manager_mock,
+                                                  srcTimeoutScheduler=self.timeout_scheduler,
+                                                  srcCallbackExecutor=self.callback_executor,
+                                                  srcBlockingExecutor=self.callback_executor,
+                                                  srcSnapshotPath=snapshot_path)
+        self.device_shadow_handler.shadowRegisterDeltaCallback(self.shadow_callback)
+
+    def _get_snapshot_write_schedules(self):
+        # The scheduler also tracks request timeouts
+        return [c[0][1] for c in self.timeout_scheduler.schedule.call_args_list
+                if c[0][1] == self.device_shadow_handler._snapshotWriteDue]
+
+    def _get_reconcile_schedule_calls(self):
+        return [c for c in self.timeout_scheduler.schedule.call_args_list
+                if c[0][1] == self.device_shadow_handler._snapshotReconcileDue]
+
+    def _get_reconcile_schedules(self):
+        return [c[0][1] for c in self._get_reconcile_schedule_calls()]
+
+    def _write_snapshot(self, tmpdir, snapshot_object):
+        snapshot_path = str(tmpdir.join("snapshot.json"))
+        with open(snapshot_path, "w") as snapshot_file:
+            json.dump(snapshot_object, snapshot_file)
+        return snapshot_path
+
+    def _read_snapshot(self, snapshot_path):
+        with open(snapshot_path, "r") as snapshot_file:
+            return json.load(snapshot_file)
+
+    def _fake_incoming_message(self, topic, payload_object):
+        message = MQTTMessage()
+        message.topic = topic
+        message.payload = json.dumps(payload_object).encode("utf-8")
+        self.device_shadow_handler.generalCallback(None, None, message)
+        self.callback_executor.run_pending()
+
+
+class TestDeviceShadowUpdateCoalescing:
+
+    def setup_method(self, method):
+        self.shadow_manager_mock = MagicMock(spec=shadowManager)
+        self.timeout_scheduler = MagicMock()
+        self.callback_executor = DeferredCallbackExecutor()
+        self.device_shadow_handler = deviceShadow(DUMMY_THING_NAME, True, self.shadow_manager_mock,
+                                                  srcTimeoutScheduler=self.timeout_scheduler,
+                                                  srcCallbackExecutor=self.callback_executor,
+                                                  srcBlockingExecutor=self.callback_executor,
+                                                  srcUpdateCoalescingWindowSecond=0.1)
+        self.callbacks = [MagicMock() for i in range(3)]
+
+    def test_updates_within_window_are_merged_into_one_request(self):
+        tokens = self._make_updates()
+        assert self.shadow_manager_mock.basicShadowPublish.call_count == 0
+
+        self._close_window()
+
+        assert len(set(tokens)) == 1
+        self.shadow_manager_mock.basicShadowPublish.assert_called_once()
+        shadow_name, action, payload = self.shadow_manager_mock.basicShadowPublish.call_args[0]
+        assert json.loads(payload) == {"state": {"reported": {"temperature": 22, "humidity": None, "light": {"on": True, "level": 3}},
+                                                 "desired": {"mode": "eco"}},
+                                       "clientToken": tokens[0]}
+
+    def test_every_merged_callback_gets_the_response(self):
+        tokens = self._make_updates()
+        self._close_window()
+
+        response = self._create_fake_response(SHADOW_TOPIC_UPDATE_ACCEPTED, {"version": 2, "clientToken": tokens[0]})
+        self.device_shadow_handler.generalCallback(None, None, response)
+        self.callback_executor.run_pending()
+
+        for callback in self.callbacks:
+            callback.assert_called_once_with(response.payload.decode("utf-8"), SHADOW_OP_RESPONSE_STATUS_ACCEPTED, tokens[0])
+
+    def test_every_merged_callback_gets_the_timeout(self):
+        tokens = self._make_updates()
+        self._close_window()
+
+        delay_sec, timer_expired, args = self.timeout_scheduler.schedule.call_args_list[-1][0]
+        assert delay_sec == 5  # Longest timeout of the merged updates
+        timer_expired(*args)
+        self.callback_executor.run_pending()
+
+        for callback in self.callbacks:
+            callback.assert_called_once_with(SHADOW_RESPONSE_PAYLOAD_TIMEOUT, SHADOW_OP_RESPONSE_STATUS_TIMEOUT, tokens[0])
+
+    def test_send_failure_is_reported_to_every_merged_callback(self):
+        tokens = self._make_updates()
+        self.shadow_manager_mock.basicShadowSubscribe.side_effect = Exception("Not connected")
+
+        self._close_window()
+
+        for callback in self.callbacks:
+            callback.assert_called_once_with(SHADOW_RESPONSE_PAYLOAD_TIMEOUT, SHADOW_OP_RESPONSE_STATUS_TIMEOUT, tokens[0])
+
+    def test_versioned_update_is_sent_on_its_own_after_held_updates(self):
+        held_token = self.device_shadow_handler.shadowUpdate('{"state": {"reported": {"temperature": 21}}}', self.callbacks[0], 3)
+
+        versioned_token = self.device_shadow_handler.shadowUpdate('{"state": {"reported": {"temperature": 22}}, "version": 5}',
+                                                                  self.callbacks[1], 3)
+
+        assert held_token != versioned_token
+        payloads = [json.loads(c[0][2]) for c in self.shadow_manager_mock.basicShadowPublish.call_args_list]
+        assert payloads == [{"state": {"reported": {"temperature": 21}}, "clientToken": held_token},
+                            {"state": {"reported": {"temperature": 22}}, "version": 5, "clientToken": versioned_token}]
+
+    def test_object_after_held_null_starts_a_new_request(self):
+        delete_token = self.device_shadow_handler.shadowUpdate('{"state": {"reported": {"a": null, "b": 1}}}',
+                                                               self.callbacks[0], 3)
+
+        replace_token = self.device_shadow_handler.shadowUpdate('{"state": {"reported": {"a": {"y": 2}}}}',
+                                                                self.callbacks[1], 3)
+        self._close_window(0)  # Window of the request already sent
+        self._close_window(1)
+
+        assert delete_token != replace_token
+        payloads = [json.loads(c[0][2]) for c in self.shadow_manager_mock.basicShadowPublish.call_args_list]
+        assert payloads == [{"state": {"reported": {"a": None, "b": 1}}, "clientToken": delete_token},
+                            {"state": {"reported": {"a": {"y": 2}}}, "clientToken": replace_token}]
+
+    def test_object_after_held_object_is_merged(self):
+        tokens = [self.device_shadow_handler.shadowUpdate('{"state": {"reported": {"a": {"x": null}}}}', self.callbacks[0], 3),
+                  self.device_shadow_handler.shadowUpdate('{"state": {"reported": {"a": {"y": 2}}}}', self.callbacks[1], 3)]
+        self._close_window()
+
+        assert tokens[0] == tokens[1]
+        self.shadow_manager_mock.basicShadowPublish.assert_called_once()
+        assert json.loads(self.shadow_manager_mock.basicShadowPublish.call_args[0][2]) == \
+            {"state": {"reported": {"a": {"x": None, "y": 2}}}, "clientToken": tokens[0]}
+
+    def test_invalid_json_should_raise(self):
+        with pytest.raises(ValueError):
+            self.device_shadow_handler.shadowUpdate(GARBAGE_PAYLOAD.decode("utf-8"), self.callbacks[0], 3)
+
+    def _make_updates(self):
+        return [self.device_shadow_handler.shadowUpdate('{"state": {"reported": {"temperature": 21, "humidity": 40, "light": {"on": true}}}}',
+                                                        self.callbacks[0], 3),
+                self.device_shadow_handler.shadowUpdate('{"state": {"reported": {"humidity": null, "light": {"level": 3}}}}',
+                                                        self.callbacks[1], 5),
+                self.device_shadow_handler.shadowUpdate('{"state": {"reported": {"temperature": 22}, "desired": {"mode": "eco"}}}',
+                                                        self.callbacks[2], 3)]
+
+    def _close_window(self, index=0):
+        delay_sec, window_closed, args = self.timeout_scheduler.schedule.call_args_list[index][0]
+        assert delay_sec == 0.1
+        window_closed(*args)
+        self.callback_executor.run_pending()
+
+    def _create_fake_response(self, topic, payload_object):
+        message = MQTTMessage()
+        message.topic = topic
+        message.payload = json.dumps(payload_object).encode("utf-8")
+        return message
@@ -0,0 +1,123 @@
+from AWSIoTPythonSDK.core.shadow.shadowExecutor import timeoutScheduler
+from AWSIoTPythonSDK.core.shadow.shadowExecutor import orderedCallbackExecutor
+from AWSIoTPythonSDK.core.shadow.shadowExecutor import getSharedCallbackExecutor
+from AWSIoTPythonSDK.core.shadow.shadowExecutor import getSharedBlockingExecutor
+from threading import Event
+from threading import Lock
+import time
+import pytest
+
+
+TIMEOUT_SEC = 5
+DUMMY_KEY_A = "CoolShadowA"
+DUMMY_KEY_B = "CoolShadowB"
+
+
+class TestTimeoutScheduler:
+
+    def setup_method(self, method):
+        self.scheduler = timeoutScheduler()
+        self.fired = []
+        self.all_fired = Event()
+
+    def _on_timeout(self, name, expected_count):
+        self.fired.append(name)
+        if len(self.fired) == expected_count:
+            self.all_fired.set()
+
+    def test_timeouts_fire_in_deadline_order(self):
+        self.scheduler.schedule(0.3, self._on_timeout, ["late", 3])
+        self.scheduler.schedule(0.1, self._on_timeout, ["early", 3])
+        self.scheduler.schedule(0.2, self._on_timeout, ["middle", 3])
+
+        assert self.all_fired.wait(TIMEOUT_SEC)
+        assert self.fired == ["early", "middle", "late"]
+
+    def test_cancelled_timeout_does_not_fire(self):
+        handle = self.scheduler.schedule(0.1, self._on_timeout, ["cancelled", 1])
+        self.scheduler.schedule(0.2, self._on_timeout, ["kept", 1])
+        handle.cancel()
+
+        assert self.all_fired.wait(TIMEOUT_SEC)
+        assert self.fired == ["kept"]
+        assert handle.isCancelled()
+
+    def test_earlier_timeout_scheduled_while_waiting(self):
+        self.scheduler.schedule(10, self._on_timeout, ["far", 1])
+        time.sleep(0.1)  # Scheduler thread is now waiting on the far deadline
+        self.scheduler.schedule(0.1, self._on_timeout, ["near", 1])
+
+        assert self.all_fired.wait(TIMEOUT_SEC)
+        assert self.fired == ["near"]
+        assert self.scheduler.pendingCount() == 1
+
+    def test_one_thread_for_all_timeouts(self):
+        for i in range(100):
+            self.scheduler.schedule(0.01, self._on_timeout, [i, 100])
+
+        assert self.all_fired.wait(TIMEOUT_SEC)
+        assert self.scheduler._thread.is_alive()
+
+
+class TestOrderedCallbackExecutor:
+
+    def setup_method(self, method):
+        self.executor = orderedCallbackExecutor(srcWorkerCount=2)
+        self.lock = Lock()
+        self.calls = []
+
+    def _record(self, key, index, done=None, delay=0):
+        time.sleep(delay)
+        with self.lock:
+            self.calls.append((key, index))
+        if done is not None:
+            done.set()
+
+    def test_invalid_worker_count(self):
+        with pytest.raises(ValueError):
+            orderedCallbackExecutor(srcWorkerCount=0)
+
+    def test_same_key_runs_in_order(self):
+        done = Event()
+        for i in range(50):
+            self.executor.submit(DUMMY_KEY_A, self._record, [DUMMY_KEY_A, i, done if i == 49 else None, 0.001 * (i % 3)])
+
+        assert done.wait(TIMEOUT_SEC)
+        assert self.calls == [(DUMMY_KEY_A, i) for i in range(50)]
+
+    def test_slow_key_does_not_block_other_key(self):
+        slow_started = Event()
+        release_slow = Event()
+        fast_done = Event()
+
+        self.executor.submit(DUMMY_KEY_A, lambda: (slow_started.set(), release_slow.wait(TIMEOUT_SEC)))
+        assert slow_started.wait(TIMEOUT_SEC)
+        self.executor.submit(DUMMY_KEY_B, self._record, [DUMMY_KEY_B, 0, fast_done])
+
+        assert fast_done.wait(TIMEOUT_SEC)
+        release_slow.set()
+
+    def test_worker_count_is_bounded(self):
+        done = Event()
+        for i in range(200):
+            self.executor.submit(i % 20, self._record, [i % 20, i, done if i == 199 else None])
+
+        assert done.wait(TIMEOUT_SEC)
+        assert self.executor.workerCount() <= 2
+
+    def test_callback_exception_does_not_kill_worker(self):
+        done = Event()
+
+        def trouble_maker():
+            raise RuntimeError("Boom")
+
+        self.executor.submit(DUMMY_KEY_A, trouble_maker)
+        self.executor.submit(DUMMY_KEY_A, self._record, [DUMMY_KEY_A, 0, done])
+
+        assert done.wait(TIMEOUT_SEC)
+        assert self.calls == [(DUMMY_KEY_A, 0)]
+
+
+def test_blocking_executor_is_separate_from_callback_executor():
+    assert getSharedBlockingExecutor() is getSharedBlockingExecutor()
+    assert getSharedBlockingExecutor() is not getSharedCallbackExecutor()
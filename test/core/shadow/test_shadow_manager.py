@@ -1,5 +1,7 @@
 from AWSIoTPythonSDK.core.protocol.mqtt_core import MqttCore
 from AWSIoTPythonSDK.core.shadow.shadowManager import shadowManager
+from AWSIoTPythonSDK.core.shadow.shadowManager import shadowRouter
+from AWSIoTPythonSDK.core.protocol.paho.client import MQTTMessage
 try:
     from mock import MagicMock
 except:
@@ -35,6 +37,10 @@ DUMMY_SHADOW_TOPIC_UPDATE_DELTA = DUMMY_SHADOW_TOPIC_UPDATE + "/delta"
 DUMMY_SHADOW_TOPIC_DELETE = DUMMY_SHADOW_TOPIC_PREFIX + "delete"
 DUMMY_SHADOW_TOPIC_DELETE_ACCEPTED = DUMMY_SHADOW_TOPIC_DELETE + "/accepted"
 DUMMY_SHADOW_TOPIC_DELETE_REJECTED = DUMMY_SHADOW_TOPIC_DELETE + "/rejected"
+DUMMY_OTHER_SHADOW_NAME = "OtherShadow"
+DUMMY_OTHER_SHADOW_TOPIC_GET_ACCEPTED = "$aws/things/" + DUMMY_OTHER_SHADOW_NAME + "/shadow/get/accepted"
+DUMMY_ROUTER_TOPIC_FILTER = "$aws/things/+/shadow/#"
+DUMMY_ROUTER_GET_UPDATE_TOPIC_FILTERS = ["$aws/things/+/shadow/get/+", "$aws/things/+/shadow/update/+"]
 
 
 class TestShadowManager:
@@ -57,13 +63,13 @@ class TestShadowManager:
         self.shadow_manager.basicShadowSubscribe(DUMMY_SHADOW_NAME, OP_SHADOW_UPDATE, callback)
         self.shadow_manager.basicShadowSubscribe(DUMMY_SHADOW_NAME, OP_SHADOW_DELETE, callback)
         self.shadow_manager.basicShadowSubscribe(DUMMY_SHADOW_NAME, OP_SHADOW_DELTA, callback)
-        self.mock_mqtt_core.subscribe.assert_has_calls([call(DUMMY_SHADOW_TOPIC_GET_ACCEPTED, 0, callback),
-                                                        call(DUMMY_SHADOW_TOPIC_GET_REJECTED, 0, callback),
-                                                        call(DUMMY_SHADOW_TOPIC_UPDATE_ACCEPTED, 0, callback),
-                                                        call(DUMMY_SHADOW_TOPIC_UPDATE_REJECTED, 0, callback),
-                                                        call(DUMMY_SHADOW_TOPIC_DELETE_ACCEPTED, 0, callback),
-                                                        call(DUMMY_SHADOW_TOPIC_DELETE_REJECTED, 0, callback),
-                                                        call(DUMMY_SHADOW_TOPIC_UPDATE_DELTA, 0, callback)])
+        self.mock_mqtt_core.subscribe_batch.assert_has_calls([call([(DUMMY_SHADOW_TOPIC_GET_ACCEPTED, 0, callback),
+                                                                     (DUMMY_SHADOW_TOPIC_GET_REJECTED, 0, callback)]),
+                                                              call([(DUMMY_SHADOW_TOPIC_UPDATE_ACCEPTED, 0, callback),
+                                                                    (DUMMY_SHADOW_TOPIC_UPDATE_REJECTED, 0, callback)]),
+                                                              call([(DUMMY_SHADOW_TOPIC_DELETE_ACCEPTED, 0, callback),
+                                                                    (DUMMY_SHADOW_TOPIC_DELETE_REJECTED, 0, callback)])])
+        self.mock_mqtt_core.subscribe.assert_called_once_with(DUMMY_SHADOW_TOPIC_UPDATE_DELTA, 0, callback)
 
     def test_basic_shadow_unsubscribe(self):
         self.shadow_manager.basicShadowUnsubscribe(DUMMY_SHADOW_NAME, OP_SHADOW_GET)
@@ -81,3 +87,81 @@ class TestShadowManager:
     def test_unsupported_shadow_action_name(self):
         with pytest.raises(TypeError):
             self.shadow_manager.basicShadowUnsubscribe(DUMMY_SHADOW_NAME, OP_SHADOW_TROUBLE_MAKER)
+
+
+class TestShadowRouter:
+
+    def setup_method(self, test_method):
+        self.mock_mqtt_core = MagicMock(spec=MqttCore)
+        self.shadow_router = shadowRouter(self.mock_mqtt_core)
+
+    def test_topic_filters_subscribed_once(self):
+        self.shadow_router.basicShadowSubscribe(DUMMY_SHADOW_NAME, OP_SHADOW_GET, NonCallableMagicMock())
+        self.shadow_router.basicShadowSubscribe(DUMMY_SHADOW_NAME, OP_SHADOW_DELTA, NonCallableMagicMock())
+        self.shadow_router.basicShadowSubscribe(DUMMY_OTHER_SHADOW_NAME, OP_SHADOW_UPDATE, NonCallableMagicMock())
+
+        self.mock_mqtt_core.subscribe_batch.assert_called_once_with([(DUMMY_ROUTER_TOPIC_FILTER, 0,
+                                                                      self.shadow_router.routeMessage)])
+        assert self.mock_mqtt_core.subscribe.called is False
+
+    def test_route_message_to_registered_shadow_and_action(self):
+        get_callback = MagicMock()
+        delta_callback = MagicMock()
+        other_get_callback = MagicMock()
+        self.shadow_router.basicShadowSubscribe(DUMMY_SHADOW_NAME, OP_SHADOW_GET, get_callback)
+        self.shadow_router.basicShadowSubscribe(DUMMY_SHADOW_NAME, OP_SHADOW_DELTA, delta_callback)
+        self.shadow_router.basicShadowSubscribe(DUMMY_OTHER_SHADOW_NAME, OP_SHADOW_GET, other_get_callback)
+
+        get_rejected = self._create_message(DUMMY_SHADOW_TOPIC_GET_REJECTED)
+        delta = self._create_message(DUMMY_SHADOW_TOPIC_UPDATE_DELTA)
+        other_get_accepted = self._create_message(DUMMY_OTHER_SHADOW_TOPIC_GET_ACCEPTED)
+        for message in (get_rejected, delta, other_get_accepted):
+            self.shadow_router.routeMessage(None, None, message)
+
+        get_callback.assert_called_once_with(None, None, get_rejected)
+        delta_callback.assert_called_once_with(None, None, delta)
+        other_get_callback.assert_called_once_with(None, None, other_get_accepted)
+
+    def test_route_message_ignores_requests_documents_and_unknown_shadows(self):
+        update_callback = MagicMock()
+        self.shadow_router.basicShadowSubscribe(DUMMY_SHADOW_NAME, OP_SHADOW_UPDATE, update_callback)
+
+        for topic in (DUMMY_SHADOW_TOPIC_UPDATE,  # Our own request
+                      DUMMY_SHADOW_TOPIC_UPDATE + "/documents",
+                      "$aws/things/" + DUMMY_OTHER_SHADOW_NAME + "/shadow/update/accepted",
+                      DUMMY_SHADOW_TOPIC_GET_ACCEPTED):
+            self.shadow_router.routeMessage(None, None, self._create_message(topic))
+
+        assert update_callback.called is False
+
+    def test_unsubscribe_stops_routing_without_unsubscribing(self):
+        get_callback = MagicMock()
+        self.shadow_router.basicShadowSubscribe(DUMMY_SHADOW_NAME, OP_SHADOW_GET, get_callback)
+
+        self.shadow_router.basicShadowUnsubscribe(DUMMY_SHADOW_NAME, OP_SHADOW_GET)
+        self.shadow_router.routeMessage(None, None, self._create_message(DUMMY_SHADOW_TOPIC_GET_ACCEPTED))
+
+        assert get_callback.called is False
+        assert self.mock_mqtt_core.unsubscribe.called is False
+
+    def test_actions_outside_topic_filters_subscribe_per_shadow(self):
+        self.shadow_router = shadowRouter(self.mock_mqtt_core, DUMMY_ROUTER_GET_UPDATE_TOPIC_FILTERS)
+        callback = NonCallableMagicMock()
+
+        self.shadow_router.basicShadowSubscribe(DUMMY_SHADOW_NAME, OP_SHADOW_DELTA, callback)  # update/delta is covered
+        self.shadow_router.basicShadowSubscribe(DUMMY_SHADOW_NAME, OP_SHADOW_DELETE, callback)
+        self.shadow_router.basicShadowUnsubscribe(DUMMY_SHADOW_NAME, OP_SHADOW_DELETE)
+
+        self.mock_mqtt_core.subscribe_batch.assert_has_calls([call([(topic_filter, 0, self.shadow_router.routeMessage)
+                                                                    for topic_filter in DUMMY_ROUTER_GET_UPDATE_TOPIC_FILTERS]),
+                                                              call([(DUMMY_SHADOW_TOPIC_DELETE_ACCEPTED, 0, callback),
+                                                                    (DUMMY_SHADOW_TOPIC_DELETE_REJECTED, 0, callback)])])
+        assert self.mock_mqtt_core.subscribe.called is False
+        self.mock_mqtt_core.unsubscribe.assert_has_calls([call(DUMMY_SHADOW_TOPIC_DELETE_ACCEPTED),
+                                                          call(DUMMY_SHADOW_TOPIC_DELETE_REJECTED)])
+
+    def _create_message(self, topic):
+        message = MQTTMessage()
+        message.topic = topic
+        message.payload = DUMMY_PAYLOAD.encode("utf-8")
+        return message
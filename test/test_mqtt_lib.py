@@ -1,18 +1,32 @@
 from AWSIoTPythonSDK.core.protocol.mqtt_core import MqttCore
+from AWSIoTPythonSDK.core.protocol.async_mqtt_core import AsyncMqttCore
 from AWSIoTPythonSDK.MQTTLib import AWSIoTMQTTClient
+from AWSIoTPythonSDK.MQTTLib import AsyncAWSIoTMQTTClient
 from AWSIoTPythonSDK.MQTTLib import AWSIoTMQTTShadowClient
 from AWSIoTPythonSDK.MQTTLib import DROP_NEWEST
+from AWSIoTPythonSDK.MQTTLib import DROP_OLDEST
+from AWSIoTPythonSDK.MQTTLib import INBOUND_QUEUE_DROP_OLDEST_QOS0
+from AWSIoTPythonSDK.MQTTLib import INBOUND_QUEUE_PAUSE_READING
+from AWSIoTPythonSDK.core.shadow.shadowManager import shadowManager
+from AWSIoTPythonSDK.core.shadow.shadowManager import shadowRouter
 try:
     from mock import patch
     from mock import MagicMock
+    from mock import AsyncMock
+    from mock import call
 except:
     from unittest.mock import patch
     from unittest.mock import MagicMock
+    from unittest.mock import AsyncMock
+    from unittest.mock import call
+import asyncio
+import pytest
 
 
 PATCH_MODULE_LOCATION = "AWSIoTPythonSDK.MQTTLib."
 CLIENT_ID = "DefaultClientId"
 SHADOW_CLIENT_ID = "DefaultShadowClientId"
+DUMMY_SHADOW_NAME = "CoolShadow"
 DUMMY_HOST = "dummy.host"
 PORT_443 = 443
 PORT_8883 = 8883
@@ -101,7 +115,7 @@ class TestMqttLibShadowClient:
 
     def test_iot_mqtt_shadow_client_configure_offline_publish_queueing(self):
         # This configurable is done at object initialization. We do not allow customers to configure this.
-        self.mqtt_core_mock.configure_offline_requests_queue.assert_called_once_with(0, DROP_NEWEST)  # Disabled
+        self.mqtt_core_mock.configure_offline_requests_queue.assert_called_once_with(0, DROP_NEWEST, 0)  # Disabled
 
     def test_iot_mqtt_client_configure_draining_frequency(self):
         # This configurable is done at object initialization. We do not allow customers to configure this.
@@ -147,6 +161,26 @@ class TestMqttLibShadowClient:
         self.iot_mqtt_shadow_client.disconnect()
         self.mqtt_core_mock.disconnect.assert_called_once()
 
+    def test_iot_mqtt_shadow_client_configure_shadow_routing(self):
+        plain_shadow_handler = self.iot_mqtt_shadow_client.createShadowHandlerWithName(DUMMY_SHADOW_NAME, True)
+        self.iot_mqtt_shadow_client.configureShadowRouting()
+        routed_shadow_handler = self.iot_mqtt_shadow_client.createShadowHandlerWithName(DUMMY_SHADOW_NAME, True)
+
+        assert type(plain_shadow_handler._shadowManagerHandler) is shadowManager
+        assert isinstance(routed_shadow_handler._shadowManagerHandler, shadowRouter)
+
+    def test_iot_mqtt_shadow_client_create_shadow_handler_with_cache(self):
+        cached_shadow_handler = self.iot_mqtt_shadow_client.createShadowHandlerWithName(DUMMY_SHADOW_NAME, True, enableCache=True)
+        plain_shadow_handler = self.iot_mqtt_shadow_client.createShadowHandlerWithName(DUMMY_SHADOW_NAME, True)
+
+        assert cached_shadow_handler.getCachedState() is None  # Nothing received yet
+        with pytest.raises(ValueError):
+            plain_shadow_handler.getCachedState()
+
+    def test_iot_mqtt_shadow_client_create_shadow_handler_with_negative_coalescing_window(self):
+        with pytest.raises(ValueError):
+            self.iot_mqtt_shadow_client.createShadowHandlerWithName(DUMMY_SHADOW_NAME, True, updateCoalescingWindowSecond=-1)
+
 
 class TestMqttLibMqttClient:
 
@@ -216,12 +250,104 @@ class TestMqttLibMqttClient:
 
     def test_iot_mqtt_client_configure_offline_publish_queueing(self):
         self.iot_mqtt_client.configureOfflinePublishQueueing(DUMMY_QUEUE_SIZE)
-        self.mqtt_core_mock.configure_offline_requests_queue.assert_called_once_with(DUMMY_QUEUE_SIZE, DROP_NEWEST)
+        self.mqtt_core_mock.configure_offline_requests_queue.assert_called_once_with(DUMMY_QUEUE_SIZE, DROP_NEWEST, 0)
+
+    def test_iot_mqtt_client_configure_offline_publish_queueing_bytes(self):
+        self.iot_mqtt_client.configureOfflinePublishQueueing(-1, DROP_NEWEST, 1024)
+        self.mqtt_core_mock.configure_offline_requests_queue.assert_called_once_with(-1, DROP_NEWEST, 1024)
+
+    def test_iot_mqtt_client_configure_persistent_offline_publish_queueing(self):
+        self.iot_mqtt_client.configurePersistentOfflinePublishQueueing("queue", 1024, DROP_OLDEST)
+        self.mqtt_core_mock.configure_persistent_offline_requests_queue.assert_called_once_with("queue", 1024, DROP_OLDEST)
 
     def test_iot_mqtt_client_configure_draining_frequency(self):
         self.iot_mqtt_client.configureDrainingFrequency(DUMMY_DRAINING_FREQUENCY)
         self.mqtt_core_mock.configure_draining_interval_sec.assert_called_once_with(1/float(DUMMY_DRAINING_FREQUENCY))
 
+    def test_iot_mqtt_client_configure_adaptive_draining(self):
+        self.iot_mqtt_client.configureAdaptiveDraining(20)
+        self.mqtt_core_mock.configure_adaptive_draining.assert_called_once_with(20, 10, 10, 1.0)
+
+    def test_iot_mqtt_client_get_draining_progress(self):
+        self.mqtt_core_mock.get_draining_progress.return_value = {"drained": 1}
+        assert self.iot_mqtt_client.getDrainingProgress() == {"drained": 1}
+
+    def test_iot_mqtt_client_configure_max_topics_per_subscribe(self):
+        self.iot_mqtt_client.configureMaxTopicsPerSubscribe(4)
+        self.mqtt_core_mock.configure_max_topics_per_subscribe.assert_called_once_with(4)
+
+    def test_iot_mqtt_client_configure_max_topics_per_subscribe_invalid(self):
+        with pytest.raises(ValueError):
+            self.iot_mqtt_client.configureMaxTopicsPerSubscribe(0)
+
+    def test_iot_mqtt_client_configure_message_dispatch_pool(self):
+        self.iot_mqtt_client.configureMessageDispatchPool(4, DUMMY_QUEUE_SIZE)
+        self.mqtt_core_mock.configure_message_dispatch_pool.assert_called_once_with(4, DUMMY_QUEUE_SIZE)
+
+    def test_iot_mqtt_client_configure_message_dispatch_pool_invalid(self):
+        with pytest.raises(ValueError):
+            self.iot_mqtt_client.configureMessageDispatchPool(-1)
+        self.mqtt_core_mock.configure_message_dispatch_pool.assert_not_called()
+
+    def test_iot_mqtt_client_configure_inbound_queue_limit(self):
+        self.iot_mqtt_client.configureInboundQueueLimit(1000, 1024, INBOUND_QUEUE_DROP_OLDEST_QOS0)
+        self.iot_mqtt_client.configureInboundQueueLimit(10)
+        self.mqtt_core_mock.configure_inbound_queue_limit.assert_has_calls([call(1000, 1024, INBOUND_QUEUE_DROP_OLDEST_QOS0),
+                                                                            call(10, 0, INBOUND_QUEUE_PAUSE_READING)])
+
+    def test_iot_mqtt_client_configure_inbound_queue_limit_invalid(self):
+        with pytest.raises(ValueError):
+            self.iot_mqtt_client.configureInboundQueueLimit(-1)
+        with pytest.raises(ValueError):
+            self.iot_mqtt_client.configureInboundQueueLimit(10, -1)
+        with pytest.raises(ValueError):
+            self.iot_mqtt_client.configureInboundQueueLimit(10, 0, 99)
+        self.mqtt_core_mock.configure_inbound_queue_limit.assert_not_called()
+
+    def test_iot_mqtt_client_get_inbound_dropped_counts(self):
+        self.mqtt_core_mock.get_inbound_dropped_message_count.return_value = 3
+        self.mqtt_core_mock.get_inbound_dropped_byte_count.return_value = 300
+        assert self.iot_mqtt_client.getInboundDroppedMessageCount() == 3
+        assert self.iot_mqtt_client.getInboundDroppedByteCount() == 300
+
+    def test_iot_mqtt_client_configure_message_process_pool(self):
+        self.iot_mqtt_client.configureMessageProcessPool(2)
+        self.mqtt_core_mock.configure_message_process_pool.assert_called_once_with(2, 100, 0.01)
+
+    def test_iot_mqtt_client_subscribe_with_process_handler(self):
+        message_callback = MagicMock()
+        process_callback = MagicMock()
+        process_handler = MagicMock()
+        self.mqtt_core_mock.create_message_process_callback.return_value = process_callback
+
+        self.iot_mqtt_client.subscribe(DUMMY_TOPIC, DUMMY_QOS, message_callback, processHandler=process_handler)
+        self.iot_mqtt_client.subscribeAsync(DUMMY_TOPIC, DUMMY_QOS, messageCallback=message_callback,
+                                            processHandler=process_handler)
+
+        self.mqtt_core_mock.create_message_process_callback.assert_called_with(process_handler, message_callback)
+        self.mqtt_core_mock.subscribe.assert_called_once_with(DUMMY_TOPIC, DUMMY_QOS, process_callback)
+        self.mqtt_core_mock.subscribe_async.assert_called_once_with(DUMMY_TOPIC, DUMMY_QOS, None, process_callback)
+
+    def test_iot_mqtt_client_subscribe_batch(self):
+        batch_callback = MagicMock()
+        message_batcher = MagicMock()
+        self.mqtt_core_mock.create_message_batch_callback.return_value = message_batcher
+
+        self.iot_mqtt_client.subscribeBatch(DUMMY_TOPIC, DUMMY_QOS, batch_callback, 500, 0.5)
+        self.iot_mqtt_client.subscribeBatchAsync(DUMMY_TOPIC, DUMMY_QOS, batchCallback=batch_callback)
+
+        self.mqtt_core_mock.create_message_batch_callback.assert_has_calls([call(batch_callback, 500, 0.5),
+                                                                            call(batch_callback, 100, 0.01)])
+        self.mqtt_core_mock.subscribe.assert_called_once_with(DUMMY_TOPIC, DUMMY_QOS, message_batcher)
+        self.mqtt_core_mock.subscribe_async.assert_called_once_with(DUMMY_TOPIC, DUMMY_QOS, None, message_batcher)
+
+    def test_iot_mqtt_client_subscribe_batch_invalid_arguments(self):
+        with pytest.raises(ValueError):
+            self.iot_mqtt_client.subscribeBatch(DUMMY_TOPIC, DUMMY_QOS, MagicMock(), 0)
+        with pytest.raises(ValueError):
+            self.iot_mqtt_client.subscribeBatch(DUMMY_TOPIC, DUMMY_QOS, MagicMock(), 10, -1)
+        self.mqtt_core_mock.subscribe.assert_not_called()
+
     def test_iot_mqtt_client_configure_connect_disconnect_timeout(self):
         self.iot_mqtt_client.configureConnectDisconnectTimeout(DUMMY_TIMEOUT_SEC)
         self.mqtt_core_mock.configure_connect_disconnect_timeout_sec.assert_called_once_with(DUMMY_TIMEOUT_SEC)
@@ -302,3 +428,45 @@ class TestMqttLibMqttClient:
         unsuback_callback = MagicMock()
         self.iot_mqtt_client.unsubscribeAsync(DUMMY_TOPIC, unsuback_callback)
         self.mqtt_core_mock.unsubscribe_async.assert_called_once_with(DUMMY_TOPIC, unsuback_callback)
+
+
+class TestMqttLibAsyncClient:
+
+    def setup_method(self, test_method):
+        self.mqtt_core_patcher = patch(PATCH_MODULE_LOCATION + "AsyncMqttCore", spec=AsyncMqttCore)
+        self.mock_mqtt_core_constructor = self.mqtt_core_patcher.start()
+        self.mqtt_core_mock = MagicMock()
+        self.mqtt_core_mock.connect = AsyncMock(return_value=True)
+        self.mqtt_core_mock.publish = AsyncMock(return_value=True)
+        self.mqtt_core_mock.subscribe = AsyncMock(return_value=True)
+        self.mock_mqtt_core_constructor.return_value = self.mqtt_core_mock
+        self.async_iot_mqtt_client = AsyncAWSIoTMQTTClient(CLIENT_ID)
+
+    def teardown_method(self, test_method):
+        self.mqtt_core_patcher.stop()
+
+    def test_async_iot_mqtt_client_connect_default_keepalive(self):
+        assert asyncio.run(self.async_iot_mqtt_client.connect()) is True
+        self.mqtt_core_mock.connect.assert_awaited_once_with(DEFAULT_KEEPALIVE_SEC)
+        assert self.mqtt_core_mock.on_online == self.async_iot_mqtt_client.onOnline
+
+    def test_async_iot_mqtt_client_auto_enable_alpn_over_443(self):
+        self.async_iot_mqtt_client.configureEndpoint(hostName=DUMMY_HOST, portNumber=PORT_443)
+        self.mqtt_core_mock.configure_alpn_protocols.assert_called_once()
+
+    def test_async_iot_mqtt_client_configure_max_topics_per_subscribe(self):
+        self.async_iot_mqtt_client.configureMaxTopicsPerSubscribe(4)
+        self.mqtt_core_mock.configure_max_topics_per_subscribe.assert_called_once_with(4)
+
+    def test_async_iot_mqtt_client_publish(self):
+        asyncio.run(self.async_iot_mqtt_client.publish(DUMMY_TOPIC, DUMMY_PAYLOAD, DUMMY_QOS))
+        self.mqtt_core_mock.publish.assert_awaited_once_with(DUMMY_TOPIC, DUMMY_PAYLOAD, DUMMY_QOS, False)
+
+    def test_async_iot_mqtt_client_subscribe(self):
+        message_callback = MagicMock()
+        asyncio.run(self.async_iot_mqtt_client.subscribe(DUMMY_TOPIC, DUMMY_QOS, message_callback))
+        self.mqtt_core_mock.subscribe.assert_awaited_once_with(DUMMY_TOPIC, DUMMY_QOS, message_callback)
+
+    def test_async_iot_mqtt_client_messages(self):
+        self.async_iot_mqtt_client.messages(DUMMY_TOPIC)
+        self.mqtt_core_mock.message_stream.assert_called_once_with(DUMMY_TOPIC, 0)